@@ -1,4 +1,24 @@
-"""Make pre-defined comments on Differential revisions."""
+"""Make pre-defined comments on Differential revisions.
+
+Processing a branch often makes several comments on the same revision, e.g.
+'created' followed by some warnings. Each comment is a separate write to
+Conduit, so comments made within 'buffered_context' are combined and posted
+as a single comment when the context exits.
+
+Usage example:
+
+    >>> class FakeConduit(object):
+    ...     def create_comment(self, revision, message, silent=False):
+    ...         print(revision, message.count('---'), silent)
+    >>> commenter = Commenter(FakeConduit(), 1)
+    >>> with commenter.buffered_context():
+    ...     commenter.updatedReview('abc123', 'mybranch')
+    ...     commenter.abandonedForUser('mybranch', 'abc123', 'refs/x')
+    ...     print('nothing posted yet')
+    nothing posted yet
+    1 1 False
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -6,6 +26,7 @@
 #
 # Public Classes:
 #   Commenter
+#    .buffered_context
 #    .exception
 #    .userWarnings
 #    .failedCreateReview
@@ -27,6 +48,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import contextlib
+
 import phlcon_remarkup
 
 import abdt_differ
@@ -83,6 +106,10 @@ if this review is accepted then nothing will be landed.
 if the branch is pushed again then a completely new review will be created.
 """.strip()
 
+# separate combined comments with a horizontal rule, so that it's clear where
+# each one begins
+_COMBINED_COMMENT_SEPARATOR = "\n\n---\n\n"
+
 
 class Commenter(object):
 
@@ -98,6 +125,38 @@ class Commenter(object):
         self._conduit = conduit
         self._revision_id = revision_id
 
+        # a list of (message, silent) while buffering, None otherwise
+        self._buffered_comments = None
+
+    @contextlib.contextmanager
+    def buffered_context(self):
+        """Post the comments made within the context as a single comment.
+
+        The combined comment is silent only if all of the comments were
+        silent. Comments are posted even if the context exits by exception,
+        as they would have been when unbuffered. Nested contexts are combined
+        into the outermost one.
+
+        :returns: a context manager
+
+        """
+        if self._buffered_comments is not None:
+            yield
+            return
+
+        self._buffered_comments = []
+        try:
+            yield
+        finally:
+            comments = self._buffered_comments
+            self._buffered_comments = None
+            if comments:
+                message = _COMBINED_COMMENT_SEPARATOR.join(
+                    m.strip() for m, _ in comments)
+                silent = all(s for _, s in comments)
+                self._conduit.create_comment(
+                    self._revision_id, message, silent=silent)
+
     def exception(self, e):
         if isinstance(e, abdt_exception.AbdBaseException):
             if isinstance(e, abdt_exception.CommitMessageParseException):
@@ -123,20 +182,9 @@ class Commenter(object):
             self._createComment(message)
 
     def userWarnings(self, user_warning_list):
-        for warning in user_warning_list:
-            if isinstance(warning, abdt_userwarning.UsedDefaultTestPlan):
-                self.usedDefaultTestPlan(warning.default_message)
-            elif isinstance(warning, abdt_userwarning.SelfReviewer):
-                self.removedSelfReviewer(warning.user, warning.commit_message)
-            elif isinstance(warning, abdt_userwarning.UnknownReviewers):
-                self.unknownReviewers(
-                    warning.unknown_reviewers, warning.commit_message)
-            elif isinstance(warning, abdt_userwarning.LargeDiff):
-                self.largeDiff(
-                    warning.diff_result)
-            else:
-                message = "unhandled user warning: " + str(warning)
-                self._createComment(message)
+        with self.buffered_context():
+            for warning in user_warning_list:
+                self._userWarning(warning)
 
     def failedCreateReview(
             self, repo_name, branch_hash, branch_name, branch_url, exception):
@@ -158,8 +206,9 @@ failed to create revision from:
                 name=phlcon_remarkup.monospaced(branch_name),
                 url=phlcon_remarkup.link(branch_url))
 
-        self._createComment(message)
-        self.exception(exception)
+        with self.buffered_context():
+            self._createComment(message)
+            self.exception(exception)
 
     def createdReview(
             self,
@@ -380,7 +429,26 @@ the 'edit revision' link at the top-right of the page.
         self._createComment(message)
 
     def _createComment(self, message, silent=False):
-        self._conduit.create_comment(self._revision_id, message, silent=silent)
+        if self._buffered_comments is not None:
+            self._buffered_comments.append((message, silent))
+        else:
+            self._conduit.create_comment(
+                self._revision_id, message, silent=silent)
+
+    def _userWarning(self, warning):
+        if isinstance(warning, abdt_userwarning.UsedDefaultTestPlan):
+            self.usedDefaultTestPlan(warning.default_message)
+        elif isinstance(warning, abdt_userwarning.SelfReviewer):
+            self.removedSelfReviewer(warning.user, warning.commit_message)
+        elif isinstance(warning, abdt_userwarning.UnknownReviewers):
+            self.unknownReviewers(
+                warning.unknown_reviewers, warning.commit_message)
+        elif isinstance(warning, abdt_userwarning.LargeDiff):
+            self.largeDiff(
+                warning.diff_result)
+        else:
+            message = "unhandled user warning: " + str(warning)
+            self._createComment(message)
 
     def _commitMessageParseException(self, e):
         message = "errors were encountered, see below.\n"
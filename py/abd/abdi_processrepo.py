@@ -99,16 +99,12 @@ def create_review(conduit, branch):
     if diff_result.reduction_list:
         user_warnings.append(abdt_userwarning.LargeDiff(diff_result))
 
-    revisionid = create_differential_review(
-        conduit, user, parsed, branch, raw_diff)
+    create_differential_review(
+        conduit, user, parsed, branch, raw_diff, user_warnings)
 
-    commenter = abdcmnt_commenter.Commenter(conduit, revisionid)
 
-    if user_warnings:
-        commenter.userWarnings(user_warnings)
-
-
-def create_differential_review(conduit, user, parsed, branch, raw_diff):
+def create_differential_review(
+        conduit, user, parsed, branch, raw_diff, user_warnings=None):
     _LOGGER.debug("- creating revision")
     revision_id = conduit.create_revision_as_user(
         raw_diff, parsed.fields, user)
@@ -118,12 +114,15 @@ def create_differential_review(conduit, user, parsed, branch, raw_diff):
 
     _LOGGER.debug("- commenting on {}".format(revision_id))
     commenter = abdcmnt_commenter.Commenter(conduit, revision_id)
-    commenter.createdReview(
-        branch.get_repo_name(),
-        branch.review_branch_hash(),
-        branch.review_branch_name(),
-        branch.base_branch_name(),
-        branch.get_browse_url())
+    with commenter.buffered_context():
+        commenter.createdReview(
+            branch.get_repo_name(),
+            branch.review_branch_hash(),
+            branch.review_branch_name(),
+            branch.base_branch_name(),
+            branch.get_browse_url())
+        if user_warnings:
+            commenter.userWarnings(user_warnings)
 
     return revision_id
 
@@ -193,11 +192,12 @@ def update_in_review(conduit, branch):
 
     _LOGGER.debug("- commenting on revision {}".format(review_id_str))
     commenter = abdcmnt_commenter.Commenter(conduit, review_id)
-    commenter.updatedReview(
-        branch.review_branch_hash(),
-        branch.review_branch_name())
-    if user_warnings:
-        commenter.userWarnings(user_warnings)
+    with commenter.buffered_context():
+        commenter.updatedReview(
+            branch.review_branch_hash(),
+            branch.review_branch_name())
+        if user_warnings:
+            commenter.userWarnings(user_warnings)
 
 
 def land(conduit, branch):
@@ -320,6 +320,15 @@ def process_abandoned_branch(conduit, branch):
 
 
 def process_branches(branches, conduit, mailer):
+    # query the states of all the reviews at once, rather than one at a time
+    # as each branch is processed
+    review_id_list = [
+        review_id for review_id in (b.review_id_or_none() for b in branches)
+        if review_id is not None
+    ]
+    if review_id_list:
+        conduit.prefetch_review_states(review_id_list)
+
     for branch in branches:
         if branch.is_abandoned():
             process_abandoned_branch(conduit, branch)
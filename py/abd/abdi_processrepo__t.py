@@ -38,6 +38,7 @@ import abdi_processrepo
 # [ B] processUpdateRepo doesn't leave the current branch set after processing
 # [ L] processUpdateRepo can handle a branch with only empty commits
 # [ M] processUpdateRepo won't emit errors in a cycle when landing w/o author
+# [ N] processUpdateRepo combines the comments for a new review with warnings
 # [  ] processUpdateRepo can handle a review without commits in repo
 # [  ] processUpdateRepo will comment on a bad branch if the error has changed
 # -----------------------------------------------------------------------------
@@ -55,6 +56,7 @@ import abdi_processrepo
 # [ K] test_K_ExceptionDuringProcessing
 # [ L] test_L_EmptyDiff
 # [ M] test_M_NoLandingAuthor
+# [ N] test_N_CombinedComments
 # =============================================================================
 
 
@@ -324,6 +326,38 @@ class Test(unittest.TestCase):
         # ensure that the review is landed
         self.assertTrue(branch.is_null())
 
+    def test_N_CombinedComments(self):
+        branch, branch_data = abdt_branchmock.create_simple_new_review()
+
+        def no_test_plan_parse_commit_message(self, unused_message):
+            return phlcon_differential.ParseCommitMessageResponse(
+                fields={'title': 'title'},
+                errors=[
+                    "Invalid or missing field 'Test Plan': "
+                    "You must provide a test plan."])
+
+        comment_list = []
+
+        def create_comment(self, revision, message, silent=False):
+            comment_list.append((revision, message, silent))
+
+        self.conduit.parse_commit_message = types.MethodType(
+            no_test_plan_parse_commit_message, self.conduit)
+        self.conduit.create_comment = types.MethodType(
+            create_comment, self.conduit)
+
+        self._process_branches([branch])
+        self.assertFalse(branch.is_status_bad())
+
+        # the 'created' comment and the test plan warning are one comment,
+        # which is silent as both of them are
+        self.assertEqual(len(comment_list), 1)
+        revision, message, silent = comment_list[0]
+        self.assertEqual(revision, branch_data.revision_id)
+        self.assertIn('created revision', message)
+        self.assertIn('test plan could not be determined', message)
+        self.assertTrue(silent)
+
 
 # factors affecting a review:
 #  age of the revisions
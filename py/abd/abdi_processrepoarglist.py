@@ -22,13 +22,20 @@ import logging
 import multiprocessing
 import os
 import time
+import urlparse
 
+import phlcon_emailusercache
 import phlcon_reviewstatecache
+import phlgitu_refdelta
 import phlgitx_refcache
+import phlgitx_stalelocks
+import phlmp_boundedjobs
 import phlmp_cyclingpool
 import phlsys_conduit
+import phlsys_conduitsessions
 import phlsys_fs
 import phlsys_git
+import phlsys_gitobjectreader
 import phlsys_strtotime
 import phlsys_subprocess
 import phlsys_timer
@@ -44,6 +51,7 @@ import abdt_exhandlers
 import abdt_fs
 import abdt_git
 import abdt_logging
+import abdt_metrics
 import abdt_rbranchnaming
 import abdt_tryloop
 
@@ -54,6 +62,13 @@ import abdi_repoargs
 
 _LOGGER = logging.getLogger(__name__)
 
+_MIN_IDLE_BACKOFF = datetime.timedelta(seconds=10)
+
+# review state refreshes which overrun the refresh timeout are left running so
+# that their results may be used on a later cycle, unless they take longer
+# than this, in which case they're stopped and a fresh one is started
+_MAX_REFRESH_SECS = 600
+
 
 def do(
         repo_configs,
@@ -63,11 +78,27 @@ def do(
         external_report_command,
         mail_sender,
         max_workers,
-        overrun_secs):
-
-    conduit_manager = _ConduitManager()
+        overrun_secs,
+        persistent_workers=False,
+        max_idle_backoff_secs=0,
+        repo_shard=None,
+        conduit_refresh_timeout_secs=30,
+        max_fetch_workers=0,
+        max_fetches_per_host=1,
+        fetch_timeout_secs=600,
+        conduit_max_concurrent_calls=5,
+        conduit_max_calls_per_sec=0,
+        diff_cache_max_bytes=32 * 1024 * 1024,
+        diff_cache_dir=None):
 
     fs_accessor = abdt_fs.make_default_accessor()
+
+    conduit_manager = _ConduitManager(
+        conduit_refresh_timeout_secs,
+        fs_accessor.layout.usercache,
+        fs_accessor.layout.conduit_sessions,
+        conduit_max_concurrent_calls,
+        conduit_max_calls_per_sec)
     url_watcher_wrapper = phlurl_watcher.FileCacheWatcherWrapper(
         fs_accessor.layout.urlwatcher_cache_path)
 
@@ -75,6 +106,10 @@ def do(
     if max_workers == 0:
         max_workers = determine_max_workers_default()
 
+    # keep the diffs of all the repos within one budget
+    diff_result_store = abdt_differresultcache.ResultStore(
+        diff_cache_max_bytes, diff_cache_dir)
+
     repo_list = []
     for name, config in repo_configs:
         repo_list.append(
@@ -84,15 +119,84 @@ def do(
                 conduit_manager,
                 url_watcher_wrapper,
                 sys_admin_emails,
-                mail_sender))
+                mail_sender,
+                max_idle_backoff_secs,
+                diff_result_store,
+                repo_shard))
 
     # if we always overrun half our workers then the loop is sustainable, if we
     # overrun more than that then we'll be lagging too far behind. In the event
     # that we only have one worker then we can't overrun any.
     max_overrun_workers = max_workers // 2
 
-    pool = phlmp_cyclingpool.CyclingPool(
-        repo_list, max_workers, max_overrun_workers)
+    # start the repos which are likely to have the most work first
+    def schedule_key(index):
+        return repo_list[index].get_schedule_key()
+
+    # only process the repos we own, if we're sharing them with other
+    # instances of arcyd
+    repo_name_list = [name for name, _ in repo_configs]
+    owned_repo_set = set(repo_name_list)
+
+    # fetch repos in the background, the processing workers carry on with
+    # the other repos meanwhile and pick up each repo after its fetch
+    prefetcher = None
+    if max_fetch_workers:
+        prefetcher = phlmp_boundedjobs.BoundedJobs(
+            max_fetch_workers, max_fetches_per_host, fetch_timeout_secs)
+
+    # leave idle repos alone until they're due to be polled again
+    def is_repo_due(index):
+        if repo_name_list[index] not in owned_repo_set:
+            return False
+        if prefetcher is not None and index in prefetcher.job_ids:
+            return False
+        return repo_list[index].is_due()
+
+    if persistent_workers:
+        pool = phlmp_cyclingpool.PreforkCyclingPool(
+            repo_list,
+            max_workers,
+            max_overrun_workers,
+            schedule_key,
+            is_repo_due)
+    else:
+        pool = phlmp_cyclingpool.CyclingPool(
+            repo_list,
+            max_workers,
+            max_overrun_workers,
+            schedule_key,
+            is_repo_due)
+
+    # record where the time goes in each cycle, and in total for each repo
+    cycle_metrics = abdt_metrics.Recorder()
+    total_metrics = abdt_metrics.Recorder()
+    repo_metrics_list = [abdt_metrics.Recorder() for _ in repo_list]
+
+    def merge_repo_metrics(index):
+        repo_metrics_data = repo_list[index].metrics_data
+        cycle_metrics.merge_data(repo_metrics_data)
+        repo_metrics_list[index].merge_data(repo_metrics_data)
+
+    def poll_prefetches():
+        if prefetcher is None:
+            return
+        for i, result in prefetcher.poll_results():
+            if _merge_prefetch_result(
+                    repo_list[i], result, fetch_timeout_secs):
+                merge_repo_metrics(i)
+
+    # fetching and processing may take longer than our leases last, renew
+    # them while we wait so that other instances don't take over our repos
+    # in the meantime
+    def renew_repo_shard():
+        if repo_shard is None:
+            return
+        owned_repo_set.intersection_update(repo_shard.renew())
+
+    def on_wait():
+        renew_repo_shard()
+        poll_prefetches()
 
     cycle_timer = phlsys_timer.Timer()
     cycle_timer.start()
@@ -105,27 +209,74 @@ def do(
         sleep_timer = phlsys_timer.Timer()
         sleep_timer.start()
 
-        # refresh git snoops
-        with abdt_logging.remote_io_read_event_context(
-                'refresh-git-snoop', ''):
-            abdt_tryloop.critical_tryloop(
-                url_watcher_wrapper.watcher.refresh,
-                abdt_errident.GIT_SNOOP,
-                '')
-
-        with abdt_logging.remote_io_read_event_context('refresh-conduit', ''):
-            conduit_manager.refresh_conduits()
-
-        with abdt_logging.misc_operation_event_context(
-                'process-repos',
-                '{} workers, {} repos'.format(max_workers, len(repo_list))):
-            if max_workers > 1:
-                for i, res in pool.cycle_results(overrun_secs=overrun_secs):
-                    repo = repo_list[i]
-                    repo.merge_from_worker(res)
-            else:
-                for r in repo_list:
-                    r()
+        with abdt_metrics.recorder_context(cycle_metrics):
+
+            # refresh git snoops
+            with abdt_logging.remote_io_read_event_context(
+                    'refresh-git-snoop', ''):
+                abdt_tryloop.critical_tryloop(
+                    url_watcher_wrapper.watcher.refresh,
+                    abdt_errident.GIT_SNOOP,
+                    '')
+
+            with abdt_logging.remote_io_read_event_context(
+                    'refresh-conduit', ''):
+                conduit_manager.refresh_conduits()
+
+            if repo_shard is not None:
+                with abdt_logging.remote_io_read_event_context(
+                        'update-repo-shard', ''):
+                    busy_index_set = set(pool.active_job_indices)
+                    if prefetcher is not None:
+                        busy_index_set |= prefetcher.job_ids
+                    busy_repo_set = set(
+                        repo_name_list[i] for i in busy_index_set)
+                    owned_repo_set.clear()
+                    owned_repo_set.update(
+                        repo_shard.update(repo_name_list, busy_repo_set))
+
+            if prefetcher is not None:
+                # merge the fetches which finished since the last cycle, so
+                # that those repos are processed in this one
+                poll_prefetches()
+                fetch_index_list = [
+                    i for i in xrange(len(repo_list))
+                    if i not in pool.active_job_indices and
+                    is_repo_due(i) and
+                    repo_list[i].is_prefetch_due()
+                ]
+                with abdt_logging.misc_operation_event_context(
+                        'prefetch-repos',
+                        '{} workers, {} repos'.format(
+                            max_fetch_workers, len(fetch_index_list))):
+                    for i in fetch_index_list:
+                        prefetcher.add_job(
+                            i, repo_list[i].prefetch, repo_list[i].fetch_host)
+                    poll_prefetches()
+
+            with abdt_logging.misc_operation_event_context(
+                    'process-repos',
+                    '{} workers, {} repos'.format(
+                        max_workers, len(repo_list))):
+                if max_workers > 1:
+                    cycle_results = pool.cycle_results(
+                        overrun_secs=overrun_secs, on_wait=on_wait)
+                    for i, res in cycle_results:
+                        repo = repo_list[i]
+                        repo.merge_from_worker(res)
+                        merge_repo_metrics(i)
+                    num_skipped_repos = pool.num_skipped_jobs
+                else:
+                    num_skipped_repos = 0
+                    repo_order = sorted(
+                        xrange(len(repo_list)), key=schedule_key)
+                    for i in repo_order:
+                        if is_repo_due(i):
+                            repo_list[i]()
+                            merge_repo_metrics(i)
+                        else:
+                            num_skipped_repos += 1
+                        on_wait()
 
         # important to do this before stopping arcyd and as soon as possible
         # after doing fetches
@@ -135,8 +286,20 @@ def do(
         report = {
             "cycle_time_secs": cycle_timer.restart(),
             "overrun_jobs": pool.num_active_jobs,
+            "skipped_repos": num_skipped_repos,
+            "owned_repos": len(owned_repo_set),
         }
         _LOGGER.debug("cycle-stats: {}".format(report))
+
+        total_metrics.merge_data(cycle_metrics.get_data())
+        _write_metrics_file(
+            fs_accessor.layout.metrics,
+            report,
+            cycle_metrics,
+            total_metrics,
+            repo_name_list,
+            repo_metrics_list)
+        cycle_metrics = abdt_metrics.Recorder()
         if external_report_command:
             report_json = json.dumps(report)
             full_path = os.path.abspath(external_report_command)
@@ -174,10 +337,22 @@ def do(
                     'sleep', secs_to_sleep):
                 time.sleep(secs_to_sleep)
 
+    # abandon any fetches, the repos will be fetched again when we restart
+    if prefetcher is not None:
+        for i in prefetcher.stop():
+            repo_list[i].remove_stale_git_locks()
+
     # finish any jobs that overran
-    for i, res in pool.finish_results():
+    for i, res in pool.finish_results(on_wait=renew_repo_shard):
         repo = repo_list[i]
         repo.merge_from_worker(res)
+        merge_repo_metrics(i)
+
+    conduit_manager.finish_refreshes()
+
+    # let other instances take over our repos straight away
+    if repo_shard is not None:
+        repo_shard.release_all()
 
     # important to do this before stopping arcyd and as soon as
     # possible after doing fetches
@@ -186,6 +361,54 @@ def do(
     return exit_code
 
 
+def _merge_prefetch_result(repo, result, timeout_secs):
+    """Merge the 'result' of prefetching 'repo', return False if it failed.
+
+    :repo: the _ArcydManagedRepository which was prefetched
+    :result: the result from phlmp_boundedjobs, None if the job failed
+    :timeout_secs: the number of seconds after which fetches are abandoned
+    :returns: True if the result was merged, False otherwise
+
+    """
+    if result is None:
+        _LOGGER.warning(
+            'repo-event: {} prefetch timed out after {} secs or died, it '
+            'will be fetched again next cycle'.format(repo.name, timeout_secs))
+
+        # the fetch may have been killed before git could clean up, nothing
+        # else uses the repo while it's being prefetched so it's safe to
+        # remove its locks before the repo is processed
+        repo.remove_stale_git_locks()
+        return False
+
+    repo.merge_prefetch(result)
+    return True
+
+
+def _write_metrics_file(
+        path,
+        report,
+        cycle_metrics,
+        total_metrics,
+        repo_name_list,
+        repo_metrics_list):
+
+    metrics = {
+        "cycle": report,
+        "cycle_phases": cycle_metrics.to_json_dict(),
+        "total_phases": total_metrics.to_json_dict(),
+        "repo_total_phases": {
+            name: recorder.to_json_dict()
+            for name, recorder in zip(repo_name_list, repo_metrics_list)
+        },
+        "cycle_conduit_calls": cycle_metrics.conduit_calls.to_json_dict(),
+        "total_conduit_calls": total_metrics.conduit_calls.to_json_dict(),
+    }
+
+    phlsys_fs.write_text_file_atomic(
+        path, json.dumps(metrics, sort_keys=True, indent=1))
+
+
 def determine_max_workers_default():
     max_workers = 1
     try:
@@ -265,6 +488,36 @@ class _RepoActiveRetryState(object):
         self._retry_delays = self._original_retry_delays[:]
 
 
+class _RepoIdleBackoff(object):
+
+    """Determine when to next poll a repo which has been idle."""
+
+    def __init__(self, max_delay_secs):
+        self._max_delay = datetime.timedelta(seconds=max_delay_secs)
+        self._delay = datetime.timedelta()
+        self._next_poll_time = None
+
+    def is_due(self):
+        if self._next_poll_time is None:
+            return True
+        return datetime.datetime.utcnow() >= self._next_poll_time
+
+    def note_idle(self):
+        if not self._max_delay:
+            return
+        self._delay = min(
+            max(self._delay * 2, _MIN_IDLE_BACKOFF), self._max_delay)
+        self._next_poll_time = datetime.datetime.utcnow() + self._delay
+
+    def note_busy(self):
+        self._delay = datetime.timedelta()
+        self._next_poll_time = None
+
+    @property
+    def delay(self):
+        return self._delay
+
+
 class _ArcydManagedRepository(object):
 
     def __init__(
@@ -274,13 +527,17 @@ class _ArcydManagedRepository(object):
             conduit_manager,
             url_watcher_wrapper,
             sys_admin_emails,
-            mail_sender):
+            mail_sender,
+            max_idle_backoff_secs=0,
+            diff_result_store=None,
+            repo_shard=None):
 
         self._active_state = _RepoActiveRetryState(
             retry_timestr_list=["10 seconds", "10 minutes", "1 hours"])
         sys_repo = phlsys_git.Repo(repo_args.repo_path)
         self._refcache_repo = phlgitx_refcache.Repo(sys_repo)
-        self._differ_cache = abdt_differresultcache.Cache(self._refcache_repo)
+        self._differ_cache = abdt_differresultcache.Cache(
+            self._refcache_repo, diff_result_store, repo_name)
         self._abd_repo = abdt_git.Repo(
             self._refcache_repo,
             self._differ_cache,
@@ -288,6 +545,7 @@ class _ArcydManagedRepository(object):
             repo_args.repo_desc)
         self._name = repo_name
         self._args = repo_args
+        self._repo_shard = repo_shard
         self._conduit_manager = conduit_manager
 
         conduit_cache = conduit_manager.get_conduit_and_cache_for_args(
@@ -299,12 +557,207 @@ class _ArcydManagedRepository(object):
         self._mail_sender = mail_sender
         self._on_exception = abdt_exhandlers.make_exception_delay_handler(
             sys_admin_emails, repo_name)
+        self._num_active_reviews = 0
+        self._last_process_secs = 0.0
+        self._idle_backoff = _RepoIdleBackoff(max_idle_backoff_secs)
+        self._metrics_data = abdt_metrics.Recorder().get_data()
+        self._is_prefetched = False
+        self._prefetch_hash_ref_delta = None
+
+        # the generation of the review cache when we last sent it to a
+        # worker, warm workers only need the changes since then
+        self._review_sync_generation = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def fetch_host(self):
+        """Return the host that the repo is fetched from, '' if local."""
+        return _get_url_host(abdi_repoargs.get_repo_url(self._args))
+
+    @property
+    def metrics_data(self):
+        """Return the abdt_metrics data recorded when last processed."""
+        return self._metrics_data
+
+    def is_due(self):
+        """Return True if this repo should be processed in the next cycle.
+
+        Repos which were idle when last processed are backed off, they are
+        due again once the backoff expires or as soon as their snoop url
+        reports a change. Repos with active reviews are always due, so that
+        changes in the state of their reviews are noticed promptly. Repos
+        which were prefetched are due, as the change has been consumed. Repos
+        are never due if their conduit failed to refresh its review states.
+
+        :returns: True if the repo should be processed
+
+        """
+        # don't act on review states which we failed to refresh
+        if not self._conduit_manager.is_refreshed_for_args(self._args):
+            return False
+
+        if self._num_active_reviews or self._is_prefetched:
+            return True
+
+        snoop_url = abdi_repoargs.get_repo_snoop_url(self._args)
+        watcher = self._url_watcher_wrapper.watcher
+        if snoop_url and watcher.is_url_known(snoop_url):
+            if watcher.peek_has_url_recently_changed(snoop_url):
+                return True
+
+        return self._idle_backoff.is_due()
+
+    def is_prefetch_due(self):
+        """Return True if this repo should be fetched before processing.
+
+        Only enabled repos whose snoop url reports a change are prefetched,
+        other repos are fetched by the processing workers as usual.
+
+        :returns: True if the repo should be prefetched
+
+        """
+        if not self._active_state.is_active:
+            return False
+        snoop_url = abdi_repoargs.get_repo_snoop_url(self._args)
+        watcher = self._url_watcher_wrapper.watcher
+        if not snoop_url or not watcher.is_url_known(snoop_url):
+            return False
+        return watcher.peek_has_url_recently_changed(snoop_url)
+
+    def prefetch(self):
+        """Fetch the repo, return the changes to merge with 'merge_prefetch'.
+
+        This is intended to be called in a separate process, failures are
+        logged and left for the processing worker to retry and report.
+
+        :returns: a picklable object to pass to 'merge_prefetch'
+
+        """
+        old_hash_ref_pairs = self._refcache_repo.peek_hash_ref_pairs()
+
+        metrics = abdt_metrics.Recorder()
+        if not self._is_owned():
+            return False, None, metrics.get_data()
+
+        with abdt_metrics.recorder_context(metrics):
+            try:
+                with abdt_metrics.phase_context('prefetch'):
+                    self._abd_repo.checkout_master_fetch_prune()
+                new_hash_ref_pairs = self._abd_repo.hash_ref_pairs
+            except Exception as e:
+                _LOGGER.warning(
+                    'repo-event: {} prefetch failed, leaving it to the '
+                    'worker: {}'.format(self._name, e))
+                return False, None, metrics.get_data()
+            finally:
+                self._close_git_processes()
+
+        hash_ref_delta = _make_hash_ref_delta(
+            old_hash_ref_pairs, new_hash_ref_pairs)
+        return True, hash_ref_delta, metrics.get_data()
+
+    def merge_prefetch(self, result):
+        is_fetched, hash_ref_delta, metrics_data = result
+        self._metrics_data = metrics_data
+
+        if is_fetched:
+            self._refcache_repo.set_hash_ref_pairs(
+                _apply_hash_ref_delta(
+                    self._refcache_repo.peek_hash_ref_pairs(),
+                    hash_ref_delta))
+            self._prefetch_hash_ref_delta = hash_ref_delta
+
+            # consume the 'newness' of the repo, so the worker won't fetch
+            # again, and remember to process it
+            snoop_url = abdi_repoargs.get_repo_snoop_url(self._args)
+            self._url_watcher_wrapper.watcher.has_url_recently_changed(
+                snoop_url)
+            self._is_prefetched = True
+
+    def get_schedule_key(self):
+        """Return a key to sort repos by, such that busy repos are first.
+
+        Repos whose snoop url has changed are likely to have new branches to
+        process, followed by repos with active reviews which may need
+        landing or updating. Within those groups, repos which took longest to
+        process last time are first.
+
+        :returns: a tuple suitable for comparing with other keys
+
+        """
+        is_snoop_changed = True
+        snoop_url = abdi_repoargs.get_repo_snoop_url(self._args)
+        watcher = self._url_watcher_wrapper.watcher
+        if snoop_url and watcher.is_url_known(snoop_url):
+            is_snoop_changed = watcher.peek_has_url_recently_changed(snoop_url)
+        is_snoop_changed = is_snoop_changed or self._is_prefetched
+
+        return (
+            not is_snoop_changed,
+            not self._num_active_reviews,
+            -self._last_process_secs,
+        )
 
     def __call__(self):
         watcher = _RecordingWatcherWrapper(
             self._url_watcher_wrapper.watcher)
 
         old_active_reviews = set(self._review_cache.active_reviews)
+        old_review_generation = self._review_cache.generation
+        old_hash_ref_pairs = self._refcache_repo.peek_hash_ref_pairs()
+        was_prefetched = self._is_prefetched
+        self._is_prefetched = False
+
+        process_timer = phlsys_timer.Timer()
+        process_timer.start()
+
+        metrics = abdt_metrics.Recorder()
+        try:
+            with abdt_metrics.recorder_context(metrics):
+                with abdt_metrics.phase_context('process-repo'):
+                    is_processed = self._process_if_active(watcher)
+        finally:
+            self._close_git_processes()
+        self._metrics_data = metrics.get_data()
+
+        # note these here as well as in 'merge_from_worker', in case we're not
+        # running in a worker
+        new_active_reviews = (
+            self._review_cache.active_reviews - old_active_reviews)
+        self._num_active_reviews = len(new_active_reviews)
+        self._last_process_secs = process_timer.duration
+
+        # we were idle if nothing changed and there's nothing to follow up
+        new_hash_ref_pairs = self._refcache_repo.peek_hash_ref_pairs()
+        is_idle = (
+            is_processed and
+            not was_prefetched and
+            not new_active_reviews and
+            old_hash_ref_pairs is not None and
+            old_hash_ref_pairs == new_hash_ref_pairs
+        )
+        self._note_idle(is_idle)
+
+        return (
+            new_active_reviews,
+            self._review_cache.get_changed_entries(old_review_generation),
+            self._active_state,
+            watcher.get_data_for_merging(),
+            _make_hash_ref_delta(old_hash_ref_pairs, new_hash_ref_pairs),
+            self._differ_cache.pop_new_entries(),
+            self._last_process_secs,
+            is_idle,
+            self._metrics_data
+        )
+
+    def _process_if_active(self, watcher):
+        is_processed = False
+
+        if not self._is_owned():
+            return is_processed
 
         was_active = self._active_state.is_active
         if self._active_state.calc_active():
@@ -328,51 +781,209 @@ class _ArcydManagedRepository(object):
                 self._on_exception(retry_delay)
             else:
                 self._active_state.reset_retries()
+                is_processed = True
         else:
             _LOGGER.debug(
                 'repo-status: {} is inactive until {}'.format(
                     self._name, self._active_state.reactivate_time))
 
+        return is_processed
+
+    def _is_owned(self):
+        # our lease may have expired and been taken by another instance since
+        # we were scheduled, check again so that we never both work on it
+        if self._repo_shard is None or self._repo_shard.is_owned(self._name):
+            return True
+        _LOGGER.warning(
+            'repo-event: {} is no longer owned by this instance, '
+            'leaving it alone'.format(self._name))
+        return False
+
+    def remove_stale_git_locks(self):
+        """Remove the lock files left by git processes which were killed.
+
+        Only call this when no other process is using the repo. Failures are
+        logged and left for the processing worker to report.
+
+        :returns: None
+
+        """
+        try:
+            removed = phlgitx_stalelocks.remove_stale_locks(
+                self._refcache_repo)
+        except Exception as e:
+            _LOGGER.warning(
+                'repo-event: {} failed to remove stale git locks: {}'.format(
+                    self._name, e))
+            return
+
+        if removed:
+            _LOGGER.warning(
+                'repo-event: {} removed stale git locks: {}'.format(
+                    self._name, ', '.join(removed)))
+
+    def _close_git_processes(self):
+        # a persistent worker processes every repo eventually, if it kept the
+        # long-lived git processes for each of them then it would run out of
+        # processes and file descriptors, they're cheap to start again
+        reader = phlsys_gitobjectreader.get_reader_or_none(self._refcache_repo)
+        if reader is not None:
+            reader.close()
+
+    def make_sync_state(self, is_warm):
+        """Return the state needed to bring a worker's copy of us up to date.
+
+        If 'is_warm' then the worker's copy is assumed to have been the source
+        of the last results passed to 'merge_from_worker', only state which is
+        updated here in the parent process will be included.
+
+        :is_warm: True if the worker last ran this repository
+        :returns: a picklable object to pass to 'apply_sync_state'
+
+        """
+        watcher_data = {}
+        snoop_url = abdi_repoargs.get_repo_snoop_url(self._args)
+        if snoop_url:
+            watcher = self._url_watcher_wrapper.watcher
+            all_watcher_data = watcher.get_data_for_merging()
+            if snoop_url in all_watcher_data:
+                watcher_data[snoop_url] = all_watcher_data[snoop_url]
+
+        cold_state = None
+        if not is_warm:
+            cold_state = (
+                self._active_state,
+                self._refcache_repo.peek_hash_ref_pairs(),
+                self._differ_cache.get_cache()
+            )
+
+        # a warm worker's refs are from before the prefetch, send it the same
+        # changes that we applied
+        prefetch_state = None
+        if self._is_prefetched:
+            prefetch_state = (self._prefetch_hash_ref_delta,)
+
+        # a warm worker's review cache is at least as new as when we last
+        # sent it, the entries it changed itself have been marked as changed
+        # here since, so send only the entries changed since then
+        review_sync_generation = None
+        if is_warm:
+            review_sync_generation = self._review_sync_generation
+        review_changes = self._review_cache.get_changes(review_sync_generation)
+        self._review_sync_generation = self._review_cache.generation
+
         return (
-            self._review_cache.active_reviews - old_active_reviews,
-            self._active_state,
-            watcher.get_data_for_merging(),
-            self._refcache_repo.peek_hash_ref_pairs(),
-            self._differ_cache.get_cache()
+            watcher_data,
+            review_changes,
+            prefetch_state,
+            cold_state
         )
 
+    def apply_sync_state(self, state):
+        watcher_data, review_changes, prefetch_state, cold_state = state
+
+        self._url_watcher_wrapper.watcher.overwrite_data(watcher_data)
+        self._review_cache.apply_changes(review_changes)
+
+        self._is_prefetched = prefetch_state is not None
+        if self._is_prefetched and cold_state is None:
+            hash_ref_delta, = prefetch_state
+            self._refcache_repo.set_hash_ref_pairs(
+                _apply_hash_ref_delta(
+                    self._refcache_repo.peek_hash_ref_pairs(),
+                    hash_ref_delta))
+
+        if cold_state is not None:
+            active_state, hash_ref_pairs, differ_cache = cold_state
+            self._active_state = active_state
+            self._refcache_repo.set_hash_ref_pairs(hash_ref_pairs)
+            self._differ_cache.set_cache(differ_cache)
+
     def merge_from_worker(self, results):
 
         (
             active_reviews,
+            changed_review_entries,
             active_state,
             watcher_data,
-            hash_ref_pairs,
-            differ_cache
+            hash_ref_delta,
+            new_differ_entries,
+            process_secs,
+            is_idle,
+            metrics_data
         ) = results
 
+        self._num_active_reviews = len(active_reviews)
+        self._last_process_secs = process_secs
+        self._is_prefetched = False
+        self._note_idle(is_idle)
+        self._metrics_data = metrics_data
         self._review_cache.merge_additional_active_reviews(active_reviews)
+        self._review_cache.mark_entries_changed(changed_review_entries)
         self._active_state = active_state
-        self._refcache_repo.set_hash_ref_pairs(hash_ref_pairs)
-        self._differ_cache.set_cache(differ_cache)
+        self._refcache_repo.set_hash_ref_pairs(
+            _apply_hash_ref_delta(
+                self._refcache_repo.peek_hash_ref_pairs(), hash_ref_delta))
+        self._differ_cache.merge_entries(new_differ_entries)
 
         # merge in the consumed urls from the worker
         self._url_watcher_wrapper.watcher.merge_data_consume_only(watcher_data)
 
+    def _note_idle(self, is_idle):
+        if is_idle:
+            self._idle_backoff.note_idle()
+            _LOGGER.debug(
+                'repo-status: {} is idle, next poll in {}'.format(
+                    self._name, self._idle_backoff.delay))
+        else:
+            self._idle_backoff.note_busy()
+
+
+def _make_hash_ref_delta(old_hash_ref_pairs, new_hash_ref_pairs):
+    # the worker's copy of our refs started as 'old_hash_ref_pairs', send
+    # only the changes since then back to the parent process
+    if new_hash_ref_pairs is None:
+        return None
+    return phlgitu_refdelta.make_delta(old_hash_ref_pairs, new_hash_ref_pairs)
+
+
+def _apply_hash_ref_delta(hash_ref_pairs, hash_ref_delta):
+    if hash_ref_delta is None:
+        return None
+    try:
+        return phlgitu_refdelta.apply_delta(hash_ref_pairs, hash_ref_delta)
+    except phlgitu_refdelta.BaseMismatchError:
+        # forget the refs, they'll be listed again next time they're needed
+        _LOGGER.debug('hash-ref delta mismatched, discarding refs')
+        return None
+
 
 class _ConduitManager(object):
 
-    def __init__(self):
+    def __init__(
+            self,
+            refresh_timeout_secs,
+            usercache_path,
+            sessions_path,
+            max_concurrent_calls,
+            max_calls_per_sec):
         super(_ConduitManager, self).__init__()
         self._conduits_caches = {}
+        self._refresh_timeout_secs = refresh_timeout_secs
+        self._usercache_path = usercache_path
+        self._max_concurrent_calls = max_concurrent_calls
+        self._max_calls_per_sec = max_calls_per_sec or None
+
+        # share conduit sessions between all our processes, including those
+        # of previous runs, so that we only connect when sessions expire
+        self._session_store = phlsys_conduitsessions.SessionStore(
+            sessions_path)
+        self._refresh_key_list = None
+        self._refresh_jobs = None
+        self._stale_keys = set()
 
     def get_conduit_and_cache_for_args(self, args):
-        key = (
-            args.instance_uri,
-            args.arcyd_user,
-            args.arcyd_cert,
-            args.https_proxy
-        )
+        key = _make_conduit_key(args)
 
         if key not in self._conduits_caches:
             # create an array so that the 'connect' closure binds to the
@@ -381,6 +992,14 @@ class _ConduitManager(object):
             # XXX: we can _process_repo better in python 3.x (nonlocal?)
             conduit = [None]
 
+            # coordinate with all the other processes that call the same
+            # instance as the same user, to stay within the server's limits
+            governor = phlsys_conduit.make_governor(
+                args.instance_uri,
+                args.arcyd_user,
+                self._max_concurrent_calls,
+                self._max_calls_per_sec)
+
             def connect():
                 # XXX: we'll rebind in python 3.x, instead
                 # nonlocal conduit
@@ -388,14 +1007,19 @@ class _ConduitManager(object):
                     args.instance_uri,
                     args.arcyd_user,
                     args.arcyd_cert,
-                    https_proxy=args.https_proxy)
+                    https_proxy=args.https_proxy,
+                    session_store=self._session_store,
+                    governor=governor)
 
             abdt_tryloop.tryloop(
                 connect, abdt_errident.CONDUIT_CONNECT, args.instance_uri)
 
             multi_conduit = conduit[0]
             cache = phlcon_reviewstatecache.make_from_conduit(multi_conduit)
-            arcyd_conduit = abdt_conduit.Conduit(multi_conduit, cache)
+            email_user_cache = phlcon_emailusercache.EmailUserCache(
+                self._usercache_path, args.instance_uri)
+            arcyd_conduit = abdt_conduit.Conduit(
+                multi_conduit, cache, email_user_cache)
             self._conduits_caches[key] = (arcyd_conduit, cache)
         else:
             arcyd_conduit, cache = self._conduits_caches[key]
@@ -403,11 +1027,123 @@ class _ConduitManager(object):
         return arcyd_conduit, cache
 
     def refresh_conduits(self):
-        for conduit, cache in self._conduits_caches.itervalues():
-            abdt_tryloop.critical_tryloop(
-                cache.refresh_active_reviews,
-                abdt_errident.CONDUIT_REFRESH,
-                conduit.describe())
+        """Refresh the review state caches of all instances concurrently.
+
+        Don't wait for longer than the refresh timeout, instances which
+        haven't refreshed by then are considered stale until a later refresh
+        succeeds. Refreshes which overrun are left running and their results
+        are applied on a later call, unless they run for longer than
+        _MAX_REFRESH_SECS.
+
+        :returns: None
+
+        """
+        if self._refresh_jobs is None:
+            self._refresh_key_list = list(self._conduits_caches.iterkeys())
+
+            # each refresh runs in its own process, so that we can stop
+            # waiting for any of them, including when there's only one
+            self._refresh_jobs = phlmp_boundedjobs.BoundedJobs(
+                max(len(self._refresh_key_list), 1), 1, _MAX_REFRESH_SECS)
+
+        # refresh the instances which aren't still refreshing from before
+        running_indices = self._refresh_jobs.job_ids
+        for i, key in enumerate(self._refresh_key_list):
+            if i not in running_indices:
+                refresher = _ReviewStateRefresher(*self._conduits_caches[key])
+                self._refresh_jobs.add_job(i, refresher, i)
+
+        refreshed_keys = set()
+        for i, result in self._poll_refresh_results():
+            if result is None:
+                # the refresh was stopped for taking too long, or it died
+                continue
+            refresh, metrics_data = result
+            abdt_metrics.merge_data(metrics_data)
+            if refresh is not None:
+                key = self._refresh_key_list[i]
+                _, cache = self._conduits_caches[key]
+                cache.apply_refresh(refresh)
+                refreshed_keys.add(key)
+
+        stale_keys = set(self._refresh_key_list) - refreshed_keys
+        for key in stale_keys - self._stale_keys:
+            conduit, _ = self._conduits_caches[key]
+            _LOGGER.warning(
+                'conduit-status: {} failed to refresh, skipping its '
+                'repos until it does'.format(conduit.describe()))
+        for key in self._stale_keys - stale_keys:
+            conduit, _ = self._conduits_caches[key]
+            _LOGGER.info(
+                'conduit-status: {} refreshed again'.format(
+                    conduit.describe()))
+        self._stale_keys = stale_keys
+
+    def _poll_refresh_results(self):
+        # return the results of the refreshes which finish within the refresh
+        # timeout, including those of overrunning refreshes from before
+        timer = phlsys_timer.Timer()
+        timer.start()
+        results = []
+        while True:
+            remaining_secs = self._refresh_timeout_secs - timer.duration
+            results.extend(
+                self._refresh_jobs.poll_results(max(remaining_secs, 0)))
+            if not self._refresh_jobs.job_ids or remaining_secs <= 0:
+                return results
+
+    def is_refreshed_for_args(self, args):
+        """Return True if the conduit for 'args' refreshed last time."""
+        return _make_conduit_key(args) not in self._stale_keys
+
+    def finish_refreshes(self):
+        """Stop any overrunning refreshes, their results are discarded.
+
+        :returns: None
+
+        """
+        if self._refresh_jobs is not None:
+            self._refresh_jobs.stop()
+
+
+class _ReviewStateRefresher(object):
+
+    def __init__(self, conduit, cache):
+        self._conduit = conduit
+        self._cache = cache
+
+    def __call__(self):
+        refresh = None
+        metrics = abdt_metrics.Recorder()
+        with abdt_metrics.recorder_context(metrics):
+            try:
+                refresh = abdt_tryloop.tryloop(
+                    self._cache.make_refresh,
+                    abdt_errident.CONDUIT_REFRESH,
+                    self._conduit.describe())
+            except Exception:
+                # the tryloop has already logged the failure, let the caller
+                # carry on without this refresh
+                pass
+        return refresh, metrics.get_data()
+
+
+def _make_conduit_key(args):
+    return (
+        args.instance_uri,
+        args.arcyd_user,
+        args.arcyd_cert,
+        args.https_proxy
+    )
+
+
+def _get_url_host(url):
+    if '://' in url:
+        return urlparse.urlparse(url).hostname or ''
+    if ':' in url:
+        # scp-like syntax, e.g. 'user@host:path/to/repo'
+        return url.split(':', 1)[0].rsplit('@', 1)[-1]
+    return ''
 
 
 def fetch_if_needed(url_watcher, snoop_url, repo, repo_desc):
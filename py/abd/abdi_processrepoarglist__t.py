@@ -0,0 +1,162 @@
+"""Test suite for abdi_processrepoarglist."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] refresh_conduits() applies the refreshes of responsive instances
+# [ B] refresh_conduits() gives up on a lone hanging instance after the timeout
+# [ B] an instance which didn't refresh is stale, others aren't
+# [ C] the results of overrunning refreshes are applied on a later call
+# [ C] an instance isn't refreshed again while its refresh is overrunning
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_HangingInstance
+# [ C] test_C_Overrun
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import time
+import unittest
+
+import phlsys_fs
+import phlsys_timer
+
+import abdi_processrepoarglist
+
+_Args = collections.namedtuple(
+    '_Args', ['instance_uri', 'arcyd_user', 'arcyd_cert', 'https_proxy'])
+
+
+class _FakeConduit(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def describe(self):
+        return self._name
+
+
+class _FakeCache(object):
+
+    def __init__(self, refresh_secs):
+        self._refresh_secs = refresh_secs
+        self.applied_refreshes = []
+
+    def make_refresh(self):
+        # runs in a worker process, so report when we started
+        start = time.time()
+        time.sleep(self._refresh_secs)
+        return start
+
+    def apply_refresh(self, refresh):
+        self.applied_refreshes.append(refresh)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir_context = phlsys_fs.chtmpdir_context()
+        self.tmpdir_context.__enter__()
+        self.manager = None
+
+    def tearDown(self):
+        if self.manager is not None:
+            self.manager.finish_refreshes()
+        self.tmpdir_context.__exit__(None, None, None)
+
+    def _make_manager(self, timeout_secs, name_to_refresh_secs):
+        self.manager = abdi_processrepoarglist._ConduitManager(
+            timeout_secs, 'usercache', 'sessions', 1, 0)
+        name_to_args_cache = {}
+        for name, refresh_secs in name_to_refresh_secs.iteritems():
+            args = _Args(name, 'arcyd', 'cert', None)
+            cache = _FakeCache(refresh_secs)
+            key = abdi_processrepoarglist._make_conduit_key(args)
+            self.manager._conduits_caches[key] = (_FakeConduit(name), cache)
+            name_to_args_cache[name] = (args, cache)
+        return name_to_args_cache
+
+    def _timed_refresh(self):
+        timer = phlsys_timer.Timer()
+        timer.start()
+        self.manager.refresh_conduits()
+        return timer.duration
+
+    def test_A_Breathing(self):
+        name_to_args_cache = self._make_manager(10, {'a': 0, 'b': 0})
+
+        # [ A] refresh_conduits() applies the refreshes of responsive
+        #      instances
+        self.assertLess(self._timed_refresh(), 5)
+        for args, cache in name_to_args_cache.itervalues():
+            self.assertTrue(self.manager.is_refreshed_for_args(args))
+            self.assertEqual(1, len(cache.applied_refreshes))
+
+    def test_B_HangingInstance(self):
+        timeout_secs = 0.5
+
+        # [ B] refresh_conduits() gives up on a lone hanging instance after
+        #      the timeout
+        name_to_args_cache = self._make_manager(timeout_secs, {'hang': 60})
+        duration = self._timed_refresh()
+        self.assertGreaterEqual(duration, timeout_secs)
+        self.assertLess(duration, timeout_secs + 2)
+        args, cache = name_to_args_cache['hang']
+        self.assertFalse(self.manager.is_refreshed_for_args(args))
+        self.assertEqual([], cache.applied_refreshes)
+        self.manager.finish_refreshes()
+
+        # [ B] an instance which didn't refresh is stale, others aren't
+        name_to_args_cache = self._make_manager(
+            timeout_secs, {'hang': 60, 'ok': 0})
+        duration = self._timed_refresh()
+        self.assertLess(duration, timeout_secs + 2)
+        self.assertFalse(
+            self.manager.is_refreshed_for_args(name_to_args_cache['hang'][0]))
+        self.assertTrue(
+            self.manager.is_refreshed_for_args(name_to_args_cache['ok'][0]))
+
+    def test_C_Overrun(self):
+        name_to_args_cache = self._make_manager(0.2, {'slow': 1})
+        args, cache = name_to_args_cache['slow']
+        self._timed_refresh()
+        self.assertFalse(self.manager.is_refreshed_for_args(args))
+
+        # [ C] an instance isn't refreshed again while its refresh is
+        #      overrunning
+        second_call_time = time.time()
+        self._timed_refresh()
+        self.assertFalse(self.manager.is_refreshed_for_args(args))
+
+        # [ C] the results of overrunning refreshes are applied on a later
+        #      call
+        time.sleep(1)
+        self._timed_refresh()
+        self.assertTrue(self.manager.is_refreshed_for_args(args))
+        refresh_start_time, = cache.applied_refreshes
+        self.assertLess(refresh_start_time, second_call_time)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
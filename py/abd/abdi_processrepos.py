@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 import os
+import socket
 
 import phlmail_sender
 import phlsys_sendmail
@@ -26,6 +27,7 @@ import abdt_exhandlers
 import abdt_logging
 
 import abdi_processrepoarglist
+import abdi_reposhard
 
 
 def addCommonParserArgs(parser):
@@ -98,6 +100,114 @@ def setupParser(parser):
         default=60,
         help="number of seconds to wait before starting the next cycle and "
              "leaving active jobs behind.")
+    parser.add_argument(
+        '--persistent-workers',
+        action='store_true',
+        help="keep worker processes alive between cycles instead of forking "
+             "new ones each cycle, workers will keep their caches warm.")
+    parser.add_argument(
+        '--idle-backoff-max-secs',
+        metavar="SECONDS",
+        type=int,
+        default=0,
+        help="maximum number of seconds to wait before polling a repo again, "
+             "when it had no changes and no active reviews last time. The "
+             "wait doubles each time the repo is idle, zero disables backoff. "
+             "Repos are polled immediately if their snoop url changes.")
+    parser.add_argument(
+        '--shard-lease-dir',
+        metavar="PATH",
+        type=str,
+        default=None,
+        help="path to a directory shared with other instances of arcyd, the "
+             "repos will be divided between the live instances using leases "
+             "kept there. If unspecified then all repos are processed.")
+    parser.add_argument(
+        '--shard-instance-name',
+        metavar="NAME",
+        type=str,
+        default=socket.gethostname(),
+        help="name to identify this instance by when sharing repos, must be "
+             "unique amongst the instances. Defaults to the hostname.")
+    parser.add_argument(
+        '--shard-lease-secs',
+        metavar="SECONDS",
+        type=int,
+        default=300,
+        help="number of seconds a shard lease lasts without renewal. Leases "
+             "are renewed each cycle and while waiting for fetches and "
+             "workers, so this must be more than twice '--sleep-secs'. When "
+             "'--max-workers' is 1 they're renewed between repos, so it must "
+             "also be more than twice the time to process a repo. Repos of "
+             "dead instances are taken over after this time.")
+    parser.add_argument(
+        '--conduit-refresh-timeout-secs',
+        metavar="SECONDS",
+        type=int,
+        default=30,
+        help="number of seconds to wait for the review states of each "
+             "Phabricator instance to refresh. Repos of instances which fail "
+             "to refresh in time are skipped until a later refresh succeeds.")
+    parser.add_argument(
+        '--max-fetch-workers',
+        metavar="COUNT",
+        type=int,
+        default=0,
+        help="maximum number of repos to fetch at once, before processing "
+             "them. Repos whose snoop url changed are fetched in the "
+             "background while the other repos are processed, each repo is "
+             "processed in the cycle after its fetch finishes. Zero disables "
+             "this, workers fetch repos themselves.")
+    parser.add_argument(
+        '--max-fetches-per-host',
+        metavar="COUNT",
+        type=int,
+        default=1,
+        help="maximum number of repos to fetch at once from the same host, "
+             "when fetching before processing.")
+    parser.add_argument(
+        '--fetch-timeout-secs',
+        metavar="SECONDS",
+        type=int,
+        default=600,
+        help="number of seconds to wait for a repo to fetch, before "
+             "processing. Repos which time out are fetched again next cycle, "
+             "other repos are processed meanwhile.")
+    parser.add_argument(
+        '--conduit-max-concurrent-calls',
+        metavar="COUNT",
+        type=int,
+        default=5,
+        help="maximum number of calls to make to each Phabricator instance "
+             "at once. This is shared with all processes calling the same "
+             "instance as the same user on this machine, including arcyon.")
+    parser.add_argument(
+        '--conduit-max-calls-per-sec',
+        metavar="RATE",
+        type=float,
+        default=0,
+        help="maximum rate of calls to make to each Phabricator instance, "
+             "shared as for '--conduit-max-concurrent-calls'. Zero means "
+             "unlimited.")
+    parser.add_argument(
+        '--diff-cache-max-bytes',
+        metavar="BYTES",
+        type=int,
+        default=32 * 1024 * 1024,
+        help="maximum total size of the diffs to remember for all the repos, "
+             "so that they needn't be made again if a review must be "
+             "retried. This applies to the memory of each worker process "
+             "and to '--diff-cache-dir'. Zero disables this.")
+    parser.add_argument(
+        '--diff-cache-dir',
+        metavar="PATH",
+        type=str,
+        default=None,
+        help="path to a directory to keep the remembered diffs in, so that "
+             "they are shared between worker processes and kept when arcyd "
+             "restarts. If unspecified then they are only kept in the "
+             "memory of each worker process, which may only last for a "
+             "cycle unless '--persistent-workers' is used.")
 
 
 def process(args, repo_configs):
@@ -138,13 +248,48 @@ def _processrepolist(
             args.external_report_command,
             mail_sender,
             args.max_workers,
-            args.overrun_secs)
+            args.overrun_secs,
+            args.persistent_workers,
+            args.idle_backoff_max_secs,
+            _make_repo_shard(args),
+            args.conduit_refresh_timeout_secs,
+            args.max_fetch_workers,
+            args.max_fetches_per_host,
+            args.fetch_timeout_secs,
+            args.conduit_max_concurrent_calls,
+            args.conduit_max_calls_per_sec,
+            args.diff_cache_max_bytes,
+            _get_abspath_or_none(args.diff_cache_dir))
     except BaseException:
         on_exception("Arcyd will now stop")
         print("stopping")
         raise
 
 
+def _get_abspath_or_none(path):
+    if not path:
+        return None
+    return os.path.abspath(path)
+
+
+def _make_repo_shard(args):
+    if not args.shard_lease_dir:
+        return None
+
+    # leases are renewed once half of them has passed, the sleep between
+    # cycles is the longest that we're sure to go without renewing them
+    if args.shard_lease_secs <= 2 * args.sleep_secs:
+        raise Exception(
+            "'--shard-lease-secs' ({}) must be more than twice "
+            "'--sleep-secs' ({})".format(
+                args.shard_lease_secs, args.sleep_secs))
+
+    return abdi_reposhard.RepoShard(
+        os.path.abspath(args.shard_lease_dir),
+        args.shard_instance_name,
+        args.shard_lease_secs)
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2015 Bloomberg Finance L.P.
 #
@@ -0,0 +1,184 @@
+"""Share the processing of repos between several arcyd instances.
+
+Each instance holds a lease on its membership of the shard group, the repos
+are divided between the live members by consistent hashing. An instance only
+processes the repos that it holds leases for, so that no two instances process
+the same repo at once.
+
+When an instance joins, the other instances release the repos that are now
+assigned to it. When an instance dies, its leases expire and its repos are
+acquired by the remaining instances.
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# abdi_reposhard
+#
+# Public Classes:
+#   RepoShard
+#    .owned_repos
+#    .update
+#    .renew
+#    .is_owned
+#    .release_all
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import logging
+import os
+
+import phlsys_fslease
+import phlsys_hashring
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RepoShard(object):
+
+    def __init__(self, lease_dir_path, instance_name, lease_secs):
+        """Create a shard of repos for 'instance_name'.
+
+        :lease_dir_path: the string path of the directory to keep leases in
+        :instance_name: the string name of this instance, unique in the group
+        :lease_secs: the number of seconds a lease lasts without renewal
+
+        """
+        self._instance_name = instance_name
+        self._instance_leases = phlsys_fslease.LeaseDirectory(
+            os.path.join(lease_dir_path, 'instances'),
+            instance_name,
+            lease_secs)
+        self._repo_leases = phlsys_fslease.LeaseDirectory(
+            os.path.join(lease_dir_path, 'repos'),
+            instance_name,
+            lease_secs)
+        self._owned_repos = set()
+        self._instance_names = set()
+
+    @property
+    def owned_repos(self):
+        return frozenset(self._owned_repos)
+
+    def update(self, repo_name_list, busy_repo_set=frozenset()):
+        """Renew leases and rebalance repos, return the set of owned repos.
+
+        Repos in 'busy_repo_set' won't be released if they're owned, even if
+        they're now assigned to another instance. They'll be released on a
+        later update, once they're no longer busy.
+
+        :repo_name_list: a list of the string names of all the repos
+        :busy_repo_set: a set of repo names which are being processed
+        :returns: a frozenset of the repo names this instance owns
+
+        """
+        if not self._instance_leases.try_acquire(self._instance_name):
+            _LOGGER.error(
+                "another live instance is named '{}', "
+                "not processing any repos".format(self._instance_name))
+            self._release_repos(set(self._owned_repos), busy_repo_set)
+            return self.owned_repos
+
+        instance_names = set(self._instance_leases.get_live_leases())
+        instance_names.add(self._instance_name)
+        if instance_names != self._instance_names:
+            _LOGGER.info(
+                "shard-event: live instances are now {}".format(
+                    sorted(instance_names)))
+            self._instance_names = instance_names
+
+        ring = phlsys_hashring.HashRing(instance_names)
+        owned_repos = set()
+        unwanted_repos = set()
+        for name in repo_name_list:
+            is_assigned = ring.get_node(name) == self._instance_name
+            is_held_busy = name in self._owned_repos and name in busy_repo_set
+            if is_assigned or is_held_busy:
+                if self._repo_leases.try_acquire(name):
+                    owned_repos.add(name)
+            elif name in self._owned_repos:
+                unwanted_repos.add(name)
+
+        # also let go of repos which aren't configured any more
+        unwanted_repos |= self._owned_repos - set(repo_name_list)
+
+        for name in owned_repos - self._owned_repos:
+            _LOGGER.info("shard-event: acquired {}".format(name))
+        self._release_repos(unwanted_repos, busy_repo_set)
+        self._owned_repos = owned_repos
+
+        return self.owned_repos
+
+    def renew(self):
+        """Renew the leases we hold, return the set of owned repos.
+
+        Unlike 'update', this doesn't rebalance repos between instances. It's
+        cheap to call often, leases are only rewritten when half of them have
+        passed, so call it while waiting on long-running work to stop the
+        leases expiring in the meantime.
+
+        Repos whose leases have been taken by other instances are no longer
+        owned.
+
+        :returns: a frozenset of the repo names this instance owns
+
+        """
+        self._instance_leases.try_acquire(self._instance_name)
+        for name in list(self._owned_repos):
+            if not self._repo_leases.try_acquire(name):
+                self._owned_repos.discard(name)
+                _LOGGER.warning("shard-event: lost {}".format(name))
+        return self.owned_repos
+
+    def is_owned(self, repo_name):
+        """Return True if this instance holds an unexpired lease on the repo.
+
+        This reads the lease from the lease directory, so it's accurate in
+        worker processes which have a stale copy of the shard.
+
+        :repo_name: the string name of the repo
+        :returns: True if the repo is owned, False otherwise
+
+        """
+        return self._repo_leases.is_held(repo_name)
+
+    def release_all(self):
+        """Release all leases held by this instance.
+
+        :returns: None
+
+        """
+        self._repo_leases.release_all()
+        self._instance_leases.release_all()
+        self._owned_repos = set()
+
+    def _release_repos(self, repo_set, busy_repo_set):
+        for name in repo_set:
+            if name in busy_repo_set:
+                continue
+            self._repo_leases.release(name)
+            self._owned_repos.discard(name)
+            _LOGGER.info("shard-event: released {}".format(name))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,159 @@
+"""Test suite for abdi_reposhard."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] a lone instance owns all the repos
+# [ B] repos are divided between instances without overlap
+# [ B] all repos are owned once the instances have settled
+# [ C] a joining instance takes over repos from the others
+# [ D] the repos of a departed instance are taken over by the others
+# [ E] busy repos aren't released until they're no longer busy
+# [ F] renew() keeps leases from expiring between updates
+# [ F] renew() drops repos whose leases were taken by other instances
+# [ F] is_owned() reports the repos which are owned
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Divided
+# [ C] test_C_Join
+# [ D] test_D_Leave
+# [ E] test_E_Busy
+# [ F] test_F_Renew
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+import phlsys_fs
+
+import abdi_reposhard
+
+
+_REPO_LIST = ['repo{}'.format(i) for i in xrange(50)]
+
+
+def _make_shard(name):
+    return abdi_reposhard.RepoShard('leases', name, 60)
+
+
+def _settle(shard_list):
+    # instances only release repos to newcomers when they notice them, so it
+    # may take a couple of rounds for ownership to settle
+    for _ in xrange(3):
+        owned_list = [s.update(_REPO_LIST) for s in shard_list]
+    return owned_list
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        with phlsys_fs.chtmpdir_context():
+            shard = _make_shard('alpha')
+
+            # [ A] a lone instance owns all the repos
+            self.assertSetEqual(
+                set(shard.update(_REPO_LIST)), set(_REPO_LIST))
+
+    def test_B_Divided(self):
+        with phlsys_fs.chtmpdir_context():
+            shard_list = [_make_shard(n) for n in ('alpha', 'beta', 'gamma')]
+            owned_list = _settle(shard_list)
+            self._assert_divided(owned_list)
+
+    def test_C_Join(self):
+        with phlsys_fs.chtmpdir_context():
+            alpha = _make_shard('alpha')
+            alpha.update(_REPO_LIST)
+            beta = _make_shard('beta')
+
+            # [ C] a joining instance takes over repos from the others
+            owned_list = _settle([alpha, beta])
+            self._assert_divided(owned_list)
+
+    def test_D_Leave(self):
+        with phlsys_fs.chtmpdir_context():
+            alpha = _make_shard('alpha')
+            beta = _make_shard('beta')
+            _settle([alpha, beta])
+            beta.release_all()
+
+            # [ D] the repos of a departed instance are taken over by the
+            #      others
+            self.assertSetEqual(
+                set(alpha.update(_REPO_LIST)), set(_REPO_LIST))
+
+    def test_E_Busy(self):
+        with phlsys_fs.chtmpdir_context():
+            alpha = _make_shard('alpha')
+            alpha.update(_REPO_LIST)
+            beta = _make_shard('beta')
+            beta.update(_REPO_LIST)
+
+            # [ E] busy repos aren't released until they're no longer busy
+            busy_set = set(_REPO_LIST)
+            self.assertSetEqual(
+                set(alpha.update(_REPO_LIST, busy_set)), busy_set)
+            self.assertSetEqual(set(beta.update(_REPO_LIST)), set())
+
+            owned_list = _settle([alpha, beta])
+            self._assert_divided(owned_list)
+
+    def test_F_Renew(self):
+        with phlsys_fs.chtmpdir_context():
+            alpha = abdi_reposhard.RepoShard('leases', 'alpha', 0.2)
+            alpha.update(_REPO_LIST)
+
+            # [ F] is_owned() reports the repos which are owned
+            self.assertTrue(alpha.is_owned(_REPO_LIST[0]))
+
+            # [ F] renew() keeps leases from expiring between updates
+            for _ in xrange(4):
+                time.sleep(0.1)
+                self.assertSetEqual(set(alpha.renew()), set(_REPO_LIST))
+            self.assertTrue(alpha.is_owned(_REPO_LIST[0]))
+
+            # [ F] renew() drops repos whose leases were taken by other
+            #      instances
+            time.sleep(0.3)
+            self.assertFalse(alpha.is_owned(_REPO_LIST[0]))
+            beta = _make_shard('beta')
+            self.assertSetEqual(
+                set(beta.update(_REPO_LIST)), set(_REPO_LIST))
+            self.assertSetEqual(set(alpha.renew()), set())
+            self.assertFalse(alpha.is_owned(_REPO_LIST[0]))
+
+    def _assert_divided(self, owned_list):
+
+        # [ B] repos are divided between instances without overlap
+        for i, owned in enumerate(owned_list):
+            self.assertTrue(owned)
+            for other in owned_list[i + 1:]:
+                self.assertFalse(owned & other)
+
+        # [ B] all repos are owned once the instances have settled
+        self.assertSetEqual(set().union(*owned_list), set(_REPO_LIST))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
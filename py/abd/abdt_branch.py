@@ -295,7 +295,10 @@ class Branch(object):
 
         hashes = self._repo.get_range_hashes(previous, latest)
         hashes.reverse()
-        revisions = self._repo.make_revisions_from_hashes(hashes)
+
+        # at most 'max_commits' are described, don't read the rest
+        revisions = self._repo.make_revisions_from_hashes(
+            hashes[:max_commits + 1])
 
         message = ""
         count = 0
@@ -306,7 +309,7 @@ class Branch(object):
             message_size += len(new_message)
             if count > max_commits or message_size > max_size:
                 message += "...{num_commits} commits not shown.\n".format(
-                    num_commits=len(revisions) - count + 1)
+                    num_commits=len(hashes) - count + 1)
                 break
             else:
                 message += new_message
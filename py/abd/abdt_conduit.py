@@ -16,6 +16,7 @@
 #    .parse_commit_message
 #    .is_review_accepted
 #    .is_review_abandoned
+#    .prefetch_review_states
 #    .is_review_recently_updated
 #    .update_revision
 #    .set_requires_revision
@@ -41,21 +42,26 @@ import phlsys_textconvert
 
 import abdt_exception
 import abdt_logging
+import abdt_metrics
 
 
 # TODO: re-order methods as (accessor, mutator)
 class Conduit(object):
 
-    def __init__(self, multi_conduit, reviewstate_cache):
+    def __init__(
+            self, multi_conduit, reviewstate_cache, email_user_cache=None):
         """Initialise a new Conduit.
 
         :multi_conduit: a phlsys_conduit to delegate to
+        :reviewstate_cache: a phlcon_reviewstatecache to query reviews with
+        :email_user_cache: a phlcon_emailusercache to look up users in first
         :returns: None
 
         """
         super(Conduit, self).__init__()
         self._multi_conduit = multi_conduit
         self._reviewstate_cache = reviewstate_cache
+        self._email_user_cache = email_user_cache
 
     def describe(self):
         """Return a string description of this conduit for a human to read.
@@ -110,8 +116,10 @@ class Conduit(object):
         :returns: the string of the commit message
 
         """
-        msg = phlcon_differential.get_commit_message(
-            self._multi_conduit, revisionid)
+        with self._log_read_context(
+                'conduit-getcommitmessage', 'for {}'.format(revisionid)):
+            msg = phlcon_differential.get_commit_message(
+                self._multi_conduit, revisionid)
         return phlsys_textconvert.lossy_unicode_to_ascii(msg)
 
     def create_revision_as_user(self, raw_diff, fields, username):
@@ -132,6 +140,7 @@ class Conduit(object):
                 'conduit-createrev',
                 'create as {}'.format(username)) as log:
 
+            abdt_metrics.add_bytes('conduit-createrev', len(raw_diff))
             diffid = phlcon_differential.create_raw_diff(
                 as_user_conduit, raw_diff).id
 
@@ -151,10 +160,21 @@ class Conduit(object):
         :returns: a (username, phid) tuple
 
         """
-        user = phlcon_user.query_user_from_email(self._multi_conduit, email)
+        if self._email_user_cache is not None:
+            is_cached, result = self._email_user_cache.lookup(email)
+            if is_cached:
+                return result
+
+        with self._log_read_context('conduit-queryuser', email):
+            user = phlcon_user.query_user_from_email(
+                self._multi_conduit, email)
         result = None
         if user:
             result = (user.userName, user.phid)
+
+        if self._email_user_cache is not None:
+            self._email_user_cache.store(email, result)
+
         return result
 
     def query_users_from_emails(self, emails):
@@ -167,7 +187,16 @@ class Conduit(object):
         :returns: a list of strings corresponding to Phabricator usernames
 
         """
-        return phlcon_user.query_users_from_emails(self._multi_conduit, emails)
+        if self._email_user_cache is None:
+            with self._log_read_context('conduit-queryusers', emails):
+                return phlcon_user.query_users_from_emails(
+                    self._multi_conduit, emails)
+
+        usernames = []
+        for email in emails:
+            user = self.query_name_and_phid_from_email(email)
+            usernames.append(user[0] if user is not None else None)
+        return usernames
 
     def parse_commit_message(self, message):
         """Return a ParseCommitMessageResponse based on 'message'.
@@ -177,16 +206,14 @@ class Conduit(object):
 
         """
         message = phlsys_textconvert.to_unicode(message)
-        return phlcon_differential.parse_commit_message(
-            self._multi_conduit, message)
+        with self._log_read_context('conduit-parsecommitmessage', ''):
+            return phlcon_differential.parse_commit_message(
+                self._multi_conduit, message)
 
     def _get_author_user(self, revisionid):
-        # TODO: these queries are very expensive, cache them
-        revision = phlcon_differential.query(
-            self._multi_conduit, [revisionid])[0]
-        author_user = phlcon_user.query_usernames_from_phids(
-            self._multi_conduit, [revision.authorPHID])[0]
-        return author_user
+        # the author is cached along with the state of the review, it's kept
+        # up to date by refreshing the active reviews
+        return self._reviewstate_cache.get_author_username(revisionid)
 
     def is_review_accepted(self, revisionid):
         """Return True if the supplied 'revisionid' is in 'accepted' status.
@@ -208,6 +235,19 @@ class Conduit(object):
         state = self._reviewstate_cache.get_state(revisionid)
         return int(state.status) == phlcon_differential.ReviewStates.abandoned
 
+    def prefetch_review_states(self, revisionid_list):
+        """Cache the states of the supplied revisions in as few queries as
+        possible, so that querying them individually later is cheap.
+
+        :revisionid_list: ids of the Differential revisions to prefetch
+        :returns: None
+
+        """
+        with self._log_read_context(
+                'conduit-prefetchstates',
+                '{} revisions'.format(len(revisionid_list))):
+            self._reviewstate_cache.prefetch_states(revisionid_list)
+
     def _get_update_age(self, revisionid):
         state = self._reviewstate_cache.get_state(revisionid)
         date_modified = state.date_modified
@@ -252,6 +292,7 @@ class Conduit(object):
                 'conduit-updaterev',
                 'update {} as {}'.format(revisionid, author_user)):
 
+            abdt_metrics.add_bytes('conduit-updaterev', len(raw_diff))
             diffid = phlcon_differential.create_raw_diff(
                 as_user_conduit, raw_diff).id
             try:
@@ -351,11 +392,19 @@ class Conduit(object):
                 revisionid,
                 action=phlcon_differential.Action.claim)
 
+        # the cached author is now wrong
+        self._reviewstate_cache.forget_state(revisionid)
+
     def _log_context(self, identifier, description):
         return abdt_logging.remote_io_write_event_context(
             identifier,
             '{}:{}'.format(self.describe(), description))
 
+    def _log_read_context(self, identifier, description):
+        return abdt_logging.remote_io_read_event_context(
+            identifier,
+            '{}:{}'.format(self.describe(), description))
+
     def _make_as_user_conduit(self, username):
         return phlsys_conduit.CallMultiConduitAsUser(
             self._multi_conduit, username)
@@ -27,6 +27,7 @@
 #    .parse_commit_message
 #    .is_review_accepted
 #    .is_review_abandoned
+#    .prefetch_review_states
 #    .is_review_recently_updated
 #    .update_revision
 #    .set_requires_revision
@@ -321,6 +322,17 @@ class ConduitMock(object):
         revision = self._data.get_revision(revisionid)
         return revision.is_abandoned()
 
+    def prefetch_review_states(self, revisionid_list):
+        """Cache the states of the supplied revisions in as few queries as
+        possible, so that querying them individually later is cheap.
+
+        :revisionid_list: ids of the Differential revisions to prefetch
+        :returns: None
+
+        """
+        for revisionid in revisionid_list:
+            self._data.assert_is_revision(revisionid)
+
     def is_review_recently_updated(self, revisionid):
         """Return True if the supplied 'revisionid' was updated recently.
 
@@ -1,13 +1,37 @@
-"""Cache the results from abdt_differ."""
+"""Cache the results from abdt_differ.
+
+Results are keyed by the hashes of the branches diffed and the size limit, so
+a cached result is only used if the branches haven't changed since.
+
+Successful results are kept in a ResultStore, which may be shared between the
+caches of many repositories so that they all keep to one budget. The store
+keeps them in memory, the least recently used are discarded to keep the total
+size of the cached diffs within the budget. They may also be persisted to a
+directory, so that they outlive the process which made them and may be used
+by other processes. The persisted results of all the repositories are pruned
+to the same budget. Note that each process keeps its own results in memory,
+so each may use up to the budget.
+
+NoDiffError results are small, they're all kept and may be passed between
+processes with 'pop_new_entries()' and 'merge_entries()'.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
 # abdt_differresultcache
 #
 # Public Classes:
+#   ResultStore
+#    .get_stats
+#    .get_result_or_none
+#    .add_result
 #   Cache
+#    .get_stats
 #    .get_cache
 #    .set_cache
+#    .pop_new_entries
+#    .merge_entries
 #    .checkout_make_raw_diff
 #
 # -----------------------------------------------------------------------------
@@ -18,27 +42,257 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import phlgit_checkout
+import collections
+import logging
+import os
+import pickle
+import time
+
 import phlgitu_ref
+import phlgitx_attributesrepo
+import phlsys_fs
 
 import abdt_differ
 
+_LOGGER = logging.getLogger(__name__)
+
+# the largest diffs that arcyd makes are 1.5MB, keep a few of those for each
+# of a handful of busy repos
+_DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+_PERSISTED_SUFFIX = '.diffresult'
+
+# other files in the cache dir are temporary files from writing results, those
+# older than this were left by writers which were killed and can be removed
+_STALE_TEMP_FILE_SECS = 60 * 60
+
+
+class ResultStore(object):
+
+    """Keep successful results from abdt_differ within a total size."""
+
+    def __init__(self, max_bytes=_DEFAULT_MAX_BYTES, cache_dir=None):
+        """Return a ResultStore.
+
+        If 'cache_dir' is supplied then results are also written there, the
+        least recently used files are removed to keep their total size within
+        'max_bytes'.
+
+        :max_bytes: the total size of successful diffs to keep, 0 to keep none
+        :cache_dir: the string path of the directory to persist results in,
+                    or None to keep them in memory only
+
+        """
+        self._max_bytes = max_bytes
+        self._cache_dir = cache_dir
+
+        # map of keys to successful DiffResults, least recently used first
+        self._key_to_result = collections.OrderedDict()
+        self._num_bytes = 0
+
+        # map of the paths of persisted results to their sizes, least recently
+        # used first. This is loaded from 'cache_dir' by each process that
+        # uses it, so that we needn't list the dir for every result.
+        self._persisted_pid = None
+        self._persisted_path_to_size = collections.OrderedDict()
+        self._persisted_bytes = 0
+
+        self._stats = {'disk_hits': 0, 'evictions': 0}
+
+    def get_stats(self):
+        """Return a dict of the counts of store events, and the bytes used.
+
+        'disk_hits' counts results read from 'cache_dir', 'evictions' counts
+        results discarded from memory to make room.
+
+        :returns: a dict of string names to integer counts
+
+        """
+        stats = dict(self._stats)
+        stats['bytes'] = self._num_bytes
+        return stats
+
+    def get_result_or_none(self, namespace, key):
+        """Return the result stored for 'key' in 'namespace', or None.
+
+        :namespace: the string name of the repo the result is for
+        :key: a tuple of the strings and ints which identify the result
+        :returns: an abdt_differ.DiffResult or None
+
+        """
+        store_key = (namespace,) + key
+        result = self._key_to_result.pop(store_key, None)
+        if result is not None:
+            # re-insert to mark it as the most recently used
+            self._key_to_result[store_key] = result
+            return result
+
+        if self._cache_dir is not None:
+            result = self._read_persisted_result_or_none(namespace, key)
+            if result is not None:
+                self._stats['disk_hits'] += 1
+                self._remember_result(store_key, result)
+
+        return result
+
+    def add_result(self, namespace, key, result):
+        """Store 'result' for 'key' in 'namespace', unless it's too large.
+
+        :namespace: the string name of the repo the result is for
+        :key: a tuple of the strings and ints which identify the result
+        :result: an abdt_differ.DiffResult
+        :returns: None
+
+        """
+        if result.diff_size_utf8_bytes > self._max_bytes:
+            return
+
+        self._remember_result((namespace,) + key, result)
+        if self._cache_dir is not None:
+            self._persist_result(namespace, key, result)
+
+    def _remember_result(self, store_key, result):
+        self._key_to_result[store_key] = result
+        self._num_bytes += result.diff_size_utf8_bytes
+        while self._num_bytes > self._max_bytes:
+            _, old_result = self._key_to_result.popitem(last=False)
+            self._num_bytes -= old_result.diff_size_utf8_bytes
+            self._stats['evictions'] += 1
+
+    def _persisted_path(self, namespace, key):
+        from_hash, to_hash, max_diff_size_utf8_bytes = key
+        return os.path.join(
+            self._cache_dir,
+            namespace,
+            '{}-{}-{}{}'.format(
+                from_hash,
+                to_hash,
+                max_diff_size_utf8_bytes,
+                _PERSISTED_SUFFIX))
+
+    def _read_persisted_result_or_none(self, namespace, key):
+        path = self._persisted_path(namespace, key)
+        try:
+            with open(path, 'rb') as f:
+                text = f.read()
+            # mark it as the most recently used, for pruning
+            os.utime(path, None)
+        except (IOError, OSError):
+            # the result was never persisted or has been pruned since
+            return None
+
+        try:
+            result = abdt_differ.DiffResult(*pickle.loads(text))
+        except Exception:
+            # unpickling a damaged file may raise almost anything
+            _LOGGER.warning("removing damaged diff result: {}".format(path))
+            phlsys_fs.delete_file_if_exists(path)
+            return None
+
+        self._load_persisted_sizes_if_new_process()
+        self._note_persisted_size(path, len(text))
+        return result
+
+    def _persist_result(self, namespace, key, result):
+        # other processes may be reading, writing or pruning the same files,
+        # so write atomically and tolerate files disappearing at any time
+        #
+        # N.B. DiffResult can't be pickled directly, the name of its type
+        # doesn't match its name in abdt_differ, so pickle it as a tuple
+        path = self._persisted_path(namespace, key)
+        try:
+            self._load_persisted_sizes_if_new_process()
+            with phlsys_fs.open_write_text_file_atomic(path) as f:
+                pickle.dump(tuple(result), f, pickle.HIGHEST_PROTOCOL)
+            self._note_persisted_size(path, os.path.getsize(path))
+            self._prune_persisted_results()
+        except (IOError, OSError) as e:
+            _LOGGER.warning("couldn't persist diff result: {}".format(e))
+
+    def _note_persisted_size(self, path, size):
+        old_size = self._persisted_path_to_size.pop(path, 0)
+        self._persisted_path_to_size[path] = size
+        self._persisted_bytes += size - old_size
+
+    def _prune_persisted_results(self):
+        # note that we don't know about results persisted by other processes
+        # since we loaded the sizes, so we may remove less than we should;
+        # the next process to load them will catch up
+        while self._persisted_bytes > self._max_bytes:
+            path, size = self._persisted_path_to_size.popitem(last=False)
+            self._persisted_bytes -= size
+            phlsys_fs.delete_file_if_exists(path)
+
+    def _load_persisted_sizes_if_new_process(self):
+        pid = os.getpid()
+        if pid == self._persisted_pid:
+            return
+        self._persisted_pid = pid
+
+        now = time.time()
+        mtime_size_path_list = []
+        for dir_path, _, filename_list in os.walk(self._cache_dir):
+            for filename in filename_list:
+                path = os.path.join(dir_path, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                if filename.endswith(_PERSISTED_SUFFIX):
+                    mtime_size_path_list.append(
+                        (stat.st_mtime, stat.st_size, path))
+                elif now - stat.st_mtime > _STALE_TEMP_FILE_SECS:
+                    _LOGGER.warning(
+                        "removing stale temporary file: {}".format(path))
+                    phlsys_fs.delete_file_if_exists(path)
+
+        self._persisted_path_to_size = collections.OrderedDict(
+            (path, size) for _, size, path in sorted(mtime_size_path_list))
+        self._persisted_bytes = sum(self._persisted_path_to_size.values())
+
 
 class Cache(object):
 
     """Cache the results from abdt_differ."""
 
-    def __init__(self, refcache_repo):
+    def __init__(self, refcache_repo, result_store=None, namespace=''):
         """Return a Cache.
 
         :refcache_repo: a phlgitx_refcache repository
+        :result_store: the ResultStore to keep successful results in, which
+                       may be shared with other caches, or None for a store
+                       of the default size in memory only
+        :namespace: the string name of the repo in 'result_store', must be
+                    unique amongst the caches sharing the store
 
         """
         self._diff_results = {}
+        self._new_keys = set()
         self._repo = refcache_repo
+        if result_store is None:
+            result_store = ResultStore()
+        self._result_store = result_store
+        self._namespace = namespace
+
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get_stats(self):
+        """Return a dict of the counts of cache events, and the bytes used.
+
+        'hits' and 'misses' are for this cache, the rest are from the
+        ResultStore.get_stats() of its result store. 'hits' includes
+        'disk_hits'.
+
+        :returns: a dict of string names to integer counts
+
+        """
+        stats = self._result_store.get_stats()
+        stats.update(self._stats)
+        return stats
 
     def get_cache(self):
-        """Return the cache internals for persisting.
+        """Return the NoDiffError cache internals for persisting.
 
         :returns: something suitable to supply to 'set_cache()' later
 
@@ -46,13 +300,37 @@ class Cache(object):
         return self._diff_results
 
     def set_cache(self, cache):
-        """Set the cache internals.
+        """Set the NoDiffError cache internals.
 
         :cache: the result of a call to get_cache()
         :returns: None
 
         """
         self._diff_results = cache
+        self._new_keys = set()
+
+    def pop_new_entries(self):
+        """Return the cache entries added since the last call, forget them.
+
+        This is useful for sending only the changes to another cache, e.g. in
+        another process, rather than the whole cache.
+
+        :returns: something suitable to supply to 'merge_entries()' later
+
+        """
+        new_entries = dict(
+            (key, self._diff_results[key]) for key in self._new_keys)
+        self._new_keys = set()
+        return new_entries
+
+    def merge_entries(self, entries):
+        """Add the cache entries from another cache.
+
+        :entries: the result of a call to pop_new_entries()
+        :returns: None
+
+        """
+        self._diff_results.update(entries)
 
     def checkout_make_raw_diff(
             self, from_branch, to_branch, max_diff_size_utf8_bytes):
@@ -61,8 +339,8 @@ class Cache(object):
         If the diff would exceed the pre-specified max diff size then take
         measures to reduce the diff.
 
-        Potentially checkout onto the 'to_branch' so that changes to
-        .gitattributes files will be considered.
+        The .gitattributes files on 'to_branch' are considered, without
+        checking it out.
 
         :from_branch: string name of the merge-base of 'branch'
         :to_branch: string name of the branch to diff
@@ -78,21 +356,33 @@ class Cache(object):
 
         key = self._make_key(from_branch, to_branch, max_diff_size_utf8_bytes)
         if key in self._diff_results:
+            self._stats['hits'] += 1
             raise self._diff_results[key]
 
-        # checkout the 'to' branch, otherwise we won't take into account any
-        # changes to .gitattributes files
-        phlgit_checkout.branch(self._repo, to_branch)
+        result = self._result_store.get_result_or_none(self._namespace, key)
+        if result is not None:
+            self._stats['hits'] += 1
+            return result
 
-        try:
-            return abdt_differ.make_raw_diff(
-                self._repo,
-                from_branch,
-                to_branch,
-                max_diff_size_utf8_bytes)
-        except abdt_differ.NoDiffError as e:
-            self._diff_results[key] = e
-            raise
+        self._stats['misses'] += 1
+
+        # diff with the .gitattributes files from the 'to' branch, rather
+        # than those in the working tree, without checking it out
+        with phlgitx_attributesrepo.attributes_repo_context(
+                self._repo, to_branch) as attributes_repo:
+            try:
+                result = abdt_differ.make_raw_diff(
+                    attributes_repo,
+                    from_branch,
+                    to_branch,
+                    max_diff_size_utf8_bytes)
+            except abdt_differ.NoDiffError as e:
+                self._diff_results[key] = e
+                self._new_keys.add(key)
+                raise
+
+        self._result_store.add_result(self._namespace, key, result)
+        return result
 
     def _make_key(self, from_branch, to_branch, max_diff_size_utf8_bytes):
         from_ref, to_ref = self._refs_to_hashes(from_branch, to_branch)
@@ -6,10 +6,32 @@
 # cover those concerns.
 #
 # Concerns:
-# [  ]
+# [ B] pop_new_entries() returns entries added since the last call
+# [ B] pop_new_entries() returns nothing if nothing was added since
+# [ B] merge_entries() makes another cache use the entries without the repo
+# [ C] diffs honour the .gitattributes files on the 'to' branch
+# [ C] making a diff doesn't change the working tree
+# [ D] successful results are reused without the repo
+# [ D] get_stats() counts hits and misses
+# [ E] the least recently used results are discarded to stay within max_bytes
+# [ E] results larger than max_bytes aren't kept
+# [ F] persisted results are used by a new cache without the repo
+# [ F] damaged persisted results are ignored and replaced
+# [ F] persisted results are pruned to stay within max_bytes
+# [ F] stale temporary files are removed when pruning
+# [ G] caches sharing a result store keep within its one max_bytes
+# [ G] caches sharing a result store don't use each other's results
+# [ H] the cache dir is listed once by each process, not for every result
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] test_A_Breathing
+# [ B] test_B_PopMergeEntries
+# [ C] test_C_Attributes
+# [ D] test_D_SuccessfulResults
+# [ E] test_E_LeastRecentlyUsed
+# [ F] test_F_Persistence
+# [ G] test_G_SharedResultStore
+# [ H] test_H_ListsCacheDirOnce
 # =============================================================================
 
 from __future__ import absolute_import
@@ -17,9 +39,12 @@ from __future__ import division
 from __future__ import print_function
 
 import contextlib
+import os
+import time
 import unittest
 
 import phlgitu_fixture
+import phlsys_fs
 import phlgitx_refcache
 
 import abdt_differ
@@ -53,6 +78,22 @@ class _BreakableRepo(object):
             self._is_enabled = True
 
 
+@contextlib.contextmanager
+def _count_os_walk_context():
+    walk = os.walk
+    count_list = [0]
+
+    def counting_walk(*args, **kwargs):
+        count_list[0] += 1
+        return walk(*args, **kwargs)
+
+    os.walk = counting_walk
+    try:
+        yield count_list
+    finally:
+        os.walk = walk
+
+
 class Test(unittest.TestCase):
 
     def setUp(self):
@@ -103,16 +144,13 @@ class Test(unittest.TestCase):
                 with self.assertRaises(abdt_differ.NoDiffError):
                     make_diff(1)
 
-            # the differ will detach HEAD so attach to branch again before
-            # making any more commits on the branch
-            # pylint has faulty detection here
-            # pylint: disable=not-callable
-            worker.repo('checkout', branch_name)
-            # pylint: enable=not-callable
-
             worker.commit_new_file(
                 "make a test diff", "newfile", "test content")
 
+            # the worker doesn't commit via the refcache, so make it forget
+            # the refs it has cached
+            refcache_repo.set_hash_ref_pairs(None)
+
             # a diff within the limits passes straight through
             diff_result = make_diff(1000)
             self.assertIn("test content", diff_result.diff)
@@ -129,6 +167,255 @@ class Test(unittest.TestCase):
             with self.assertRaises(abdt_exception.LargeDiffException):
                 make_diff(1)
 
+    def test_B_PopMergeEntries(self):
+        with phlgitu_fixture.lone_worker_context() as worker:
+
+            branch_name = 'diff_branch'
+
+            breakable_repo = _BreakableRepo(worker.repo)
+            refcache_repo = phlgitx_refcache.Repo(breakable_repo)
+            differ = abdt_differresultcache.Cache(refcache_repo)
+            other_differ = abdt_differresultcache.Cache(refcache_repo)
+
+            # pylint has faulty detection here
+            # pylint: disable=not-callable
+            worker.repo('checkout', '-b', branch_name)
+            # pylint: enable=not-callable
+
+            def make_diff(cache):
+                return cache.checkout_make_raw_diff(
+                    "refs/heads/master",
+                    "refs/heads/{}".format(branch_name),
+                    1)
+
+            with self.assertRaises(abdt_differ.NoDiffError):
+                make_diff(differ)
+
+            # [ B] pop_new_entries() returns entries added since the last call
+            entries = differ.pop_new_entries()
+            self.assertEqual(len(entries), 1)
+
+            # [ B] pop_new_entries() returns nothing if nothing was added since
+            self.assertEqual(differ.pop_new_entries(), {})
+
+            # [ B] merge_entries() makes another cache use the entries without
+            #      the repo
+            other_differ.merge_entries(entries)
+
+            # cache the refs, so that the repo isn't needed to make the key
+            self.assertTrue(refcache_repo.hash_ref_pairs)
+            with breakable_repo.disabled_context():
+                with self.assertRaises(abdt_differ.NoDiffError):
+                    make_diff(other_differ)
+
+    def test_C_Attributes(self):
+        with phlgitu_fixture.lone_worker_context() as worker:
+
+            branch_name = 'diff_branch'
+            refcache_repo = phlgitx_refcache.Repo(worker.repo)
+            differ = abdt_differresultcache.Cache(refcache_repo)
+
+            worker.commit_new_file('add text', 'file.txt', 'text\n')
+
+            # pylint has faulty detection here
+            # pylint: disable=not-callable
+            worker.repo('checkout', '-b', branch_name)
+            worker.commit_new_file(
+                'add attributes', '.gitattributes', '*.txt -diff\n')
+            worker.commit_new_file('change text', 'file.txt', 'new\n')
+            worker.repo('checkout', 'master')
+            # pylint: enable=not-callable
+
+            diff_result = differ.checkout_make_raw_diff(
+                "refs/heads/master",
+                "refs/heads/{}".format(branch_name),
+                1000)
+
+            # [ C] diffs honour the .gitattributes files on the 'to' branch
+            self.assertIn(
+                'Binary files a/file.txt and b/file.txt differ',
+                diff_result.diff)
+
+            # [ C] making a diff doesn't change the working tree
+            # pylint: disable=not-callable
+            self.assertEqual(
+                worker.repo('rev-parse', '--abbrev-ref', 'HEAD').strip(),
+                'master')
+            self.assertEqual(worker.repo('status', '--porcelain'), '')
+            # pylint: enable=not-callable
+
+    def test_D_SuccessfulResults(self):
+        with phlgitu_fixture.lone_worker_context() as worker:
+            breakable_repo = _BreakableRepo(worker.repo)
+            refcache_repo = phlgitx_refcache.Repo(breakable_repo)
+            differ = abdt_differresultcache.Cache(refcache_repo)
+            _make_branches(worker, ['one'])
+
+            diff_result = _make_diff(differ, 'one')
+            self.assertIn('content of one', diff_result.diff)
+
+            # [ D] successful results are reused without the repo
+            with breakable_repo.disabled_context():
+                self.assertEqual(_make_diff(differ, 'one'), diff_result)
+
+            # [ D] get_stats() counts hits and misses
+            stats = differ.get_stats()
+            self.assertEqual(stats['hits'], 1)
+            self.assertEqual(stats['misses'], 1)
+            self.assertEqual(stats['disk_hits'], 0)
+            self.assertEqual(stats['bytes'], diff_result.diff_size_utf8_bytes)
+
+    def test_E_LeastRecentlyUsed(self):
+        with phlgitu_fixture.lone_worker_context() as worker:
+            refcache_repo = phlgitx_refcache.Repo(worker.repo)
+            _make_branches(worker, ['one', 'two'])
+
+            # the diffs are the same size, make room for only one of them
+            diff_size = _make_diff(
+                abdt_differresultcache.Cache(refcache_repo),
+                'one').diff_size_utf8_bytes
+            differ = abdt_differresultcache.Cache(
+                refcache_repo, abdt_differresultcache.ResultStore(diff_size))
+
+            # [ E] the least recently used results are discarded to stay
+            #      within max_bytes
+            _make_diff(differ, 'one')
+            _make_diff(differ, 'two')
+            _make_diff(differ, 'two')
+            _make_diff(differ, 'one')
+            stats = differ.get_stats()
+            self.assertEqual(stats['misses'], 3)
+            self.assertEqual(stats['hits'], 1)
+            self.assertEqual(stats['evictions'], 2)
+            self.assertEqual(stats['bytes'], diff_size)
+
+            # [ E] results larger than max_bytes aren't kept
+            differ = abdt_differresultcache.Cache(
+                refcache_repo,
+                abdt_differresultcache.ResultStore(diff_size - 1))
+            _make_diff(differ, 'one')
+            _make_diff(differ, 'one')
+            stats = differ.get_stats()
+            self.assertEqual(stats['misses'], 2)
+            self.assertEqual(stats['bytes'], 0)
+
+    def test_F_Persistence(self):
+        with phlgitu_fixture.lone_worker_context() as worker, \
+                phlsys_fs.tmpdir_context() as cache_dir:
+            breakable_repo = _BreakableRepo(worker.repo)
+            refcache_repo = phlgitx_refcache.Repo(breakable_repo)
+            _make_branches(worker, ['one', 'two'])
+
+            def make_cache(max_bytes=1024 * 1024):
+                return abdt_differresultcache.Cache(
+                    refcache_repo,
+                    abdt_differresultcache.ResultStore(max_bytes, cache_dir))
+
+            diff_result = _make_diff(make_cache(), 'one')
+            filename, = os.listdir(cache_dir)
+            path = os.path.join(cache_dir, filename)
+
+            # [ F] persisted results are used by a new cache without the repo
+            differ = make_cache()
+            with breakable_repo.disabled_context():
+                self.assertEqual(_make_diff(differ, 'one'), diff_result)
+            self.assertEqual(differ.get_stats()['disk_hits'], 1)
+
+            # [ F] damaged persisted results are ignored and replaced
+            phlsys_fs.write_text_file(path, 'not a pickle')
+            differ = make_cache()
+            self.assertEqual(_make_diff(differ, 'one'), diff_result)
+            self.assertEqual(differ.get_stats()['misses'], 1)
+            self.assertEqual(
+                _make_diff(make_cache(), 'one'), diff_result)
+
+            # [ F] persisted results are pruned to stay within max_bytes
+            differ = make_cache(os.path.getsize(path))
+            _make_diff(differ, 'two')
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+            self.assertNotEqual(os.listdir(cache_dir), [filename])
+
+            # [ F] stale temporary files are removed when pruning
+            stale_path = os.path.join(cache_dir, 'tmpstale')
+            fresh_path = os.path.join(cache_dir, 'tmpfresh')
+            phlsys_fs.write_text_file(stale_path, 'partial')
+            phlsys_fs.write_text_file(fresh_path, 'partial')
+            two_hours_ago = time.time() - 2 * 60 * 60
+            os.utime(stale_path, (two_hours_ago, two_hours_ago))
+            _make_diff(make_cache(), 'one')
+            self.assertFalse(os.path.exists(stale_path))
+            self.assertTrue(os.path.exists(fresh_path))
+
+    def test_G_SharedResultStore(self):
+        with phlgitu_fixture.lone_worker_context() as worker:
+            refcache_repo = phlgitx_refcache.Repo(worker.repo)
+            _make_branches(worker, ['one', 'two'])
+
+            # the diffs are the same size, make room for only one of them
+            diff_size = _make_diff(
+                abdt_differresultcache.Cache(refcache_repo),
+                'one').diff_size_utf8_bytes
+            store = abdt_differresultcache.ResultStore(diff_size)
+            differ_a = abdt_differresultcache.Cache(refcache_repo, store, 'a')
+            differ_b = abdt_differresultcache.Cache(refcache_repo, store, 'b')
+
+            # [ G] caches sharing a result store keep within its one
+            #      max_bytes
+            _make_diff(differ_a, 'one')
+            _make_diff(differ_b, 'two')
+            _make_diff(differ_a, 'one')
+            self.assertEqual(differ_a.get_stats()['misses'], 2)
+            self.assertEqual(store.get_stats()['evictions'], 2)
+            self.assertEqual(store.get_stats()['bytes'], diff_size)
+
+            # [ G] caches sharing a result store don't use each other's
+            #      results
+            _make_diff(differ_b, 'one')
+            self.assertEqual(differ_b.get_stats()['misses'], 2)
+            self.assertEqual(differ_b.get_stats()['hits'], 0)
+
+    def test_H_ListsCacheDirOnce(self):
+        with phlgitu_fixture.lone_worker_context() as worker, \
+                phlsys_fs.tmpdir_context() as cache_dir:
+            refcache_repo = phlgitx_refcache.Repo(worker.repo)
+            branch_list = ['one', 'two', 'three']
+            _make_branches(worker, branch_list)
+
+            diff_size = _make_diff(
+                abdt_differresultcache.Cache(refcache_repo),
+                'one').diff_size_utf8_bytes
+            store = abdt_differresultcache.ResultStore(
+                diff_size * 10, cache_dir)
+
+            # [ H] the cache dir is listed once by each process, not for
+            #      every result
+            with _count_os_walk_context() as count_list:
+                for namespace in ('a', 'b'):
+                    differ = abdt_differresultcache.Cache(
+                        refcache_repo, store, namespace)
+                    for branch in branch_list:
+                        _make_diff(differ, branch)
+            self.assertEqual(count_list, [1])
+            self.assertEqual(
+                len(branch_list) * 2,
+                sum(len(files) for _, _, files in os.walk(cache_dir)))
+
+
+def _make_branches(worker, branch_list):
+    # pylint has faulty detection here
+    # pylint: disable=not-callable
+    for branch in branch_list:
+        worker.repo('checkout', '-b', branch, 'master')
+        worker.commit_new_file(
+            'add ' + branch, branch, 'content of {}\n'.format(branch))
+    worker.repo('checkout', 'master')
+    # pylint: enable=not-callable
+
+
+def _make_diff(cache, branch):
+    return cache.checkout_make_raw_diff(
+        'refs/heads/master', 'refs/heads/{}'.format(branch), 1000)
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2014-2017 Bloomberg Finance L.P.
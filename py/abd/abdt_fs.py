@@ -147,9 +147,12 @@ class Layout(object):
     phabricator_config_dir = 'config/repository'
     repository_config_dir = 'config/repository'
     urlwatcher_cache_path = '.arcyd.urlwatcher.cache'
+    usercache = 'var/run/usercache.sqlite'
+    conduit_sessions = 'var/run/conduitsessions.json'
     lockfile = 'var/lockfile'
     killfile = 'var/command/killfile'
     reloadfile = 'var/command/reload'
+    metrics = 'var/status/metrics.json'
 
     dir_run = 'var/run'
 
@@ -23,6 +23,8 @@
 #    .checkout_master_fetch_prune
 #    .hash_ref_pairs
 #    .checkout_make_raw_diff
+#    .object_reader
+#    .ref_reader
 #    .get_remote
 #
 # Public Functions:
@@ -52,10 +54,14 @@ import phlgit_merge
 import phlgit_push
 import phlgit_showref
 import phlgitu_ref
+import phlsys_gitobjectreader
+import phlsys_gitrefreader
+import phlsys_timer
 
 import abdt_branch
 import abdt_lander
 import abdt_logging
+import abdt_metrics
 import abdt_naming
 
 _ARCYD_REFSPACE = 'refs/arcyd'
@@ -339,7 +345,13 @@ class Repo(object):
         :returns: a list of (sha1, name)
 
         """
-        return self._repo.hash_ref_pairs
+        # record cache hits separately, so that the count of 'ref-listing'
+        # is the number of times that git had to list the refs
+        phase = 'ref-listing'
+        if self._repo.peek_hash_ref_pairs() is not None:
+            phase = 'ref-listing-cached'
+        with abdt_metrics.phase_context(phase):
+            return self._repo.hash_ref_pairs
 
     def checkout_make_raw_diff(
             self, from_branch, to_branch, max_diff_size_utf8_bytes):
@@ -348,8 +360,8 @@ class Repo(object):
         If the diff would exceed the pre-specified max diff size then take
         measures to reduce the diff.
 
-        Potentially checkout onto the 'to_branch' so that changes to
-        .gitattributes files will be considered.
+        The .gitattributes files on 'to_branch' are considered, without
+        checking it out.
 
         :from_branch: string name of the merge-base of 'branch'
         :to_branch: string name of the branch to diff
@@ -357,8 +369,30 @@ class Repo(object):
         :returns: the string diff of the changes on the branch
 
         """
-        return self._differ_cache.checkout_make_raw_diff(
-            from_branch, to_branch, max_diff_size_utf8_bytes)
+        num_hits = self._differ_cache.get_stats()['hits']
+        timer = phlsys_timer.Timer()
+        timer.start()
+        try:
+            result = self._differ_cache.checkout_make_raw_diff(
+                from_branch, to_branch, max_diff_size_utf8_bytes)
+        finally:
+            phase = 'diff-generation'
+            if self._differ_cache.get_stats()['hits'] != num_hits:
+                phase = 'diff-generation-cached'
+            abdt_metrics.record(phase, timer.duration)
+        if phase == 'diff-generation':
+            abdt_metrics.add_bytes(phase, result.diff_size_utf8_bytes)
+        return result
+
+    @property
+    def object_reader(self):
+        """Return the ObjectReader of the wrapped repo, or None."""
+        return phlsys_gitobjectreader.get_reader_or_none(self._repo)
+
+    @property
+    def ref_reader(self):
+        """Return the RefReader of the wrapped repo, or None."""
+        return phlsys_gitrefreader.get_reader_or_none(self._repo)
 
     def _log_read_call(self, args, kwargs):
         with abdt_logging.remote_io_read_event_context(
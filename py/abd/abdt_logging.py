@@ -27,6 +27,8 @@ import logging
 import phlsys_subprocess
 import phlsys_timer
 
+import abdt_metrics
+
 
 _LOGGER = logging.getLogger(__name__)
 _EXTERNAL_SYSTEM_ERROR_LOGGER = None
@@ -103,7 +105,9 @@ def _remote_io_event_log_context(kind, identifier, detail, logger):
     try:
         yield result_list
     finally:
-        prolog = '{:.3f}s'.format(timer.duration)
+        duration = timer.duration
+        abdt_metrics.record(identifier, duration)
+        prolog = '{:.3f}s'.format(duration)
         _log_remote_io_event_to_logger(
             kind, prolog, identifier, detail, result_list, logger)
 
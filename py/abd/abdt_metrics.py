@@ -0,0 +1,230 @@
+"""Record where Arcyd spends its time, by phase of processing.
+
+Durations are recorded against the 'current' recorder, which is set with
+'recorder_context'. This means that code deep in Arcyd can record phases
+without a recorder being passed to it. When no recorder is current then
+nothing is recorded.
+
+Calls to Conduit are recorded by method alongside the phases, as the current
+recorder is also made the current phlsys_callstats recorder.
+
+The data from a recorder is picklable, so recorders in worker processes can
+be merged into a recorder in the parent process.
+
+Usage example:
+
+    >>> recorder = Recorder()
+    >>> with recorder_context(recorder):
+    ...     with phase_context('git-fetch'):
+    ...         pass
+    ...     add_bytes('git-fetch', 100)
+    >>> stats = recorder.to_json_dict()['git-fetch']
+    >>> stats['count'], stats['total_bytes']
+    (1, 100)
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# abdt_metrics
+#
+# Public Classes:
+#   Recorder
+#    .record
+#    .add_bytes
+#    .merge_data
+#    .get_data
+#    .to_json_dict
+#    .conduit_calls
+#
+# Public Functions:
+#   recorder_context
+#   phase_context
+#   record
+#   add_bytes
+#   merge_data
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import contextlib
+
+import phlsys_callstats
+import phlsys_timer
+
+# the upper bounds of the histogram buckets for durations, anything longer
+# than the last bound goes in an extra bucket
+_HISTOGRAM_BOUNDS_SECS = (0.01, 0.1, 1, 10, 60, 600)
+
+_COUNT = 0
+_TOTAL_SECS = 1
+_MAX_SECS = 2
+_TOTAL_BYTES = 3
+_HISTOGRAM = 4
+
+_RECORDER = None
+
+
+class Recorder(object):
+
+    def __init__(self):
+        # map of phase names to a list of the fields indexed above, lists are
+        # small to pickle and easy to merge
+        self._phase_to_stats = {}
+        self._conduit_calls = phlsys_callstats.Recorder()
+
+    def record(self, phase, duration_secs):
+        """Record one occurrence of 'phase' which took 'duration_secs'.
+
+        :phase: the string name of the phase
+        :duration_secs: the float number of seconds the phase took
+        :returns: None
+
+        """
+        stats = self._get_stats(phase)
+        stats[_COUNT] += 1
+        stats[_TOTAL_SECS] += duration_secs
+        stats[_MAX_SECS] = max(stats[_MAX_SECS], duration_secs)
+        stats[_HISTOGRAM][
+            bisect.bisect_left(_HISTOGRAM_BOUNDS_SECS, duration_secs)] += 1
+
+    def add_bytes(self, phase, num_bytes):
+        """Record that 'num_bytes' were transferred or generated in 'phase'.
+
+        :phase: the string name of the phase
+        :num_bytes: the integer number of bytes
+        :returns: None
+
+        """
+        self._get_stats(phase)[_TOTAL_BYTES] += num_bytes
+
+    def merge_data(self, data):
+        """Add the stats from 'data', which came from another 'get_data'.
+
+        :data: the result of 'get_data' on another recorder
+        :returns: None
+
+        """
+        phase_data, conduit_call_data = data
+        self._conduit_calls.merge_data(conduit_call_data)
+        for phase, other in phase_data.iteritems():
+            stats = self._get_stats(phase)
+            stats[_COUNT] += other[_COUNT]
+            stats[_TOTAL_SECS] += other[_TOTAL_SECS]
+            stats[_MAX_SECS] = max(stats[_MAX_SECS], other[_MAX_SECS])
+            stats[_TOTAL_BYTES] += other[_TOTAL_BYTES]
+            stats[_HISTOGRAM] = [
+                a + b for a, b in zip(stats[_HISTOGRAM], other[_HISTOGRAM])
+            ]
+
+    def get_data(self):
+        """Return a picklable copy of the stats, suitable for 'merge_data'."""
+        phase_data = {
+            phase: stats[:_HISTOGRAM] + [list(stats[_HISTOGRAM])]
+            for phase, stats in self._phase_to_stats.iteritems()
+        }
+        return phase_data, self._conduit_calls.get_data()
+
+    def to_json_dict(self):
+        """Return a dict of the stats for each phase, for human consumption.
+
+        :returns: a dict of string phase names to dicts of stats
+
+        """
+        labels = ['<={}s'.format(b) for b in _HISTOGRAM_BOUNDS_SECS]
+        labels.append('>{}s'.format(_HISTOGRAM_BOUNDS_SECS[-1]))
+
+        result = {}
+        for phase, stats in self._phase_to_stats.iteritems():
+            result[phase] = {
+                'count': stats[_COUNT],
+                'total_secs': stats[_TOTAL_SECS],
+                'max_secs': stats[_MAX_SECS],
+                'total_bytes': stats[_TOTAL_BYTES],
+                'histogram_secs': dict(zip(labels, stats[_HISTOGRAM])),
+            }
+        return result
+
+    @property
+    def conduit_calls(self):
+        """Return the phlsys_callstats.Recorder of calls to Conduit."""
+        return self._conduit_calls
+
+    def _get_stats(self, phase):
+        stats = self._phase_to_stats.get(phase)
+        if stats is None:
+            stats = [0, 0.0, 0.0, 0, [0] * (len(_HISTOGRAM_BOUNDS_SECS) + 1)]
+            self._phase_to_stats[phase] = stats
+        return stats
+
+
+@contextlib.contextmanager
+def recorder_context(recorder):
+    """Make 'recorder' the current recorder for the duration of the context.
+
+    :recorder: the Recorder to record phases to
+    :returns: a context manager which yields 'recorder'
+
+    """
+    global _RECORDER
+    previous_recorder = _RECORDER
+    _RECORDER = recorder
+    try:
+        with phlsys_callstats.recorder_context(recorder.conduit_calls):
+            yield recorder
+    finally:
+        _RECORDER = previous_recorder
+
+
+@contextlib.contextmanager
+def phase_context(phase):
+    """Record the duration of the context as an occurrence of 'phase'.
+
+    :phase: the string name of the phase
+    :returns: a context manager
+
+    """
+    timer = phlsys_timer.Timer()
+    timer.start()
+    try:
+        yield
+    finally:
+        record(phase, timer.duration)
+
+
+def record(phase, duration_secs):
+    if _RECORDER is not None:
+        _RECORDER.record(phase, duration_secs)
+
+
+def add_bytes(phase, num_bytes):
+    if _RECORDER is not None:
+        _RECORDER.add_bytes(phase, num_bytes)
+
+
+def merge_data(data):
+    if _RECORDER is not None:
+        _RECORDER.merge_data(data)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,133 @@
+"""Test suite for abdt_metrics."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] record() counts occurrences and totals durations of phases
+# [ A] add_bytes() totals bytes of phases
+# [ A] durations are counted in the appropriate histogram bucket
+# [ B] merge_data() of get_data() doubles all counts and totals
+# [ B] get_data() is a copy, unaffected by later records
+# [ C] phases are recorded to the current recorder
+# [ C] nested recorder_context() restores the previous recorder
+# [ C] nothing is recorded when there is no current recorder
+# [ D] conduit calls are recorded to the current recorder
+# [ D] merge_data() merges conduit calls
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Merge
+# [ C] test_C_Context
+# [ D] test_D_ConduitCalls
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pickle
+import unittest
+
+import phlsys_callstats
+
+import abdt_metrics
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        recorder = abdt_metrics.Recorder()
+        recorder.record('fetch', 0.5)
+        recorder.record('fetch', 2)
+        recorder.add_bytes('fetch', 100)
+        stats = recorder.to_json_dict()['fetch']
+
+        # [ A] record() counts occurrences and totals durations of phases
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['total_secs'], 2.5)
+        self.assertEqual(stats['max_secs'], 2)
+
+        # [ A] add_bytes() totals bytes of phases
+        self.assertEqual(stats['total_bytes'], 100)
+
+        # [ A] durations are counted in the appropriate histogram bucket
+        histogram = stats['histogram_secs']
+        self.assertEqual(histogram['<=1s'], 1)
+        self.assertEqual(histogram['<=10s'], 1)
+        self.assertEqual(sum(histogram.itervalues()), 2)
+
+    def test_B_Merge(self):
+        recorder = abdt_metrics.Recorder()
+        recorder.record('fetch', 0.5)
+        recorder.add_bytes('diff', 100)
+        data = pickle.loads(pickle.dumps(recorder.get_data()))
+        expected = recorder.to_json_dict()
+
+        # [ B] merge_data() of get_data() doubles all counts and totals
+        recorder.merge_data(data)
+        merged = recorder.to_json_dict()
+        self.assertEqual(merged['fetch']['count'], 2)
+        self.assertEqual(merged['fetch']['total_secs'], 1.0)
+        self.assertEqual(merged['fetch']['histogram_secs']['<=1s'], 2)
+        self.assertEqual(merged['diff']['total_bytes'], 200)
+
+        # [ B] get_data() is a copy, unaffected by later records
+        other = abdt_metrics.Recorder()
+        other.merge_data(data)
+        self.assertEqual(other.to_json_dict(), expected)
+
+    def test_C_Context(self):
+        outer = abdt_metrics.Recorder()
+        inner = abdt_metrics.Recorder()
+
+        # [ C] nothing is recorded when there is no current recorder
+        abdt_metrics.record('nowhere', 1)
+
+        with abdt_metrics.recorder_context(outer):
+            with abdt_metrics.recorder_context(inner):
+                with abdt_metrics.phase_context('inner'):
+                    pass
+            abdt_metrics.add_bytes('outer', 10)
+
+        # [ C] phases are recorded to the current recorder
+        self.assertEqual(inner.to_json_dict().keys(), ['inner'])
+
+        # [ C] nested recorder_context() restores the previous recorder
+        self.assertEqual(outer.to_json_dict().keys(), ['outer'])
+
+    def test_D_ConduitCalls(self):
+        recorder = abdt_metrics.Recorder()
+
+        # [ D] conduit calls are recorded to the current recorder
+        with abdt_metrics.recorder_context(recorder):
+            phlsys_callstats.record_call('user.query', 0.1, 10, 100)
+        calls = recorder.conduit_calls.to_json_dict()
+        self.assertEqual(calls.keys(), ['user.query'])
+        self.assertEqual(calls['user.query']['count'], 1)
+
+        # [ D] merge_data() merges conduit calls
+        other = abdt_metrics.Recorder()
+        with abdt_metrics.recorder_context(other):
+            abdt_metrics.merge_data(
+                pickle.loads(pickle.dumps(recorder.get_data())))
+        self.assertEqual(other.conduit_calls.to_json_dict(), calls)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -22,7 +22,10 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import json
+import sys
 
+import phlsys_callstats
 import phlsys_conduit
 import phlsys_makeconduit
 import phlsys_subcommand
@@ -67,6 +70,9 @@ usage examples:
 
     to create a diff to pass to arcyon, from within a git repository:
     $ arcyon git-diff-helper base head
+
+    to print statistics about the conduit calls made by a command:
+    $ arcyon --stats query --author-me
     """
 
 
@@ -76,6 +82,12 @@ def main():
         description=__doc__,
         epilog=_USAGE_EXAMPLES)
 
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help="print statistics about the calls made to conduit, by method, "
+             "to stderr as json when the command finishes.")
+
     subparsers = parser.add_subparsers()
 
     phlsys_subcommand.setup_parser(
@@ -103,6 +115,24 @@ def main():
 
     args = parser.parse_args()
 
+    if args.stats:
+        recorder = phlsys_callstats.Recorder()
+        with phlsys_callstats.recorder_context(recorder):
+            try:
+                return _run(args)
+            finally:
+                json.dump(
+                    recorder.to_json_dict(),
+                    sys.stderr,
+                    sort_keys=True,
+                    indent=1,
+                    separators=(',', ': '))
+                sys.stderr.write('\n')
+
+    return _run(args)
+
+
+def _run(args):
     try:
         return args.func(args)
     except phlsys_conduit.ConduitException as e:
@@ -230,10 +230,7 @@ def get_revision_generator(args):
     if commits_to_follow:
         commit_list += phlgit_revlist.commits(repo, *commits_to_follow)
 
-    make_rev = phlgit_log.make_revision_from_hash
-    revision_generator = (make_rev(repo, commit) for commit in commit_list)
-
-    return revision_generator
+    return phlgit_log.iter_revisions_from_hashes(repo, commit_list)
 
 
 def parse_fields(message_body):
@@ -0,0 +1,187 @@
+"""Cache the Phabricator users that email addresses belong to, on disk.
+
+Looking up users by email address requires a round-trip to Phabricator, which
+is wasteful when the same few authors are looked up again and again. The
+results are stored in an sqlite database, which may be shared by several
+processes and persists across restarts.
+
+Emails which don't belong to any user are cached too, for a shorter time so
+that new users are noticed reasonably quickly.
+
+The cache is only an optimisation, errors from the database are treated as
+cache misses rather than raised.
+
+Usage example:
+
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     cache = EmailUserCache('users.sqlite', 'http://phab.test')
+    ...     cache.lookup('alice@server.test')
+    ...     cache.store('alice@server.test', ('alice', 'PHID-USER-1'))
+    ...     cache.store('nobody@server.test', None)
+    ...     cache.lookup('alice@server.test')
+    ...     cache.lookup('nobody@server.test')
+    (False, None)
+    (True, (u'alice', u'PHID-USER-1'))
+    (True, None)
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlcon_emailusercache
+#
+# Public Classes:
+#   EmailUserCache
+#    .lookup
+#    .store
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sqlite3
+import time
+
+import phlsys_fs
+
+# user details rarely change, refresh them daily
+_DEFAULT_TTL_SECS = 24 * 60 * 60
+
+# new users may appear at any time, don't keep them waiting for long
+_DEFAULT_UNKNOWN_TTL_SECS = 10 * 60
+
+# wait this long for other processes to finish writing before giving up
+_BUSY_TIMEOUT_SECS = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_user (
+    instance TEXT NOT NULL,
+    email TEXT NOT NULL,
+    username TEXT,
+    phid TEXT,
+    expiry REAL NOT NULL,
+    PRIMARY KEY (instance, email)
+)
+"""
+
+
+class EmailUserCache(object):
+
+    def __init__(
+            self,
+            path,
+            instance,
+            ttl_secs=_DEFAULT_TTL_SECS,
+            unknown_ttl_secs=_DEFAULT_UNKNOWN_TTL_SECS):
+        """Cache the users of 'instance' in the database at 'path'.
+
+        :path: the string path of the sqlite database, created if missing
+        :instance: the string to distinguish the Phabricator instance by
+        :ttl_secs: the number of seconds to remember users for
+        :unknown_ttl_secs: the number of seconds to remember unknown emails
+
+        """
+        self._path = os.path.abspath(path)
+        self._instance = instance
+        self._ttl_secs = ttl_secs
+        self._unknown_ttl_secs = unknown_ttl_secs
+
+        # connections mustn't be shared with forked processes, so remember
+        # which process each one belongs to
+        self._connection = None
+        self._connection_pid = None
+
+    def lookup(self, email):
+        """Return a tuple of (is_cached, user) for 'email'.
+
+        If 'is_cached' is True then 'user' is either a (username, phid) tuple
+        or None if 'email' is known not to belong to any user.
+
+        :email: the string email address to look up
+        :returns: a tuple of (bool, (username, phid) or None)
+
+        """
+        try:
+            row = self._get_connection().execute(
+                'SELECT username, phid, expiry FROM email_user '
+                'WHERE instance = ? AND email = ?',
+                (self._instance, email)).fetchone()
+        except (sqlite3.Error, OSError):
+            return False, None
+
+        if row is None:
+            return False, None
+
+        username, phid, expiry = row
+        if expiry < time.time():
+            return False, None
+
+        if username is None:
+            return True, None
+
+        return True, (username, phid)
+
+    def store(self, email, user):
+        """Remember that 'email' belongs to 'user'.
+
+        :email: the string email address
+        :user: a (username, phid) tuple, or None if there is no such user
+        :returns: None
+
+        """
+        username, phid = user if user is not None else (None, None)
+        ttl_secs = self._ttl_secs if user is not None else (
+            self._unknown_ttl_secs)
+
+        try:
+            connection = self._get_connection()
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO email_user '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (
+                        self._instance,
+                        email,
+                        username,
+                        phid,
+                        time.time() + ttl_secs
+                    ))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _get_connection(self):
+        pid = os.getpid()
+        if self._connection is None or self._connection_pid != pid:
+            # N.B. don't close a connection inherited from our parent, that
+            # could disturb the parent's use of it
+            self._connection = None
+            phlsys_fs.ensure_dir(os.path.dirname(self._path))
+            connection = sqlite3.connect(
+                self._path, timeout=_BUSY_TIMEOUT_SECS)
+            with connection:
+                connection.execute(_SCHEMA)
+            self._connection = connection
+            self._connection_pid = pid
+        return self._connection
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,142 @@
+"""Test suite for phlcon_emailusercache."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] unknown emails aren't cached to begin with
+# [ A] stored users can be looked up
+# [ A] emails without users can be cached
+# [ B] users are forgotten when they expire
+# [ B] emails without users expire separately
+# [ C] users are shared between caches on the same database
+# [ C] users of different instances are kept apart
+# [ D] caches may be used from forked processes
+# [ E] errors from the database are treated as cache misses
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Expiry
+# [ C] test_C_Sharing
+# [ D] test_D_Fork
+# [ E] test_E_Errors
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import time
+import unittest
+
+import phlsys_fs
+
+import phlcon_emailusercache
+
+_ALICE = ('alice', 'PHID-USER-alice')
+_BOB = ('bob', 'PHID-USER-bob')
+
+
+def _store_bob(cache):
+    cache.store('bob@server.test', _BOB)
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        with phlsys_fs.chtmpdir_context():
+            cache = phlcon_emailusercache.EmailUserCache('users', 'phab')
+
+            # [ A] unknown emails aren't cached to begin with
+            self.assertEqual(
+                (False, None), cache.lookup('alice@server.test'))
+
+            # [ A] stored users can be looked up
+            cache.store('alice@server.test', _ALICE)
+            self.assertEqual(
+                (True, _ALICE), cache.lookup('alice@server.test'))
+
+            # [ A] emails without users can be cached
+            cache.store('nobody@server.test', None)
+            self.assertEqual(
+                (True, None), cache.lookup('nobody@server.test'))
+
+    def test_B_Expiry(self):
+        with phlsys_fs.chtmpdir_context():
+            cache = phlcon_emailusercache.EmailUserCache(
+                'users', 'phab', ttl_secs=0.1, unknown_ttl_secs=60)
+            cache.store('alice@server.test', _ALICE)
+            cache.store('nobody@server.test', None)
+            time.sleep(0.2)
+
+            # [ B] users are forgotten when they expire
+            self.assertEqual(
+                (False, None), cache.lookup('alice@server.test'))
+
+            # [ B] emails without users expire separately
+            self.assertEqual(
+                (True, None), cache.lookup('nobody@server.test'))
+
+    def test_C_Sharing(self):
+        with phlsys_fs.chtmpdir_context():
+            cache = phlcon_emailusercache.EmailUserCache('users', 'phab')
+            other_cache = phlcon_emailusercache.EmailUserCache(
+                'users', 'phab')
+            other_instance_cache = phlcon_emailusercache.EmailUserCache(
+                'users', 'otherphab')
+
+            # [ C] users are shared between caches on the same database
+            cache.store('alice@server.test', _ALICE)
+            self.assertEqual(
+                (True, _ALICE), other_cache.lookup('alice@server.test'))
+
+            # [ C] users of different instances are kept apart
+            self.assertEqual(
+                (False, None),
+                other_instance_cache.lookup('alice@server.test'))
+
+    def test_D_Fork(self):
+        with phlsys_fs.chtmpdir_context():
+            cache = phlcon_emailusercache.EmailUserCache('users', 'phab')
+            cache.store('alice@server.test', _ALICE)
+
+            # [ D] caches may be used from forked processes
+            process = multiprocessing.Process(target=_store_bob, args=(cache,))
+            process.start()
+            process.join()
+            self.assertEqual(0, process.exitcode)
+            self.assertEqual((True, _BOB), cache.lookup('bob@server.test'))
+            self.assertEqual(
+                (True, _ALICE), cache.lookup('alice@server.test'))
+
+    def test_E_Errors(self):
+        with phlsys_fs.chtmpdir_context():
+            phlsys_fs.write_text_file('users', 'not a database')
+            cache = phlcon_emailusercache.EmailUserCache(
+                os.path.join('users', 'db'), 'phab')
+
+            # [ E] errors from the database are treated as cache misses
+            cache.store('alice@server.test', _ALICE)
+            self.assertEqual(
+                (False, None), cache.lookup('alice@server.test'))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
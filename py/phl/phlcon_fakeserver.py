@@ -0,0 +1,852 @@
+"""A local stand-in for Phabricator, serving the Conduit methods Arcyd uses.
+
+The stand-in keeps users, diffs and revisions in memory and serves them over
+HTTP, so that Arcyd and Arcyon may be run end to end against it without a
+real Phabricator install or any network access.
+
+Only the subset of Conduit that Arcyd uses is served:
+
+    conduit.connect, conduit.ping, user.query,
+    differential.createrawdiff, differential.createrevision,
+    differential.updaterevision, differential.query,
+    differential.createcomment, differential.close,
+    differential.parsecommitmessage, differential.getcommitmessage
+
+For load testing, the server may be told to delay calls, to fail a fraction
+of them and to expire sessions after a while. Delays don't hold up other
+calls, each request is served on its own thread.
+
+Usage example:
+
+    >>> phab = FakePhabricator([phldef_conduit.ALICE, phldef_conduit.PHAB])
+    >>> with server_context(phab) as server:
+    ...     conduit = phlsys_conduit.Conduit(
+    ...         server.uri,
+    ...         phldef_conduit.PHAB.user,
+    ...         phldef_conduit.PHAB.certificate)
+    ...     conduit('user.query', {'usernames': ['alice']})[0]['userName']
+    u'alice'
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlcon_fakeserver
+#
+# Public Classes:
+#   FakePhabricator
+#    .add_user
+#    .call
+#    .get_revision_status
+#    .revision_count
+#   Server
+#    .uri
+#    .call
+#    .add_connection
+#    .remove_connection
+#    .server_close
+#    .handle_error
+#
+# Public Functions:
+#   server_context
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import BaseHTTPServer
+import SocketServer
+import contextlib
+import hashlib
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import urlparse
+
+import phldef_conduit
+import phlsys_conduit
+
+# Phabricator permits this many sessions per user by default, making another
+# session expires the oldest one
+_DEFAULT_MAX_SESSIONS_PER_USER = 5
+
+_ERROR_CORE = 'ERR-CONDUIT-CORE'
+_ERROR_BAD_AUTH = 'ERR-INVALID-AUTH'
+_ERROR_CLOSED = 'ERR_CLOSED'
+_ERROR_BAD_REVISION = 'ERR_BAD_REVISION'
+_ERROR_BAD_DIFF = 'ERR_BAD_DIFF'
+
+_TEST_PLAN_ERROR = (
+    "Invalid or missing field 'Test Plan': You must provide a test plan.")
+
+_UNKNOWN_USERS_ERROR = (
+    "Error parsing field '{field}': "
+    "Commit message references nonexistent users: {users}.")
+
+# the 'ReviewStates' of phlcon_differential, which this module doesn't depend
+# on as it's a dependency of it
+_NEEDS_REVIEW = 0
+_NEEDS_REVISION = 1
+_ACCEPTED = 2
+_CLOSED = 3
+_ABANDONED = 4
+
+_STATUS_NAMES = {
+    _NEEDS_REVIEW: 'Needs Review',
+    _NEEDS_REVISION: 'Needs Revision',
+    _ACCEPTED: 'Accepted',
+    _CLOSED: 'Closed',
+    _ABANDONED: 'Abandoned',
+}
+
+# map the 'action' parameter of differential.createcomment to the status that
+# it leaves the revision in
+_ACTION_TO_STATUS = {
+    'accept': _ACCEPTED,
+    'reject': _NEEDS_REVISION,
+    'rethink': _NEEDS_REVISION,
+    'abandon': _ABANDONED,
+    'reclaim': _NEEDS_REVIEW,
+    'request_review': _NEEDS_REVIEW,
+    'reopen': _NEEDS_REVIEW,
+    'commit': _CLOSED,
+}
+
+# map the 'status' parameter of differential.query to the matching statuses
+_QUERY_STATUS_TO_STATUS_SET = {
+    'status-any': frozenset(_STATUS_NAMES),
+    'status-open': frozenset([_NEEDS_REVIEW, _NEEDS_REVISION, _ACCEPTED]),
+    'status-accepted': frozenset([_ACCEPTED]),
+    'status-needs-review': frozenset([_NEEDS_REVIEW]),
+    'status-needs-revision': frozenset([_NEEDS_REVISION]),
+    'status-closed': frozenset([_CLOSED, _ABANDONED]),
+    'status-abandoned': frozenset([_ABANDONED]),
+}
+
+# map the labels of commit message fields to the fields they fill out
+_LABEL_TO_FIELD = {
+    'summary': 'summary',
+    'test plan': 'testPlan',
+    'testplan': 'testPlan',
+    'reviewer': 'reviewerPHIDs',
+    'reviewers': 'reviewerPHIDs',
+    'reviewed by': 'reviewedByPHIDs',
+    'cc': 'ccPHIDs',
+    'ccs': 'ccPHIDs',
+    'subscribers': 'ccPHIDs',
+    'differential revision': 'revisionID',
+}
+
+_LABEL_RE = re.compile(r'^\s*([A-Za-z][A-Za-z ]*?)\s*:\s*(.*)$')
+
+# which of the fields name users, with the label to use in errors about them
+_USER_FIELD_TO_LABEL = {
+    'reviewerPHIDs': 'Reviewers',
+    'reviewedByPHIDs': 'Reviewed By',
+    'ccPHIDs': 'CC',
+}
+
+
+class _Error(Exception):
+
+    def __init__(self, code, info):
+        super(_Error, self).__init__(info)
+        self.code = code
+        self.info = info
+
+
+class FakePhabricator(object):
+
+    def __init__(
+            self,
+            account_list=None,
+            base_uri=phldef_conduit.BASE_TEST_URI,
+            session_secs=None,
+            max_sessions_per_user=_DEFAULT_MAX_SESSIONS_PER_USER,
+            auto_create_users=False):
+        """Create a Phabricator with the users from 'account_list'.
+
+        Users which are added without a certificate may not connect, they may
+        still author revisions via 'actAsUser' and be queried for.
+
+        :account_list: a list of phldef_conduit.Account, None for the
+                       default accounts
+        :base_uri: the string uri to make the uris of revisions from
+        :session_secs: the number of seconds a session lasts, None for ever
+        :max_sessions_per_user: the number of live sessions a user may have
+        :auto_create_users: if True, make new users for unknown emails
+
+        """
+        if account_list is None:
+            account_list = [
+                phldef_conduit.PHAB,
+                phldef_conduit.ALICE,
+                phldef_conduit.BOB,
+            ]
+
+        self._lock = threading.Lock()
+        self._base_uri = base_uri.rstrip('/')
+        self._session_secs = session_secs
+        self._max_sessions_per_user = max_sessions_per_user
+        self._auto_create_users = auto_create_users
+
+        self._users = []
+        self._username_to_user = {}
+        self._email_to_user = {}
+        self._phid_to_user = {}
+        self._session_key_to_session = {}
+        self._diff_id_to_diff = {}
+        self._revisions = []
+        self._next_connection_id = 1
+
+        for account in account_list:
+            self.add_user(
+                account.user, account.email, account.certificate, account.phid)
+
+    def add_user(self, username, email, certificate=None, phid=None):
+        """Add a new user and return its phid.
+
+        :username: the string name of the new user
+        :email: the string email address of the new user
+        :certificate: the string certificate the user connects with, or None
+        :phid: the string phid of the user, None to make one up
+        :returns: the string phid of the user
+
+        """
+        with self._lock:
+            return self._add_user(username, email, certificate, phid)
+
+    def call(self, method, params):
+        """Return the response to Conduit 'method' with 'params'.
+
+        :method: the string name of the Conduit method, e.g. 'conduit.ping'
+        :params: the dict of parameters, including '__conduit__' if any
+        :returns: a dict with 'result', 'error_code' and 'error_info'
+
+        """
+        handler = _METHOD_TO_HANDLER.get(method)
+        try:
+            if handler is None:
+                raise _Error(
+                    'ERR-CONDUIT-CALL',
+                    "Conduit method '{}' does not exist.".format(method))
+            with self._lock:
+                result = handler(self, params)
+        except _Error as e:
+            return {'result': None, 'error_code': e.code, 'error_info': e.info}
+        return {'result': result, 'error_code': None, 'error_info': None}
+
+    def get_revision_status(self, revision_id):
+        """Return the integer status of the revision with 'revision_id'.
+
+        :revision_id: the integer id of the revision
+        :returns: an integer, as phlcon_differential.ReviewStates
+
+        """
+        with self._lock:
+            return self._get_revision(revision_id)['status']
+
+    @property
+    def revision_count(self):
+        with self._lock:
+            return len(self._revisions)
+
+    def _add_user(self, username, email, certificate, phid):
+        if username in self._username_to_user:
+            raise ValueError("user '{}' already exists".format(username))
+        if phid is None:
+            phid = 'PHID-USER-fake{:016d}'.format(len(self._users) + 1)
+        user = {
+            'username': username,
+            'email': email,
+            'certificate': certificate,
+            'phid': phid,
+            'session_keys': [],
+        }
+        self._users.append(user)
+        self._username_to_user[username] = user
+        self._email_to_user[email.lower()] = user
+        self._phid_to_user[phid] = user
+        return phid
+
+    def _auto_create_user(self, email):
+        name = re.sub(r'[^a-z0-9._-]', '', email.split('@')[0].lower())
+        name = name or 'user'
+        username = name
+        suffix = 1
+        while username in self._username_to_user:
+            suffix += 1
+            username = '{}{}'.format(name, suffix)
+        self._add_user(username, email, None, None)
+        return self._email_to_user[email.lower()]
+
+    def _get_revision(self, revision_id):
+        try:
+            revision_id = int(revision_id)
+        except (TypeError, ValueError):
+            revision_id = 0
+        if revision_id < 1 or revision_id > len(self._revisions):
+            raise _Error(
+                _ERROR_BAD_REVISION,
+                "Revision '{}' does not exist.".format(revision_id))
+        return self._revisions[revision_id - 1]
+
+    def _get_diff(self, diff_id):
+        diff = self._diff_id_to_diff.get(diff_id)
+        if diff is None:
+            raise _Error(
+                _ERROR_BAD_DIFF, "Diff '{}' does not exist.".format(diff_id))
+        return diff
+
+    def _get_actor(self, params):
+        """Return the user dict that the call is made as."""
+        conduit = params.get('__conduit__') or {}
+        session = self._session_key_to_session.get(conduit.get('sessionKey'))
+        if session is None:
+            raise _Error(
+                phlsys_conduit.SESSION_ERROR,
+                "Session key is not present or has expired.")
+        username, expiry = session
+        if expiry is not None and expiry < time.time():
+            self._expire_session(conduit['sessionKey'])
+            raise _Error(
+                phlsys_conduit.SESSION_ERROR,
+                "Session key is not present or has expired.")
+
+        act_as_user = conduit.get('actAsUser')
+        if act_as_user:
+            user = self._username_to_user.get(act_as_user)
+            if user is None:
+                raise _Error(
+                    _ERROR_CORE,
+                    "Unknown user '{}' to act as.".format(act_as_user))
+            return user
+        return self._username_to_user[username]
+
+    def _expire_session(self, session_key):
+        username, _ = self._session_key_to_session.pop(session_key)
+        self._username_to_user[username]['session_keys'].remove(session_key)
+
+    def _revision_uri(self, revision_id):
+        return '{}/D{}'.format(self._base_uri, revision_id)
+
+    def _usernames(self, phid_list):
+        return [
+            self._phid_to_user[phid]['username']
+            for phid in phid_list
+            if phid in self._phid_to_user
+        ]
+
+    def _apply_fields(self, revision, fields):
+        for key in ('title', 'summary', 'testPlan'):
+            if key in fields:
+                revision[key] = fields[key]
+        for key in ('reviewerPHIDs', 'ccPHIDs'):
+            if key in fields:
+                revision[key] = [
+                    phid for phid in fields[key]
+                    if phid in self._phid_to_user
+                ]
+
+    def _conduit_connect(self, params):
+        username = params.get('user')
+        user = self._username_to_user.get(username)
+        if user is None or user['certificate'] is None:
+            raise _Error(
+                _ERROR_BAD_AUTH, "Unknown user '{}'.".format(username))
+
+        token = str(params.get('authToken', ''))
+        signature = hashlib.sha1(token + user['certificate']).hexdigest()
+        if params.get('authSignature') != signature:
+            raise _Error(_ERROR_BAD_AUTH, "Authentication is invalid.")
+
+        expiry = None
+        if self._session_secs is not None:
+            expiry = time.time() + self._session_secs
+
+        session_key = hashlib.sha1(
+            '{}:{}:{}'.format(
+                username, self._next_connection_id, random.random())
+        ).hexdigest()
+        self._session_key_to_session[session_key] = (username, expiry)
+        user['session_keys'].append(session_key)
+        while len(user['session_keys']) > self._max_sessions_per_user:
+            self._expire_session(user['session_keys'][0])
+
+        connection_id = self._next_connection_id
+        self._next_connection_id += 1
+        return {
+            'sessionKey': session_key,
+            'connectionID': connection_id,
+            'userPHID': user['phid'],
+        }
+
+    def _conduit_ping(self, params):
+        _ = params  # NOQA
+        return 'fake-phabricator'
+
+    def _user_query(self, params):
+        self._get_actor(params)
+        user_list = []
+        for email in params.get('emails') or []:
+            user = self._email_to_user.get(email.lower())
+            if user is None and self._auto_create_users:
+                user = self._auto_create_user(email)
+            if user is not None:
+                user_list.append(user)
+        for username in params.get('usernames') or []:
+            user = self._username_to_user.get(username)
+            if user is not None:
+                user_list.append(user)
+        for phid in params.get('phids') or []:
+            user = self._phid_to_user.get(phid)
+            if user is not None:
+                user_list.append(user)
+
+        limit = params.get('limit')
+        if limit is not None:
+            user_list = user_list[:int(limit)]
+
+        return [
+            {
+                'phid': u['phid'],
+                'userName': u['username'],
+                'realName': u['username'],
+                'image': '{}/res/user.png'.format(self._base_uri),
+                'uri': '{}/p/{}/'.format(self._base_uri, u['username']),
+                'roles': ['verified', 'approved', 'activated'],
+                'primaryEmail': u['email'],
+            }
+            for u in user_list
+        ]
+
+    def _differential_createrawdiff(self, params):
+        self._get_actor(params)
+        diff_id = len(self._diff_id_to_diff) + 1
+        self._diff_id_to_diff[diff_id] = {
+            'diff': params.get('diff', ''),
+            'revision_id': None,
+        }
+        return {
+            'id': diff_id,
+            'uri': '{}/differential/diff/{}/'.format(self._base_uri, diff_id),
+        }
+
+    def _differential_createrevision(self, params):
+        actor = self._get_actor(params)
+        diff = self._get_diff(params.get('diffid'))
+        now = int(time.time())
+        revision_id = len(self._revisions) + 1
+        revision = {
+            'id': revision_id,
+            'phid': 'PHID-DREV-fake{:016d}'.format(revision_id),
+            'authorPHID': actor['phid'],
+            'status': _NEEDS_REVIEW,
+            'title': '',
+            'summary': '',
+            'testPlan': '',
+            'reviewerPHIDs': [],
+            'ccPHIDs': [],
+            'diffs': [params['diffid']],
+            'comments': [],
+            'dateCreated': now,
+            'dateModified': now,
+        }
+        self._apply_fields(revision, params.get('fields') or {})
+        self._revisions.append(revision)
+        diff['revision_id'] = revision_id
+        return {
+            'revisionid': revision_id,
+            'uri': self._revision_uri(revision_id),
+        }
+
+    def _differential_updaterevision(self, params):
+        self._get_actor(params)
+        revision = self._get_revision(params.get('id'))
+        diff = self._get_diff(params.get('diffid'))
+        if revision['status'] == _CLOSED:
+            raise _Error(
+                _ERROR_CLOSED, "Unable to update a closed revision.")
+        self._apply_fields(revision, params.get('fields') or {})
+        revision['diffs'].insert(0, params['diffid'])
+        revision['comments'].append(params.get('message') or '')
+        revision['dateModified'] = int(time.time())
+        if revision['status'] == _NEEDS_REVISION:
+            revision['status'] = _NEEDS_REVIEW
+        diff['revision_id'] = revision['id']
+        return {
+            'revisionid': revision['id'],
+            'uri': self._revision_uri(revision['id']),
+        }
+
+    def _differential_query(self, params):
+        self._get_actor(params)
+        revision_list = list(self._revisions)
+
+        ids = params.get('ids')
+        if ids is not None:
+            id_set = set(int(i) for i in ids)
+            revision_list = [r for r in revision_list if r['id'] in id_set]
+
+        authors = params.get('authors')
+        if authors:
+            revision_list = [
+                r for r in revision_list if r['authorPHID'] in authors
+            ]
+
+        status = params.get('status', 'status-any')
+        status_set = _QUERY_STATUS_TO_STATUS_SET.get(status)
+        if status_set is None:
+            raise _Error(
+                _ERROR_CORE, "Unsupported status '{}'.".format(status))
+        revision_list = [r for r in revision_list if r['status'] in status_set]
+
+        # like Phabricator, return the most recently created first
+        revision_list.reverse()
+
+        offset = int(params.get('offset') or 0)
+        limit = params.get('limit')
+        if limit is None:
+            revision_list = revision_list[offset:]
+        else:
+            revision_list = revision_list[offset:offset + int(limit)]
+
+        return [
+            {
+                'id': str(r['id']),
+                'phid': r['phid'],
+                'title': r['title'],
+                'uri': self._revision_uri(r['id']),
+                'dateCreated': str(r['dateCreated']),
+                'dateModified': str(r['dateModified']),
+                'authorPHID': r['authorPHID'],
+                'status': str(r['status']),
+                'statusName': _STATUS_NAMES[r['status']],
+                'branch': None,
+                'summary': r['summary'],
+                'testPlan': r['testPlan'],
+                'lineCount': str(
+                    self._diff_id_to_diff[r['diffs'][0]]['diff'].count('\n')),
+                'diffs': [str(d) for d in r['diffs']],
+                'commits': [],
+                'reviewers': list(r['reviewerPHIDs']),
+                'ccs': list(r['ccPHIDs']),
+                'hashes': [],
+                'auxiliary': {},
+                'sourcePath': None,
+            }
+            for r in revision_list
+        ]
+
+    def _differential_createcomment(self, params):
+        actor = self._get_actor(params)
+        revision = self._get_revision(params.get('revision_id'))
+        action = params.get('action')
+        if action == 'claim':
+            revision['authorPHID'] = actor['phid']
+        elif action in _ACTION_TO_STATUS:
+            revision['status'] = _ACTION_TO_STATUS[action]
+        elif action not in (None, 'none'):
+            raise _Error(
+                _ERROR_CORE, "Unsupported action '{}'.".format(action))
+        revision['comments'].append(params.get('message') or '')
+        revision['dateModified'] = int(time.time())
+        return {
+            'revisionid': revision['id'],
+            'uri': self._revision_uri(revision['id']),
+        }
+
+    def _differential_close(self, params):
+        self._get_actor(params)
+        revision = self._get_revision(params.get('revisionID'))
+        if revision['status'] != _ACCEPTED:
+            raise _Error(
+                _ERROR_CORE,
+                "Revision 'D{}' isn't accepted, it can't be closed.".format(
+                    revision['id']))
+        revision['status'] = _CLOSED
+        revision['dateModified'] = int(time.time())
+        return None
+
+    def _differential_getcommitmessage(self, params):
+        self._get_actor(params)
+        revision = self._get_revision(params.get('revision_id'))
+        section_list = [revision['title']]
+        if revision['summary']:
+            section_list.append('Summary: ' + revision['summary'])
+        section_list.append('Test Plan: ' + revision['testPlan'])
+        reviewers = self._usernames(revision['reviewerPHIDs'])
+        if reviewers:
+            section_list.append('Reviewers: ' + ', '.join(reviewers))
+        ccs = self._usernames(revision['ccPHIDs'])
+        if ccs:
+            section_list.append('CC: ' + ', '.join(ccs))
+        section_list.append(
+            'Differential Revision: ' + self._revision_uri(revision['id']))
+        return '\n\n'.join(section_list)
+
+    def _differential_parsecommitmessage(self, params):
+        self._get_actor(params)
+        lines = (params.get('corpus') or '').strip().splitlines()
+        title = lines[0].strip() if lines else ''
+
+        field_to_lines = {'summary': []}
+        field = 'summary'
+        for line in lines[1:]:
+            match = _LABEL_RE.match(line)
+            if match and match.group(1).lower() in _LABEL_TO_FIELD:
+                field = _LABEL_TO_FIELD[match.group(1).lower()]
+                field_to_lines.setdefault(field, [])
+                line = match.group(2)
+            field_to_lines[field].append(line)
+
+        fields = {'title': title}
+        errors = []
+        for field, field_lines in field_to_lines.iteritems():
+            text = '\n'.join(field_lines).strip()
+            if field in _USER_FIELD_TO_LABEL:
+                phid_list = []
+                unknown_list = []
+                for name in re.split(r'[\s,]+', text):
+                    if not name:
+                        continue
+                    user = self._username_to_user.get(name)
+                    if user is None:
+                        unknown_list.append(name)
+                    else:
+                        phid_list.append(user['phid'])
+                fields[field] = phid_list
+                if unknown_list:
+                    errors.append(_UNKNOWN_USERS_ERROR.format(
+                        field=_USER_FIELD_TO_LABEL[field],
+                        users=', '.join(unknown_list)))
+            elif field == 'revisionID':
+                fields[field] = text
+            elif text:
+                fields[field] = text
+
+        if 'testPlan' not in fields:
+            errors.append(_TEST_PLAN_ERROR)
+
+        return {'fields': fields, 'errors': errors}
+
+
+_METHOD_TO_HANDLER = {
+    'conduit.connect': FakePhabricator._conduit_connect,
+    'conduit.ping': FakePhabricator._conduit_ping,
+    'user.query': FakePhabricator._user_query,
+    'differential.createrawdiff': FakePhabricator._differential_createrawdiff,
+    'differential.createrevision': (
+        FakePhabricator._differential_createrevision),
+    'differential.updaterevision': (
+        FakePhabricator._differential_updaterevision),
+    'differential.query': FakePhabricator._differential_query,
+    'differential.createcomment': (
+        FakePhabricator._differential_createcomment),
+    'differential.close': FakePhabricator._differential_close,
+    'differential.getcommitmessage': (
+        FakePhabricator._differential_getcommitmessage),
+    'differential.parsecommitmessage': (
+        FakePhabricator._differential_parsecommitmessage),
+}
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(
+            self,
+            phabricator,
+            host='127.0.0.1',
+            port=0,
+            latency_secs=0,
+            error_rate=0,
+            method_to_latency_secs=None,
+            method_to_error_rate=None,
+            seed=None):
+        """Serve 'phabricator' over HTTP at 'host' and 'port'.
+
+        Calls are delayed by 'latency_secs' before they're made, and fail
+        with an 'ERR-CONDUIT-CORE' error with a chance of 'error_rate'.
+        Failed calls don't change anything. Sessions aren't checked when a
+        call fails, so a failure may hide an expired session.
+
+        :phabricator: the FakePhabricator to serve calls from
+        :host: the string address to listen on
+        :port: the integer port to listen on, 0 to pick a free one
+        :latency_secs: the float seconds to delay each call by
+        :error_rate: the float chance from 0 to 1 that a call fails
+        :method_to_latency_secs: dict of method names to latency, overriding
+                                 'latency_secs' for those methods
+        :method_to_error_rate: dict of method names to error rates,
+                               overriding 'error_rate' for those methods
+        :seed: a seed for the failures, for repeatable runs
+
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), _RequestHandler)
+        self.phabricator = phabricator
+        self._latency_secs = latency_secs
+        self._error_rate = error_rate
+        self._method_to_latency_secs = dict(method_to_latency_secs or {})
+        self._method_to_error_rate = dict(method_to_error_rate or {})
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+        # the sockets of the connections being served, connections are kept
+        # alive so they must be closed for the handler threads to finish
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    @property
+    def uri(self):
+        """Return the string uri to pass to phlsys_conduit.Conduit."""
+        host, port = self.server_address[:2]
+        return 'http://{}:{}/api/'.format(host, port)
+
+    def call(self, method, params):
+        """Return the response to 'method', after injecting any faults.
+
+        :method: the string name of the Conduit method
+        :params: the dict of parameters, including '__conduit__' if any
+        :returns: a dict with 'result', 'error_code' and 'error_info'
+
+        """
+        latency_secs = self._method_to_latency_secs.get(
+            method, self._latency_secs)
+        if latency_secs > 0:
+            time.sleep(latency_secs)
+
+        error_rate = self._method_to_error_rate.get(method, self._error_rate)
+        with self._random_lock:
+            is_failed = self._random.random() < error_rate
+        if is_failed:
+            return {
+                'result': None,
+                'error_code': _ERROR_CORE,
+                'error_info': "Injected failure calling '{}'.".format(method),
+            }
+
+        return self.phabricator.call(method, params)
+
+    def add_connection(self, connection):
+        with self._connections_lock:
+            self._connections.add(connection)
+
+    def remove_connection(self, connection):
+        with self._connections_lock:
+            self._connections.discard(connection)
+
+    def server_close(self):
+        """Stop listening and close all connections, override of base."""
+        BaseHTTPServer.HTTPServer.server_close(self)
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass  # the client may have closed it already
+
+    def handle_error(self, request, client_address):
+        """Report errors in handling requests, override of base class."""
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(
+                self, request, client_address)
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # keep connections alive between calls, as Phabricator would
+    protocol_version = 'HTTP/1.1'
+
+    # buffer responses, so that they're sent in as few packets as possible,
+    # otherwise small writes are delayed by Nagle's algorithm on kept-alive
+    # connections
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.add_connection(self.connection)
+
+    def finish(self):
+        self.server.remove_connection(self.connection)
+        BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+
+    def do_POST(self):
+        """Handle http POST requests, override of base class function."""
+        content_len = int(self.headers.getheader('content-length', 0))
+        body = self.rfile.read(content_len)
+
+        path = urlparse.urlsplit(self.path).path
+        if not path.startswith('/api/'):
+            self.send_error(404)
+            return
+        method = path[len('/api/'):]
+
+        form = urlparse.parse_qs(body)
+        try:
+            params = json.loads(form.get('params', ['{}'])[0])
+        except ValueError:
+            params = None
+        if not isinstance(params, dict):
+            self.send_error(400, "'params' must be a json object")
+            return
+
+        content = json.dumps(self.server.call(method, params))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # don't write every request to stderr, it's too much under load
+        pass
+
+
+@contextlib.contextmanager
+def server_context(phabricator, **kwargs):
+    """Serve 'phabricator' from a background thread within the context.
+
+    :phabricator: the FakePhabricator to serve calls from
+    :**kwargs: passed on to Server
+    :returns: a context manager which yields the Server
+
+    """
+    server = Server(phabricator, **kwargs)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.1})
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,280 @@
+"""Test suite for phlcon_fakeserver."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] the server may be connected to and pinged
+# [ A] users with the wrong certificate can't connect
+# [ B] revisions may be created, updated, accepted and closed
+# [ B] revisions are authored by the user acted as
+# [ B] closed revisions can't be updated
+# [ B] the commit message is made from the fields of the revision
+# [ C] commit messages are parsed into fields
+# [ C] missing test plans and unknown reviewers are reported as Phabricator
+#      reports them
+# [ D] users may be queried by email, username and phid
+# [ D] users are made for unknown emails if 'auto_create_users'
+# [ E] expired sessions are rejected and Conduit reconnects
+# [ E] making too many sessions for a user expires the oldest
+# [ F] calls fail with the configured chance, per method
+# [ F] calls are delayed by the configured latency, per method
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Revisions
+# [ C] test_C_ParseCommitMessage
+# [ D] test_D_Users
+# [ E] test_E_Sessions
+# [ F] test_F_Faults
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import time
+import unittest
+
+import phldef_conduit
+import phlsys_conduit
+import phlsys_timer
+
+import phlcon_differential
+import phlcon_user
+
+import phlcon_fakeserver
+
+_PHAB = phldef_conduit.PHAB
+_ALICE = phldef_conduit.ALICE
+_BOB = phldef_conduit.BOB
+
+_STATES = phlcon_differential.ReviewStates
+
+
+def _make_conduit(server, account=_PHAB):
+    return phlsys_conduit.Conduit(
+        server.uri, account.user, account.certificate)
+
+
+def _connect(phab, account=_PHAB):
+    token = str(int(time.time()))
+    response = phab.call(
+        'conduit.connect',
+        {
+            'user': account.user,
+            'authToken': token,
+            'authSignature': hashlib.sha1(
+                token + account.certificate).hexdigest(),
+        })
+    return {'sessionKey': response['result']['sessionKey']}
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(phab) as server:
+            conduit = _make_conduit(server)
+            self.assertTrue(conduit.ping())
+
+            self.assertRaises(
+                phlsys_conduit.ConduitException,
+                phlsys_conduit.Conduit,
+                server.uri,
+                _ALICE.user,
+                _BOB.certificate)
+
+    def test_B_Revisions(self):
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(phab) as server:
+            conduit = _make_conduit(server)
+
+            with phlsys_conduit.act_as_user_context(conduit, _ALICE.user):
+                diff = phlcon_differential.create_raw_diff(conduit, 'diff 1')
+                revision = phlcon_differential.create_revision(
+                    conduit,
+                    diff.id,
+                    {
+                        'title': 'my title',
+                        'testPlan': 'my test plan',
+                        'reviewerPHIDs': [_BOB.phid],
+                    })
+
+            review_id = revision.revisionid
+            response = phlcon_differential.query(conduit, [review_id])[0]
+            self.assertEqual(_ALICE.phid, response.authorPHID)
+            self.assertEqual(_STATES.needs_review, response.status)
+            self.assertEqual('my title', response.title)
+
+            diff = phlcon_differential.create_raw_diff(conduit, 'diff 2')
+            phlcon_differential.update_revision(
+                conduit, review_id, diff.id, [], 'update')
+            response = phlcon_differential.query(conduit, [review_id])[0]
+            self.assertEqual(2, len(response.diffs))
+
+            phlcon_differential.create_comment(
+                conduit,
+                review_id,
+                action=phlcon_differential.Action.accept)
+            self.assertEqual(
+                _STATES.accepted,
+                phlcon_differential.get_revision_status(conduit, review_id))
+
+            self.assertEqual(
+                'my title\n\n'
+                'Test Plan: my test plan\n\n'
+                'Reviewers: bob\n\n'
+                'Differential Revision: http://127.0.0.1/D1',
+                phlcon_differential.get_commit_message(conduit, review_id))
+
+            phlcon_differential.close(conduit, review_id)
+            self.assertEqual(_STATES.closed, phab.get_revision_status(1))
+
+            diff = phlcon_differential.create_raw_diff(conduit, 'diff 3')
+            self.assertRaises(
+                phlcon_differential.UpdateClosedRevisionError,
+                phlcon_differential.update_revision,
+                conduit, review_id, diff.id, [], 'update')
+
+    def test_C_ParseCommitMessage(self):
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(phab) as server:
+            conduit = _make_conduit(server)
+
+            parsed = phlcon_differential.parse_commit_message(
+                conduit,
+                'my title\n\n'
+                'my summary\n'
+                'over two lines\n\n'
+                'Test Plan: my test plan\n\n'
+                'Reviewers: alice, bob\n')
+            self.assertEqual([], parsed.errors)
+            self.assertEqual('my title', parsed.fields['title'])
+            self.assertEqual(
+                'my summary\nover two lines', parsed.fields['summary'])
+            self.assertEqual('my test plan', parsed.fields['testPlan'])
+            self.assertEqual(
+                [_ALICE.phid, _BOB.phid], parsed.fields['reviewerPHIDs'])
+
+            parsed = phlcon_differential.parse_commit_message(
+                conduit, 'my title\n\nReviewers: alice, carol, dave')
+            errors = phlcon_differential.parse_commit_message_errors(
+                parsed.errors)
+            self.assertEqual(2, len(errors))
+            self.assertIsInstance(
+                errors[0],
+                phlcon_differential.ParseCommitMessageUnknownReviewerFail)
+            self.assertEqual(['carol', 'dave'], errors[0].user_list)
+            self.assertIsInstance(
+                errors[1],
+                phlcon_differential.ParseCommitMessageNoTestPlanFail)
+
+    def test_D_Users(self):
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(phab) as server:
+            conduit = _make_conduit(server)
+
+            user = phlcon_user.query_user_from_email(conduit, _ALICE.email)
+            self.assertEqual(_ALICE.user, user.userName)
+            self.assertEqual(_ALICE.phid, user.phid)
+            self.assertIsNone(
+                phlcon_user.query_user_from_email(conduit, 'carol@x.test'))
+            self.assertEqual(
+                [_BOB.user],
+                phlcon_user.query_usernames_from_phids(conduit, [_BOB.phid]))
+            self.assertEqual(
+                {_ALICE.user: _ALICE.phid},
+                phlcon_user.make_username_phid_dict(conduit, [_ALICE.user]))
+
+        phab = phlcon_fakeserver.FakePhabricator(auto_create_users=True)
+        with phlcon_fakeserver.server_context(phab) as server:
+            conduit = _make_conduit(server)
+            user = phlcon_user.query_user_from_email(conduit, 'carol@x.test')
+            self.assertEqual('carol', user.userName)
+            self.assertEqual(
+                user.phid,
+                phlcon_user.query_user_from_email(
+                    conduit, 'carol@x.test').phid)
+
+    def test_E_Sessions(self):
+        phab = phlcon_fakeserver.FakePhabricator(
+            session_secs=0.1, max_sessions_per_user=2)
+        with phlcon_fakeserver.server_context(phab) as server:
+            session = _connect(phab)
+            conduit = _make_conduit(server)
+            time.sleep(0.2)
+
+            response = phab.call('conduit.ping', {'__conduit__': session})
+            self.assertIsNone(response['error_code'])
+            response = phab.call(
+                'differential.query', {'__conduit__': session})
+            self.assertEqual(
+                phlsys_conduit.SESSION_ERROR, response['error_code'])
+
+            # Conduit reconnects when its session is rejected
+            self.assertEqual([], phlcon_differential.query(conduit, []))
+
+        phab = phlcon_fakeserver.FakePhabricator(max_sessions_per_user=2)
+        session_list = [_connect(phab) for _ in xrange(3)]
+        response_list = [
+            phab.call('differential.query', {'__conduit__': s})
+            for s in session_list
+        ]
+        self.assertEqual(
+            [phlsys_conduit.SESSION_ERROR, None, None],
+            [r['error_code'] for r in response_list])
+
+    def test_F_Faults(self):
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(
+                phab,
+                method_to_error_rate={'differential.query': 1},
+                method_to_latency_secs={'differential.createrawdiff': 0.2},
+                seed=0) as server:
+            conduit = _make_conduit(server)
+
+            self.assertRaises(
+                phlsys_conduit.ConduitException,
+                phlcon_differential.query,
+                conduit,
+                [])
+
+            timer = phlsys_timer.Timer()
+            timer.start()
+            conduit.ping()
+            self.assertLess(timer.duration, 0.2)
+
+            timer = phlsys_timer.Timer()
+            timer.start()
+            phlcon_differential.create_raw_diff(conduit, 'diff')
+            self.assertGreaterEqual(timer.duration, 0.2)
+
+        phab = phlcon_fakeserver.FakePhabricator()
+        with phlcon_fakeserver.server_context(
+                phab, error_rate=0.5, seed=0) as server:
+            num_failures = 0
+            for _ in xrange(100):
+                if server.call('conduit.ping', {})['error_code']:
+                    num_failures += 1
+            self.assertTrue(25 < num_failures < 75)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -1,4 +1,15 @@
-"""Cache the status of Differential revisions."""
+"""Cache the status and authors of Differential revisions.
+
+The authors of revisions are cached as phids, the usernames of which are
+cached separately. This means that a change of author, e.g. when a revision is
+commandeered, is picked up when the states of the active revisions are
+refreshed.
+
+Copies of the cache in other processes can be kept up to date cheaply, the
+cache remembers when each entry last changed and 'get_changes' returns only
+the entries changed since a given generation.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -7,9 +18,21 @@
 # Public Classes:
 #   ReviewStateCache
 #    .get_state
+#    .get_author_username
+#    .forget_state
+#    .prefetch_states
 #    .refresh_active_reviews
+#    .make_refresh
+#    .apply_refresh
 #    .active_reviews
 #    .merge_additional_active_reviews
+#    .generation
+#    .get_changes
+#    .apply_changes
+#    .get_changed_entries
+#    .mark_entries_changed
+#    .get_cache
+#    .set_cache
 #
 # Public Functions:
 #   make_from_conduit
@@ -28,10 +51,24 @@ from __future__ import print_function
 import collections
 
 import phlcon_differential
+import phlcon_user
+
+# query the states of at most this many reviews at once, so that the requests
+# and responses stay a reasonable size
+_MAX_QUERY_PAGE_SIZE = 100
+
+# the kinds of entry in the cache, for keeping track of changes to them
+_STATE_ENTRY = 'state'
+_ACTIVE_ENTRY = 'active'
+_USERNAME_ENTRY = 'username'
+
+# always remember this many removed entries before forgetting them, so that
+# small caches aren't compacted too often
+_MIN_REMOVED_ENTRIES = 100
 
 ReviewState = collections.namedtuple(
     'phlcon_reviewstatecache__ReviewState',
-    ['status', 'date_modified'])
+    ['status', 'date_modified', 'author_phid'])
 
 
 def make_from_conduit(conduit):
@@ -39,46 +76,373 @@ def make_from_conduit(conduit):
     def revision_list_status(revision_list):
         return phlcon_differential.query(conduit, revision_list)
 
-    return ReviewStateCache(revision_list_status)
+    def phid_list_usernames(phid_list):
+        # N.B. the users may not be returned in the order they were asked
+        # for, and none are returned if any of the phids are unknown
+        users = phlcon_user.query_users_from_phids(conduit, phid_list)
+        return {u.phid: u.userName for u in users or []}
+
+    return ReviewStateCache(revision_list_status, phid_list_usernames)
 
 
 class ReviewStateCache(object):
 
-    def __init__(self, status_callable):
+    def __init__(self, status_callable, usernames_callable=None):
         super(ReviewStateCache, self).__init__()
         self._review_to_state = {}
         self._active_reviews = set()
+        self._phid_to_username = {}
         self._revision_list_status_callable = status_callable
+        self._phid_list_usernames_callable = usernames_callable
+
+        # each change increments the generation, remember the generation that
+        # each entry last changed in, oldest first, so that the changes since
+        # any generation back to '_oldest_generation' can be found quickly
+        self._generation = 0
+        self._entry_to_generation = collections.OrderedDict()
+        self._oldest_generation = 0
 
     def _make_state(self, response):
-        return ReviewState(response.status, response.dateModified)
+        return ReviewState(
+            response.status, response.dateModified, response.authorPHID)
 
     def get_state(self, review_id):
         assert self._revision_list_status_callable
         if review_id not in self._review_to_state:
             response = self._revision_list_status_callable([review_id])[0]
             self._review_to_state[review_id] = self._make_state(response)
+            self._note_changed(_STATE_ENTRY, [review_id])
 
-        self._active_reviews.add(review_id)
+        if review_id not in self._active_reviews:
+            self._active_reviews.add(review_id)
+            self._note_changed(_ACTIVE_ENTRY, [review_id])
         return self._review_to_state[review_id]
 
+    def get_author_username(self, review_id):
+        """Return the username of the author of the review 'review_id'.
+
+        The review becomes active, as with 'get_state'. The username for each
+        author is only queried once.
+
+        :review_id: the id of the review to get the author of
+        :returns: a string username
+
+        """
+        assert self._phid_list_usernames_callable
+        author_phid = self.get_state(review_id).author_phid
+        if author_phid not in self._phid_to_username:
+            phid_to_username = self._query_usernames(set([author_phid]))
+            self._phid_to_username.update(phid_to_username)
+            self._note_changed(_USERNAME_ENTRY, phid_to_username)
+            if author_phid not in self._phid_to_username:
+                raise ValueError(
+                    "no user for author '{}' of review {}".format(
+                        author_phid, review_id))
+        return self._phid_to_username[author_phid]
+
+    def forget_state(self, review_id):
+        """Forget the cached state of 'review_id', e.g. if it was changed.
+
+        :review_id: the id of the review to forget
+        :returns: None
+
+        """
+        if review_id in self._review_to_state:
+            del self._review_to_state[review_id]
+            self._note_changed(_STATE_ENTRY, [review_id])
+
+    def prefetch_states(self, review_id_iterable):
+        """Cache the states of the supplied reviews, with as few queries as
+        possible.
+
+        Reviews whose states are already cached aren't queried again. Reviews
+        aren't considered active until 'get_state' is called for them.
+
+        :review_id_iterable: the ids of the reviews to prefetch
+        :returns: None
+
+        """
+        assert self._revision_list_status_callable
+        missing_reviews = set(review_id_iterable) - set(self._review_to_state)
+        review_to_state = self._query_states(missing_reviews)
+        self._review_to_state.update(review_to_state)
+        self._note_changed(_STATE_ENTRY, review_to_state)
+
     def refresh_active_reviews(self):
+        self.apply_refresh(self.make_refresh())
+
+    def make_refresh(self):
+        """Return the latest states of the active reviews, don't apply them.
+
+        The cache is not modified, so this may be called in another process.
+        Note that the result is picklable.
+
+        :returns: something suitable to supply to 'apply_refresh()' later
+
+        """
         assert self._revision_list_status_callable
-        self._review_to_state = {}
-        if self._active_reviews:
+        active_reviews = set(self._active_reviews)
+        review_to_state = self._query_states(active_reviews)
+
+        # resolve the authors we haven't seen before, e.g. because a review
+        # was commandeered or became active in another process
+        phid_to_username = {}
+        if self._phid_list_usernames_callable:
+            new_author_phids = set(
+                s.author_phid for s in review_to_state.itervalues())
+            new_author_phids -= set(self._phid_to_username)
+            phid_to_username = self._query_usernames(new_author_phids)
+
+        review_to_state = {
+            k: tuple(v) for k, v in review_to_state.iteritems()
+        }
+        return active_reviews, review_to_state, phid_to_username
+
+    def apply_refresh(self, refresh):
+        """Replace the cached states with those from 'make_refresh()'.
+
+        Reviews which became active since the refresh was made are still
+        considered active afterwards.
+
+        :refresh: the result of a call to make_refresh()
+        :returns: None
+
+        """
+        refreshed_reviews, review_to_state, phid_to_username = refresh
+        old_review_to_state = self._review_to_state
+        self._review_to_state = {
+            k: ReviewState(*v) for k, v in review_to_state.iteritems()
+        }
+        self._note_changed(
+            _STATE_ENTRY,
+            [
+                k for k in set(old_review_to_state) | set(review_to_state)
+                if old_review_to_state.get(k) != self._review_to_state.get(k)
+            ])
+
+        inactive_reviews = self._active_reviews & refreshed_reviews
+        self._active_reviews -= inactive_reviews
+        self._note_changed(_ACTIVE_ENTRY, inactive_reviews)
+
+        self._phid_to_username.update(phid_to_username)
+        self._note_changed(_USERNAME_ENTRY, phid_to_username)
+
+    def _query_states(self, review_id_set):
+        review_id_list = sorted(review_id_set)
+        review_to_state = {}
+        for i in xrange(0, len(review_id_list), _MAX_QUERY_PAGE_SIZE):
             responses = self._revision_list_status_callable(
-                list(self._active_reviews))
-            self._review_to_state = {
-                r.id: self._make_state(r) for r in responses
-            }
-            self._active_reviews = set()
+                review_id_list[i:i + _MAX_QUERY_PAGE_SIZE])
+            review_to_state.update(
+                (r.id, self._make_state(r)) for r in responses)
+        return review_to_state
+
+    def _query_usernames(self, phid_set):
+        if not phid_set:
+            return {}
+        return self._phid_list_usernames_callable(sorted(phid_set))
 
     @property
     def active_reviews(self):
         return self._active_reviews
 
     def merge_additional_active_reviews(self, active_review_set):
-        self._active_reviews.update(active_review_set)
+        new_active_reviews = set(active_review_set) - self._active_reviews
+        self._active_reviews.update(new_active_reviews)
+        self._note_changed(_ACTIVE_ENTRY, new_active_reviews)
+
+    @property
+    def generation(self):
+        """Return the current generation, to pass to 'get_changes' later."""
+        return self._generation
+
+    def get_changes(self, since_generation=None):
+        """Return the changes since 'since_generation' for 'apply_changes'.
+
+        If 'since_generation' is None, or older than the changes which are
+        remembered, then the whole cache is returned.
+
+        :since_generation: the 'generation' of the cache when the receiving
+                           copy was last brought up to date, or None
+        :returns: something suitable to supply to 'apply_changes()' later
+
+        """
+        is_whole_cache = (
+            since_generation is None or
+            since_generation < self._oldest_generation)
+        if is_whole_cache:
+            entries = (
+                [(_STATE_ENTRY, k) for k in self._review_to_state] +
+                [(_ACTIVE_ENTRY, k) for k in self._active_reviews] +
+                [(_USERNAME_ENTRY, k) for k in self._phid_to_username])
+        else:
+            entries = self.get_changed_entries(since_generation)
+
+        # convert the states to plain tuples so that they may be pickled,
+        # removed entries are represented by None
+        review_to_state = {}
+        review_to_is_active = {}
+        phid_to_username = {}
+        for kind, key in entries:
+            if kind == _STATE_ENTRY:
+                state = self._review_to_state.get(key)
+                if state is not None:
+                    state = tuple(state)
+                review_to_state[key] = state
+            elif kind == _ACTIVE_ENTRY:
+                review_to_is_active[key] = key in self._active_reviews
+            else:
+                phid_to_username[key] = self._phid_to_username.get(key)
+
+        return (
+            is_whole_cache,
+            review_to_state,
+            review_to_is_active,
+            phid_to_username,
+        )
+
+    def apply_changes(self, changes):
+        """Apply the changes from another cache's 'get_changes()'.
+
+        The changes aren't noted as changes to this cache, they won't be
+        returned from this cache's 'get_changes' or 'get_changed_entries'.
+
+        :changes: the result of a call to get_changes()
+        :returns: None
+
+        """
+        (
+            is_whole_cache,
+            review_to_state,
+            review_to_is_active,
+            phid_to_username,
+        ) = changes
+
+        if is_whole_cache:
+            self._review_to_state = {}
+            self._active_reviews = set()
+            self._phid_to_username = {}
+            self._forget_changes()
+
+        for review_id, state in review_to_state.iteritems():
+            if state is None:
+                self._review_to_state.pop(review_id, None)
+            else:
+                self._review_to_state[review_id] = ReviewState(*state)
+
+        for review_id, is_active in review_to_is_active.iteritems():
+            if is_active:
+                self._active_reviews.add(review_id)
+            else:
+                self._active_reviews.discard(review_id)
+
+        for phid, username in phid_to_username.iteritems():
+            if username is None:
+                self._phid_to_username.pop(phid, None)
+            else:
+                self._phid_to_username[phid] = username
+
+    def get_changed_entries(self, since_generation):
+        """Return a list of the entries changed since 'since_generation'.
+
+        This is intended for a copy of the cache to report the entries that
+        it changed back to the original, so that they'll be overwritten with
+        the original's values next time, see 'mark_entries_changed'.
+
+        :since_generation: the 'generation' to list changes since
+        :returns: a picklable list of entries
+
+        """
+        entries = []
+        for entry in reversed(self._entry_to_generation):
+            if self._entry_to_generation[entry] <= since_generation:
+                break
+            entries.append(entry)
+        return entries
+
+    def mark_entries_changed(self, entry_list):
+        """Mark the entries from 'get_changed_entries' as changed.
+
+        They'll be included in the next 'get_changes', even though they
+        haven't changed here.
+
+        :entry_list: the result of a call to get_changed_entries()
+        :returns: None
+
+        """
+        self._note_entries_changed(entry_list)
+
+    def _note_changed(self, kind, key_iterable):
+        self._note_entries_changed((kind, key) for key in key_iterable)
+
+    def _note_entries_changed(self, entry_iterable):
+        self._generation += 1
+        for entry in entry_iterable:
+            # move the entry to the end, to keep them ordered by generation
+            self._entry_to_generation.pop(entry, None)
+            self._entry_to_generation[entry] = self._generation
+
+        # removed entries are remembered so that their removal can be passed
+        # on, forget them once there are too many and make copies which are
+        # older than that take the whole cache instead
+        num_live_entries = (
+            len(self._review_to_state) +
+            len(self._active_reviews) +
+            len(self._phid_to_username))
+        num_removed_entries = len(self._entry_to_generation) - num_live_entries
+        if num_removed_entries > max(num_live_entries, _MIN_REMOVED_ENTRIES):
+            self._forget_removed_entries()
+
+    def _forget_removed_entries(self):
+        for entry, generation in self._entry_to_generation.items():
+            if not self._is_live_entry(entry):
+                del self._entry_to_generation[entry]
+                self._oldest_generation = max(
+                    self._oldest_generation, generation)
+
+    def _is_live_entry(self, entry):
+        kind, key = entry
+        if kind == _STATE_ENTRY:
+            return key in self._review_to_state
+        elif kind == _ACTIVE_ENTRY:
+            return key in self._active_reviews
+        return key in self._phid_to_username
+
+    def _forget_changes(self):
+        self._generation += 1
+        self._entry_to_generation.clear()
+        self._oldest_generation = self._generation
+
+    def get_cache(self):
+        """Return the cache internals for copying to another process.
+
+        :returns: something suitable to supply to 'set_cache()' later
+
+        """
+        # convert the states to plain tuples so that they may be pickled
+        review_to_state = {
+            k: tuple(v) for k, v in self._review_to_state.iteritems()
+        }
+        return (
+            review_to_state,
+            set(self._active_reviews),
+            dict(self._phid_to_username),
+        )
+
+    def set_cache(self, cache):
+        """Set the cache internals.
+
+        :cache: the result of a call to get_cache()
+        :returns: None
+
+        """
+        review_to_state, active_reviews, phid_to_username = cache
+        self._review_to_state = {
+            k: ReviewState(*v) for k, v in review_to_state.iteritems()
+        }
+        self._active_reviews = set(active_reviews)
+        self._phid_to_username = dict(phid_to_username)
+        self._forget_changes()
 
 
 # -----------------------------------------------------------------------------
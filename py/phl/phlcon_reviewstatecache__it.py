@@ -13,12 +13,35 @@
 # [ D] ReviewStateCache retrieves statuses for reviews not queried before
 # [ D] ReviewStateCache does not callable when queried for cached query
 # [ D] ReviewStateCache returns correct value when retrieving cached
+# [ E] ReviewStateCache.make_refresh does not modify the cache
+# [ E] ReviewStateCache.apply_refresh applies a picklable refresh
+# [ E] ReviewStateCache keeps reviews which became active since make_refresh
+# [ F] ReviewStateCache.prefetch_states queries many reviews at once
+# [ F] ReviewStateCache.prefetch_states splits large queries into pages
+# [ F] ReviewStateCache.prefetch_states doesn't query cached reviews again
+# [ F] ReviewStateCache.prefetch_states doesn't make reviews active
+# [ F] ReviewStateCache does not call out for prefetched states
+# [ G] ReviewStateCache.get_author_username queries each author only once
+# [ G] ReviewStateCache.get_author_username makes the review active
+# [ G] ReviewStateCache.make_refresh resolves only unknown authors
+# [ G] ReviewStateCache picks up changed authors on refresh
+# [ G] ReviewStateCache.forget_state causes the review to be queried again
+# [ G] ReviewStateCache copies authors with 'get_cache' and 'set_cache'
+# [ H] ReviewStateCache.get_changes copies the whole cache by default
+# [ H] ReviewStateCache.get_changes includes only entries changed since
+# [ H] ReviewStateCache.apply_changes removes states and inactive reviews
+# [ H] ReviewStateCache overwrites the entries a copy changed once marked
+# [ H] ReviewStateCache.get_changes copies the whole cache if too old
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] test_A_Breathing
 # [ B] test_B_MergeAdditionalActiveReviews
 # [ C] test_C_RefreshBeforeGet
 # [ D] test_D_InvalidationRules
+# [ E] test_E_SeparateRefresh
+# [ F] test_F_PrefetchStates
+# [ G] test_G_AuthorUsernames
+# [ H] test_H_Changes
 # =============================================================================
 
 from __future__ import absolute_import
@@ -26,6 +49,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import pickle
 import unittest
 
 import phldef_conduit
@@ -37,7 +61,7 @@ import phlcon_reviewstatecache
 
 FakeResult = collections.namedtuple(
     'phlcon_reviewstatecache__t_FakeResult',
-    ['id', 'status', 'dateModified'])
+    ['id', 'status', 'dateModified', 'authorPHID'])
 
 
 class Test(unittest.TestCase):
@@ -143,7 +167,7 @@ class Test(unittest.TestCase):
             expected_queries[:] = expected_queries[1:]
 
             return [
-                FakeResult(r, str(r) + 'r', str(r) + 'd')
+                FakeResult(r, str(r) + 'r', str(r) + 'd', 'PHID-' + str(r))
                 for r in actual_revision_list
             ]
 
@@ -165,6 +189,204 @@ class Test(unittest.TestCase):
             result = cache_impl.get_state(revision).status
             self.assertEqual(result, str(revision) + 'r')
 
+    def test_E_SeparateRefresh(self):
+
+        def fake_callable(revision_list):
+            return [
+                FakeResult(r, str(r) + 'r', str(r) + 'd', 'PHID-' + str(r))
+                for r in revision_list
+            ]
+
+        cache_impl = phlcon_reviewstatecache.ReviewStateCache(fake_callable)
+        cache_impl.merge_additional_active_reviews([1, 2])
+
+        # [ E] ReviewStateCache.make_refresh does not modify the cache
+        refresh = cache_impl.make_refresh()
+        self.assertEqual(set([1, 2]), cache_impl.active_reviews)
+
+        # [ E] ReviewStateCache keeps reviews which became active since
+        #      make_refresh
+        cache_impl.merge_additional_active_reviews([3])
+
+        # [ E] ReviewStateCache.apply_refresh applies a picklable refresh
+        cache_impl.apply_refresh(pickle.loads(pickle.dumps(refresh)))
+        self.assertEqual(set([3]), cache_impl.active_reviews)
+        self.assertEqual('2r', cache_impl.get_state(2).status)
+        self.assertEqual('2d', cache_impl.get_state(2).date_modified)
+
+    def test_F_PrefetchStates(self):
+
+        query_list = []
+
+        def fake_callable(revision_list):
+            query_list.append(list(revision_list))
+            return [
+                FakeResult(r, str(r) + 'r', str(r) + 'd', 'PHID-' + str(r))
+                for r in revision_list
+            ]
+
+        cache_impl = phlcon_reviewstatecache.ReviewStateCache(fake_callable)
+        self.assertEqual('1r', cache_impl.get_state(1).status)
+        del query_list[:]
+
+        # [ F] ReviewStateCache.prefetch_states queries many reviews at once
+        # [ F] ReviewStateCache.prefetch_states splits large queries into
+        #      pages
+        # [ F] ReviewStateCache.prefetch_states doesn't query cached reviews
+        #      again
+        num_reviews = 250
+        cache_impl.prefetch_states(xrange(1, num_reviews + 1))
+        self.assertEqual([100, 100, 49], [len(q) for q in query_list])
+        self.assertEqual(
+            range(2, num_reviews + 1),
+            sorted(sum(query_list, [])))
+
+        # [ F] ReviewStateCache.prefetch_states doesn't make reviews active
+        self.assertEqual(set([1]), cache_impl.active_reviews)
+
+        # [ F] ReviewStateCache does not call out for prefetched states
+        del query_list[:]
+        for review in xrange(1, num_reviews + 1):
+            self.assertEqual(
+                str(review) + 'r', cache_impl.get_state(review).status)
+        self.assertEqual([], query_list)
+
+    def test_G_AuthorUsernames(self):
+
+        review_to_author = {1: 'PHID-alice', 2: 'PHID-alice', 3: 'PHID-bob'}
+        review_query_list = []
+        user_query_list = []
+
+        def fake_callable(revision_list):
+            review_query_list.append(list(revision_list))
+            return [
+                FakeResult(r, 'r', 'd', review_to_author[r])
+                for r in revision_list
+            ]
+
+        def fake_usernames_callable(phid_list):
+            user_query_list.append(list(phid_list))
+            return {p: p[len('PHID-'):] for p in phid_list}
+
+        cache_impl = phlcon_reviewstatecache.ReviewStateCache(
+            fake_callable, fake_usernames_callable)
+
+        # [ G] ReviewStateCache.get_author_username queries each author only
+        #      once
+        # [ G] ReviewStateCache.get_author_username makes the review active
+        self.assertEqual('alice', cache_impl.get_author_username(1))
+        self.assertEqual('alice', cache_impl.get_author_username(2))
+        self.assertEqual('alice', cache_impl.get_author_username(1))
+        self.assertEqual([[1], [2]], review_query_list)
+        self.assertEqual([['PHID-alice']], user_query_list)
+        self.assertEqual(set([1, 2]), cache_impl.active_reviews)
+
+        # [ G] ReviewStateCache.make_refresh resolves only unknown authors
+        # [ G] ReviewStateCache picks up changed authors on refresh
+        del user_query_list[:]
+        review_to_author[2] = 'PHID-bob'
+        cache_impl.merge_additional_active_reviews([3])
+        cache_impl.apply_refresh(
+            pickle.loads(pickle.dumps(cache_impl.make_refresh())))
+        self.assertEqual([['PHID-bob']], user_query_list)
+        del review_query_list[:]
+        del user_query_list[:]
+        self.assertEqual('bob', cache_impl.get_author_username(2))
+        self.assertEqual('bob', cache_impl.get_author_username(3))
+        self.assertEqual([], review_query_list)
+        self.assertEqual([], user_query_list)
+
+        # [ G] ReviewStateCache.forget_state causes the review to be queried
+        #      again
+        review_to_author[3] = 'PHID-alice'
+        cache_impl.forget_state(3)
+        self.assertEqual('alice', cache_impl.get_author_username(3))
+        self.assertEqual([[3]], review_query_list)
+        self.assertEqual([], user_query_list)
+
+        # [ G] ReviewStateCache copies authors with 'get_cache' and
+        #      'set_cache'
+        other_cache = phlcon_reviewstatecache.ReviewStateCache(
+            fake_callable, fake_usernames_callable)
+        other_cache.set_cache(
+            pickle.loads(pickle.dumps(cache_impl.get_cache())))
+        self.assertEqual('alice', other_cache.get_author_username(3))
+        self.assertEqual([[3]], review_query_list)
+        self.assertEqual([], user_query_list)
+
+    def test_H_Changes(self):
+
+        review_to_status = {i: 'r' for i in xrange(1, 6)}
+
+        def fake_callable(revision_list):
+            return [
+                FakeResult(r, review_to_status[r], 'd', 'PHID-' + str(r))
+                for r in revision_list
+            ]
+
+        def fake_usernames_callable(phid_list):
+            return {p: p[len('PHID-'):] for p in phid_list}
+
+        def copy_changes(original, copy, since_generation):
+            changes = pickle.loads(
+                pickle.dumps(original.get_changes(since_generation)))
+            copy.apply_changes(changes)
+            return changes
+
+        def fail_callable(revision_list):
+            raise Exception("shouldn't get here")
+
+        original = phlcon_reviewstatecache.ReviewStateCache(
+            fake_callable, fake_usernames_callable)
+        copy = phlcon_reviewstatecache.ReviewStateCache(fail_callable)
+        original.get_author_username(1)
+        original.get_state(2)
+        original.prefetch_states([3, 4])
+
+        # [ H] ReviewStateCache.get_changes copies the whole cache by default
+        copy_changes(original, copy, None)
+        self.assertEqual(original.get_cache(), copy.get_cache())
+        generation = original.generation
+
+        # [ H] ReviewStateCache.get_changes includes only entries changed
+        #      since
+        review_to_status[1] = 'closed'
+        original.merge_additional_active_reviews([3])
+        original.apply_refresh(original.make_refresh())
+        changes = copy_changes(original, copy, generation)
+        is_whole_cache, review_to_state, review_to_is_active, _ = changes
+        self.assertFalse(is_whole_cache)
+        self.assertEqual(set([1, 4]), set(review_to_state))
+        self.assertEqual(set([1, 2, 3]), set(review_to_is_active))
+
+        # [ H] ReviewStateCache.apply_changes removes states and inactive
+        #      reviews
+        self.assertEqual(original.get_cache(), copy.get_cache())
+        self.assertEqual(set(), copy.active_reviews)
+        self.assertEqual('closed', copy.get_cache()[0][1][0])
+        self.assertNotIn(4, copy.get_cache()[0])
+
+        # [ H] ReviewStateCache overwrites the entries a copy changed once
+        #      marked
+        generation = original.generation
+        copy_generation = copy.generation
+        copy.forget_state(1)
+        copy.merge_additional_active_reviews([5])
+        original.mark_entries_changed(
+            copy.get_changed_entries(copy_generation))
+        copy_changes(original, copy, generation)
+        self.assertEqual(original.get_cache(), copy.get_cache())
+
+        # [ H] ReviewStateCache.get_changes copies the whole cache if too old
+        generation = original.generation
+        for i in xrange(300):
+            original.merge_additional_active_reviews([i])
+            original.apply_refresh((set([i]), {}, {}))
+        original.get_state(5)
+        changes = copy_changes(original, copy, generation)
+        self.assertTrue(changes[0])
+        self.assertEqual(original.get_cache(), copy.get_cache())
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2015 Bloomberg Finance L.P.
@@ -14,6 +14,8 @@
 #   make_revision_from_full_message
 #   make_revision_from_hash
 #   make_revisions_from_hashes
+#   iter_revisions_from_hashes
+#   iter_range_revisions
 #   get_author_names_emails_from_hashes
 #   get_range_to_here_raw_body
 #
@@ -29,8 +31,21 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import itertools
 import string
 
+import phlgit_revparse
+import phlsys_gitobjectreader
+
+# fields are separated by NUL, which can't appear in them, and so are commits
+# as we pass '-z'. every commit has exactly '_NUM_FIELDS' fields.
+_BATCH_FORMAT = "%H%x00%h%x00%ae%x00%an%x00%ce%x00%cn%x00%s%x00%b"
+_NUM_FIELDS = 8
+
+# the number of commits to read per call to git when streaming, enough that
+# the cost of calling git is small in comparison
+_DEFAULT_BATCH_SIZE = 500
+
 """NamedTuple to represent a git revision.
 
 :hash:the sha1 associated with this revision
@@ -131,6 +146,12 @@ def get_last_commit_hash_from_ref(repo, ref):
     :returns: a string corresponding to the commit referred to by 'ref'
 
     """
+    try:
+        info = phlsys_gitobjectreader.read_info(repo, ref + '^{commit}')
+    except phlsys_gitobjectreader.Error:
+        info = None
+    if info is not None:
+        return info[0]
     return get_last_n_commit_hashes_from_ref(repo, 1, ref)[0]
 
 
@@ -146,8 +167,8 @@ def get_range_hashes(repo, start, end):
     :returns: a list of strings corresponding to commits from 'start' to 'end'.
 
     """
-    assert repo("rev-parse", "--revs-only", start)
-    assert repo("rev-parse", "--revs-only", end)
+    assert phlgit_revparse.get_sha1_or_none(repo, start)
+    assert phlgit_revparse.get_sha1_or_none(repo, end)
     hashes = repo("log", start + ".." + end, "--format=%H").split()
     if not all(c in string.hexdigits for s in hashes for c in s):
         raise ValueError(
@@ -196,6 +217,9 @@ def make_revision_from_hash(repo, commitHash):
 def make_revisions_from_hashes(repo, hashes):
     """Return a list of 'phlgit_log__Revision' from 'hashes'.
 
+    The revisions are read with a single call to git, rather than one call
+    per hash.
+
     Raise an exception if the repo does not return a valid FullMessage
     from any of 'hashes'.
 
@@ -203,8 +227,66 @@ def make_revisions_from_hashes(repo, hashes):
     :returns: a list of 'phlgit_log__Revision'
 
     """
-    revisions = [make_revision_from_hash(repo, h) for h in hashes]
-    return revisions
+    # git only shows each commit once, so ask for each hash once
+    unique_hashes = list(collections.OrderedDict.fromkeys(hashes))
+    if not unique_hashes:
+        return []
+
+    output = repo(
+        "log",
+        "--no-walk=unsorted",
+        "--stdin",
+        "-z",
+        "--format=" + _BATCH_FORMAT,
+        stdin="\n".join(unique_hashes) + "\n")
+    revisions = _make_revisions_from_batch_output(output)
+
+    if len(revisions) != len(unique_hashes):
+        # some of the hashes refer to the same commit, e.g. 'HEAD' and its
+        # sha1, so we can't match them up with the output. read them one at
+        # a time instead.
+        return [make_revision_from_hash(repo, h) for h in hashes]
+
+    hash_to_revision = dict(itertools.izip(unique_hashes, revisions))
+    return [hash_to_revision[h] for h in hashes]
+
+
+def iter_revisions_from_hashes(repo, hashes, batch_size=_DEFAULT_BATCH_SIZE):
+    """Yield a 'phlgit_log__Revision' for each of 'hashes', in order.
+
+    The revisions are read in batches of 'batch_size' as they're consumed,
+    so that long lists of hashes don't have to be read all at once.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :hashes: an iterable of strings containing the hashes to read
+    :batch_size: the number of revisions to read with each call to git
+    :returns: a generator of 'phlgit_log__Revision'
+
+    """
+    hashes = iter(hashes)
+    while True:
+        batch = list(itertools.islice(hashes, batch_size))
+        if not batch:
+            break
+        for revision in make_revisions_from_hashes(repo, batch):
+            yield revision
+
+
+def iter_range_revisions(repo, start, end, batch_size=_DEFAULT_BATCH_SIZE):
+    """Yield a 'phlgit_log__Revision' for each commit from 'start' to 'end'.
+
+    The revisions begin with the one closest to but not including 'start',
+    like 'get_range_hashes'. They are read in batches as they're consumed.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :start: a reference that log will understand
+    :end: a reference that log will understand
+    :batch_size: the number of revisions to read with each call to git
+    :returns: a generator of 'phlgit_log__Revision'
+
+    """
+    return iter_revisions_from_hashes(
+        repo, get_range_hashes(repo, start, end), batch_size)
 
 
 def get_author_names_emails_from_hashes(repo, hashes):
@@ -235,6 +317,45 @@ def get_author_names_emails_from_hashes(repo, hashes):
     return uniqueAuthors
 
 
+def _make_revisions_from_batch_output(output):
+    # each commit is terminated by a NUL, rather than separated by one
+    if output.endswith("\0"):
+        output = output[:-1]
+    fields = output.split("\0")
+
+    num_commits = len(fields) // _NUM_FIELDS
+    if len(fields) % _NUM_FIELDS:
+        raise ValueError(
+            "unexpected number of fields in log output: {}".format(
+                len(fields)))
+
+    revisions = []
+    for i in xrange(num_commits):
+        (
+            commit_hash,
+            abbrev_hash,
+            author_email,
+            author_name,
+            committer_email,
+            committer_name,
+            subject,
+            body,
+        ) = fields[i * _NUM_FIELDS:(i + 1) * _NUM_FIELDS]
+
+        revisions.append(Revision(
+            hash=commit_hash,
+            abbrev_hash=abbrev_hash,
+            author_email=author_email,
+            author_name=author_name,
+            committer_email=committer_email,
+            committer_name=committer_name,
+            subject=subject,
+            # make the same message as 'make_revision_from_full_message'
+            message='\n'.join((body + '\n').splitlines())))
+
+    return revisions
+
+
 def get_range_to_here_raw_body(repo, start):
     # TODO: we actually want something that can return an list of bodies
     # TODO: '-n ' '1' is a hack until we return a list
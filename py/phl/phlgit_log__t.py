@@ -25,6 +25,15 @@ import phlsys_subprocess
 import phlgit_log
 
 
+class _NoReaderRepo(object):
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __call__(self, *args, **kwargs):
+        return self._repo(*args, **kwargs)
+
+
 class Test(unittest.TestCase):
 
     def __init__(self, data):
@@ -130,6 +139,54 @@ class Test(unittest.TestCase):
         self.assertEqual(len(committers), 1)
         self.assertEqual(committers[0], (self.authorName, self.authorEmail))
 
+    def testLastCommitHashWithoutReader(self):
+        self._createCommitNewFile("README")
+        self.repo("tag", "-a", "-m", "tag", "mytag")
+        plain_repo = _NoReaderRepo(self.repo)
+
+        # annotated tags are peeled to their commit, with or without an
+        # object reader
+        head = phlgit_log.get_last_commit_hash(self.repo)
+        self.assertEqual(
+            head,
+            phlgit_log.get_last_commit_hash_from_ref(self.repo, "mytag"))
+        self.assertEqual(
+            head,
+            phlgit_log.get_last_commit_hash_from_ref(plain_repo, "mytag"))
+
+    def testBatchRevisions(self):
+        self._createCommitNewFile("README")
+        self._createCommitNewFile("FILE1", "SUBJECT1", "BODY\n\nBODY")
+        self._createCommitNewFile("FILE2", "SUBJECT2", "BODY\r\nBODY\n\n")
+        self._createCommitNewFile("FILE3")
+        hashes = phlgit_log.get_last_n_commit_hashes(self.repo, 4)
+
+        # the batch reader makes the same revisions as reading one at a time
+        expected = [
+            phlgit_log.make_revision_from_hash(self.repo, h) for h in hashes
+        ]
+        self.assertListEqual(
+            expected, phlgit_log.make_revisions_from_hashes(self.repo, hashes))
+        self.assertListEqual(
+            [], phlgit_log.make_revisions_from_hashes(self.repo, []))
+
+        # hashes may be repeated, or refer to the same commit
+        self.assertListEqual(
+            [expected[3], expected[3], expected[0], expected[3]],
+            phlgit_log.make_revisions_from_hashes(
+                self.repo, [hashes[3], hashes[3], hashes[0], "HEAD"]))
+
+        # streaming gives the same revisions, whatever the batch size
+        for batch_size in (1, 3, 100):
+            self.assertListEqual(
+                expected,
+                list(phlgit_log.iter_revisions_from_hashes(
+                    self.repo, iter(hashes), batch_size)))
+            self.assertListEqual(
+                expected[1:],
+                list(phlgit_log.iter_range_revisions(
+                    self.repo, hashes[0], "HEAD", batch_size)))
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2014 Bloomberg Finance L.P.
@@ -10,6 +10,7 @@
 # Public Functions:
 #   get_sha1_or_none
 #   get_sha1
+#   get_absolute_git_dir
 #
 # -----------------------------------------------------------------------------
 # (this contents block is generated, edits will be lost)
@@ -19,6 +20,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
+
+import phlsys_gitobjectreader
+
 
 class Error(Exception):
     pass
@@ -32,8 +37,12 @@ def get_sha1_or_none(repo, ref):
     :returns: string of the ref's commit hash if valid, else None.
 
     """
-    commit = repo("rev-parse", "--revs-only", ref).strip()
-    return commit if commit else None
+    try:
+        info = phlsys_gitobjectreader.read_info(repo, ref)
+    except phlsys_gitobjectreader.Error:
+        commit = repo("rev-parse", "--revs-only", ref).strip()
+        return commit if commit else None
+    return info[0] if info is not None else None
 
 
 def get_sha1(repo, ref):
@@ -52,6 +61,22 @@ def get_sha1(repo, ref):
     return commit
 
 
+def get_absolute_git_dir(repo):
+    """Return the string absolute path of the repo's git dir.
+
+    This is the same as 'git rev-parse --absolute-git-dir', which needs git
+    2.13 or later. Note that the repo must have a working tree.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :returns: the string absolute path of the git dir
+
+    """
+    # '--git-dir' may be relative to the working tree, e.g. '.git'
+    working_dir, git_dir = repo(
+        'rev-parse', '--show-toplevel', '--git-dir').splitlines()
+    return os.path.normpath(os.path.join(working_dir, git_dir))
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2014 Bloomberg Finance L.P.
 #
@@ -0,0 +1,114 @@
+"""Test suite for phlgit_revparse."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] get_sha1_or_none() returns the hash of commits, tags and blobs
+# [ A] get_sha1_or_none() returns None for missing refs
+# [ A] get_sha1() raises Error for missing refs
+# [ A] the results are the same with and without an object reader
+# [ B] get_absolute_git_dir() agrees with 'git rev-parse --absolute-git-dir'
+# [ B] get_absolute_git_dir() works from subdirectories
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_GitDir
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import unittest
+
+import phlgitu_fixture
+import phlsys_git
+import phlsys_gitobjectreader
+
+import phlgit_revparse
+
+
+class _NoReaderRepo(object):
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __call__(self, *args, **kwargs):
+        return self._repo(*args, **kwargs)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_context = phlgitu_fixture.temprepo_context()
+        self.repo = self.repo_context.__enter__()
+        self.worker = phlgitu_fixture.Worker(self.repo)
+        self.worker.commit_new_file('add README', 'README', 'hello\n')
+        self.repo('tag', '-a', '-m', 'tag', 'mytag')
+
+    def tearDown(self):
+        self.repo_context.__exit__(None, None, None)
+
+    def test_A_Breathing(self):
+        plain_repo = _NoReaderRepo(self.repo)
+        self.assertIsNone(
+            phlsys_gitobjectreader.get_reader_or_none(plain_repo))
+
+        # [ A] get_sha1_or_none() returns the hash of commits, tags and blobs
+        # [ A] the results are the same with and without an object reader
+        for ref in ('HEAD', 'mytag', 'HEAD:README'):
+            expected = self.repo('rev-parse', ref).strip()
+            self.assertEqual(
+                expected, phlgit_revparse.get_sha1_or_none(self.repo, ref))
+            self.assertEqual(
+                expected, phlgit_revparse.get_sha1_or_none(plain_repo, ref))
+
+        for repo in (self.repo, plain_repo):
+
+            # [ A] get_sha1_or_none() returns None for missing refs
+            self.assertIsNone(
+                phlgit_revparse.get_sha1_or_none(repo, 'nosuchbranch'))
+
+            # [ A] get_sha1() raises Error for missing refs
+            self.assertRaises(
+                phlgit_revparse.Error,
+                phlgit_revparse.get_sha1,
+                repo,
+                'nosuchbranch')
+
+    def test_B_GitDir(self):
+        git_dir = os.path.join(
+            os.path.realpath(self.repo.working_dir), '.git')
+
+        # [ B] get_absolute_git_dir() agrees with 'git rev-parse
+        #      --absolute-git-dir'
+        self.assertEqual(
+            git_dir, phlgit_revparse.get_absolute_git_dir(self.repo))
+
+        # [ B] get_absolute_git_dir() works from subdirectories
+        sub_dir = os.path.join(self.repo.working_dir, 'sub')
+        os.mkdir(sub_dir)
+        self.assertEqual(
+            git_dir,
+            phlgit_revparse.get_absolute_git_dir(phlsys_git.Repo(sub_dir)))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -16,6 +16,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import phlsys_gitobjectreader
+
 
 def object_(repo, ref):
     """Return the content of the specified object.
@@ -25,7 +27,10 @@ def object_(repo, ref):
     :returns: the contents of the object
 
     """
-    return repo('show', ref)
+    content = _read_blob_or_none(repo, ref)
+    if content is None:
+        content = repo('show', ref)
+    return content
 
 
 def file_on_ref(repo, path, ref):
@@ -39,7 +44,23 @@ def file_on_ref(repo, path, ref):
     :returns: the string contents of the file
 
     """
-    return repo('show', '{}:{}'.format(ref, path))
+    rev = '{}:{}'.format(ref, path)
+    content = _read_blob_or_none(repo, rev)
+    if content is None:
+        content = repo('show', rev)
+    return content
+
+
+def _read_blob_or_none(repo, rev):
+    # 'git show' pretty-prints objects other than blobs, leave those to git,
+    # along with any which are missing so that git reports the error
+    try:
+        obj = phlsys_gitobjectreader.read_object(repo, rev)
+    except phlsys_gitobjectreader.Error:
+        return None
+    if obj is None or obj[1] != 'blob':
+        return None
+    return obj[2]
 
 
 # -----------------------------------------------------------------------------
@@ -0,0 +1,82 @@
+"""Test suite for phlgit_show."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] object_() and file_on_ref() return the contents of blobs
+# [ A] object_() pretty-prints objects other than blobs, like 'git show'
+# [ A] the results are the same with and without an object reader
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import phlgitu_fixture
+import phlsys_gitobjectreader
+
+import phlgit_show
+
+
+class _NoReaderRepo(object):
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __call__(self, *args, **kwargs):
+        return self._repo(*args, **kwargs)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_context = phlgitu_fixture.temprepo_context()
+        self.repo = self.repo_context.__enter__()
+        self.worker = phlgitu_fixture.Worker(self.repo)
+        self.worker.commit_new_file('add README', 'README', 'hello\n')
+
+    def tearDown(self):
+        self.repo_context.__exit__(None, None, None)
+
+    def test_A_Breathing(self):
+        plain_repo = _NoReaderRepo(self.repo)
+        self.assertIsNone(
+            phlsys_gitobjectreader.get_reader_or_none(plain_repo))
+
+        # [ A] the results are the same with and without an object reader
+        for repo in (self.repo, plain_repo):
+
+            # [ A] object_() and file_on_ref() return the contents of blobs
+            self.assertEqual(
+                phlgit_show.object_(repo, 'HEAD:README'), 'hello\n')
+            self.assertEqual(
+                phlgit_show.file_on_ref(repo, 'README', 'HEAD'), 'hello\n')
+
+            # [ A] object_() pretty-prints objects other than blobs, like
+            #      'git show'
+            self.assertIn('add README', phlgit_show.object_(repo, 'HEAD'))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
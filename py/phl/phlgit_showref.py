@@ -16,6 +16,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import phlsys_gitrefreader
+
 
 def names(repo):
     """Return a list of string names of the refs in the supplied repo.
@@ -35,7 +37,15 @@ def hash_ref_pairs(repo):
     :returns: a list of (sha1, name)
 
     """
-    result = [line.split() for line in repo('show-ref').splitlines()]
+    try:
+        # copy the list, the reader may return it again next time
+        return list(phlsys_gitrefreader.read_hash_ref_pairs(repo))
+    except phlsys_gitrefreader.Error:
+        pass
+
+    result = [
+        tuple(line.split()) for line in repo('show-ref').splitlines()
+    ]
     return result
 
 
@@ -0,0 +1,88 @@
+"""Test suite for phlgit_showref."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] hash_ref_pairs() agrees with 'git show-ref'
+# [ A] hash_ref_pairs() uses the ref reader, or git if there is none
+# [ A] names() lists the names of the refs
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import phlgitu_fixture
+import phlsys_gitrefreader
+
+import phlgit_showref
+
+
+class _NoReaderRepo(object):
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __call__(self, *args, **kwargs):
+        return self._repo(*args, **kwargs)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_context = phlgitu_fixture.temprepo_context()
+        self.repo = self.repo_context.__enter__()
+        self.worker = phlgitu_fixture.Worker(self.repo)
+        self.worker.commit_new_file('add README', 'README', 'hello\n')
+
+    def tearDown(self):
+        self.repo_context.__exit__(None, None, None)
+
+    def test_A_Breathing(self):
+        self.repo('branch', 'packed')
+        self.repo('pack-refs', '--all')
+        self.repo('branch', 'other')
+        plain_repo = _NoReaderRepo(self.repo)
+        self.assertIsNone(phlsys_gitrefreader.get_reader_or_none(plain_repo))
+
+        # [ A] hash_ref_pairs() agrees with 'git show-ref'
+        expected = [
+            tuple(line.split())
+            for line in self.repo('show-ref').splitlines()
+        ]
+        self.assertEqual(expected, phlgit_showref.hash_ref_pairs(self.repo))
+
+        # [ A] hash_ref_pairs() uses the ref reader, or git if there is none
+        # 'packed-refs' and the loose 'other' branch
+        self.assertEqual(self.repo.ref_reader.num_files_read, 2)
+        self.assertEqual(expected, phlgit_showref.hash_ref_pairs(plain_repo))
+
+        # [ A] names() lists the names of the refs
+        self.assertEqual(
+            ['refs/heads/master', 'refs/heads/other', 'refs/heads/packed'],
+            phlgit_showref.names(self.repo))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
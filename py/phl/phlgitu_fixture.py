@@ -113,6 +113,7 @@ class TempRepo(object):
         :returns: None
 
         """
+        self._repo.object_reader.close()
         shutil.rmtree(self._tmp_dir)
 
     @property
@@ -0,0 +1,192 @@
+"""Compactly encode the changes between two lists of (sha1, ref) pairs.
+
+Repositories can have tens of thousands of refs, of which only a handful
+change at a time. Sending only the changes is much cheaper than sending the
+whole list, e.g. between processes.
+
+The encoding is a binary string, sha1s are packed as raw bytes and ref names
+are separated by NUL characters. Checksums of the base and the result are
+included, so that a delta applied to the wrong base is detected. The checksums
+rely on Python's string hashing, so deltas may only be applied in the process
+that made them or in processes forked from the same parent.
+
+Usage example:
+
+    >>> old = [('a' * 40, 'refs/heads/master'), ('b' * 40, 'refs/heads/x')]
+    >>> new = [('c' * 40, 'refs/heads/master'), ('d' * 40, 'refs/heads/y')]
+    >>> apply_delta(old, make_delta(old, new)) == new
+    True
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlgitu_refdelta
+#
+# Public Classes:
+#   BaseMismatchError
+#
+# Public Functions:
+#   make_delta
+#   apply_delta
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import binascii
+import bisect
+import operator
+import struct
+
+# flags, length of binary hashes, base checksum, result checksum,
+# number of removed refs, number of added or changed refs
+_HEADER = struct.Struct('!BBIIII')
+
+_FLAG_HAS_BASE = 1
+
+
+class BaseMismatchError(ValueError):
+    pass
+
+
+def make_delta(old_hash_ref_pairs, new_hash_ref_pairs):
+    """Return a string encoding the changes from 'old_' to 'new_'.
+
+    If 'old_hash_ref_pairs' is None then the whole of 'new_hash_ref_pairs' is
+    encoded, the delta may then be applied to any base.
+
+    :old_hash_ref_pairs: a list of (sha1, name) or None
+    :new_hash_ref_pairs: a list of (sha1, name)
+    :returns: a string suitable for 'apply_delta'
+
+    """
+    new_set = frozenset(new_hash_ref_pairs)
+    new_checksum = _checksum(new_set)
+
+    if old_hash_ref_pairs is new_hash_ref_pairs:
+        # avoid the comparison if nothing could have changed
+        return _HEADER.pack(
+            _FLAG_HAS_BASE, 0, new_checksum, new_checksum, 0, 0)
+
+    flags = 0
+    base_checksum = 0
+    old_set = frozenset()
+    if old_hash_ref_pairs is not None:
+        flags |= _FLAG_HAS_BASE
+        old_set = frozenset(old_hash_ref_pairs)
+        base_checksum = _checksum(old_set)
+
+    changed_pairs = sorted(new_set - old_set, key=operator.itemgetter(1))
+    changed_refs = [r for _, r in changed_pairs]
+    removed_refs = sorted(
+        set(r for _, r in old_set - new_set) - set(changed_refs))
+
+    hash_len = len(changed_pairs[0][0]) // 2 if changed_pairs else 0
+    header = _HEADER.pack(
+        flags,
+        hash_len,
+        base_checksum,
+        new_checksum,
+        len(removed_refs),
+        len(changed_refs))
+
+    return ''.join([
+        header,
+        binascii.unhexlify(''.join(h for h, _ in changed_pairs)),
+        '\0'.join(removed_refs + changed_refs),
+    ])
+
+
+def apply_delta(old_hash_ref_pairs, delta):
+    """Return the list of (sha1, name) made by applying 'delta' to 'old_'.
+
+    Raise BaseMismatchError if 'delta' was made against a different base, or
+    if 'old_hash_ref_pairs' is None and the delta isn't a whole list.
+
+    :old_hash_ref_pairs: a list of (sha1, name) or None
+    :delta: a string from 'make_delta'
+    :returns: a list of (sha1, name), sorted by name if the base is sorted
+
+    """
+    (
+        flags,
+        hash_len,
+        base_checksum,
+        result_checksum,
+        num_removed,
+        num_changed
+    ) = _HEADER.unpack_from(delta)
+
+    old_pairs = []
+    if flags & _FLAG_HAS_BASE:
+        if old_hash_ref_pairs is None:
+            raise BaseMismatchError("delta needs a base, none supplied")
+        if _checksum(frozenset(old_hash_ref_pairs)) != base_checksum:
+            raise BaseMismatchError("delta was made against another base")
+        old_pairs = old_hash_ref_pairs
+
+    if not num_removed and not num_changed:
+        return list(old_pairs)
+
+    offset = _HEADER.size
+    hashes_end = offset + hash_len * num_changed
+    hex_hashes = binascii.hexlify(delta[offset:hashes_end])
+    refs = delta[hashes_end:].split('\0')
+    changed_refs = refs[num_removed:]
+
+    hex_len = hash_len * 2
+    ref_to_changed_pair = dict(
+        (ref, (hex_hashes[i * hex_len:(i + 1) * hex_len], ref))
+        for i, ref in enumerate(changed_refs)
+    )
+
+    # replace changed pairs in place, consuming them from the dict, so that
+    # we don't have to sort the whole list again
+    removed_refs = set(refs[:num_removed])
+    new_hash_ref_pairs = [
+        ref_to_changed_pair.pop(pair[1], pair)
+        for pair in old_pairs
+        if pair[1] not in removed_refs
+    ]
+
+    # insert the remaining, new, refs in order
+    if ref_to_changed_pair:
+        new_refs = [ref for _, ref in new_hash_ref_pairs]
+        for ref in sorted(ref_to_changed_pair):
+            index = bisect.bisect(new_refs, ref)
+            new_refs.insert(index, ref)
+            new_hash_ref_pairs.insert(index, ref_to_changed_pair[ref])
+
+    if _checksum(frozenset(new_hash_ref_pairs)) != result_checksum:
+        raise BaseMismatchError("delta didn't reproduce the expected result")
+
+    return new_hash_ref_pairs
+
+
+def _checksum(hash_ref_pair_set):
+    # N.B. this relies on the hashes of strings being the same in the process
+    # which makes the delta and the one which applies it, which is the case
+    # for processes forked from the same parent
+    return hash(hash_ref_pair_set) & 0xffffffff
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
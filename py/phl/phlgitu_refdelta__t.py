@@ -0,0 +1,113 @@
+"""Test suite for phlgitu_refdelta."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] applying a delta reproduces the new list, sorted by name
+# [ A] can encode additions, removals and changes together
+# [ A] a delta may be applied to the base in any order
+# [ B] a delta without a base reproduces the new list
+# [ B] a delta with no changes reproduces the old list
+# [ C] applying a delta to the wrong base raises BaseMismatchError
+# [ C] applying a delta with a base to None raises BaseMismatchError
+# [ D] a delta of a few changes is much smaller than the whole list
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_NoBaseNoChange
+# [ C] test_C_Mismatch
+# [ D] test_D_Compact
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import pickle
+import unittest
+
+import phlgitu_refdelta
+
+
+def _make_pairs(name_list, salt=''):
+    return [
+        (hashlib.sha1(name + salt).hexdigest(), name)
+        for name in sorted(name_list)
+    ]
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        old = _make_pairs(['refs/heads/a', 'refs/heads/b', 'refs/heads/c'])
+        new = [old[0]] + _make_pairs(['refs/heads/c', 'refs/heads/d'], 'x')
+        delta = phlgitu_refdelta.make_delta(old, new)
+
+        # [ A] applying a delta reproduces the new list, sorted by name
+        # [ A] can encode additions, removals and changes together
+        self.assertEqual(phlgitu_refdelta.apply_delta(old, delta), new)
+
+        # [ A] a delta may be applied to the base in any order
+        self.assertItemsEqual(
+            phlgitu_refdelta.apply_delta(list(reversed(old)), delta),
+            new)
+
+    def test_B_NoBaseNoChange(self):
+        old = _make_pairs(['refs/heads/a', 'refs/heads/b'])
+
+        # [ B] a delta without a base reproduces the new list
+        delta = phlgitu_refdelta.make_delta(None, old)
+        self.assertEqual(phlgitu_refdelta.apply_delta(None, delta), old)
+        self.assertEqual(phlgitu_refdelta.apply_delta([], delta), old)
+
+        # [ B] a delta with no changes reproduces the old list
+        for new in (old, list(old)):
+            delta = phlgitu_refdelta.make_delta(old, new)
+            self.assertEqual(phlgitu_refdelta.apply_delta(old, delta), old)
+
+    def test_C_Mismatch(self):
+        old = _make_pairs(['refs/heads/a', 'refs/heads/b'])
+        new = _make_pairs(['refs/heads/a', 'refs/heads/c'])
+        other = _make_pairs(['refs/heads/a', 'refs/heads/b'], 'x')
+        delta = phlgitu_refdelta.make_delta(old, new)
+
+        # [ C] applying a delta to the wrong base raises BaseMismatchError
+        with self.assertRaises(phlgitu_refdelta.BaseMismatchError):
+            phlgitu_refdelta.apply_delta(other, delta)
+
+        # [ C] applying a delta with a base to None raises BaseMismatchError
+        with self.assertRaises(phlgitu_refdelta.BaseMismatchError):
+            phlgitu_refdelta.apply_delta(None, delta)
+
+    def test_D_Compact(self):
+        names = sorted(
+            'refs/remotes/origin/r{}'.format(i) for i in xrange(1000))
+        old = _make_pairs(names)
+        new = _make_pairs(names[:5], 'x') + old[5:]
+        delta = phlgitu_refdelta.make_delta(old, new)
+        self.assertEqual(phlgitu_refdelta.apply_delta(old, delta), new)
+
+        # [ D] a delta of a few changes is much smaller than the whole list
+        full_size = len(pickle.dumps(new, pickle.HIGHEST_PROTOCOL))
+        self.assertLess(len(delta) * 100, full_size)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,126 @@
+"""Git callable which sees only the '.gitattributes' files from a ref.
+
+Some git commands, like 'git diff', take their attributes from the
+'.gitattributes' files in the working tree. To honour the attributes on a
+branch, it used to be necessary to check that branch out first, which may
+rewrite thousands of files in a large repository.
+
+Instead, 'attributes_repo_context' makes a temporary working tree which
+contains only the '.gitattributes' files from the branch, linked to the
+original repository. Commands run in it see the same refs and objects as the
+original repository and the attributes from the branch.
+
+Only commands which don't otherwise use the working tree or the index, such
+as 'git diff' between commits, should be run in the temporary working tree.
+
+Usage example:
+
+    >>> import phlgitu_fixture
+    >>> with phlgitu_fixture.lone_worker_context() as worker:
+    ...     worker.commit_new_file(
+    ...         'add attributes', '.gitattributes', '*.txt -diff\\n')
+    ...     worker.commit_new_file('add text', 'file.txt', 'text\\n')
+    ...     _ = worker.repo('checkout', 'HEAD~2')
+    ...     with attributes_repo_context(worker.repo, 'master') as repo:
+    ...         'Binary files' in repo('diff', 'HEAD...master')
+    True
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlgitx_attributesrepo
+#
+# Public Functions:
+#   attributes_repo_context
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+import phlgit_revparse
+import phlgit_show
+import phlsys_git
+
+_ATTRIBUTES_FILENAME = '.gitattributes'
+
+# git doesn't follow symlinked attributes files, so neither do we
+_SYMLINK_MODE = '120000'
+
+
+@contextlib.contextmanager
+def attributes_repo_context(repo, ref):
+    """Yield a repo which sees only the '.gitattributes' files from 'ref'.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :ref: the string name of the commit to take the attributes from
+    :returns: a context manager which yields a phlsys_git.Repo
+
+    """
+    git_dir = phlgit_revparse.get_absolute_git_dir(repo)
+    path_to_sha1 = _get_attributes_path_to_sha1(repo, ref)
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # a '.git' file links the working tree to the repository, as git
+        # does for submodules
+        with open(os.path.join(tmp_dir, '.git'), 'w') as f:
+            f.write('gitdir: {}\n'.format(git_dir))
+
+        for path, sha1 in path_to_sha1.iteritems():
+            full_path = os.path.join(tmp_dir, path)
+            dir_path = os.path.dirname(full_path)
+            if not os.path.isdir(dir_path):
+                os.makedirs(dir_path)
+            with open(full_path, 'wb') as f:
+                f.write(phlgit_show.object_(repo, sha1))
+
+        attributes_repo = phlsys_git.Repo(tmp_dir)
+        try:
+            yield attributes_repo
+        finally:
+            attributes_repo.object_reader.close()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def _get_attributes_path_to_sha1(repo, ref):
+    # each entry is like '<mode> <type> <sha1>\t<path>'
+    path_to_sha1 = {}
+    entries = repo('ls-tree', '-r', '-z', '--full-tree', ref).split('\0')
+    for entry in entries:
+        if not entry.endswith(_ATTRIBUTES_FILENAME):
+            continue
+        info, _, path = entry.partition('\t')
+        if os.path.basename(path) != _ATTRIBUTES_FILENAME:
+            continue
+        mode, type_, sha1 = info.split()
+        if type_ == 'blob' and mode != _SYMLINK_MODE:
+            path_to_sha1[path] = sha1
+    return path_to_sha1
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,110 @@
+"""Test suite for phlgitx_attributesrepo."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] diffs are the same as diffs made with the ref checked out
+# [ A] attributes files in subdirectories are honoured
+# [ B] attributes in the original working tree are not honoured
+# [ C] the original working tree is left alone
+# [ C] the temporary working tree is removed afterwards
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_IgnoreWorkingTree
+# [ C] test_C_Cleanup
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import unittest
+
+import phlgitu_fixture
+
+import phlgitx_attributesrepo
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.worker_context = phlgitu_fixture.lone_worker_context()
+        self.worker = self.worker_context.__enter__()
+        self.repo = self.worker.repo
+        os.makedirs(os.path.join(self.repo.working_dir, 'sub'))
+        self.worker.commit_new_file('add text', 'sub/file.txt', 'text\n')
+        self.worker.commit_new_file('add more text', 'more.txt', 'more\n')
+        self.repo('checkout', '-b', 'attributes')
+        self.worker.commit_new_file(
+            'add attributes', 'sub/.gitattributes', '*.txt -diff\n')
+        self.worker.commit_new_file('change text', 'sub/file.txt', 'new\n')
+        self.worker.commit_new_file('change more', 'more.txt', 'new\n')
+
+    def tearDown(self):
+        self.worker_context.__exit__(None, None, None)
+
+    def _diff(self, repo):
+        return repo('diff', 'master...attributes', '-M')
+
+    def test_A_Breathing(self):
+        checkout_diff = self._diff(self.repo)
+        self.repo('checkout', 'master')
+
+        with phlgitx_attributesrepo.attributes_repo_context(
+                self.repo, 'attributes') as repo:
+
+            # [ A] diffs are the same as diffs made with the ref checked out
+            diff = self._diff(repo)
+            self.assertEqual(diff, checkout_diff)
+
+            # [ A] attributes files in subdirectories are honoured
+            self.assertIn('Binary files a/sub/file.txt', diff)
+            self.assertIn('+new', diff)
+
+    def test_B_IgnoreWorkingTree(self):
+        self.repo('checkout', 'master')
+        master_diff = self._diff(self.repo)
+        self.repo('checkout', 'attributes')
+
+        # [ B] attributes in the original working tree are not honoured
+        with phlgitx_attributesrepo.attributes_repo_context(
+                self.repo, 'master') as repo:
+            self.assertEqual(self._diff(repo), master_diff)
+            self.assertNotIn('Binary files', master_diff)
+
+    def test_C_Cleanup(self):
+        head = self.repo('rev-parse', 'HEAD')
+        with phlgitx_attributesrepo.attributes_repo_context(
+                self.repo, 'master') as repo:
+            tmp_dir = repo.working_dir
+            self.assertTrue(os.path.isdir(tmp_dir))
+            self._diff(repo)
+
+        # [ C] the original working tree is left alone
+        self.assertEqual(self.repo('rev-parse', 'HEAD'), head)
+        self.assertEqual(self.repo('status', '--porcelain'), '')
+
+        # [ C] the temporary working tree is removed afterwards
+        self.assertFalse(os.path.exists(tmp_dir))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
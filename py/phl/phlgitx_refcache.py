@@ -1,4 +1,12 @@
-"""Git callable that maintains a cache of refs for efficient querying."""
+"""Git callable that maintains a cache of refs for efficient querying.
+
+The cache is only discarded when a git command which may move refs is run
+through the callable, read-only commands like 'log' and 'diff' leave it as it
+is. When a single ref is set or deleted with 'update-ref', the cached list is
+updated in place rather than discarded, unless the ref is symbolic; then it's
+the ref it points to that moves.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -9,6 +17,9 @@
 #    .hash_ref_pairs
 #    .peek_hash_ref_pairs
 #    .set_hash_ref_pairs
+#    .get_stats
+#    .object_reader
+#    .ref_reader
 #
 # -----------------------------------------------------------------------------
 # (this contents block is generated, edits will be lost)
@@ -18,7 +29,45 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import bisect
+
+import phlgit_revparse
 import phlgit_showref
+import phlsys_gitobjectreader
+import phlsys_gitrefreader
+import phlsys_subprocess
+
+# git commands which never create, move or delete refs, running these keeps
+# the cache. Note that this doesn't mean they're read-only, some change the
+# index, the working tree or the config; none of which the cache covers.
+_NON_REF_MOVING_COMMANDS = frozenset([
+    'add',
+    'cat-file',
+    'checkout-index',
+    'clean',
+    'config',
+    'diff',
+    'diff-index',
+    'diff-tree',
+    'for-each-ref',
+    'hash-object',
+    'log',
+    'ls-files',
+    'ls-remote',
+    'ls-tree',
+    'merge-base',
+    'pack-refs',
+    'rev-list',
+    'rev-parse',
+    'rm',
+    'show',
+    'show-ref',
+    'status',
+])
+
+# options to 'update-ref' which don't change which ref is updated, note that
+# '-m' takes a value
+_UPDATE_REF_FLAGS = frozenset(['--no-deref', '--create-reflog'])
 
 
 class Repo(object):
@@ -30,6 +79,12 @@ class Repo(object):
         super(Repo, self).__init__()
         self._repo = repo
         self._hash_ref_pairs = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'updates': 0,
+            'invalidations': 0,
+        }
 
     @property
     def hash_ref_pairs(self):
@@ -39,7 +94,10 @@ class Repo(object):
 
         """
         if self._hash_ref_pairs is None:
+            self._stats['misses'] += 1
             self._hash_ref_pairs = phlgit_showref.hash_ref_pairs(self._repo)
+        else:
+            self._stats['hits'] += 1
         return self._hash_ref_pairs
 
     def peek_hash_ref_pairs(self):
@@ -68,9 +126,82 @@ class Repo(object):
         """
         self._hash_ref_pairs = hash_ref_pairs
 
+    def get_stats(self):
+        """Return a dict of the counts of how the cache has been used.
+
+        'hits' and 'misses' count requests for 'hash_ref_pairs' which were
+        served from the cache and from git. 'updates' counts the times the
+        cache was updated in place and 'invalidations' the times that it was
+        discarded.
+
+        :returns: a dict of string names to integer counts
+
+        """
+        return dict(self._stats)
+
+    @property
+    def object_reader(self):
+        """Return the ObjectReader of the wrapped repo, or None.
+
+        Reading objects doesn't change any refs, so the cache is kept.
+
+        """
+        return phlsys_gitobjectreader.get_reader_or_none(self._repo)
+
+    @property
+    def ref_reader(self):
+        """Return the RefReader of the wrapped repo, or None."""
+        return phlsys_gitrefreader.get_reader_or_none(self._repo)
+
     def __call__(self, *args, **kwargs):
-        self._hash_ref_pairs = None
-        return self._repo(*args, **kwargs)
+        if args and args[0] in _NON_REF_MOVING_COMMANDS:
+            return self._repo(*args, **kwargs)
+
+        # we must look before running 'update-ref', afterwards a symbolic ref
+        # may have been replaced or deleted
+        updated_ref = None
+        if self._hash_ref_pairs is not None:
+            updated_ref = _get_updated_ref(args, kwargs)
+            if updated_ref is not None and self._is_symbolic(updated_ref):
+                updated_ref = None
+
+        try:
+            result = self._repo(*args, **kwargs)
+        finally:
+            if self._hash_ref_pairs is not None:
+                if updated_ref is not None:
+                    self._update_ref(updated_ref)
+                else:
+                    self._stats['invalidations'] += 1
+                    self._hash_ref_pairs = None
+
+        return result
+
+    def _is_symbolic(self, ref):
+        # a symbolic ref, like 'refs/remotes/origin/HEAD', is listed with the
+        # hash of the ref it points to; 'symbolic-ref -q' exits with 1 if
+        # 'ref' isn't symbolic, including if it doesn't exist
+        try:
+            self._repo('symbolic-ref', '-q', ref)
+        except phlsys_subprocess.CalledProcessError as e:
+            if e.exitcode == 1:
+                return False
+            raise
+        return True
+
+    def _update_ref(self, ref):
+        # make a new list rather than modifying the cached one, clients may
+        # be comparing against lists they peeked before
+        sha1 = phlgit_revparse.get_sha1_or_none(self._repo, ref)
+        pairs = list(self._hash_ref_pairs)
+        refs = [r for _, r in pairs]
+        index = bisect.bisect_left(refs, ref)
+        if index < len(refs) and refs[index] == ref:
+            del pairs[index]
+        if sha1 is not None:
+            pairs.insert(index, (sha1, ref))
+        self._stats['updates'] += 1
+        self._hash_ref_pairs = pairs
 
     # we don't implement this as it would be hard to guess when to invalidate
     # the cache when the client has direct access to the git directory
@@ -80,6 +211,30 @@ class Repo(object):
     #     return self._repo._workingDir
 
 
+def _get_updated_ref(args, kwargs):
+    # return the full name of the single ref that an 'update-ref' command
+    # sets or deletes, None if it's another command or we're not sure
+    if not args or args[0] != 'update-ref' or kwargs.get('stdin'):
+        return None
+
+    positional = []
+    arg_iter = iter(args[1:])
+    for arg in arg_iter:
+        if arg == '-m':
+            next(arg_iter, None)
+        elif arg == '-d' or arg in _UPDATE_REF_FLAGS:
+            pass
+        elif arg.startswith('-'):
+            return None
+        else:
+            positional.append(arg)
+
+    # other names, like 'HEAD', may update the ref they point to
+    if not positional or not positional[0].startswith('refs/'):
+        return None
+    return positional[0]
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2014 Bloomberg Finance L.P.
 #
@@ -0,0 +1,145 @@
+"""Test suite for phlgitx_refcache."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] hash_ref_pairs agrees with 'git show-ref'
+# [ A] the pairs are hashable tuples
+# [ A] repeated requests are served from the cache
+# [ B] read-only commands keep the cache
+# [ B] commands which may move refs discard the cache
+# [ C] 'update-ref' creates, moves and deletes cached refs in place
+# [ C] in-place updates make a new list, peeked lists are unchanged
+# [ C] 'update-ref' on symbolic names like 'HEAD' discards the cache
+# [ C] 'update-ref' on symbolic refs under 'refs/' discards the cache
+# [ D] get_stats() counts hits, misses, updates and invalidations
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Invalidation
+# [ C] test_C_UpdateRef
+# [ D] test_D_Stats
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import phlgit_showref
+import phlgitu_fixture
+
+import phlgitx_refcache
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.repo_context = phlgitu_fixture.temprepo_context()
+        self.sys_repo = self.repo_context.__enter__()
+        self.worker = phlgitu_fixture.Worker(self.sys_repo)
+        self.worker.commit_new_file('add README', 'README', 'hello\n')
+        self.repo = phlgitx_refcache.Repo(self.sys_repo)
+
+    def tearDown(self):
+        self.repo_context.__exit__(None, None, None)
+
+    def _assert_cache_is_accurate(self):
+        self.assertEqual(
+            self.repo.hash_ref_pairs,
+            phlgit_showref.hash_ref_pairs(self.sys_repo))
+
+    def test_A_Breathing(self):
+        # [ A] hash_ref_pairs agrees with 'git show-ref'
+        self._assert_cache_is_accurate()
+
+        # [ A] the pairs are hashable tuples
+        self.assertTrue(frozenset(self.repo.hash_ref_pairs))
+
+        # [ A] repeated requests are served from the cache
+        pairs = self.repo.hash_ref_pairs
+        self.assertIs(self.repo.hash_ref_pairs, pairs)
+
+    def test_B_Invalidation(self):
+        pairs = self.repo.hash_ref_pairs
+
+        # [ B] read-only commands keep the cache
+        self.repo('log', '--format=%H')
+        self.repo('rev-parse', 'HEAD')
+        self.repo('status')
+        self.assertIs(self.repo.peek_hash_ref_pairs(), pairs)
+
+        # [ B] commands which may move refs discard the cache
+        self.repo('branch', 'newbranch')
+        self.assertIsNone(self.repo.peek_hash_ref_pairs())
+        self._assert_cache_is_accurate()
+
+    def test_C_UpdateRef(self):
+        head = self.repo('rev-parse', 'HEAD').strip()
+        tree = self.repo('rev-parse', 'HEAD^{tree}').strip()
+        self.worker.commit_new_file('add NEWS', 'NEWS', 'news\n')
+        pairs = self.repo.hash_ref_pairs
+
+        # [ C] 'update-ref' creates, moves and deletes cached refs in place
+        self.repo('update-ref', 'refs/heads/aaa', head)
+        self.repo('update-ref', 'refs/zzz', 'HEAD')
+        self.repo('update-ref', '-m', 'move', 'refs/zzz', tree)
+        self.assertIsNotNone(self.repo.peek_hash_ref_pairs())
+        self._assert_cache_is_accurate()
+        self.repo('update-ref', '-d', 'refs/heads/aaa')
+        self.assertIsNotNone(self.repo.peek_hash_ref_pairs())
+        self._assert_cache_is_accurate()
+
+        # [ C] in-place updates make a new list, peeked lists are unchanged
+        self.assertIsNot(self.repo.hash_ref_pairs, pairs)
+        self.assertEqual(
+            [ref for _, ref in pairs], ['refs/heads/master'])
+
+        # [ C] 'update-ref' on symbolic names like 'HEAD' discards the cache
+        self.repo('update-ref', 'HEAD', head)
+        self.assertIsNone(self.repo.peek_hash_ref_pairs())
+        self._assert_cache_is_accurate()
+
+        # [ C] 'update-ref' on symbolic refs under 'refs/' discards the cache
+        self.worker.commit_new_file('add CHANGES', 'CHANGES', 'changes\n')
+        self.repo(
+            'symbolic-ref', 'refs/remotes/origin/HEAD', 'refs/heads/master')
+        self._assert_cache_is_accurate()
+        self.repo('update-ref', 'refs/remotes/origin/HEAD', head)
+        self.assertIsNone(self.repo.peek_hash_ref_pairs())
+        self._assert_cache_is_accurate()
+
+    def test_D_Stats(self):
+        head = self.repo('rev-parse', 'HEAD').strip()
+
+        # [ D] get_stats() counts hits, misses, updates and invalidations
+        self.repo.hash_ref_pairs
+        self.repo.hash_ref_pairs
+        self.repo('update-ref', 'refs/heads/other', head)
+        self.repo.hash_ref_pairs
+        self.repo('branch', 'newbranch')
+        self.repo.hash_ref_pairs
+        self.assertEqual(
+            self.repo.get_stats(),
+            {'hits': 2, 'misses': 2, 'updates': 1, 'invalidations': 1})
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,98 @@
+"""Remove the lock files left behind by git processes which were killed.
+
+Git takes a lock on a file like 'index' or 'refs/heads/master' by creating
+'index.lock' or 'refs/heads/master.lock' next to it. Git removes its lock
+files when it exits, even when it's sent SIGTERM, but it can't when it's
+sent SIGKILL. Later git commands then refuse to touch the locked files until
+the lock files are removed.
+
+Only remove lock files when it's certain that no git processes are using the
+repository, otherwise they may be corrupted.
+
+Usage example:
+
+    >>> import phlgitu_fixture
+    >>> with phlgitu_fixture.lone_worker_context() as worker:
+    ...     git_dir = phlgit_revparse.get_absolute_git_dir(worker.repo)
+    ...     open(os.path.join(git_dir, 'index.lock'), 'w').close()
+    ...     remove_stale_locks(worker.repo)
+    ['index.lock']
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlgitx_stalelocks
+#
+# Public Functions:
+#   remove_stale_locks
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import phlgit_revparse
+import phlsys_fs
+
+_LOCK_SUFFIX = '.lock'
+
+# the directories which contain lockable files, apart from the git dir itself
+_LOCKABLE_DIRS = ('refs', 'logs')
+
+
+def remove_stale_locks(repo):
+    """Remove the lock files in 'repo', return the paths of those removed.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :returns: a sorted list of the string paths removed, relative to the git
+              dir
+
+    """
+    git_dir = phlgit_revparse.get_absolute_git_dir(repo)
+
+    removed = []
+    for path in _iter_lock_paths(git_dir):
+        phlsys_fs.delete_file_if_exists(os.path.join(git_dir, path))
+        removed.append(path)
+
+    return sorted(removed)
+
+
+def _iter_lock_paths(git_dir):
+    # e.g. 'index.lock', 'HEAD.lock', 'packed-refs.lock', 'config.lock'
+    for name in os.listdir(git_dir):
+        if name.endswith(_LOCK_SUFFIX):
+            if os.path.isfile(os.path.join(git_dir, name)):
+                yield name
+
+    # e.g. 'refs/heads/master.lock', 'logs/refs/heads/master.lock'
+    for lockable_dir in _LOCKABLE_DIRS:
+        top = os.path.join(git_dir, lockable_dir)
+        for dir_path, _, filename_list in os.walk(top):
+            for name in filename_list:
+                if name.endswith(_LOCK_SUFFIX):
+                    yield os.path.relpath(
+                        os.path.join(dir_path, name), git_dir)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,98 @@
+"""Test suite for phlgitx_stalelocks."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] nothing is removed if there are no lock files
+# [ A] lock files in the git dir and under 'refs' and 'logs' are removed
+# [ A] other files are left alone
+# [ A] git can use the locked files again afterwards
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import unittest
+
+import phlgit_revparse
+import phlgitu_fixture
+import phlsys_subprocess
+
+import phlgitx_stalelocks
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.worker_context = phlgitu_fixture.lone_worker_context()
+        self.worker = self.worker_context.__enter__()
+        self.repo = self.worker.repo
+        self.git_dir = phlgit_revparse.get_absolute_git_dir(self.repo)
+
+    def tearDown(self):
+        self.worker_context.__exit__(None, None, None)
+
+    def _touch(self, path):
+        full_path = os.path.join(self.git_dir, path)
+        open(full_path, 'w').close()
+        return full_path
+
+    def test_A_Breathing(self):
+
+        # [ A] nothing is removed if there are no lock files
+        self.assertEqual([], phlgitx_stalelocks.remove_stale_locks(self.repo))
+
+        lock_paths = [
+            'index.lock',
+            'HEAD.lock',
+            'refs/heads/master.lock',
+            'logs/refs/heads/master.lock',
+        ]
+        for path in lock_paths:
+            self._touch(path)
+        other_path = self._touch('refs/heads/not-a-lock')
+
+        with self.assertRaises(phlsys_subprocess.CalledProcessError):
+            self.repo('update-ref', 'refs/heads/master', 'HEAD')
+
+        # [ A] lock files in the git dir and under 'refs' and 'logs' are
+        #      removed
+        self.assertEqual(
+            sorted(lock_paths),
+            phlgitx_stalelocks.remove_stale_locks(self.repo))
+        for path in lock_paths:
+            self.assertFalse(
+                os.path.exists(os.path.join(self.git_dir, path)))
+
+        # [ A] other files are left alone
+        self.assertTrue(os.path.exists(other_path))
+        os.remove(other_path)
+
+        # [ A] git can use the locked files again afterwards
+        self.repo('update-ref', 'refs/heads/master', 'HEAD')
+        self.worker.commit_new_file('add file', 'file')
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,349 @@
+"""Run jobs in worker processes, with limits on concurrency and duration.
+
+Each job runs in a freshly forked worker process. At most 'max_workers' jobs
+run at once, and at most 'max_workers_per_key' of the jobs sharing the same
+key. This is useful for limiting the load on each host when the jobs access
+the network, for example.
+
+Jobs which run for longer than 'timeout_secs' are stopped, along with any
+processes that they started. They're sent SIGTERM first so that they can
+clean up, e.g. git removes its lock files, and then SIGKILL if they're still
+running after 'grace_secs'. Jobs which time out or die before returning have
+a result of None.
+
+'run_jobs' blocks until all the jobs are finished, a BoundedJobs runs them in
+the background while the caller gets on with other work, polling for the
+results now and then.
+
+Usage example:
+
+    >>> job_key_list = [(lambda: 1, 'a'), (lambda: 2, 'a'), (lambda: 3, 'b')]
+    >>> sorted(run_jobs(job_key_list, 2, 1, timeout_secs=60))
+    [(0, 1), (1, 2), (2, 3)]
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlmp_boundedjobs
+#
+# Public Classes:
+#   BoundedJobs
+#    .job_ids
+#    .add_job
+#    .poll_results
+#    .stop
+#
+# Public Functions:
+#   run_jobs
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import errno
+import multiprocessing
+import os
+import select
+import signal
+
+import phlsys_timer
+
+_DEFAULT_GRACE_SECS = 10
+
+
+def run_jobs(
+        job_key_list,
+        max_workers,
+        max_workers_per_key,
+        timeout_secs,
+        grace_secs=_DEFAULT_GRACE_SECS):
+    """Yield (index, result) for each of the jobs in 'job_key_list'.
+
+    Jobs are started in the order that they're supplied, except that jobs are
+    passed over while their key is at its limit. Results are yielded in the
+    order that the jobs finish.
+
+    :job_key_list: a list of (callable, key), the results must be picklable
+    :max_workers: the maximum number of jobs to run at once
+    :max_workers_per_key: the maximum number of jobs with the same key to run
+    :timeout_secs: the number of seconds after which to stop a job
+    :grace_secs: the number of seconds to let a stopped job clean up
+    :yields: an (index, result) tuple, result is None if the job failed
+
+    """
+    jobs = BoundedJobs(
+        max_workers, max_workers_per_key, timeout_secs, grace_secs)
+    for index, (job, key) in enumerate(job_key_list):
+        jobs.add_job(index, job, key)
+
+    while jobs.job_ids:
+        for index, result in jobs.poll_results(timeout_secs=None):
+            yield index, result
+
+
+class BoundedJobs(object):
+
+    def __init__(
+            self,
+            max_workers,
+            max_workers_per_key,
+            timeout_secs,
+            grace_secs=_DEFAULT_GRACE_SECS):
+        """Run jobs in the background within the supplied limits.
+
+        :max_workers: the maximum number of jobs to run at once
+        :max_workers_per_key: the maximum number of jobs with the same key to
+                              run at once
+        :timeout_secs: the number of seconds after which to stop a job
+        :grace_secs: the number of seconds to let a stopped job clean up
+                     before it's killed
+
+        """
+        if max_workers < 1:
+            raise ValueError(
+                "'max_workers' must be at least 1, got {}".format(
+                    max_workers))
+        if max_workers_per_key < 1:
+            raise ValueError(
+                "'max_workers_per_key' must be at least 1, got {}".format(
+                    max_workers_per_key))
+
+        self._max_workers = max_workers
+        self._max_workers_per_key = max_workers_per_key
+        self._timeout_secs = timeout_secs
+        self._grace_secs = grace_secs
+
+        # map of job ids to (job, key) for jobs not started yet, in the order
+        # that they were added
+        self._pending = collections.OrderedDict()
+        self._key_to_num_active = collections.defaultdict(int)
+        self._active_workers = []
+
+    @property
+    def job_ids(self):
+        """Return a frozenset of the ids of the jobs without results yet."""
+        return frozenset(
+            self._pending.keys() + [w.job_id for w in self._active_workers])
+
+    def add_job(self, job_id, job, key):
+        """Add 'job' to be started once the limits allow.
+
+        Jobs are started in the order that they're added, except that jobs
+        are passed over while their key is at its limit.
+
+        :job_id: a hashable to identify the job, unique amongst 'job_ids'
+        :job: a callable, the result of which must be picklable
+        :key: a hashable to limit the jobs by, e.g. the host they access
+        :returns: None
+
+        """
+        if job_id in self.job_ids:
+            raise ValueError("job id is already in use: {}".format(job_id))
+        self._pending[job_id] = (job, key)
+
+    def poll_results(self, timeout_secs=0):
+        """Return a list of (job_id, result) for the jobs which have finished.
+
+        Pending jobs are started as the limits allow. Jobs which have run for
+        too long are sent SIGTERM, they have a result of None once they exit
+        or are killed at the end of their grace period.
+
+        If no jobs have finished then wait for up to 'timeout_secs' for one
+        to, or until the next job deadline if 'timeout_secs' is None.
+
+        :timeout_secs: the maximum number of seconds to wait, or None
+        :returns: a list of (job_id, result), result is None if the job failed
+
+        """
+        self._start_jobs()
+        if not self._active_workers:
+            return []
+
+        timeout = min(w.secs_until_deadline() for w in self._active_workers)
+        if timeout_secs is not None:
+            timeout = min(timeout, timeout_secs)
+        readable = _select_readable(
+            [w.fileno() for w in self._active_workers], max(timeout, 0))
+
+        results = []
+        for worker in list(self._active_workers):
+            if worker.fileno() in readable:
+                result = worker.receive_result()
+            elif worker.secs_until_deadline() > 0:
+                continue
+            elif not worker.is_terminating:
+                worker.terminate()
+                continue
+            else:
+                result = worker.kill()
+            self._active_workers.remove(worker)
+            self._key_to_num_active[worker.key] -= 1
+            results.append((worker.job_id, result))
+
+        # make use of the workers that we just freed up
+        self._start_jobs()
+
+        return results
+
+    def stop(self):
+        """Stop any running jobs and forget the pending ones.
+
+        Running jobs are sent SIGTERM and given up to 'grace_secs' to exit
+        before they're killed.
+
+        :returns: a sorted list of the ids of the jobs which were running
+
+        """
+        self._pending.clear()
+        stopped_job_ids = sorted(w.job_id for w in self._active_workers)
+
+        for worker in self._active_workers:
+            if not worker.is_terminating:
+                worker.terminate()
+
+        while self._active_workers:
+            timeout = min(
+                w.secs_until_deadline() for w in self._active_workers)
+            readable = _select_readable(
+                [w.fileno() for w in self._active_workers], max(timeout, 0))
+            for worker in list(self._active_workers):
+                if worker.fileno() in readable:
+                    worker.receive_result()
+                elif worker.secs_until_deadline() <= 0:
+                    worker.kill()
+                else:
+                    continue
+                self._active_workers.remove(worker)
+
+        self._key_to_num_active.clear()
+        return stopped_job_ids
+
+    def _start_jobs(self):
+        for job_id, (job, key) in self._pending.items():
+            if len(self._active_workers) >= self._max_workers:
+                break
+            if self._key_to_num_active[key] >= self._max_workers_per_key:
+                continue
+            del self._pending[job_id]
+            self._key_to_num_active[key] += 1
+            self._active_workers.append(
+                _Worker(
+                    job_id, key, job, self._timeout_secs, self._grace_secs))
+
+
+class _Worker(object):
+
+    def __init__(self, job_id, key, job, timeout_secs, grace_secs):
+        self.job_id = job_id
+        self.key = key
+        self._timeout_secs = timeout_secs
+        self._grace_secs = grace_secs
+        self._timer = phlsys_timer.Timer()
+        self._timer.start()
+        self._terminate_timer = None
+
+        self._reader, writer = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_worker_process, args=(job, writer))
+        self._process.start()
+
+        # only the worker should hold the write end, so that we see EOF if it
+        # dies without sending a result
+        writer.close()
+
+    def fileno(self):
+        return self._reader.fileno()
+
+    @property
+    def is_terminating(self):
+        return self._terminate_timer is not None
+
+    def secs_until_deadline(self):
+        if self.is_terminating:
+            return self._grace_secs - self._terminate_timer.duration
+        return self._timeout_secs - self._timer.duration
+
+    def receive_result(self):
+        result = None
+        if not self.is_terminating:
+            try:
+                result = self._reader.recv()
+            except EOFError:
+                pass
+        if result is None:
+            # make sure that nothing the job started outlives it
+            self._signal_group(signal.SIGKILL)
+        self._reader.close()
+        self._process.join()
+        return result
+
+    def terminate(self):
+        self._terminate_timer = phlsys_timer.Timer()
+        self._terminate_timer.start()
+        self._signal_group(signal.SIGTERM)
+
+    def kill(self):
+        self._signal_group(signal.SIGKILL)
+        self._reader.close()
+        self._process.join()
+        return None
+
+    def _signal_group(self, signum):
+        # the worker leads its own process group, so this also signals any
+        # processes that it started
+        try:
+            os.killpg(self._process.pid, signum)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+            # the worker may not have made its process group yet, or it may
+            # have finished already
+            _kill_ignoring_missing(self._process.pid, signum)
+
+
+def _worker_process(job, writer):
+    os.setpgid(0, 0)
+    writer.send(job())
+    writer.close()
+
+
+def _kill_ignoring_missing(pid, signum):
+    try:
+        os.kill(pid, signum)
+    except OSError as e:
+        if e.errno != errno.ESRCH:
+            raise
+
+
+def _select_readable(fd_list, timeout_secs):
+    try:
+        readable, _, _ = select.select(fd_list, [], [], timeout_secs)
+    except select.error as e:
+        # a signal interrupted the wait, let the caller re-check everything
+        if e.args[0] != errno.EINTR:
+            raise
+        readable = []
+    return readable
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,289 @@
+"""Test suite for phlmp_boundedjobs."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] run_jobs yields the correct results for the job indices
+# [ A] run_jobs yields each job exactly once
+# [ B] run_jobs runs no more than 'max_workers' jobs at once
+# [ B] run_jobs runs no more than 'max_workers_per_key' jobs per key at once
+# [ B] run_jobs runs jobs concurrently when the limits allow
+# [ C] run_jobs yields None for jobs which time out
+# [ C] run_jobs kills processes started by jobs which time out
+# [ C] run_jobs doesn't wait for jobs which time out
+# [ D] run_jobs yields None for jobs which raise or die
+# [ E] BoundedJobs.poll_results doesn't wait for running jobs by default
+# [ E] BoundedJobs.job_ids includes pending and running jobs until polled
+# [ E] BoundedJobs.add_job rejects ids which are in use
+# [ E] BoundedJobs.stop kills running jobs and forgets pending ones
+# [ E] BoundedJobs.stop returns the ids of the jobs which were running
+# [ F] jobs which time out are sent SIGTERM before they're killed
+# [ F] jobs which ignore SIGTERM are killed after the grace period
+# [ F] BoundedJobs.stop sends SIGTERM before killing jobs
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Limits
+# [ C] test_C_Timeout
+# [ D] test_D_FailedJobs
+# [ E] test_E_Background
+# [ F] test_F_GracefulStop
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import signal
+import subprocess
+import time
+import unittest
+
+import phlsys_fs
+import phlsys_timer
+
+import phlmp_boundedjobs
+
+
+class _TestJob(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+class _CountingJob(object):
+
+    def __init__(self, key, lock, active_counts, max_counts):
+        self.key = key
+        self.lock = lock
+        self.active_counts = active_counts
+        self.max_counts = max_counts
+
+    def __call__(self):
+        # keep track of the number of jobs active overall, in slot 0, and for
+        # our key, in slot 'key'
+        with self.lock:
+            for slot in (0, self.key):
+                self.active_counts[slot] += 1
+                self.max_counts[slot] = max(
+                    self.max_counts[slot], self.active_counts[slot])
+        time.sleep(0.1)
+        with self.lock:
+            for slot in (0, self.key):
+                self.active_counts[slot] -= 1
+        return self.key
+
+
+class _HangingJob(object):
+
+    def __init__(self, pid_path):
+        self.pid_path = pid_path
+
+    def __call__(self):
+        child = subprocess.Popen(['sleep', '60'])
+        phlsys_fs.write_text_file(self.pid_path, str(child.pid))
+        child.wait()
+        return 'finished'
+
+
+class _TermHandlingJob(object):
+
+    def __init__(self, path, ignore_term=False):
+        self.path = path
+        self.ignore_term = ignore_term
+
+    def __call__(self):
+        def handle_term(signum, frame):
+            phlsys_fs.write_text_file(self.path, 'terminated')
+            if not self.ignore_term:
+                os._exit(1)
+
+        signal.signal(signal.SIGTERM, handle_term)
+        phlsys_fs.write_text_file(self.path, 'started')
+        while True:
+            time.sleep(0.01)
+
+
+class _RaisingJob(object):
+
+    def __call__(self):
+        raise Exception('job failed')
+
+
+class _ExitingJob(object):
+
+    def __call__(self):
+        os._exit(1)
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        job_key_list = [(_TestJob(i * 10), i % 2) for i in xrange(5)]
+        results = list(phlmp_boundedjobs.run_jobs(job_key_list, 2, 1, 60))
+
+        # [ A] run_jobs yields the correct results for the job indices
+        # [ A] run_jobs yields each job exactly once
+        self.assertItemsEqual(
+            [(i, i * 10) for i in xrange(5)],
+            results)
+
+    def test_B_Limits(self):
+        lock = multiprocessing.Lock()
+        active_counts = multiprocessing.Array('i', 3, lock=False)
+        max_counts = multiprocessing.Array('i', 3, lock=False)
+
+        # keys 1 and 2, with more jobs for key 1
+        keys = [1, 1, 1, 1, 2, 2]
+        job_key_list = [
+            (_CountingJob(key, lock, active_counts, max_counts), key)
+            for key in keys
+        ]
+        results = list(phlmp_boundedjobs.run_jobs(job_key_list, 3, 2, 60))
+        self.assertItemsEqual(list(enumerate(keys)), results)
+
+        # [ B] run_jobs runs no more than 'max_workers' jobs at once
+        # [ B] run_jobs runs jobs concurrently when the limits allow
+        self.assertEqual(3, max_counts[0])
+
+        # [ B] run_jobs runs no more than 'max_workers_per_key' jobs per key
+        #      at once
+        self.assertEqual(2, max_counts[1])
+        self.assertLessEqual(max_counts[2], 2)
+
+    def test_C_Timeout(self):
+        with phlsys_fs.chtmpdir_context():
+            pid_path = os.path.abspath('pid')
+            job_key_list = [
+                (_HangingJob(pid_path), 'hang'),
+                (_TestJob('quick'), 'quick'),
+            ]
+
+            timer = phlsys_timer.Timer()
+            timer.start()
+            results = list(phlmp_boundedjobs.run_jobs(job_key_list, 2, 1, 1))
+
+            # [ C] run_jobs doesn't wait for jobs which time out
+            self.assertLess(timer.duration, 30)
+
+            # [ C] run_jobs yields None for jobs which time out
+            self.assertEqual([(1, 'quick'), (0, None)], results)
+
+            # [ C] run_jobs kills processes started by jobs which time out
+            child_pid = int(phlsys_fs.read_text_file(pid_path))
+            self.assertFalse(_is_process_running(child_pid))
+
+    def test_D_FailedJobs(self):
+        job_key_list = [
+            (_RaisingJob(), 'a'),
+            (_ExitingJob(), 'a'),
+            (_TestJob('ok'), 'a'),
+        ]
+
+        # [ D] run_jobs yields None for jobs which raise or die
+        results = list(phlmp_boundedjobs.run_jobs(job_key_list, 1, 1, 60))
+        self.assertEqual([(0, None), (1, None), (2, 'ok')], results)
+
+    def test_E_Background(self):
+        with phlsys_fs.chtmpdir_context():
+            pid_path = os.path.abspath('pid')
+            jobs = phlmp_boundedjobs.BoundedJobs(1, 1, 60)
+            jobs.add_job('hang', _HangingJob(pid_path), 'a')
+            jobs.add_job('quick', _TestJob('quick'), 'a')
+
+            # [ E] BoundedJobs.poll_results doesn't wait for running jobs by
+            #      default
+            timer = phlsys_timer.Timer()
+            timer.start()
+            self.assertEqual([], jobs.poll_results())
+            self.assertLess(timer.duration, 30)
+
+            # [ E] BoundedJobs.job_ids includes pending and running jobs
+            #      until polled
+            self.assertEqual(set(['hang', 'quick']), jobs.job_ids)
+
+            # [ E] BoundedJobs.add_job rejects ids which are in use
+            with self.assertRaises(ValueError):
+                jobs.add_job('quick', _TestJob('again'), 'a')
+
+            # [ E] BoundedJobs.stop kills running jobs and forgets pending
+            #      ones
+            while not os.path.isfile(pid_path):
+                time.sleep(0.01)
+            # [ E] BoundedJobs.stop returns the ids of the jobs which were
+            #      running
+            self.assertEqual(['hang'], jobs.stop())
+            self.assertEqual(frozenset(), jobs.job_ids)
+            child_pid = int(phlsys_fs.read_text_file(pid_path))
+            self.assertFalse(_is_process_running(child_pid))
+
+            jobs.add_job('quick', _TestJob('quick'), 'a')
+            self.assertEqual(
+                [('quick', 'quick')], jobs.poll_results(timeout_secs=None))
+
+    def test_F_GracefulStop(self):
+        with phlsys_fs.chtmpdir_context():
+            job_key_list = [
+                (_TermHandlingJob(os.path.abspath('exits')), 'a'),
+                (_TermHandlingJob(os.path.abspath('ignores'), True), 'b'),
+            ]
+
+            timer = phlsys_timer.Timer()
+            timer.start()
+            results = list(
+                phlmp_boundedjobs.run_jobs(
+                    job_key_list, 2, 1, timeout_secs=1, grace_secs=1))
+
+            # [ F] jobs which time out are sent SIGTERM before they're killed
+            # [ F] jobs which ignore SIGTERM are killed after the grace period
+            self.assertEqual([(0, None), (1, None)], results)
+            self.assertEqual(
+                'terminated', phlsys_fs.read_text_file('exits'))
+            self.assertEqual(
+                'terminated', phlsys_fs.read_text_file('ignores'))
+            self.assertLess(timer.duration, 30)
+
+            # [ F] BoundedJobs.stop sends SIGTERM before killing jobs
+            jobs = phlmp_boundedjobs.BoundedJobs(1, 1, 60, grace_secs=1)
+            jobs.add_job('job', _TermHandlingJob(os.path.abspath('stop')), 'a')
+            jobs.poll_results()
+            while not os.path.isfile('stop'):
+                time.sleep(0.01)
+            self.assertEqual(['job'], jobs.stop())
+            self.assertEqual('terminated', phlsys_fs.read_text_file('stop'))
+
+
+def _is_process_running(pid):
+    # killed processes may linger as zombies until they're reaped, don't
+    # count those as running
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            state = f.read().rsplit(')', 1)[1].split()[0]
+    except IOError:
+        return False
+    return state != 'Z'
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -10,6 +10,14 @@
 #    .cycle_results
 #    .finish_results
 #    .num_active_jobs
+#    .num_skipped_jobs
+#    .active_job_indices
+#   PreforkCyclingPool
+#    .cycle_results
+#    .finish_results
+#    .num_active_jobs
+#    .num_skipped_jobs
+#    .active_job_indices
 #
 # -----------------------------------------------------------------------------
 # (this contents block is generated, edits will be lost)
@@ -19,12 +27,19 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import errno
+import fcntl
 import multiprocessing
 import multiprocessing.queues
 import os
+import select
 
 import phlsys_timer
 
+# Wake up at least this often when waiting for workers, in case a worker has
+# leaked its sentinel to a long-lived child process and we miss its exit.
+_MAX_WAIT_SECS = 1.0
+
 
 class MultiprocessingWorkerFinishError(Exception):
     # Occasionally we see errors of this form after starting workers:
@@ -71,32 +86,37 @@ class CyclingPool(object):
 
     """
 
-    def __init__(self, job_list, max_workers, max_overrunnable):
+    def __init__(
+            self,
+            job_list,
+            max_workers,
+            max_overrunnable,
+            schedule_key=None,
+            is_job_due=None):
         """Create a CyclingPool to cycle over 'job_list'.
 
+        If 'schedule_key' is supplied then it will be called with the index of
+        each job at the start of every cycle, jobs are started in order of the
+        returned keys. Otherwise jobs are started in order of their index.
+
+        If 'is_job_due' is supplied then it will be called with the index of
+        each job at the start of every cycle, jobs for which it returns False
+        will be skipped for that cycle.
+
         :job_list: a list of callables to execute in worker processes
         :max_workers: the maximum number of worker processes to make
         :max_overrunnable: the maximum number of workers to leave behind
+        :schedule_key: a callable taking a job index and returning a sort key
+        :is_job_due: a callable taking a job index and returning a bool
 
         """
         super(CyclingPool, self).__init__()
-
-        if max_workers < 1:
-            raise ValueError(
-                'invalid value for max_workers: {}'.format(max_workers))
-
-        if max_overrunnable < 0:
-            raise ValueError(
-                'invalid value for max_overrunnable: {}'.format(
-                    max_overrunnable))
-
-        if max_overrunnable >= max_workers:
-            raise ValueError(
-                'invalid value for max_overrunnable: {}, should be less '
-                'than max_workers: {}'.format(
-                    max_overrunnable, max_workers))
+        _check_pool_args(max_workers, max_overrunnable)
 
         self._job_list = job_list
+        self._schedule_key = schedule_key
+        self._is_job_due = is_job_due
+        self._num_skipped_jobs = 0
         self._max_workers = max_workers
         self._overunnable_workers = _calc_overrunnable_workers(
             max_workers=max_workers,
@@ -105,7 +125,7 @@ class CyclingPool(object):
         self._pool_list = _PoolList()
         self._active_job_index_set = set()
 
-    def cycle_results(self, overrun_secs):
+    def cycle_results(self, overrun_secs, on_wait=None):
         """Yield the results from a run of all the jobs.
 
         If overrun_secs elapse and max_overrunnable is nonzero then jobs may be
@@ -117,38 +137,58 @@ class CyclingPool(object):
         Jobs which are currently overrunning will not be started again until
         the overrun job has finished.
 
+        If 'on_wait' is supplied then it's called after each wait for events,
+        which is at least every _MAX_WAIT_SECS while waiting. This lets the
+        caller do periodic work while the jobs run.
+
         :overrun_secs: seconds to wait before considering leaving jobs behind
+        :on_wait: a callable taking no arguments, or None
         :yields: an (index, result) tuple
 
         """
 
-        # make a timer out of the overrun_secs and pass to _cycle_results
-        timer = phlsys_timer.Timer()
-        timer.start()
+        overrun_condition, secs_until_overrun = _make_overrun_timer(
+            overrun_secs)
+        for index, result in self._cycle_results(
+                overrun_condition, secs_until_overrun, on_wait):
+            yield index, result
 
-        def overrun_condition():
-            return timer.duration >= overrun_secs
+    def finish_results(self, on_wait=None):
+        """Yield the results from any outstanding jobs, block until done.
 
-        for index, result in self._cycle_results(overrun_condition):
-            yield index, result
+        :on_wait: a callable as for 'cycle_results', or None
+        :yields: an (index, result) tuple
 
-    def finish_results(self):
-        """Yield the results from any outstanding jobs, block until done."""
+        """
         while not self._pool_list.is_yield_finished():
             for index, result in self._overrun_cycle_results():
                 yield index, result
+            if not self._pool_list.is_yield_finished():
+                self._pool_list.wait_for_events(timeout_secs=None)
+                _call_if_not_none(on_wait)
 
     @property
     def num_active_jobs(self):
         """Return the number of jobs not yet yielded."""
         return len(self._active_job_index_set)
 
+    @property
+    def num_skipped_jobs(self):
+        """Return the number of jobs which weren't due in the last cycle."""
+        return self._num_skipped_jobs
+
+    @property
+    def active_job_indices(self):
+        """Return a frozenset of the indices of jobs not yet yielded."""
+        return frozenset(self._active_job_index_set)
+
     def _overrun_cycle_results(self):
         for index, result in self._pool_list.yield_available_results():
             self._active_job_index_set.remove(index)
             yield index, result
 
-    def _cycle_results(self, overrun_condition):
+    def _cycle_results(
+            self, overrun_condition, secs_until_overrun=None, on_wait=None):
 
         # clear up any dead pools and yield results
         for i, res in self._overrun_cycle_results():
@@ -169,6 +209,17 @@ class CyclingPool(object):
             for index, result in self._overrun_cycle_results():
                 yield index, result
 
+            if not should_break:
+                # block until a result arrives, a worker exits or it's time
+                # to consider overrunning; nothing else can change our mind
+                timeout_secs = None
+                num_active = self._pool_list.count_active_workers()
+                if num_active <= self._overunnable_workers:
+                    if secs_until_overrun is not None:
+                        timeout_secs = secs_until_overrun()
+                self._pool_list.wait_for_events(timeout_secs)
+                _call_if_not_none(on_wait)
+
     def _start_new_cycle(self):
 
         active_workers = self._pool_list.count_active_workers()
@@ -179,7 +230,11 @@ class CyclingPool(object):
         # schedule currently inactive jobs in the new pool
         all_job_index_set = set(xrange(len(self._job_list)))
         inactive_job_index_set = all_job_index_set - self._active_job_index_set
-        for i in inactive_job_index_set:
+        due_job_index_list = _filter_due_jobs(
+            inactive_job_index_set, self._is_job_due)
+        self._num_skipped_jobs = (
+            len(inactive_job_index_set) - len(due_job_index_list))
+        for i in sorted(due_job_index_list, key=self._schedule_key):
             pool.add_job_index(i)
             self._active_job_index_set.add(i)
         pool.finish()
@@ -187,6 +242,269 @@ class CyclingPool(object):
         self._pool_list.add_pool(pool)
 
 
+class PreforkCyclingPool(object):
+
+    """Like CyclingPool, except that worker processes live across cycles.
+
+    This saves the cost of forking new workers every cycle and allows the
+    workers to keep their copies of the jobs, including any caches that the
+    jobs build up while running.
+
+    As the workers' copies of the jobs will not reflect changes made to the
+    jobs in the calling process, the jobs must support synchronising state:
+
+      job.make_sync_state(is_warm) is called in the calling process and must
+      return a picklable object to send to the worker along with the job.
+      'is_warm' is True if the receiving worker was the last to run the job,
+      in which case only state changed in the calling process since the job's
+      last results were yielded need be included.
+
+      job.apply_sync_state(state) is called in the worker before the job.
+
+    Workers prefer to run the jobs that they ran last, they will take other
+    jobs if none of their own are near the front of the schedule.
+
+    """
+
+    def __init__(
+            self,
+            job_list,
+            max_workers,
+            max_overrunnable,
+            schedule_key=None,
+            is_job_due=None):
+        """Create a PreforkCyclingPool to cycle over 'job_list'.
+
+        :job_list: a list of callables to execute in worker processes
+        :max_workers: the maximum number of worker processes to make
+        :max_overrunnable: the maximum number of workers to leave behind
+        :schedule_key: a callable taking a job index and returning a sort key
+        :is_job_due: a callable taking a job index and returning a bool
+
+        """
+        super(PreforkCyclingPool, self).__init__()
+        _check_pool_args(max_workers, max_overrunnable)
+
+        self._job_list = job_list
+        self._schedule_key = schedule_key
+        self._is_job_due = is_job_due
+        self._num_skipped_jobs = 0
+        self._num_workers = min(max_workers, len(job_list))
+        self._overunnable_workers = _calc_overrunnable_workers(
+            max_workers=max_workers,
+            max_overrunnable=max_overrunnable,
+            num_jobs=len(job_list))
+        self._worker_list = []
+        self._job_index_to_owner = {}
+        self._pending_job_index_list = []
+        self._active_job_index_set = set()
+
+    def cycle_results(self, overrun_secs, on_wait=None):
+        """Yield the results from a run of all the jobs.
+
+        Behaves as CyclingPool.cycle_results().
+
+        :overrun_secs: seconds to wait before considering leaving jobs behind
+        :on_wait: a callable as for CyclingPool.cycle_results(), or None
+        :yields: an (index, result) tuple
+
+        """
+        overrun_condition, secs_until_overrun = _make_overrun_timer(
+            overrun_secs)
+        for index, result in self._cycle_results(
+                overrun_condition, secs_until_overrun, on_wait):
+            yield index, result
+
+    def finish_results(self, on_wait=None):
+        """Yield the results from any outstanding jobs, block until done.
+
+        The worker processes are stopped once there are no outstanding jobs,
+        they will be started again if there is another cycle.
+
+        :on_wait: a callable as for CyclingPool.cycle_results(), or None
+        :yields: an (index, result) tuple
+
+        """
+        while self._active_job_index_set:
+            for index, result in self._collect_results():
+                yield index, result
+            if self._active_job_index_set:
+                self._wait_for_events(timeout_secs=None)
+                _call_if_not_none(on_wait)
+
+        for worker in self._worker_list:
+            worker.stop()
+        self._worker_list = []
+        self._job_index_to_owner = {}
+
+    @property
+    def num_active_jobs(self):
+        """Return the number of jobs not yet yielded."""
+        return len(self._active_job_index_set)
+
+    @property
+    def num_skipped_jobs(self):
+        """Return the number of jobs which weren't due in the last cycle."""
+        return self._num_skipped_jobs
+
+    @property
+    def active_job_indices(self):
+        """Return a frozenset of the indices of jobs not yet yielded."""
+        return frozenset(self._active_job_index_set)
+
+    def _cycle_results(
+            self, overrun_condition, secs_until_overrun=None, on_wait=None):
+
+        # yield any results from overrun jobs
+        for index, result in self._collect_results():
+            yield index, result
+
+        self._start_new_cycle()
+
+        # wait for results, overrun if half our workers are available
+        should_break = False
+        while not should_break:
+
+            self._dispatch_pending_jobs()
+
+            should_break = _calc_should_overrun(
+                num_active=self._count_active_workers(),
+                num_overrunnable=self._overunnable_workers,
+                condition=overrun_condition,
+                is_finished=not self._active_job_index_set)
+
+            for index, result in self._collect_results():
+                yield index, result
+
+            if not should_break and self._active_job_index_set:
+                timeout_secs = None
+                num_active = self._count_active_workers()
+                if num_active <= self._overunnable_workers:
+                    if secs_until_overrun is not None:
+                        timeout_secs = secs_until_overrun()
+                self._wait_for_events(timeout_secs)
+                _call_if_not_none(on_wait)
+
+    def _start_new_cycle(self):
+        if not self._worker_list:
+            self._worker_list = [
+                _PreforkWorker(self._job_list)
+                for _ in xrange(self._num_workers)
+            ]
+
+        # schedule currently inactive jobs
+        inactive_job_index_list = [
+            i for i in xrange(len(self._job_list))
+            if i not in self._active_job_index_set
+        ]
+        due_job_index_list = _filter_due_jobs(
+            inactive_job_index_list, self._is_job_due)
+        self._num_skipped_jobs = (
+            len(inactive_job_index_list) - len(due_job_index_list))
+        self._pending_job_index_list.extend(due_job_index_list)
+        self._active_job_index_set.update(due_job_index_list)
+        self._pending_job_index_list.sort(key=self._schedule_key)
+
+    def _count_active_workers(self):
+        # pending jobs count as needing a worker each, so that we don't
+        # overrun while there are jobs which haven't been started yet
+        num_busy = sum(1 for w in self._worker_list if w.is_busy)
+        return num_busy + len(self._pending_job_index_list)
+
+    def _dispatch_pending_jobs(self):
+        for worker in self._worker_list:
+            if not self._pending_job_index_list:
+                break
+            if worker.is_busy:
+                continue
+            job_index = self._pop_pending_job_index_for(worker)
+            is_warm = self._job_index_to_owner.get(job_index) is worker
+            job = self._job_list[job_index]
+            worker.start_job(job_index, job.make_sync_state(is_warm))
+            self._job_index_to_owner[job_index] = worker
+
+    def _pop_pending_job_index_for(self, worker):
+        # only look for the worker's own jobs near the front of the schedule,
+        # otherwise affinity could starve jobs that should be started first
+        pending = self._pending_job_index_list
+        for i, job_index in enumerate(pending[:len(self._worker_list)]):
+            if self._job_index_to_owner.get(job_index) is worker:
+                return pending.pop(i)
+        return pending.pop(0)
+
+    def _collect_results(self):
+        for i, worker in enumerate(self._worker_list):
+            for index, result in worker.yield_available_results():
+                self._active_job_index_set.remove(index)
+                yield index, result
+
+            if worker.is_finished():
+                # the worker died unexpectedly, forget about its job so that
+                # it will be started again next cycle and replace the worker
+                lost_job_index = worker.join()
+                if lost_job_index is not None:
+                    self._active_job_index_set.remove(lost_job_index)
+                    del self._job_index_to_owner[lost_job_index]
+                self._worker_list[i] = _PreforkWorker(self._job_list)
+
+        self._dispatch_pending_jobs()
+
+    def _wait_for_events(self, timeout_secs):
+        if timeout_secs is None or timeout_secs > _MAX_WAIT_SECS:
+            timeout_secs = _MAX_WAIT_SECS
+
+        fd_list = []
+        for worker in self._worker_list:
+            fd_list.extend(worker.get_event_fds())
+
+        if fd_list:
+            _select_readable(fd_list, timeout_secs)
+
+
+def _check_pool_args(max_workers, max_overrunnable):
+
+    if max_workers < 1:
+        raise ValueError(
+            'invalid value for max_workers: {}'.format(max_workers))
+
+    if max_overrunnable < 0:
+        raise ValueError(
+            'invalid value for max_overrunnable: {}'.format(
+                max_overrunnable))
+
+    if max_overrunnable >= max_workers:
+        raise ValueError(
+            'invalid value for max_overrunnable: {}, should be less '
+            'than max_workers: {}'.format(
+                max_overrunnable, max_workers))
+
+
+def _call_if_not_none(func):
+    if func is not None:
+        func()
+
+
+def _filter_due_jobs(job_index_iterable, is_job_due):
+    if is_job_due is None:
+        return list(job_index_iterable)
+    return [i for i in job_index_iterable if is_job_due(i)]
+
+
+def _make_overrun_timer(overrun_secs):
+
+    # make a timer out of the overrun_secs, return functions for testing it
+    timer = phlsys_timer.Timer()
+    timer.start()
+
+    def overrun_condition():
+        return timer.duration >= overrun_secs
+
+    def secs_until_overrun():
+        return max(0.0, overrun_secs - timer.duration)
+
+    return overrun_condition, secs_until_overrun
+
+
 def _calc_overrunnable_workers(max_workers, max_overrunnable, num_jobs):
     return min(
         max_workers - 1,
@@ -233,6 +551,27 @@ class _PoolList(object):
     def is_yield_finished(self):
         return not self._pool_list
 
+    def wait_for_events(self, timeout_secs):
+        """Block until there may be results or finished workers to collect.
+
+        Return early if 'timeout_secs' elapse, never wait longer than
+        _MAX_WAIT_SECS. Note that spurious wakeups are possible, callers must
+        re-check their conditions.
+
+        :timeout_secs: the maximum number of seconds to wait, or None
+        :returns: None
+
+        """
+        if timeout_secs is None or timeout_secs > _MAX_WAIT_SECS:
+            timeout_secs = _MAX_WAIT_SECS
+
+        fd_list = []
+        for pool in self._pool_list:
+            fd_list.extend(pool.get_event_fds())
+
+        if fd_list:
+            _select_readable(fd_list, timeout_secs)
+
 
 class _Pool(object):
 
@@ -247,53 +586,100 @@ class _Pool(object):
         # multiprocessing.queues is a thing.
         mp = multiprocessing
         self._job_index_queue = mp.queues.SimpleQueue()
-        self._results_queue = mp.queues.SimpleQueue()
 
-        # create the workers
-        self._worker_list = []
+        # use a bare pipe for results so that we can wait on it with 'select'
+        # alongside the worker sentinels, the lock serialises the writers
+        self._results_reader, results_writer = mp.Pipe(duplex=False)
+        self._results_sender = _LockedSender(results_writer, mp.Lock())
+
+        # create the workers, each mapped to the read end of its sentinel
+        self._worker_to_sentinel = {}
         num_workers = min(max_workers, len(job_list))
         for _ in xrange(num_workers):
-            worker = _start_worker_process(
-                job_list, self._job_index_queue, self._results_queue)
-            self._worker_list.append(worker)
+            worker, sentinel = _start_worker_process(
+                _worker_process,
+                (job_list, self._job_index_queue, self._results_sender))
+            self._worker_to_sentinel[worker] = sentinel
 
     def add_job_index(self, job_index):
         self._job_index_queue.put(job_index)
 
     def finish(self):
         # the worker processes will stop when they process 'None'
-        for _ in xrange(len(self._worker_list)):
+        for _ in xrange(len(self._worker_to_sentinel)):
             self._job_index_queue.put(None)
 
     def join_finished_workers(self):
 
-        # join all finished workers and remove from list
+        # join all finished workers and remove from list, a worker is finished
+        # once the write end of its sentinel is closed by the worker exiting
+        closed_sentinels = set(
+            _select_readable(self._worker_to_sentinel.values(), 0))
         finished_workers = []
-        for worker in self._worker_list:
-            if not worker.is_alive():
+        for worker, sentinel in self._worker_to_sentinel.iteritems():
+            if sentinel in closed_sentinels or not worker.is_alive():
                 worker.join()
+                os.close(sentinel)
                 finished_workers.append(worker)
         for worker in finished_workers:
-            self._worker_list.remove(worker)
+            del self._worker_to_sentinel[worker]
 
     def yield_available_results(self):
-        while not self._results_queue.empty():
-            yield self._results_queue.get()
+        while self._results_reader.poll():
+            yield self._results_reader.recv()
+
+    def get_event_fds(self):
+        fds = [self._results_reader.fileno()]
+        fds.extend(self._worker_to_sentinel.values())
+        return fds
 
     def count_active_workers(self):
-        return len(self._worker_list)
+        return len(self._worker_to_sentinel)
 
     def is_finished(self):
-        return not self._worker_list
+        return not self._worker_to_sentinel
+
+
+class _LockedSender(object):
+
+    def __init__(self, connection, lock):
+        self._connection = connection
+        self._lock = lock
+
+    def send(self, obj):
+        with self._lock:
+            self._connection.send(obj)
+
+
+def _select_readable(fd_list, timeout_secs):
+    try:
+        readable, _, _ = select.select(fd_list, [], [], timeout_secs)
+    except select.error as e:
+        # a signal interrupted the wait, let the caller re-check everything
+        if e.args[0] != errno.EINTR:
+            raise
+        readable = []
+    return readable
+
+
+def _make_sentinel_pipe():
+    # The worker inherits the write end and holds it open until it exits, we
+    # keep the read end and observe EOF when that happens. Set 'close on exec'
+    # on the write end so that git processes spawned by the worker won't keep
+    # the sentinel alive after the worker itself has gone.
+    read_fd, write_fd = os.pipe()
+    flags = fcntl.fcntl(write_fd, fcntl.F_GETFD)
+    fcntl.fcntl(write_fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+    return read_fd, write_fd
 
 
-def _start_worker_process(job_list, work_queue, results_queue):
+def _start_worker_process(target, args, daemon=False):
 
-    worker = multiprocessing.Process(
-        target=_worker_process,
-        args=(job_list, work_queue, results_queue))
+    worker = multiprocessing.Process(target=target, args=args)
+    worker.daemon = daemon
 
     pid = os.getpid()
+    sentinel, sentinel_write_fd = _make_sentinel_pipe()
 
     try:
         worker.start()
@@ -307,18 +693,91 @@ def _start_worker_process(job_list, work_queue, results_queue):
             raise MultiprocessingWorkerFinishError(
                 'Worker with pid {} oddly failed to finish.'.format(
                     current_pid))
+    finally:
+        if pid == os.getpid():
+            # only the worker should hold the write end from now on
+            os.close(sentinel_write_fd)
 
-    return worker
+    return worker, sentinel
 
 
-def _worker_process(job_list, work_queue, results_queue):
+def _worker_process(job_list, work_queue, results_sender):
     while True:
         job_index = work_queue.get()
         if job_index is None:
             break
         job = job_list[job_index]
         results = job()
-        results_queue.put((job_index, results))
+        results_sender.send((job_index, results))
+
+
+class _PreforkWorker(object):
+
+    def __init__(self, job_list):
+        super(_PreforkWorker, self).__init__()
+        self._connection, worker_connection = multiprocessing.Pipe()
+
+        # make the worker a daemon so that it won't block the calling process
+        # from exiting if 'finish_results' is never called
+        self._process, self._sentinel = _start_worker_process(
+            _prefork_worker_process,
+            (job_list, worker_connection),
+            daemon=True)
+        worker_connection.close()
+        self._job_index = None
+
+    @property
+    def is_busy(self):
+        return self._job_index is not None
+
+    def start_job(self, job_index, sync_state):
+        assert not self.is_busy
+        self._connection.send((job_index, sync_state))
+        self._job_index = job_index
+
+    def yield_available_results(self):
+        if self.is_busy and self._connection.poll():
+            try:
+                result = self._connection.recv()
+            except EOFError:
+                # the worker died, 'is_finished' will report this
+                return
+            self._job_index = None
+            yield result
+
+    def get_event_fds(self):
+        return [self._connection.fileno(), self._sentinel]
+
+    def is_finished(self):
+        return bool(_select_readable([self._sentinel], 0))
+
+    def join(self):
+        """Join the finished worker, return the index of any unfinished job."""
+        self._process.join()
+        os.close(self._sentinel)
+        self._connection.close()
+        return self._job_index
+
+    def stop(self):
+        assert not self.is_busy
+        self._connection.send(None)
+        self.join()
+
+
+def _prefork_worker_process(job_list, connection):
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            # the calling process has gone away
+            break
+        if message is None:
+            break
+        job_index, sync_state = message
+        job = job_list[job_index]
+        job.apply_sync_state(sync_state)
+        results = job()
+        connection.send((job_index, results))
 
 
 # -----------------------------------------------------------------------------
@@ -36,6 +36,27 @@
 # [ H] CyclingPool processes all jobs at least once when overrunning
 # [ H] CyclingPool does not duplicate overrun jobs
 # [ H] CyclingPool reports active overrunning jobs
+# [ I] CyclingPool doesn't busy-wait while jobs are running
+# [ I] CyclingPool yields results before slow jobs finish
+# [ I] CyclingPool waits no longer than overrun_secs to overrun
+# [ J] PreforkCyclingPool returns correct results for the job indices
+# [ J] PreforkCyclingPool uses synced state of jobs in each cycle
+# [ J] PreforkCyclingPool keeps jobs in the same worker when possible
+# [ J] PreforkCyclingPool sends only warm state to the owning worker
+# [ J] PreforkCyclingPool reuses worker processes across cycles
+# [ K] PreforkCyclingPool reports active jobs when blocked jobs overrun
+# [ K] PreforkCyclingPool finishes all overrun jobs
+# [ K] PreforkCyclingPool reports no active jobs after 'finish_results'
+# [ L] CyclingPool starts jobs in index order by default
+# [ L] CyclingPool starts jobs in order of 'schedule_key'
+# [ L] PreforkCyclingPool starts jobs in index order by default
+# [ L] PreforkCyclingPool starts jobs in order of 'schedule_key'
+# [ M] CyclingPool skips jobs which aren't due
+# [ M] CyclingPool reports the number of skipped jobs
+# [ M] PreforkCyclingPool skips jobs which aren't due
+# [ M] PreforkCyclingPool reports the number of skipped jobs
+# [ N] CyclingPool calls 'on_wait' while waiting for jobs
+# [ N] PreforkCyclingPool calls 'on_wait' while waiting for jobs
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] test_A_pool_breathing
@@ -46,6 +67,12 @@
 # [ F] test_F_can_overrun
 # [ G] test_G_can_cycle
 # [ H] test_H_can_overrun_cycle
+# [ I] test_I_waits_for_events
+# [ J] test_J_prefork_can_cycle
+# [ K] test_K_prefork_can_overrun
+# [ L] test_L_schedule_key
+# [ M] test_M_is_job_due
+# [ N] test_N_on_wait
 # =============================================================================
 
 from __future__ import absolute_import
@@ -54,6 +81,8 @@ from __future__ import print_function
 
 import collections
 import multiprocessing
+import os
+import time
 import unittest
 
 import phlmp_cyclingpool
@@ -79,6 +108,62 @@ class _LockedJob(object):
             return self.value
 
 
+class _SyncJob(object):
+
+    def __init__(self, value):
+        self.value = value
+        self.worker_state = None
+
+    def make_sync_state(self, is_warm):
+        return (self.value, is_warm)
+
+    def apply_sync_state(self, state):
+        self.value, is_warm = state
+        if not is_warm:
+            self.worker_state = os.getpid()
+
+    def __call__(self):
+        # report back the value and the pid of the worker that last received
+        # cold state, this should always be the current worker
+        return self.value, self.worker_state, os.getpid()
+
+
+class _LockedSyncJob(_SyncJob):
+
+    def __init__(self, value, lock):
+        super(_LockedSyncJob, self).__init__(value)
+        self.lock = lock
+
+    def __call__(self):
+        with self.lock:
+            return super(_LockedSyncJob, self).__call__()
+
+
+class _SleepJob(object):
+
+    def __init__(self, value, sleep_secs):
+        self.value = value
+        self.sleep_secs = sleep_secs
+
+    def __call__(self):
+        time.sleep(self.sleep_secs)
+        return self.value
+
+
+class _SyncSleepJob(_SleepJob):
+
+    def make_sync_state(self, is_warm):
+        return None
+
+    def apply_sync_state(self, state):
+        pass
+
+
+def _cpu_secs():
+    times = os.times()
+    return times[0] + times[1]
+
+
 def _false_condition():
     return False
 
@@ -400,6 +485,230 @@ class Test(unittest.TestCase):
         for i in block_input_list:
             self.assertTrue(job_counter[i] <= i + 1)
 
+    def test_I_waits_for_events(self):
+
+        max_workers = 2
+        max_overrunnable = 1
+        slow_secs = 1.0
+        job_list = [_SleepJob(0, slow_secs), _SleepJob(1, 0)]
+        pool = phlmp_cyclingpool.CyclingPool(
+            job_list, max_workers, max_overrunnable)
+
+        start_cpu_secs = _cpu_secs()
+        start_secs = time.time()
+        result_secs = {}
+        for index, _ in pool._cycle_results(_false_condition):
+            result_secs[index] = time.time() - start_secs
+        cpu_secs = _cpu_secs() - start_cpu_secs
+
+        # [ I] CyclingPool doesn't busy-wait while jobs are running
+        self.assertLess(cpu_secs, slow_secs / 2)
+
+        # [ I] CyclingPool yields results before slow jobs finish
+        self.assertLess(result_secs[1], slow_secs)
+        self.assertGreaterEqual(result_secs[0], slow_secs)
+
+        # [ I] CyclingPool waits no longer than overrun_secs to overrun
+        overrun_secs = 0.1
+        start_secs = time.time()
+        for index, _ in pool.cycle_results(overrun_secs=overrun_secs):
+            self.assertEqual(index, 1)
+        self.assertLess(time.time() - start_secs, slow_secs)
+        self.assertEqual(pool.num_active_jobs, 1)
+        for _ in pool.finish_results():
+            pass
+        self.assertEqual(pool.num_active_jobs, 0)
+
+    def test_J_prefork_can_cycle(self):
+
+        num_loops = 3
+        num_jobs = 20
+        max_workers = 4
+        job_list = [_SyncJob(i) for i in xrange(num_jobs)]
+        pool = phlmp_cyclingpool.PreforkCyclingPool(
+            job_list, max_workers, max_workers // 2)
+
+        worker_pids = set()
+        for i in xrange(num_loops):
+            loop_offset = i * num_jobs
+            result_list = []
+            for index, result in pool._cycle_results(_false_condition):
+                value, cold_pid, pid = result
+
+                # [ J] PreforkCyclingPool returns correct results for the job
+                #      indices
+                # [ J] PreforkCyclingPool uses synced state of jobs in each
+                #      cycle
+                self.assertEqual(index + loop_offset, value)
+
+                # [ J] PreforkCyclingPool sends only warm state to the owning
+                #      worker
+                self.assertEqual(cold_pid, pid)
+
+                worker_pids.add(pid)
+                result_list.append(value)
+
+            self.assertSetEqual(
+                set(result_list),
+                set(xrange(loop_offset, loop_offset + num_jobs)))
+
+            for job in job_list:
+                job.value += num_jobs
+
+        # [ J] PreforkCyclingPool reuses worker processes across cycles
+        self.assertEqual(len(worker_pids), max_workers)
+
+        # [ J] PreforkCyclingPool keeps jobs in the same worker when possible
+        # note that idle workers will take jobs from busy ones, so we can only
+        # expect that most of the jobs stay put
+        result_pids = {}
+        for _ in xrange(num_loops):
+            for index, result in pool._cycle_results(_false_condition):
+                result_pids.setdefault(index, set()).add(result[2])
+        self.assertLess(
+            sum(len(pids) for pids in result_pids.itervalues()),
+            2 * num_jobs)
+
+        for _ in pool.finish_results():
+            pass
+        self.assertEqual(pool.num_active_jobs, 0)
+
+    def test_K_prefork_can_overrun(self):
+
+        lock = multiprocessing.Lock()
+
+        max_workers = 10
+        max_overrunnable = max_workers // 2
+        input_list = list(xrange(max_workers))
+        block_input_list = input_list[:max_overrunnable]
+        normal_input_list = input_list[max_overrunnable:]
+
+        job_list = [_LockedSyncJob(i, lock) for i in block_input_list]
+        job_list += [_SyncJob(i) for i in normal_input_list]
+
+        result_list = []
+        pool = phlmp_cyclingpool.PreforkCyclingPool(
+            job_list, max_workers, max_overrunnable)
+
+        with lock:
+            for index, result in pool._cycle_results(_true_condition):
+                self.assertEqual(index, result[0])
+                result_list.append(index)
+
+            # [ K] PreforkCyclingPool reports active jobs when blocked jobs
+            #      overrun
+            self.assertEqual(pool.num_active_jobs, max_overrunnable)
+
+        self.assertSetEqual(set(result_list), set(normal_input_list))
+
+        for index, result in pool.finish_results():
+            self.assertEqual(index, result[0])
+            result_list.append(index)
+
+        # [ K] PreforkCyclingPool reports no active jobs after 'finish_results'
+        self.assertEqual(pool.num_active_jobs, 0)
+
+        # [ K] PreforkCyclingPool finishes all overrun jobs
+        self.assertSetEqual(set(result_list), set(input_list))
+
+    def test_L_schedule_key(self):
+
+        num_jobs = 10
+        input_list = list(xrange(num_jobs))
+
+        def reverse_key(index):
+            return -index
+
+        for pool_type in (
+                phlmp_cyclingpool.CyclingPool,
+                phlmp_cyclingpool.PreforkCyclingPool):
+
+            # a single worker will process the jobs in the order they are
+            # scheduled, so we can observe the schedule from the results
+            job_list = [_SyncJob(i) for i in input_list]
+            pool = pool_type(job_list, 1, 0)
+            result_list = [i for i, _ in pool._cycle_results(_false_condition)]
+
+            # [ L] CyclingPool starts jobs in index order by default
+            # [ L] PreforkCyclingPool starts jobs in index order by default
+            self.assertEqual(result_list, input_list)
+            for _ in pool.finish_results():
+                pass
+
+            pool = pool_type(job_list, 1, 0, schedule_key=reverse_key)
+            result_list = [i for i, _ in pool._cycle_results(_false_condition)]
+
+            # [ L] CyclingPool starts jobs in order of 'schedule_key'
+            # [ L] PreforkCyclingPool starts jobs in order of 'schedule_key'
+            self.assertEqual(result_list, list(reversed(input_list)))
+
+            for _ in pool.finish_results():
+                pass
+
+    def test_M_is_job_due(self):
+
+        num_jobs = 10
+        input_list = list(xrange(num_jobs))
+        due_list = input_list[::2]
+
+        def is_job_due(index):
+            return index in due_list
+
+        for pool_type in (
+                phlmp_cyclingpool.CyclingPool,
+                phlmp_cyclingpool.PreforkCyclingPool):
+
+            job_list = [_SyncJob(i) for i in input_list]
+            pool = pool_type(job_list, 2, 1, is_job_due=is_job_due)
+            self.assertEqual(pool.num_skipped_jobs, 0)
+
+            for _ in xrange(2):
+                result_list = [
+                    i for i, _ in pool._cycle_results(_false_condition)
+                ]
+
+                # [ M] CyclingPool skips jobs which aren't due
+                # [ M] PreforkCyclingPool skips jobs which aren't due
+                self.assertSetEqual(set(result_list), set(due_list))
+
+                # [ M] CyclingPool reports the number of skipped jobs
+                # [ M] PreforkCyclingPool reports the number of skipped jobs
+                self.assertEqual(
+                    pool.num_skipped_jobs, num_jobs - len(due_list))
+
+            for _ in pool.finish_results():
+                pass
+
+    def test_N_on_wait(self):
+
+        slow_secs = 1.5
+        for pool_type in (
+                phlmp_cyclingpool.CyclingPool,
+                phlmp_cyclingpool.PreforkCyclingPool):
+            job_list = [_SyncSleepJob(0, slow_secs), _SyncSleepJob(1, 0)]
+            pool = pool_type(job_list, 2, 1)
+            wait_times = []
+
+            def on_wait():
+                wait_times.append(time.time())
+
+            # [ N] CyclingPool calls 'on_wait' while waiting for jobs
+            # [ N] PreforkCyclingPool calls 'on_wait' while waiting for jobs
+            results = list(pool.cycle_results(
+                overrun_secs=60, on_wait=on_wait))
+            self.assertItemsEqual([(0, 0), (1, 1)], results)
+            self.assertTrue(wait_times)
+
+            del wait_times[:]
+            for _ in pool.cycle_results(overrun_secs=0, on_wait=on_wait):
+                pass
+            if pool.num_active_jobs:
+                results = list(pool.finish_results(on_wait=on_wait))
+                self.assertIn((0, 0), results)
+                self.assertTrue(wait_times)
+            else:
+                list(pool.finish_results())
+
     def _loop_jobs(
             self, max_workers, num_loops, locks, max_overrunnable, job_list):
 
@@ -0,0 +1,254 @@
+"""Limit the concurrency and rate of calls made by several processes.
+
+Processes which call the same server, e.g. as the same user, can share a
+governor by using the same directory. The processes needn't be related to
+each other, so separate tools can share a governor if they agree on the
+directory, e.g. by using 'make_default'.
+
+The number of concurrent calls is limited by a set of lock files, each call
+holds a lock on one of them for its duration. The locks are released by the
+operating system if a process dies, so turns can't be lost.
+
+The rate of calls is limited by a token bucket, which is kept in a file. Each
+call takes a token from the bucket, and governors with a rate refill it at
+that rate. Governors without a rate still take tokens, so their calls count
+against the rate of the others, but they don't wait for them.
+
+Callers wait their turn in a queue, serialised by another lock file. Only
+the caller at the head of the queue polls for a free slot and a token, the
+others block on the queue lock, so that a steady stream of callers can't
+starve an unlucky one.
+
+The directory used by 'make_default' is in a predictable place in the shared
+temporary directory, so it's only used if it's private to the current user.
+
+Usage example:
+
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     governor = Governor('governor', max_concurrent=2)
+    ...     with governor.call_context() as wait_secs:
+    ...         wait_secs < 1
+    True
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_callgovernor
+#
+# Public Classes:
+#   InsecureDirectoryError
+#   Governor
+#    .max_concurrent
+#    .call_context
+#
+# Public Functions:
+#   make_default
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import time
+
+import phlsys_fs
+import phlsys_timer
+
+_QUEUE_LOCK = 'queue.lock'
+_BUCKET = 'bucket.json'
+_SLOT_FORMAT = 'slot-{}.lock'
+
+# poll for free slots at this interval to begin with, backing off to the max
+_MIN_POLL_SECS = 0.005
+_MAX_POLL_SECS = 0.05
+
+
+class InsecureDirectoryError(Exception):
+    pass
+
+
+class Governor(object):
+
+    def __init__(
+            self, path, max_concurrent, max_calls_per_sec=None, burst=None):
+        """Govern calls with the state in directory 'path'.
+
+        :path: the string path of the directory to share between processes
+        :max_concurrent: the maximum number of calls in progress at once
+        :max_calls_per_sec: the rate to refill the bucket at, None for none
+        :burst: the capacity of the bucket, one second's worth by default
+
+        """
+        if max_concurrent < 1:
+            raise ValueError(
+                "'max_concurrent' must be at least 1, got {}".format(
+                    max_concurrent))
+        if max_calls_per_sec is not None and max_calls_per_sec <= 0:
+            raise ValueError(
+                "'max_calls_per_sec' must be positive, got {}".format(
+                    max_calls_per_sec))
+
+        self._path = os.path.abspath(path)
+        self._max_concurrent = max_concurrent
+        self._rate = max_calls_per_sec
+        self._burst = burst
+        if self._burst is None and self._rate is not None:
+            self._burst = max(1.0, self._rate)
+
+    @property
+    def max_concurrent(self):
+        return self._max_concurrent
+
+    @contextlib.contextmanager
+    def call_context(self):
+        """Wait for a turn to make a call, hold the turn for the context.
+
+        :returns: a context manager which yields the float seconds waited
+
+        """
+        timer = phlsys_timer.Timer()
+        timer.start()
+
+        phlsys_fs.ensure_dir(self._path)
+        queue_lock_path = os.path.join(self._path, _QUEUE_LOCK)
+        with phlsys_fs.write_file_lock_context(queue_lock_path):
+            slot_fd = self._acquire_slot()
+            try:
+                self._take_token()
+            except Exception:
+                os.close(slot_fd)
+                raise
+
+        try:
+            yield timer.duration
+        finally:
+            # closing the file releases the lock on it
+            os.close(slot_fd)
+
+    def _acquire_slot(self):
+        poll_secs = _MIN_POLL_SECS
+        while True:
+            for i in xrange(self._max_concurrent):
+                slot_path = os.path.join(self._path, _SLOT_FORMAT.format(i))
+                fd = os.open(slot_path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except IOError as e:
+                    os.close(fd)
+                    if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                        raise
+                else:
+                    return fd
+            time.sleep(poll_secs)
+            poll_secs = min(poll_secs * 2, _MAX_POLL_SECS)
+
+    def _take_token(self):
+        bucket_path = os.path.join(self._path, _BUCKET)
+        try:
+            bucket = json.loads(phlsys_fs.read_text_file(bucket_path))
+            tokens = float(bucket['tokens'])
+            last_secs = float(bucket['time'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            # start with a full bucket if there isn't a sensible one
+            tokens = None
+            last_secs = None
+
+        now = time.time()
+        if self._rate is None:
+            if tokens is None:
+                # nobody is limiting the rate, there's nothing to count
+                return
+        else:
+            if tokens is None:
+                tokens = self._burst
+            else:
+                # governors without a rate may have run up a debt, don't let
+                # it grow beyond one bucket
+                elapsed_secs = max(0.0, now - last_secs)
+                tokens = max(-self._burst, tokens)
+                tokens = min(self._burst, tokens + elapsed_secs * self._rate)
+
+            if tokens < 1:
+                wait_secs = (1 - tokens) / self._rate
+                time.sleep(wait_secs)
+                now += wait_secs
+                tokens = 1.0
+
+            last_secs = now
+
+        tokens -= 1
+
+        # write atomically so that a process dying part way through can't
+        # leave a damaged bucket, which would be taken to be full
+        phlsys_fs.write_text_file_atomic(
+            bucket_path, json.dumps({'tokens': tokens, 'time': last_secs}))
+
+
+def make_default(key, max_concurrent, max_calls_per_sec=None, burst=None):
+    """Return a Governor shared by all the users' processes with 'key'.
+
+    :key: the string which identifies what is governed, e.g. a server
+    :max_concurrent: the maximum number of calls in progress at once
+    :max_calls_per_sec: the rate to refill the bucket at, None for none
+    :burst: the capacity of the bucket, one second's worth by default
+    :returns: a Governor
+
+    """
+    user_path = os.path.join(
+        tempfile.gettempdir(),
+        'phlsys_callgovernor-{}'.format(os.getuid()))
+    _ensure_private_dir(user_path)
+    path = os.path.join(user_path, hashlib.sha1(key).hexdigest()[:16])
+    return Governor(path, max_concurrent, max_calls_per_sec, burst)
+
+
+def _ensure_private_dir(path):
+    # anybody may create a directory at a predictable path in the shared
+    # temporary directory before we do, don't trust it unless it's ours
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    path_stat = os.lstat(path)
+    if not stat.S_ISDIR(path_stat.st_mode):
+        raise InsecureDirectoryError(
+            "'{}' is not a directory".format(path))
+    if path_stat.st_uid != os.getuid():
+        raise InsecureDirectoryError(
+            "'{}' is owned by uid {}, not {}".format(
+                path, path_stat.st_uid, os.getuid()))
+
+    # it's ours, so we can make sure that nobody else can use it
+    if stat.S_IMODE(path_stat.st_mode) != 0o700:
+        os.chmod(path, 0o700)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,223 @@
+"""Test suite for phlsys_callgovernor."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] calls within the limits don't wait
+# [ A] calls wait for a turn when the concurrency limit is reached
+# [ A] the time waited is reported
+# [ B] no more than the concurrency limit of processes call at once
+# [ C] calls wait for tokens when the rate limit is reached
+# [ C] calls of governors without a rate count against the rate of others
+# [ D] turns held by processes which die are released
+# [ E] invalid limits are rejected
+# [ F] make_default creates its directory private to the user
+# [ F] make_default makes an existing directory of the user's private
+# [ F] make_default rejects a directory which isn't the user's
+# [ F] the bucket is written atomically
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_ConcurrencyAcrossProcesses
+# [ C] test_C_Rate
+# [ D] test_D_DeadProcess
+# [ E] test_E_InvalidLimits
+# [ F] test_F_DefaultDirectory
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import multiprocessing
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+import phlsys_fs
+
+import phlsys_callgovernor
+
+
+def _call_and_count(governor, active_dir, log_path):
+    with governor.call_context():
+        marker = os.path.join(active_dir, str(os.getpid()))
+        phlsys_fs.write_text_file(marker, '')
+        num_active = len(os.listdir(active_dir))
+        time.sleep(0.1)
+        os.remove(marker)
+    with open(log_path, 'a') as f:
+        f.write('{}\n'.format(num_active))
+
+
+def _die_during_call(governor):
+    with governor.call_context():
+        os._exit(0)
+
+
+@contextlib.contextmanager
+def _tempdir_context(path):
+    old_tempdir = tempfile.tempdir
+    tempfile.tempdir = path
+    try:
+        yield
+    finally:
+        tempfile.tempdir = old_tempdir
+
+
+def _get_mode(path):
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        with phlsys_fs.chtmpdir_context():
+            governor = phlsys_callgovernor.Governor('gov', max_concurrent=1)
+
+            # [ A] calls within the limits don't wait
+            with governor.call_context() as wait_secs:
+                self.assertLess(wait_secs, 0.1)
+
+            # [ A] calls wait for a turn when the concurrency limit is reached
+            # [ A] the time waited is reported
+            # N.B. flock locks belong to open files, so a second governor in
+            #      another thread contends for the same turns as a process
+            #      would
+            other_governor = phlsys_callgovernor.Governor('gov', 1)
+            result = []
+
+            def call():
+                with other_governor.call_context() as wait_secs:
+                    result.append(wait_secs)
+
+            with governor.call_context():
+                thread = threading.Thread(target=call)
+                thread.start()
+                time.sleep(0.2)
+                self.assertEqual([], result)
+            thread.join()
+            self.assertGreaterEqual(result[0], 0.15)
+
+    def test_B_ConcurrencyAcrossProcesses(self):
+        with phlsys_fs.chtmpdir_context():
+            governor = phlsys_callgovernor.Governor('gov', max_concurrent=2)
+            phlsys_fs.ensure_dir('active')
+
+            # [ B] no more than the concurrency limit of processes call at once
+            process_list = [
+                multiprocessing.Process(
+                    target=_call_and_count,
+                    args=(governor, 'active', 'log'))
+                for _ in xrange(6)
+            ]
+            for process in process_list:
+                process.start()
+            for process in process_list:
+                process.join()
+                self.assertEqual(0, process.exitcode)
+
+            num_active_list = [
+                int(n) for n in phlsys_fs.read_text_file('log').split()
+            ]
+            self.assertEqual(6, len(num_active_list))
+            self.assertLessEqual(max(num_active_list), 2)
+
+    def test_C_Rate(self):
+        with phlsys_fs.chtmpdir_context():
+            governor = phlsys_callgovernor.Governor(
+                'gov', max_concurrent=1, max_calls_per_sec=20, burst=1)
+
+            # [ C] calls wait for tokens when the rate limit is reached
+            start = time.time()
+            for _ in xrange(5):
+                with governor.call_context():
+                    pass
+            self.assertGreaterEqual(time.time() - start, 0.19)
+
+            # [ C] calls of governors without a rate count against the rate of
+            #      others
+            unlimited = phlsys_callgovernor.Governor('gov', max_concurrent=1)
+            start = time.time()
+            for _ in xrange(3):
+                with unlimited.call_context():
+                    pass
+            self.assertLess(time.time() - start, 0.05)
+            with governor.call_context() as wait_secs:
+                self.assertGreaterEqual(wait_secs, 0.09)
+
+    def test_D_DeadProcess(self):
+        with phlsys_fs.chtmpdir_context():
+            governor = phlsys_callgovernor.Governor('gov', max_concurrent=1)
+
+            # [ D] turns held by processes which die are released
+            process = multiprocessing.Process(
+                target=_die_during_call, args=(governor,))
+            process.start()
+            process.join()
+            with governor.call_context() as wait_secs:
+                self.assertLess(wait_secs, 0.1)
+
+    def test_E_InvalidLimits(self):
+        # [ E] invalid limits are rejected
+        self.assertRaises(
+            ValueError, phlsys_callgovernor.Governor, 'gov', 0)
+        self.assertRaises(
+            ValueError, phlsys_callgovernor.Governor, 'gov', 1, 0)
+
+    def test_F_DefaultDirectory(self):
+        with phlsys_fs.chtmpdir_context() as tmpdir, \
+                _tempdir_context(tmpdir):
+            user_dir = 'phlsys_callgovernor-{}'.format(os.getuid())
+
+            # [ F] make_default creates its directory private to the user
+            governor = phlsys_callgovernor.make_default('key', 1, 10)
+            self.assertEqual(0o700, _get_mode(user_dir))
+
+            # [ F] the bucket is written atomically
+            with governor.call_context():
+                pass
+            governor_dir, = os.listdir(user_dir)
+            self.assertEqual(
+                ['bucket.json', 'queue.lock', 'slot-0.lock'],
+                sorted(os.listdir(os.path.join(user_dir, governor_dir))))
+
+            # [ F] make_default makes an existing directory of the user's
+            #      private
+            os.chmod(user_dir, 0o777)
+            phlsys_callgovernor.make_default('key', 1)
+            self.assertEqual(0o700, _get_mode(user_dir))
+
+            # [ F] make_default rejects a directory which isn't the user's
+            phlsys_fs.ensure_dir('elsewhere')
+            os.rename(user_dir, 'moved')
+            os.symlink('elsewhere', user_dir)
+            self.assertRaises(
+                phlsys_callgovernor.InsecureDirectoryError,
+                phlsys_callgovernor.make_default,
+                'key',
+                1)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,246 @@
+"""Record statistics about remote calls, by method.
+
+Calls are recorded against the 'current' recorder, which is set with
+'recorder_context'. This means that low-level code can record its calls
+without a recorder being passed to it. When no recorder is current then
+nothing is recorded.
+
+The data from a recorder is picklable, so recorders in worker processes can
+be merged into a recorder in the parent process.
+
+Usage example:
+
+    >>> recorder = Recorder()
+    >>> with recorder_context(recorder):
+    ...     record_call('user.whoami', 0.2, 100, 1000)
+    ...     record_call('user.whoami', 0.1, 100, 0, is_failed=True)
+    ...     add_retry('user.whoami')
+    >>> stats = recorder.to_json_dict()['user.whoami']
+    >>> stats['count'], stats['failures'], stats['retries']
+    (2, 1, 1)
+    >>> stats['request_bytes'], stats['response_bytes']
+    (200, 1000)
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_callstats
+#
+# Public Classes:
+#   Recorder
+#    .record_call
+#    .add_retry
+#    .add_wait
+#    .merge_data
+#    .get_data
+#    .to_json_dict
+#
+# Public Functions:
+#   recorder_context
+#   record_call
+#   add_retry
+#   add_wait
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import contextlib
+
+# the upper bounds of the histogram buckets for durations, anything longer
+# than the last bound goes in an extra bucket
+_HISTOGRAM_BOUNDS_SECS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_COUNT = 0
+_FAILURES = 1
+_RETRIES = 2
+_TOTAL_SECS = 3
+_MAX_SECS = 4
+_REQUEST_BYTES = 5
+_RESPONSE_BYTES = 6
+_WAIT_SECS = 7
+_MAX_WAIT_SECS = 8
+_HISTOGRAM = 9
+
+_RECORDER = None
+
+
+class Recorder(object):
+
+    def __init__(self):
+        # map of method names to a list of the fields indexed above, lists are
+        # small to pickle and easy to merge
+        self._method_to_stats = {}
+
+    def record_call(
+            self,
+            method,
+            duration_secs,
+            request_bytes,
+            response_bytes,
+            is_failed=False):
+        """Record one call to 'method'.
+
+        :method: the string name of the method
+        :duration_secs: the float number of seconds the call took
+        :request_bytes: the integer number of bytes sent
+        :response_bytes: the integer number of bytes received
+        :is_failed: True if the call failed
+        :returns: None
+
+        """
+        stats = self._get_stats(method)
+        stats[_COUNT] += 1
+        if is_failed:
+            stats[_FAILURES] += 1
+        stats[_TOTAL_SECS] += duration_secs
+        stats[_MAX_SECS] = max(stats[_MAX_SECS], duration_secs)
+        stats[_REQUEST_BYTES] += request_bytes
+        stats[_RESPONSE_BYTES] += response_bytes
+        stats[_HISTOGRAM][
+            bisect.bisect_left(_HISTOGRAM_BOUNDS_SECS, duration_secs)] += 1
+
+    def add_retry(self, method):
+        """Record that a call to 'method' had to be retried.
+
+        :method: the string name of the method
+        :returns: None
+
+        """
+        self._get_stats(method)[_RETRIES] += 1
+
+    def add_wait(self, method, wait_secs):
+        """Record that a call to 'method' waited 'wait_secs' before starting.
+
+        :method: the string name of the method
+        :wait_secs: the float number of seconds waited, e.g. for a turn
+        :returns: None
+
+        """
+        stats = self._get_stats(method)
+        stats[_WAIT_SECS] += wait_secs
+        stats[_MAX_WAIT_SECS] = max(stats[_MAX_WAIT_SECS], wait_secs)
+
+    def merge_data(self, data):
+        """Add the stats from 'data', which came from another 'get_data'.
+
+        :data: the result of 'get_data' on another recorder
+        :returns: None
+
+        """
+        for method, other in data.iteritems():
+            stats = self._get_stats(method)
+            for i in (
+                    _COUNT,
+                    _FAILURES,
+                    _RETRIES,
+                    _TOTAL_SECS,
+                    _REQUEST_BYTES,
+                    _RESPONSE_BYTES,
+                    _WAIT_SECS):
+                stats[i] += other[i]
+            stats[_MAX_SECS] = max(stats[_MAX_SECS], other[_MAX_SECS])
+            stats[_MAX_WAIT_SECS] = max(
+                stats[_MAX_WAIT_SECS], other[_MAX_WAIT_SECS])
+            stats[_HISTOGRAM] = [
+                a + b for a, b in zip(stats[_HISTOGRAM], other[_HISTOGRAM])
+            ]
+
+    def get_data(self):
+        """Return a picklable copy of the stats, suitable for 'merge_data'."""
+        return {
+            method: stats[:_HISTOGRAM] + [list(stats[_HISTOGRAM])]
+            for method, stats in self._method_to_stats.iteritems()
+        }
+
+    def to_json_dict(self):
+        """Return a dict of the stats for each method, for human consumption.
+
+        :returns: a dict of string method names to dicts of stats
+
+        """
+        labels = ['<={}s'.format(b) for b in _HISTOGRAM_BOUNDS_SECS]
+        labels.append('>{}s'.format(_HISTOGRAM_BOUNDS_SECS[-1]))
+
+        result = {}
+        for method, stats in self._method_to_stats.iteritems():
+            result[method] = {
+                'count': stats[_COUNT],
+                'failures': stats[_FAILURES],
+                'retries': stats[_RETRIES],
+                'total_secs': stats[_TOTAL_SECS],
+                'max_secs': stats[_MAX_SECS],
+                'request_bytes': stats[_REQUEST_BYTES],
+                'response_bytes': stats[_RESPONSE_BYTES],
+                'wait_secs': stats[_WAIT_SECS],
+                'max_wait_secs': stats[_MAX_WAIT_SECS],
+                'histogram_secs': dict(zip(labels, stats[_HISTOGRAM])),
+            }
+        return result
+
+    def _get_stats(self, method):
+        stats = self._method_to_stats.get(method)
+        if stats is None:
+            stats = [
+                0, 0, 0, 0.0, 0.0, 0, 0, 0.0, 0.0,
+                [0] * (len(_HISTOGRAM_BOUNDS_SECS) + 1)
+            ]
+            self._method_to_stats[method] = stats
+        return stats
+
+
+@contextlib.contextmanager
+def recorder_context(recorder):
+    """Make 'recorder' the current recorder for the duration of the context.
+
+    :recorder: the Recorder to record calls to
+    :returns: a context manager which yields 'recorder'
+
+    """
+    global _RECORDER
+    previous_recorder = _RECORDER
+    _RECORDER = recorder
+    try:
+        yield recorder
+    finally:
+        _RECORDER = previous_recorder
+
+
+def record_call(
+        method, duration_secs, request_bytes, response_bytes, is_failed=False):
+    if _RECORDER is not None:
+        _RECORDER.record_call(
+            method, duration_secs, request_bytes, response_bytes, is_failed)
+
+
+def add_retry(method):
+    if _RECORDER is not None:
+        _RECORDER.add_retry(method)
+
+
+def add_wait(method, wait_secs):
+    if _RECORDER is not None:
+        _RECORDER.add_wait(method, wait_secs)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,126 @@
+"""Test suite for phlsys_callstats."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] record_call() counts calls, failures, durations and bytes of methods
+# [ A] add_retry() counts retries of methods
+# [ A] add_wait() totals waits of methods
+# [ A] durations are counted in the appropriate histogram bucket
+# [ B] merge_data() of get_data() doubles all counts and totals
+# [ B] get_data() is a copy, unaffected by later records
+# [ C] calls are recorded to the current recorder
+# [ C] nested recorder_context() restores the previous recorder
+# [ C] nothing is recorded when there is no current recorder
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Merge
+# [ C] test_C_Context
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pickle
+import unittest
+
+import phlsys_callstats
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        recorder = phlsys_callstats.Recorder()
+        recorder.record_call('user.query', 0.5, 10, 100)
+        recorder.record_call('user.query', 2, 20, 0, is_failed=True)
+        recorder.add_retry('user.query')
+        recorder.add_wait('user.query', 0.25)
+        recorder.add_wait('user.query', 0.5)
+        stats = recorder.to_json_dict()['user.query']
+
+        # [ A] record_call() counts calls, failures, durations and bytes of
+        #      methods
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['failures'], 1)
+        self.assertEqual(stats['total_secs'], 2.5)
+        self.assertEqual(stats['max_secs'], 2)
+        self.assertEqual(stats['request_bytes'], 30)
+        self.assertEqual(stats['response_bytes'], 100)
+
+        # [ A] add_retry() counts retries of methods
+        self.assertEqual(stats['retries'], 1)
+
+        # [ A] add_wait() totals waits of methods
+        self.assertEqual(stats['wait_secs'], 0.75)
+        self.assertEqual(stats['max_wait_secs'], 0.5)
+
+        # [ A] durations are counted in the appropriate histogram bucket
+        histogram = stats['histogram_secs']
+        self.assertEqual(histogram['<=0.5s'], 1)
+        self.assertEqual(histogram['<=2.5s'], 1)
+        self.assertEqual(sum(histogram.itervalues()), 2)
+
+    def test_B_Merge(self):
+        recorder = phlsys_callstats.Recorder()
+        recorder.record_call('user.query', 0.5, 10, 100)
+        recorder.add_retry('conduit.connect')
+        recorder.add_wait('user.query', 0.5)
+        data = pickle.loads(pickle.dumps(recorder.get_data()))
+        expected = recorder.to_json_dict()
+
+        # [ B] merge_data() of get_data() doubles all counts and totals
+        recorder.merge_data(data)
+        merged = recorder.to_json_dict()
+        self.assertEqual(merged['user.query']['count'], 2)
+        self.assertEqual(merged['user.query']['total_secs'], 1.0)
+        self.assertEqual(merged['user.query']['request_bytes'], 20)
+        self.assertEqual(merged['user.query']['response_bytes'], 200)
+        self.assertEqual(merged['user.query']['histogram_secs']['<=0.5s'], 2)
+        self.assertEqual(merged['conduit.connect']['retries'], 2)
+        self.assertEqual(merged['user.query']['wait_secs'], 1.0)
+        self.assertEqual(merged['user.query']['max_wait_secs'], 0.5)
+
+        # [ B] get_data() is a copy, unaffected by later records
+        other = phlsys_callstats.Recorder()
+        other.merge_data(data)
+        self.assertEqual(other.to_json_dict(), expected)
+
+    def test_C_Context(self):
+        outer = phlsys_callstats.Recorder()
+        inner = phlsys_callstats.Recorder()
+
+        # [ C] nothing is recorded when there is no current recorder
+        phlsys_callstats.record_call('nowhere', 1, 0, 0)
+
+        with phlsys_callstats.recorder_context(outer):
+            with phlsys_callstats.recorder_context(inner):
+                phlsys_callstats.record_call('inner', 1, 0, 0)
+            phlsys_callstats.add_retry('outer')
+
+        # [ C] calls are recorded to the current recorder
+        self.assertEqual(inner.to_json_dict().keys(), ['inner'])
+
+        # [ C] nested recorder_context() restores the previous recorder
+        self.assertEqual(outer.to_json_dict().keys(), ['outer'])
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -21,6 +21,7 @@
 # Public Functions:
 #   act_as_user_context
 #   make_conduit_uri
+#   make_governor
 #   make_phab_example_conduit
 #
 # Public Assignments:
@@ -42,14 +43,15 @@ import json
 import logging
 import time
 import urllib
-import urllib2
 import urlparse
 
 import phldef_conduit
 
+import phlsys_callgovernor
+import phlsys_callstats
+import phlsys_httpconnpool
 import phlsys_multiprocessing
-
-_URLLIB_TIMEOUT = 600
+import phlsys_timer
 
 # TODO: handle re-authentication when the token expires
 # TODO: allow connections without specifying user details where possible
@@ -118,6 +120,26 @@ def make_conduit_uri(uri):
     return expected
 
 
+def make_governor(uri, user, max_concurrent_calls=5, max_calls_per_sec=None):
+    """Return a governor shared by all processes calling 'uri' as 'user'.
+
+    Phabricator allows each user 5 sessions by default, the default maximum
+    number of concurrent calls matches that:
+
+      conf/default.conf.php:  'auth.sessions.conduit'       => 5,
+
+    :uri: the uri of the Phabricator instance
+    :user: the string name of the user making the calls
+    :max_concurrent_calls: the maximum number of calls in progress at once
+    :max_calls_per_sec: the maximum rate of calls, None for unlimited
+    :returns: a phlsys_callgovernor.Governor
+
+    """
+    key = '{} {}'.format(make_conduit_uri(uri), user)
+    return phlsys_callgovernor.make_default(
+        key, max_concurrent_calls, max_calls_per_sec)
+
+
 def make_phab_example_conduit():
     """Return a new Conduit constructed from phldef_conduit test_uri and phab.
 
@@ -186,7 +208,9 @@ class Conduit(object):
             certificate=None,
             actAsUser=None,
             http_proxy=None,
-            https_proxy=None):
+            https_proxy=None,
+            session_store=None,
+            governor=None):
         self._conduit_uri = conduitUri
         self._act_as_user = actAsUser
         self._timeout = 5
@@ -196,10 +220,13 @@ class Conduit(object):
         self._client_version = 1
         self._http_proxy = http_proxy
         self._https_proxy = https_proxy
+        self._session_store = session_store
+        self._governor = governor
 
+        self._session = None
         self._conduit = {}
         if user and certificate:
-            self._authenticate()
+            self._connect()
 
     def set_act_as_user(self,  user):
         self._act_as_user = user
@@ -216,6 +243,23 @@ class Conduit(object):
     def conduit_uri(self):
         return self._conduit_uri
 
+    def _connect(self, rejected_session=None):
+        if self._session_store is None:
+            session = self._authenticate()
+        else:
+            # share sessions with other processes, so that we don't connect
+            # more often than we need to
+            session = self._session_store.get_session(
+                self._conduit_uri,
+                self._username,
+                self._authenticate,
+                rejected_session)
+
+        self._session = session
+        self._conduit = dict(session)
+        if self._act_as_user:
+            self._conduit["actAsUser"] = self._act_as_user
+
     def _authenticate(self):
 
         message_dict = self._authenticate_make_message()
@@ -244,19 +288,16 @@ class Conduit(object):
 
         if is_conduitproxy:
             # conduit proxies don't have sessions, send the cert every time
-            self._conduit = {
+            return {
                 'user': self._username,
                 'cert': self._certificate
             }
         else:
-            self._conduit = {
+            return {
                 'sessionKey': result["sessionKey"],
                 'connectionID': result["connectionID"],
             }
 
-        if self._act_as_user:
-            self._conduit["actAsUser"] = self._act_as_user
-
     def _authenticate_make_message(self):
         token = str(int(time.time()))
         # pylint: disable=E1101
@@ -282,19 +323,41 @@ class Conduit(object):
             "output": "json",
         })
 
+        # use the proxies from the environment unless we're given some
+        proxies = None
         if self._https_proxy or self._http_proxy:
-            proxy = {}
+            proxies = {}
             if self._https_proxy:
-                proxy['https'] = self._https_proxy
+                proxies['https'] = self._https_proxy
             if self._http_proxy:
-                proxy['http'] = self._http_proxy
-            proxy_handler = urllib2.ProxyHandler(proxy)
-            opener = urllib2.build_opener(proxy_handler)
-            data = opener.open(path, body, _URLLIB_TIMEOUT).read()
-        else:
-            data = urllib2.urlopen(path, body, _URLLIB_TIMEOUT).read()
+                proxies['http'] = self._http_proxy
+
+        # re-use connections from previous calls, to save on handshakes
+        pool = phlsys_httpconnpool.get_default_pool()
+
+        with self._governed_context(method):
+            timer = phlsys_timer.Timer()
+            timer.start()
+            data = ''
+            is_failed = True
+            try:
+                data = pool.post(path, body, proxies)
+                response = json.loads(data)
+                is_failed = bool(response.get("error_code"))
+            finally:
+                phlsys_callstats.record_call(
+                    method, timer.duration, len(body), len(data), is_failed)
+
+        return response
 
-        return json.loads(data)
+    @contextlib.contextmanager
+    def _governed_context(self, method):
+        if self._governor is None:
+            yield
+        else:
+            with self._governor.call_context() as wait_secs:
+                phlsys_callstats.add_wait(method, wait_secs)
+                yield
 
     def __call__(self, method, param_dict_in=None):
         return self.raw_call(method, param_dict_in)["result"]
@@ -316,7 +379,8 @@ class Conduit(object):
                 if error == SESSION_ERROR:
                     logging.warning(
                         "phlsys_conduit: SESSION-ERROR (try {0})".format(x))
-                    self._authenticate()
+                    phlsys_callstats.add_retry(method)
+                    self._connect(rejected_session=self._session)
                 else:
                     raise ConduitException(
                         method=method,
@@ -357,7 +421,12 @@ class MultiConduit(object):
         #
         #   conf/default.conf.php:  'auth.sessions.conduit'       => 5,
         #
+        # if there's a governor then it's configured with the server's real
+        # limit, there's no point in more sessions than it allows calls
         max_sessions_per_user = 5
+        governor = kwargs.get('governor')
+        if governor is not None:
+            max_sessions_per_user = governor.max_concurrent
         self._conduits = phlsys_multiprocessing.MultiResource(
             max_sessions_per_user, factory)
 
@@ -0,0 +1,123 @@
+"""Share authenticated Conduit sessions between processes, via a file.
+
+Each process that talks to Conduit would otherwise have to call
+'conduit.connect' to get a session of its own. Phabricator limits the number
+of sessions each user may have, so processes which connect often will end up
+invalidating each other's sessions.
+
+Sessions are stored in a json file, which is only readable by the user who
+created it. The file is replaced atomically, so it may be read without
+locking. Making new sessions is serialised by a lock file, so that when a
+session is rejected by the server only one process makes a new one. The
+others will pick up the new session from the file.
+
+Usage example:
+
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     store = SessionStore('sessions.json')
+    ...     store.get_session('http://phab/api/', 'alice', lambda: {'k': 1})
+    ...     store.get_session('http://phab/api/', 'alice', lambda: {'k': 2})
+    ...     store.get_session(
+    ...         'http://phab/api/', 'alice', lambda: {'k': 3}, {'k': 1})
+    {'k': 1}
+    {u'k': 1}
+    {'k': 3}
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_conduitsessions
+#
+# Public Classes:
+#   SessionStore
+#    .get_session
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+
+import phlsys_fs
+
+_LOCK_SUFFIX = '.lock'
+
+
+class SessionStore(object):
+
+    def __init__(self, path):
+        """Store sessions in the file at 'path', created when needed.
+
+        :path: the string path of the file to store sessions in
+
+        """
+        self._path = os.path.abspath(path)
+
+    def get_session(self, uri, user, make_session, rejected_session=None):
+        """Return the shared session of 'user' at 'uri', make one if needed.
+
+        If the shared session is 'rejected_session' then 'make_session' is
+        called to replace it, unless another process has already done so.
+
+        :uri: the string uri of the Conduit API
+        :user: the string name of the user the session belongs to
+        :make_session: a callable which returns a new json-able session
+        :rejected_session: a session which the server has rejected, or None
+        :returns: a session, as returned by 'make_session'
+
+        """
+        key = _make_key(uri, user)
+
+        session = self._read_sessions().get(key)
+        if session is not None and session != rejected_session:
+            return session
+
+        phlsys_fs.ensure_dir(os.path.dirname(self._path))
+        with phlsys_fs.write_file_lock_context(self._path + _LOCK_SUFFIX):
+
+            # another process may have made a session while we waited
+            sessions = self._read_sessions()
+            session = sessions.get(key)
+            if session is not None and session != rejected_session:
+                return session
+
+            session = make_session()
+            sessions[key] = session
+            phlsys_fs.write_text_file_atomic(
+                self._path, json.dumps(sessions, sort_keys=True))
+
+        return session
+
+    def _read_sessions(self):
+        try:
+            return json.loads(phlsys_fs.read_text_file(self._path))
+        except (IOError, OSError, ValueError):
+            # treat missing or malformed files as empty, they'll be replaced
+            return {}
+
+
+def _make_key(uri, user):
+    return '{} {}'.format(uri, user)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,158 @@
+"""Test suite for phlsys_conduitsessions."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] a session is made when there isn't one
+# [ A] the stored session is re-used after that
+# [ A] sessions of different users and uris are kept apart
+# [ B] a rejected session is replaced
+# [ B] a session which replaced the rejected one is re-used
+# [ C] sessions are shared between stores on the same file
+# [ C] only one of several processes replaces a rejected session
+# [ D] the file is only readable by its owner
+# [ D] malformed files are replaced
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Rejected
+# [ C] test_C_Sharing
+# [ D] test_D_File
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import stat
+import unittest
+
+import phlsys_fs
+
+import phlsys_conduitsessions
+
+_URI = 'http://phab.test/api/'
+
+
+class _SessionMaker(object):
+
+    def __init__(self, prefix='session'):
+        self._prefix = prefix
+        self.num_calls = 0
+
+    def __call__(self):
+        self.num_calls += 1
+        return {'sessionKey': '{}{}'.format(self._prefix, self.num_calls)}
+
+
+def _renew_and_log(store, rejected_session, log_path):
+
+    def make_session():
+        with open(log_path, 'a') as f:
+            f.write('made\n')
+        return {'sessionKey': 'renewed-{}'.format(os.getpid())}
+
+    store.get_session(_URI, 'alice', make_session, rejected_session)
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        with phlsys_fs.chtmpdir_context():
+            store = phlsys_conduitsessions.SessionStore('sessions')
+            make_session = _SessionMaker()
+
+            # [ A] a session is made when there isn't one
+            session = store.get_session(_URI, 'alice', make_session)
+            self.assertEqual({'sessionKey': 'session1'}, session)
+            self.assertEqual(1, make_session.num_calls)
+
+            # [ A] the stored session is re-used after that
+            self.assertEqual(
+                session, store.get_session(_URI, 'alice', make_session))
+            self.assertEqual(1, make_session.num_calls)
+
+            # [ A] sessions of different users and uris are kept apart
+            store.get_session(_URI, 'bob', make_session)
+            store.get_session('http://other.test/api/', 'alice', make_session)
+            self.assertEqual(3, make_session.num_calls)
+
+    def test_B_Rejected(self):
+        with phlsys_fs.chtmpdir_context():
+            store = phlsys_conduitsessions.SessionStore('sessions')
+            make_session = _SessionMaker()
+            rejected = store.get_session(_URI, 'alice', make_session)
+
+            # [ B] a rejected session is replaced
+            session = store.get_session(
+                _URI, 'alice', make_session, rejected)
+            self.assertEqual({'sessionKey': 'session2'}, session)
+
+            # [ B] a session which replaced the rejected one is re-used
+            self.assertEqual(
+                session,
+                store.get_session(_URI, 'alice', make_session, rejected))
+            self.assertEqual(2, make_session.num_calls)
+
+    def test_C_Sharing(self):
+        with phlsys_fs.chtmpdir_context():
+            store = phlsys_conduitsessions.SessionStore('sessions')
+            other_store = phlsys_conduitsessions.SessionStore('sessions')
+
+            # [ C] sessions are shared between stores on the same file
+            session = store.get_session(_URI, 'alice', _SessionMaker())
+            make_session = _SessionMaker()
+            self.assertEqual(
+                session, other_store.get_session(_URI, 'alice', make_session))
+            self.assertEqual(0, make_session.num_calls)
+
+            # [ C] only one of several processes replaces a rejected session
+            process_list = [
+                multiprocessing.Process(
+                    target=_renew_and_log, args=(store, session, 'log'))
+                for _ in xrange(4)
+            ]
+            for process in process_list:
+                process.start()
+            for process in process_list:
+                process.join()
+                self.assertEqual(0, process.exitcode)
+            self.assertEqual('made\n', phlsys_fs.read_text_file('log'))
+
+    def test_D_File(self):
+        with phlsys_fs.chtmpdir_context():
+            store = phlsys_conduitsessions.SessionStore('sessions')
+
+            # [ D] malformed files are replaced
+            phlsys_fs.write_text_file('sessions', 'not json')
+            make_session = _SessionMaker()
+            session = store.get_session(_URI, 'alice', make_session)
+            self.assertEqual(
+                session, store.get_session(_URI, 'alice', make_session))
+            self.assertEqual(1, make_session.num_calls)
+
+            # [ D] the file is only readable by its owner
+            mode = stat.S_IMODE(os.stat('sessions').st_mode)
+            self.assertEqual(stat.S_IRUSR | stat.S_IWUSR, mode)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
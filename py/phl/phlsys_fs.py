@@ -321,7 +321,12 @@ def ensure_dir(path):
 
     """
     if not os.path.exists(path):
-        os.makedirs(path)
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            # another process may have made it since we checked
+            if e.errno != errno.EEXIST or not os.path.isdir(path):
+                raise
 
 
 def read_text_file(path):
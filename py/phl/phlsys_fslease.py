@@ -0,0 +1,217 @@
+"""Time-limited ownership of named resources, shared via the filesystem.
+
+A lease gives its holder exclusive ownership of a named resource until it
+expires. Holders must renew their leases before they expire, if a holder dies
+then its leases will expire and may be acquired by others.
+
+The leases are stored as files in a directory, which may be on a filesystem
+shared between several hosts. Modifications are serialised by the locks in
+phlsys_fs, lease files are replaced atomically so they may be read without
+locking.
+
+Note that expiry times are compared between hosts, so the clocks of the hosts
+sharing a directory must be reasonably well synchronised.
+
+Usage example:
+
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     alice = LeaseDirectory('leases', 'alice', lease_secs=60)
+    ...     bob = LeaseDirectory('leases', 'bob', lease_secs=60)
+    ...     alice.try_acquire('myrepo'), bob.try_acquire('myrepo')
+    ...     alice.release('myrepo')
+    ...     bob.try_acquire('myrepo')
+    ...     bob.get_live_leases() == {'myrepo': 'bob'}
+    (True, False)
+    True
+    True
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_fslease
+#
+# Public Classes:
+#   LeaseDirectory
+#    .holder
+#    .try_acquire
+#    .is_held
+#    .release
+#    .release_all
+#    .get_live_leases
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import time
+
+import phlsys_fs
+
+_LEASE_SUFFIX = '.lease'
+_LOCK_SUFFIX = '.lock'
+
+
+class LeaseDirectory(object):
+
+    def __init__(self, path, holder, lease_secs):
+        """Manage the leases held by 'holder' in the directory at 'path'.
+
+        :path: the string path of the directory to store leases in
+        :holder: the string name to identify the holder of leases by
+        :lease_secs: the number of seconds a lease lasts without renewal
+
+        """
+        if lease_secs <= 0:
+            raise ValueError(
+                "'lease_secs' must be positive, got {}".format(lease_secs))
+        self._path = path
+        self._holder = holder
+        self._lease_secs = lease_secs
+
+        # map of lease names we hold to the time that they expire
+        self._name_to_expiry = {}
+
+    @property
+    def holder(self):
+        return self._holder
+
+    def try_acquire(self, name):
+        """Acquire or renew the lease called 'name', return True if held.
+
+        The lease can't be acquired if another holder has a lease which hasn't
+        expired yet. If we already hold the lease and more than half of it
+        remains then it won't be rewritten, so it's cheap to call this often.
+
+        :name: the string name of the lease
+        :returns: True if we now hold the lease, False otherwise
+
+        """
+        now = time.time()
+        expiry = self._name_to_expiry.get(name)
+        if expiry is not None and expiry - now > self._lease_secs / 2:
+            return True
+
+        phlsys_fs.ensure_dir(self._path)
+        with phlsys_fs.write_file_lock_context(self._lock_path(name)):
+            lease = self._read_lease(name)
+            if lease is not None:
+                holder, expiry = lease
+                if holder != self._holder and expiry > now:
+                    self._name_to_expiry.pop(name, None)
+                    return False
+
+            expiry = now + self._lease_secs
+            phlsys_fs.write_text_file_atomic(
+                self._lease_path(name),
+                json.dumps({'holder': self._holder, 'expiry': expiry}))
+            self._name_to_expiry[name] = expiry
+
+        return True
+
+    def is_held(self, name):
+        """Return True if the lease called 'name' is held by us, unexpired.
+
+        This reads the lease from the directory, so it's accurate even in a
+        copy of this object which isn't kept up to date, e.g. in a forked
+        worker process.
+
+        :name: the string name of the lease
+        :returns: True if we hold the lease, False otherwise
+
+        """
+        lease = self._read_lease(name)
+        if lease is None:
+            return False
+        holder, expiry = lease
+        return holder == self._holder and expiry > time.time()
+
+    def release(self, name):
+        """Release the lease called 'name' if we hold it.
+
+        :name: the string name of the lease
+        :returns: None
+
+        """
+        self._name_to_expiry.pop(name, None)
+        if not os.path.isdir(self._path):
+            return
+        with phlsys_fs.write_file_lock_context(self._lock_path(name)):
+            lease = self._read_lease(name)
+            if lease is not None and lease[0] == self._holder:
+                os.remove(self._lease_path(name))
+
+    def release_all(self):
+        """Release all the leases we hold.
+
+        :returns: None
+
+        """
+        for name in list(self._name_to_expiry):
+            self.release(name)
+
+    def get_live_leases(self):
+        """Return a dict of the names of unexpired leases to their holders.
+
+        :returns: a dict of string lease names to string holders
+
+        """
+        if not os.path.isdir(self._path):
+            return {}
+
+        now = time.time()
+        name_to_holder = {}
+        for filename in os.listdir(self._path):
+            if not filename.endswith(_LEASE_SUFFIX):
+                continue
+            name = filename[:-len(_LEASE_SUFFIX)]
+            lease = self._read_lease(name)
+            if lease is not None:
+                holder, expiry = lease
+                if expiry > now:
+                    name_to_holder[name] = holder
+
+        return name_to_holder
+
+    def _read_lease(self, name):
+        try:
+            text = phlsys_fs.read_text_file(self._lease_path(name))
+        except (IOError, OSError):
+            # the lease may have been released since we listed it
+            return None
+
+        try:
+            lease = json.loads(text)
+            return lease['holder'], float(lease['expiry'])
+        except (ValueError, KeyError, TypeError):
+            # treat malformed leases as expired, they'll be overwritten
+            return None
+
+    def _lease_path(self, name):
+        return os.path.join(self._path, name + _LEASE_SUFFIX)
+
+    def _lock_path(self, name):
+        return os.path.join(self._path, name + _LOCK_SUFFIX)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
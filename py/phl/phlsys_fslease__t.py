@@ -0,0 +1,129 @@
+"""Test suite for phlsys_fslease."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] can acquire a lease which nobody holds
+# [ A] can renew a lease which we hold
+# [ A] get_live_leases() reports the holders of leases
+# [ A] is_held() reports the leases we hold
+# [ B] can't acquire a lease which another holder has
+# [ B] can acquire a lease once the other holder releases it
+# [ B] is_held() doesn't report leases held by others
+# [ C] can acquire a lease once the other holder's lease expires
+# [ C] get_live_leases() doesn't report expired leases
+# [ C] is_held() doesn't report expired leases
+# [ D] release_all() releases all the leases we hold
+# [ D] release() doesn't release leases held by others
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Exclusive
+# [ C] test_C_Expiry
+# [ D] test_D_Release
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+import phlsys_fs
+
+import phlsys_fslease
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+        with phlsys_fs.chtmpdir_context():
+            alice = phlsys_fslease.LeaseDirectory('leases', 'alice', 60)
+
+            # [ A] can acquire a lease which nobody holds
+            self.assertTrue(alice.try_acquire('repo'))
+
+            # [ A] can renew a lease which we hold
+            self.assertTrue(alice.try_acquire('repo'))
+
+            # [ A] get_live_leases() reports the holders of leases
+            self.assertEqual(alice.get_live_leases(), {'repo': 'alice'})
+
+            # [ A] is_held() reports the leases we hold
+            self.assertTrue(alice.is_held('repo'))
+            self.assertFalse(alice.is_held('other'))
+
+    def test_B_Exclusive(self):
+        with phlsys_fs.chtmpdir_context():
+            alice = phlsys_fslease.LeaseDirectory('leases', 'alice', 60)
+            bob = phlsys_fslease.LeaseDirectory('leases', 'bob', 60)
+            self.assertTrue(alice.try_acquire('repo'))
+
+            # [ B] can't acquire a lease which another holder has
+            self.assertFalse(bob.try_acquire('repo'))
+
+            # [ B] is_held() doesn't report leases held by others
+            self.assertFalse(bob.is_held('repo'))
+
+            # [ B] can acquire a lease once the other holder releases it
+            alice.release('repo')
+            self.assertTrue(bob.try_acquire('repo'))
+            self.assertFalse(alice.try_acquire('repo'))
+
+    def test_C_Expiry(self):
+        with phlsys_fs.chtmpdir_context():
+            alice = phlsys_fslease.LeaseDirectory('leases', 'alice', 0.1)
+            bob = phlsys_fslease.LeaseDirectory('leases', 'bob', 60)
+            self.assertTrue(alice.try_acquire('repo'))
+            self.assertFalse(bob.try_acquire('repo'))
+
+            time.sleep(0.2)
+
+            # [ C] get_live_leases() doesn't report expired leases
+            self.assertEqual(bob.get_live_leases(), {})
+
+            # [ C] is_held() doesn't report expired leases
+            self.assertFalse(alice.is_held('repo'))
+
+            # [ C] can acquire a lease once the other holder's lease expires
+            self.assertTrue(bob.try_acquire('repo'))
+            self.assertFalse(alice.try_acquire('repo'))
+
+    def test_D_Release(self):
+        with phlsys_fs.chtmpdir_context():
+            alice = phlsys_fslease.LeaseDirectory('leases', 'alice', 60)
+            bob = phlsys_fslease.LeaseDirectory('leases', 'bob', 60)
+            self.assertTrue(alice.try_acquire('repo1'))
+            self.assertTrue(alice.try_acquire('repo2'))
+            self.assertTrue(bob.try_acquire('repo3'))
+
+            # [ D] release() doesn't release leases held by others
+            alice.release('repo3')
+            self.assertEqual(
+                alice.get_live_leases(),
+                {'repo1': 'alice', 'repo2': 'alice', 'repo3': 'bob'})
+
+            # [ D] release_all() releases all the leases we hold
+            alice.release_all()
+            self.assertEqual(alice.get_live_leases(), {'repo3': 'bob'})
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -7,6 +7,8 @@
 # Public Classes:
 #   Repo
 #    .working_dir
+#    .object_reader
+#    .ref_reader
 #
 # -----------------------------------------------------------------------------
 # (this contents block is generated, edits will be lost)
@@ -18,6 +20,8 @@ from __future__ import print_function
 
 import os
 
+import phlsys_gitobjectreader
+import phlsys_gitrefreader
 import phlsys_subprocess
 
 
@@ -25,6 +29,9 @@ class Repo(object):
 
     def __init__(self, workingDir):
         self._workingDir = os.path.abspath(workingDir)
+        self._object_reader = phlsys_gitobjectreader.ObjectReader(
+            self._workingDir)
+        self._ref_reader = phlsys_gitrefreader.RefReader(self._workingDir)
 
     # def __call__(*args, stdin=None): <-- supported in Python 3
     def __call__(self, *args, **kwargs):
@@ -39,6 +46,16 @@ class Repo(object):
     def working_dir(self):
         return self._workingDir
 
+    @property
+    def object_reader(self):
+        """Return the phlsys_gitobjectreader.ObjectReader for this repo."""
+        return self._object_reader
+
+    @property
+    def ref_reader(self):
+        """Return the phlsys_gitrefreader.RefReader for this repo."""
+        return self._ref_reader
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2014 Bloomberg Finance L.P.
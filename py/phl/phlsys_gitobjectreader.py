@@ -0,0 +1,299 @@
+"""Read objects from a git repository without starting a process each time.
+
+Each call to 'git' starts a new process, which costs more than the work done
+by small operations like resolving a ref or reading a blob. An ObjectReader
+keeps 'git cat-file --batch' and 'git cat-file --batch-check' running and
+sends them requests over pipes instead.
+
+The processes are started on first use. They aren't shared with forked
+processes, a reader used in a new process will start processes of its own.
+
+Objects and refs created after a reader was started are seen by later
+requests, as git re-reads refs and packs when it needs to.
+
+Usage example:
+
+    >>> import phlsys_fs
+    >>> import phlsys_subprocess
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     _ = phlsys_subprocess.run('git', 'init')
+    ...     reader = ObjectReader('.')
+    ...     reader.read_info('HEAD') is None
+    ...     reader.read_info('4b825dc642cb6eb9a060e54bf8d69288fbee4904')
+    ...     reader.close()
+    True
+    ('4b825dc642cb6eb9a060e54bf8d69288fbee4904', 'tree', 0)
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_gitobjectreader
+#
+# Public Classes:
+#   Error
+#   ObjectReader
+#    .num_processes_started
+#    .read_info
+#    .read_object
+#    .close
+#
+# Public Functions:
+#   get_reader_or_none
+#   read_info
+#   read_object
+#   is_single_rev
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import fcntl
+import os
+import subprocess
+
+
+class Error(Exception):
+    pass
+
+
+class ObjectReader(object):
+
+    def __init__(self, working_dir):
+        """Create a reader for the git repository at 'working_dir'.
+
+        No processes are started until the first request.
+
+        :working_dir: the string path of the repository
+
+        """
+        self._working_dir = working_dir
+        self._pid = os.getpid()
+        self._option_to_process = {}
+        self._num_processes_started = 0
+
+    @property
+    def num_processes_started(self):
+        """Return the number of git processes this process has started."""
+        self._reset_if_forked()
+        return self._num_processes_started
+
+    def read_info(self, rev):
+        """Return (sha1, type, size) of the object named by 'rev'.
+
+        Raise Error if 'rev' is ambiguous or the request fails.
+
+        :rev: the string name of the object, e.g. 'HEAD', 'master:README'
+        :returns: a tuple of (string sha1, string type, integer size), or
+                  None if there is no such object
+
+        """
+        return self._request('--batch-check', rev)
+
+    def read_object(self, rev):
+        """Return (sha1, type, content) of the object named by 'rev'.
+
+        Raise Error if 'rev' is ambiguous or the request fails.
+
+        :rev: the string name of the object, e.g. 'HEAD', 'master:README'
+        :returns: a tuple of (string sha1, string type, string content), or
+                  None if there is no such object
+
+        """
+        return self._request('--batch', rev)
+
+    def close(self):
+        """Stop any processes that this process has started.
+
+        The reader may still be used afterwards, new processes will be started
+        as they are needed.
+
+        :returns: None
+
+        """
+        self._reset_if_forked()
+        for option in list(self._option_to_process):
+            self._stop(option)
+
+    def _request(self, option, rev):
+        if '\n' in rev:
+            raise ValueError("'rev' mustn't contain newlines: {}".format(rev))
+        self._reset_if_forked()
+
+        process = self._option_to_process.get(option)
+        if process is None:
+            process = self._start(option)
+
+        try:
+            header, info, content = _exchange(process, option, rev)
+        except (IOError, OSError) as e:
+            # we can't tell what state the process is in, start a new one
+            # for the next request
+            self._stop(option)
+            raise Error("git cat-file {} failed: {}".format(option, e))
+
+        if info is None:
+            if header == rev + ' missing\n':
+                return None
+            # e.g. '<rev> ambiguous', the process is still usable
+            raise Error("can't read '{}': {}".format(rev, header.strip()))
+
+        if content is None:
+            return info
+        return info[0], info[1], content
+
+    def _start(self, option):
+        with open(os.devnull, 'w') as devnull:
+            process = subprocess.Popen(
+                ['git', 'cat-file', option],
+                cwd=self._working_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                close_fds=True)
+
+        # other children, e.g. from phlsys_subprocess, mustn't inherit our
+        # ends of the pipes, otherwise the process won't see EOF when we
+        # close them and 'close()' would wait for those children to exit
+        for f in (process.stdin, process.stdout):
+            flags = fcntl.fcntl(f.fileno(), fcntl.F_GETFD)
+            fcntl.fcntl(f.fileno(), fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+        self._option_to_process[option] = process
+        self._num_processes_started += 1
+        return process
+
+    def _stop(self, option):
+        process = self._option_to_process.pop(option)
+        try:
+            process.stdin.close()
+        except IOError:
+            pass
+        process.stdout.close()
+        process.wait()
+
+    def _reset_if_forked(self):
+        pid = os.getpid()
+        if pid != self._pid:
+            # the processes belong to the parent, closing our copies of the
+            # pipes doesn't affect it as it still holds its own copies
+            for process in self._option_to_process.itervalues():
+                process.stdin.close()
+                process.stdout.close()
+            self._option_to_process = {}
+            self._num_processes_started = 0
+            self._pid = pid
+
+
+def get_reader_or_none(repo):
+    """Return the ObjectReader of 'repo', or None if it doesn't have one.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :returns: an ObjectReader or None
+
+    """
+    return getattr(repo, 'object_reader', None)
+
+
+def read_info(repo, rev):
+    """Return the result of 'read_info' on the ObjectReader of 'repo'.
+
+    Raise Error if 'repo' has no reader or 'rev' can't be read by one, in
+    which case the caller should fall back to running git.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :rev: the string name of the object, e.g. 'HEAD', 'master:README'
+    :returns: a tuple of (string sha1, string type, integer size), or None
+
+    """
+    return _get_reader_for_rev(repo, rev).read_info(rev)
+
+
+def read_object(repo, rev):
+    """Return the result of 'read_object' on the ObjectReader of 'repo'.
+
+    Raise Error if 'repo' has no reader or 'rev' can't be read by one, in
+    which case the caller should fall back to running git.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :rev: the string name of the object, e.g. 'HEAD', 'master:README'
+    :returns: a tuple of (string sha1, string type, string content), or None
+
+    """
+    return _get_reader_for_rev(repo, rev).read_object(rev)
+
+
+def is_single_rev(rev):
+    """Return True if 'rev' names one object, so a reader may look it up.
+
+    Ranges like 'a..b' and options like '--all' can be passed to some git
+    commands in place of a rev, but can't be read by an ObjectReader.
+
+        >>> is_single_rev('origin/master~2')
+        True
+
+        >>> is_single_rev('origin/master..HEAD')
+        False
+
+    :rev: the string to test
+    :returns: True if 'rev' names one object
+
+    """
+    if not rev or rev[0] in '-^' or '\n' in rev or '..' in rev:
+        return False
+    return not rev.endswith(('^@', '^!', '^-'))
+
+
+def _get_reader_for_rev(repo, rev):
+    reader = get_reader_or_none(repo)
+    if reader is None:
+        raise Error("repo has no object reader")
+    if not is_single_rev(rev):
+        raise Error("'{}' doesn't name a single object".format(rev))
+    return reader
+
+
+def _exchange(process, option, rev):
+    process.stdin.write(rev + '\n')
+    process.stdin.flush()
+    header = process.stdout.readline()
+    if not header:
+        raise IOError("no response")
+
+    info = _parse_info(header)
+    if info is None or option != '--batch':
+        return header, info, None
+
+    # the content is followed by a newline
+    size = info[2]
+    content = process.stdout.read(size + 1)
+    if len(content) != size + 1:
+        raise IOError("truncated response")
+    return header, info, content[:-1]
+
+
+def _parse_info(header):
+    fields = header.split()
+    if len(fields) != 3 or not fields[2].isdigit():
+        return None
+    return fields[0], fields[1], int(fields[2])
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,181 @@
+"""Test suite for phlsys_gitobjectreader."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] read_info() and read_object() agree with git for commits and blobs
+# [ A] missing objects are reported as None
+# [ A] many requests are served by one process each for info and objects
+# [ B] refs and objects made after the reader started are seen
+# [ C] a reader recovers when its process dies
+# [ C] a reader may be used again after close()
+# [ C] other child processes don't inherit the pipes to the processes
+# [ D] a forked process starts its own processes, the parent is unaffected
+# [ E] get_reader_or_none() finds the reader of a repo, if it has one
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_SeesNewRefs
+# [ C] test_C_Recovers
+# [ D] test_D_Fork
+# [ E] test_E_GetReaderOrNone
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import fcntl
+import os
+import shutil
+import tempfile
+import unittest
+
+import phlsys_git
+
+import phlsys_gitobjectreader
+
+
+class _NoReaderRepo(object):
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __call__(self, *args, **kwargs):
+        return self._repo(*args, **kwargs)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repo = phlsys_git.Repo(self.tmp_dir)
+        self.repo('init')
+        self._commit_new_file('add README', 'README', 'hello\n')
+        self.reader = self.repo.object_reader
+
+    def tearDown(self):
+        self.reader.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _commit_new_file(self, message, relative_path, contents):
+        with open(os.path.join(self.tmp_dir, relative_path), 'w') as f:
+            f.write(contents)
+        self.repo('add', relative_path)
+        self.repo('commit', '-m', message, '--', relative_path)
+
+    def test_A_Breathing(self):
+        head = self.repo('rev-parse', 'HEAD').strip()
+
+        # [ A] read_info() and read_object() agree with git for commits and
+        #      blobs
+        sha1, type_, size = self.reader.read_info('HEAD')
+        self.assertEqual(sha1, head)
+        self.assertEqual(type_, 'commit')
+        self.assertEqual(
+            self.reader.read_object('HEAD'),
+            (head, 'commit', self.repo('cat-file', 'commit', 'HEAD')))
+        self.assertEqual(
+            self.reader.read_object('HEAD:README')[1:], ('blob', 'hello\n'))
+
+        # [ A] missing objects are reported as None
+        self.assertIsNone(self.reader.read_info('refs/heads/nosuchbranch'))
+        self.assertIsNone(self.reader.read_object('HEAD:nosuchfile'))
+
+        # [ A] many requests are served by one process each for info and
+        #      objects
+        for _ in xrange(10):
+            self.reader.read_info('HEAD')
+            self.reader.read_object('HEAD')
+        self.assertEqual(self.reader.num_processes_started, 2)
+
+    def test_B_SeesNewRefs(self):
+        old_head = self.reader.read_info('HEAD')[0]
+        self.assertIsNone(self.reader.read_info('refs/heads/newbranch'))
+
+        # [ B] refs and objects made after the reader started are seen
+        self._commit_new_file('add NEWS', 'NEWS', 'news\n')
+        self.repo('branch', 'newbranch')
+        self.repo('pack-refs', '--all')
+        new_head = self.reader.read_info('HEAD')[0]
+        self.assertNotEqual(new_head, old_head)
+        self.assertEqual(
+            self.reader.read_info('refs/heads/newbranch')[0], new_head)
+        self.assertEqual(
+            self.reader.read_object('HEAD:NEWS')[2], 'news\n')
+
+    def test_C_Recovers(self):
+        self.reader.read_info('HEAD')
+
+        # [ C] a reader recovers when its process dies
+        process = self.reader._option_to_process['--batch-check']
+        process.kill()
+        process.wait()
+        with self.assertRaises(phlsys_gitobjectreader.Error):
+            self.reader.read_info('HEAD')
+        self.assertEqual(self.reader.read_info('HEAD')[1], 'commit')
+        self.assertEqual(self.reader.num_processes_started, 2)
+
+        # [ C] a reader may be used again after close()
+        self.reader.close()
+        self.assertEqual(self.reader.read_info('HEAD')[1], 'commit')
+        self.assertEqual(self.reader.num_processes_started, 3)
+
+        # [ C] other child processes don't inherit the pipes to the processes
+        process = self.reader._option_to_process['--batch-check']
+        for f in (process.stdin, process.stdout):
+            flags = fcntl.fcntl(f.fileno(), fcntl.F_GETFD)
+            self.assertTrue(flags & fcntl.FD_CLOEXEC)
+
+    def test_D_Fork(self):
+        head = self.reader.read_info('HEAD')[0]
+
+        # [ D] a forked process starts its own processes, the parent is
+        #      unaffected
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(read_fd)
+            try:
+                is_ok = (
+                    self.reader.num_processes_started == 0 and
+                    self.reader.read_info('HEAD')[0] == head and
+                    self.reader.num_processes_started == 1)
+                os.write(write_fd, 'ok' if is_ok else 'bad')
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            self.assertEqual(f.read(), 'ok')
+        os.waitpid(pid, 0)
+        self.assertEqual(self.reader.read_info('HEAD')[0], head)
+        self.assertEqual(self.reader.num_processes_started, 1)
+
+    def test_E_GetReaderOrNone(self):
+        # [ E] get_reader_or_none() finds the reader of a repo, if it has one
+        self.assertIs(
+            phlsys_gitobjectreader.get_reader_or_none(self.repo),
+            self.reader)
+        self.assertIsNone(
+            phlsys_gitobjectreader.get_reader_or_none(
+                _NoReaderRepo(self.repo)))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
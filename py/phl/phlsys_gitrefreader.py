@@ -0,0 +1,385 @@
+"""Read the refs of a git repository without starting a process.
+
+Listing refs with 'git show-ref' means starting a process and parsing its
+output, which is slow for repositories with tens of thousands of refs. A
+RefReader reads the 'packed-refs' file and the loose ref files directly and
+remembers what it read, on later reads only the files which have changed
+since are read again.
+
+Only the plain 'files' layout that git uses by default is supported, a
+RefReader raises Error for anything else so that the caller may fall back to
+running git. This includes invalid ref names and ref files which can't be
+parsed, git will report those better.
+
+Usage example:
+
+    >>> import phlsys_fs
+    >>> import phlsys_subprocess
+    >>> with phlsys_fs.chtmpdir_context():
+    ...     _ = phlsys_subprocess.run('git', 'init')
+    ...     _ = phlsys_subprocess.run(
+    ...         'git', 'update-ref', 'refs/tree',
+    ...         '4b825dc642cb6eb9a060e54bf8d69288fbee4904')
+    ...     RefReader('.').read_hash_ref_pairs()
+    [('4b825dc642cb6eb9a060e54bf8d69288fbee4904', 'refs/tree')]
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_gitrefreader
+#
+# Public Classes:
+#   Error
+#   RefReader
+#    .num_files_read
+#    .read_hash_ref_pairs
+#
+# Public Functions:
+#   get_reader_or_none
+#   read_hash_ref_pairs
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import errno
+import operator
+import os
+import re
+import stat
+import string
+
+_SYMREF_PREFIX = 'ref: '
+
+# git gives up on symbolic refs which are nested deeper than this
+_MAX_SYMREF_DEPTH = 5
+
+_INVALID_REF_CHARS = frozenset(' ~^:?*[\\\x7f') | frozenset(
+    chr(i) for i in xrange(0x20))
+
+_HEX_DIGITS = frozenset(string.hexdigits)
+
+# the number of times to read the refs again if 'packed-refs' changed while we
+# were reading them, before giving up
+_MAX_READ_ATTEMPTS = 3
+
+# the peeled values of tags in 'packed-refs', which we don't need
+_PACKED_PEELED_RE = re.compile(r'^\^.*\n?', re.M)
+
+
+class Error(Exception):
+    pass
+
+
+class RefReader(object):
+
+    def __init__(self, working_dir):
+        """Create a reader for the git repository at 'working_dir'.
+
+        Nothing is read until the first call to 'read_hash_ref_pairs'.
+
+        :working_dir: the string path of the repository
+
+        """
+        self._working_dir = working_dir
+        self._git_dir = None
+
+        self._packed_stat_key = None
+        self._packed_hash_ref_pairs = []
+        self._packed_names = []
+
+        # map of loose ref names to (stat key, string contents of the file)
+        self._loose_name_to_stat_contents = {}
+
+        self._hash_ref_pairs = None
+        self._num_files_read = 0
+
+    @property
+    def num_files_read(self):
+        """Return the number of ref files this reader has read."""
+        return self._num_files_read
+
+    def read_hash_ref_pairs(self):
+        """Return a list of (sha1, name) tuples of the refs in the repository.
+
+        The list is sorted by name and is the same as 'git show-ref' would
+        give. If nothing has changed since the last call then the same list
+        is returned again, callers mustn't modify it.
+
+        Raise Error if the repository isn't in a form that we can read, or if
+        'packed-refs' keeps changing while we read.
+
+        :returns: a list of (sha1, name)
+
+        """
+        git_dir = self._get_git_dir()
+        packed_path = os.path.join(git_dir, 'packed-refs')
+
+        # read the loose refs before 'packed-refs', as git does. If 'git
+        # pack-refs' moves a ref from loose to packed while we're reading then
+        # it's written to 'packed-refs' before the loose file is deleted, so
+        # we'll see it in one or the other. Read again if 'packed-refs'
+        # changed in the meantime, the loose refs may have been pruned.
+        is_changed = False
+        for _ in xrange(_MAX_READ_ATTEMPTS):
+            packed_stat_key = _get_stat_key_or_none(packed_path)
+            is_changed |= self._refresh_loose(git_dir)
+            is_changed |= self._refresh_packed(packed_path)
+            if self._packed_stat_key == packed_stat_key:
+                break
+        else:
+            # we've remembered what we read, make sure it's merged next time
+            self._hash_ref_pairs = None
+            raise Error("'packed-refs' changed while reading refs")
+
+        if is_changed or self._hash_ref_pairs is None:
+            self._hash_ref_pairs = self._merge()
+        return self._hash_ref_pairs
+
+    def _get_git_dir(self):
+        if self._git_dir is None:
+            git_dir = os.path.join(self._working_dir, '.git')
+            if not os.path.isdir(git_dir):
+                # perhaps a bare repository
+                git_dir = self._working_dir
+            if not os.path.isdir(os.path.join(git_dir, 'refs')):
+                raise Error("no 'refs' dir in {}".format(git_dir))
+            if os.path.exists(os.path.join(git_dir, 'commondir')):
+                raise Error("worktrees aren't supported")
+            if os.path.exists(os.path.join(git_dir, 'reftable')):
+                raise Error("reftable isn't supported")
+            self._git_dir = git_dir
+        return self._git_dir
+
+    def _refresh_packed(self, path):
+        stat_key = _get_stat_key_or_none(path)
+        if stat_key == self._packed_stat_key:
+            return False
+
+        hash_ref_pairs = []
+        if stat_key is not None:
+            with open(path) as f:
+                text = f.read()
+            self._num_files_read += 1
+
+            is_sorted = False
+            if text.startswith('#'):
+                header, _, text = text.partition('\n')
+                is_sorted = ' sorted' in header
+            if '\n^' in text:
+                text = _PACKED_PEELED_RE.sub('', text)
+
+            # splitting all the lines at once is much quicker than splitting
+            # them one by one, count the words to make sure each line had two
+            words = text.split()
+            num_lines = text.count('\n') + (not text.endswith('\n'))
+            if len(words) != num_lines * 2 and words:
+                raise Error("can't parse packed-refs")
+            if words and not _is_sha1(words[0]):
+                raise Error("can't parse packed-refs")
+            hash_ref_pairs = zip(words[0::2], words[1::2])
+
+            if not is_sorted:
+                hash_ref_pairs.sort(key=operator.itemgetter(1))
+
+        self._packed_stat_key = stat_key
+        self._packed_hash_ref_pairs = hash_ref_pairs
+        self._packed_names = map(operator.itemgetter(1), hash_ref_pairs)
+        return True
+
+    def _refresh_loose(self, git_dir):
+        old = self._loose_name_to_stat_contents
+        new = {}
+        is_changed = False
+        for name, path, stat_key in _iter_loose_ref_files(git_dir):
+            stat_contents = old.get(name)
+            if stat_contents is None or stat_contents[0] != stat_key:
+                contents = _read_loose_or_none(path)
+                if contents is None:
+                    # deleted since we listed it
+                    continue
+                self._num_files_read += 1
+                if not _is_valid_ref_name(name):
+                    raise Error("invalid ref name: {}".format(name))
+                if not _is_sha1(contents):
+                    if not contents.startswith(_SYMREF_PREFIX):
+                        raise Error("can't parse ref {}: {}".format(
+                            name, contents))
+                stat_contents = (stat_key, contents)
+                is_changed = True
+            new[name] = stat_contents
+
+        if len(new) != len(old):
+            is_changed = True
+        self._loose_name_to_stat_contents = new
+        return is_changed
+
+    def _merge(self):
+        # there are usually many more packed refs than loose ones, so work
+        # from the sorted list of packed refs rather than sorting everything
+        loose_name_to_sha1 = {}
+        symref_to_target = {}
+        for name, (_, contents) in self._loose_name_to_stat_contents.items():
+            if contents.startswith(_SYMREF_PREFIX):
+                symref_to_target[name] = contents[len(_SYMREF_PREFIX):]
+            else:
+                loose_name_to_sha1[name] = contents
+
+        # like git, leave out symbolic refs which don't resolve to anything
+        for name, target in symref_to_target.iteritems():
+            for _ in xrange(_MAX_SYMREF_DEPTH):
+                if target not in symref_to_target:
+                    break
+                target = symref_to_target[target]
+            sha1 = loose_name_to_sha1.get(target)
+            if sha1 is None:
+                sha1 = self._get_packed_sha1_or_none(target)
+            if sha1 is not None:
+                loose_name_to_sha1[name] = sha1
+
+        if not loose_name_to_sha1:
+            return self._packed_hash_ref_pairs
+
+        # loose refs take precedence over packed ones of the same name
+        hash_ref_pairs = self._packed_hash_ref_pairs
+        overridden = set(
+            name for name in loose_name_to_sha1
+            if self._get_packed_sha1_or_none(name) is not None)
+        if overridden:
+            hash_ref_pairs = [
+                pair for pair in hash_ref_pairs if pair[1] not in overridden
+            ]
+
+        # the packed refs are already sorted and there are few loose refs, so
+        # sorting them together is cheap
+        hash_ref_pairs = hash_ref_pairs + [
+            (s, n) for n, s in loose_name_to_sha1.iteritems()
+        ]
+        hash_ref_pairs.sort(key=operator.itemgetter(1))
+        return hash_ref_pairs
+
+    def _get_packed_sha1_or_none(self, name):
+        index = bisect.bisect_left(self._packed_names, name)
+        if index < len(self._packed_names):
+            if self._packed_names[index] == name:
+                return self._packed_hash_ref_pairs[index][0]
+        return None
+
+
+def get_reader_or_none(repo):
+    """Return the RefReader of 'repo', or None if it doesn't have one.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :returns: a RefReader or None
+
+    """
+    return getattr(repo, 'ref_reader', None)
+
+
+def read_hash_ref_pairs(repo):
+    """Return the result of 'read_hash_ref_pairs' on the RefReader of 'repo'.
+
+    Raise Error if 'repo' has no reader or it can't read the refs, in which
+    case the caller should fall back to running git.
+
+    :repo: a callable supporting git commands, e.g. repo("status")
+    :returns: a list of (sha1, name)
+
+    """
+    reader = get_reader_or_none(repo)
+    if reader is None:
+        raise Error("repo has no ref reader")
+    return reader.read_hash_ref_pairs()
+
+
+def _iter_loose_ref_files(git_dir):
+    # yield (name, path, stat key) for each loose ref file, note that we
+    # 'lstat' each entry only once, as that's most of the cost
+    dir_stack = ['refs']
+    while dir_stack:
+        dir_name = dir_stack.pop()
+        dir_path = os.path.join(git_dir, dir_name)
+        try:
+            entries = os.listdir(dir_path)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                # deleted since we listed it, e.g. by 'git pack-refs'
+                continue
+            raise
+        for entry in entries:
+            if entry.endswith('.lock'):
+                # git is in the middle of writing this ref
+                continue
+            name = dir_name + '/' + entry
+            path = os.path.join(dir_path, entry)
+            try:
+                st = os.lstat(path)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+            if stat.S_ISDIR(st.st_mode):
+                dir_stack.append(name)
+            elif stat.S_ISREG(st.st_mode):
+                yield name, path, (st.st_mtime, st.st_size, st.st_ino)
+            else:
+                raise Error("unexpected file type for ref: {}".format(name))
+
+
+def _get_stat_key_or_none(path):
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+    return st.st_mtime, st.st_size, st.st_ino
+
+
+def _read_loose_or_none(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except IOError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+
+
+def _is_sha1(text):
+    return len(text) in (40, 64) and _HEX_DIGITS.issuperset(text)
+
+
+def _is_valid_ref_name(name):
+    # a subset of the rules that 'git check-ref-format' applies, enough for
+    # names that git would refuse to list
+    if '..' in name or '@{' in name or name.endswith('.'):
+        return False
+    if not _INVALID_REF_CHARS.isdisjoint(name):
+        return False
+    return all(
+        part and not part.startswith('.') and not part.endswith('.lock')
+        for part in name.split('/'))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
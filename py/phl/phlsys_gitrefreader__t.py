@@ -0,0 +1,215 @@
+"""Test suite for phlsys_gitrefreader."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] agrees with 'git show-ref' for loose and packed refs
+# [ A] loose refs take precedence over packed refs
+# [ A] symbolic refs are resolved, dangling ones are left out
+# [ A] lock files are ignored
+# [ B] unchanged files aren't read again
+# [ B] the same list is returned if nothing changed
+# [ C] changes, deletions and packing of refs are seen
+# [ D] raises Error for refs which git would complain about
+# [ D] raises Error for repositories it doesn't support
+# [ E] refs packed by 'git pack-refs' during a read aren't missed
+# [ E] raises Error if 'packed-refs' keeps changing during reads
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Caching
+# [ C] test_C_Changes
+# [ D] test_D_Unsupported
+# [ E] test_E_PackedDuringRead
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import contextlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import phlsys_git
+
+import phlsys_gitrefreader
+
+
+@contextlib.contextmanager
+def _during_loose_scan_context(action):
+    # call 'action' after the first loose ref is found by each scan
+    iter_loose_ref_files = phlsys_gitrefreader._iter_loose_ref_files
+
+    def iter_and_act(git_dir):
+        for i, loose_ref in enumerate(iter_loose_ref_files(git_dir)):
+            yield loose_ref
+            if i == 0:
+                action()
+
+    phlsys_gitrefreader._iter_loose_ref_files = iter_and_act
+    try:
+        yield
+    finally:
+        phlsys_gitrefreader._iter_loose_ref_files = iter_loose_ref_files
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.repo = phlsys_git.Repo(self.tmp_dir)
+        self.repo('init')
+        self._commit_new_file('add README', 'README', 'hello\n')
+        self.head = self.repo('rev-parse', 'HEAD').strip()
+        self.git_dir = os.path.join(self.tmp_dir, '.git')
+        self.reader = phlsys_gitrefreader.RefReader(self.tmp_dir)
+
+    def tearDown(self):
+        self.repo.object_reader.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _commit_new_file(self, message, relative_path, contents):
+        with open(os.path.join(self.tmp_dir, relative_path), 'w') as f:
+            f.write(contents)
+        self.repo('add', relative_path)
+        self.repo('commit', '-m', message, '--', relative_path)
+
+    def _write_ref_file(self, name, contents):
+        with open(os.path.join(self.git_dir, name), 'w') as f:
+            f.write(contents)
+
+    def _show_ref(self):
+        return [
+            tuple(line.split())
+            for line in self.repo('show-ref').splitlines()
+        ]
+
+    def _assert_agrees_with_git(self):
+        self.assertEqual(self.reader.read_hash_ref_pairs(), self._show_ref())
+
+    def test_A_Breathing(self):
+        self.repo('tag', '-a', '-m', 'tag', 'packedtag')
+        self.repo('branch', 'packed')
+        self.repo('pack-refs', '--all')
+        self._commit_new_file('add NEWS', 'NEWS', 'news\n')
+        self.repo('branch', 'loose')
+
+        # [ A] agrees with 'git show-ref' for loose and packed refs
+        # [ A] loose refs take precedence over packed refs
+        self._assert_agrees_with_git()
+        self.assertNotIn(
+            (self.head, 'refs/heads/master'),
+            self.reader.read_hash_ref_pairs())
+
+        # [ A] symbolic refs are resolved, dangling ones are left out
+        self.repo('symbolic-ref', 'refs/remotes/origin/HEAD', 'refs/heads/x')
+        self._assert_agrees_with_git()
+        self.repo(
+            'symbolic-ref', 'refs/remotes/origin/HEAD', 'refs/heads/packed')
+        self._assert_agrees_with_git()
+
+        # [ A] lock files are ignored
+        self._write_ref_file('refs/heads/new.lock', self.head + '\n')
+        self._assert_agrees_with_git()
+
+    def test_B_Caching(self):
+        self.repo('branch', 'other')
+        pairs = self.reader.read_hash_ref_pairs()
+        num_files_read = self.reader.num_files_read
+
+        # [ B] unchanged files aren't read again
+        # [ B] the same list is returned if nothing changed
+        self.assertIs(self.reader.read_hash_ref_pairs(), pairs)
+        self.assertEqual(self.reader.num_files_read, num_files_read)
+
+        self.repo('update-ref', 'refs/heads/other', 'HEAD')
+        self._commit_new_file('add NEWS', 'NEWS', 'news\n')
+        self._assert_agrees_with_git()
+        self.assertEqual(self.reader.num_files_read, num_files_read + 1)
+
+    def test_C_Changes(self):
+        self.repo('branch', 'other')
+        self.repo('branch', 'gone')
+        self._assert_agrees_with_git()
+
+        # [ C] changes, deletions and packing of refs are seen
+        self._commit_new_file('add NEWS', 'NEWS', 'news\n')
+        self._assert_agrees_with_git()
+        self.repo('branch', '-D', 'gone')
+        self._assert_agrees_with_git()
+        self.repo('pack-refs', '--all')
+        self._assert_agrees_with_git()
+        self.repo('branch', '-D', 'other')
+        self._assert_agrees_with_git()
+
+    def test_D_Unsupported(self):
+        self.reader.read_hash_ref_pairs()
+
+        # [ D] raises Error for refs which git would complain about
+        self._write_ref_file('refs/heads/bad', 'garbage\n')
+        with self.assertRaises(phlsys_gitrefreader.Error):
+            self.reader.read_hash_ref_pairs()
+        os.remove(os.path.join(self.git_dir, 'refs/heads/bad'))
+        self._write_ref_file('refs/heads/sp ace', self.head + '\n')
+        with self.assertRaises(phlsys_gitrefreader.Error):
+            self.reader.read_hash_ref_pairs()
+        os.remove(os.path.join(self.git_dir, 'refs/heads/sp ace'))
+        self._assert_agrees_with_git()
+
+        # [ D] raises Error for repositories it doesn't support
+        worktree_dir = os.path.join(self.tmp_dir, 'worktree')
+        self.repo('worktree', 'add', '--detach', worktree_dir)
+        worktree_reader = phlsys_gitrefreader.RefReader(worktree_dir)
+        with self.assertRaises(phlsys_gitrefreader.Error):
+            worktree_reader.read_hash_ref_pairs()
+
+    def test_E_PackedDuringRead(self):
+        self.repo('branch', 'other')
+        self.repo('tag', 'mytag')
+        expected = self._show_ref()
+        self.assertEqual(3, len(expected))
+
+        # [ E] refs packed by 'git pack-refs' during a read aren't missed
+        def pack_refs():
+            self.repo('pack-refs', '--all')
+
+        with _during_loose_scan_context(pack_refs):
+            self.assertEqual(expected, self.reader.read_hash_ref_pairs())
+        self._assert_agrees_with_git()
+
+        # [ E] raises Error if 'packed-refs' keeps changing during reads
+        packed_path = os.path.join(self.git_dir, 'packed-refs')
+        self.repo('branch', 'loose')
+        mtime_list = [0]
+
+        def touch_packed_refs():
+            mtime_list[0] += 1
+            os.utime(packed_path, (mtime_list[0], mtime_list[0]))
+
+        with _during_loose_scan_context(touch_packed_refs):
+            with self.assertRaises(phlsys_gitrefreader.Error):
+                self.reader.read_hash_ref_pairs()
+        self._assert_agrees_with_git()
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,101 @@
+"""Assign keys to nodes with consistent hashing.
+
+Consistent hashing assigns each key to one of a set of nodes such that when a
+node is added or removed, only the keys belonging to that node move. Keys
+assigned to the other nodes stay where they were.
+
+Usage example:
+
+    >>> ring = HashRing(['alpha', 'beta', 'gamma'])
+    >>> ring.get_node('myrepo') in ['alpha', 'beta', 'gamma']
+    True
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_hashring
+#
+# Public Classes:
+#   HashRing
+#    .nodes
+#    .get_node
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+import hashlib
+
+# each node appears at this many points on the ring, which evens out the
+# share of keys that each node receives
+_DEFAULT_REPLICAS = 64
+
+
+class HashRing(object):
+
+    def __init__(self, node_list, replicas=_DEFAULT_REPLICAS):
+        """Create a ring which distributes keys over the nodes in 'node_list'.
+
+        :node_list: a list of unique strings naming the nodes
+        :replicas: the number of points on the ring for each node
+
+        """
+        if replicas < 1:
+            raise ValueError(
+                "'replicas' must be at least 1, got {}".format(replicas))
+
+        self._nodes = sorted(set(node_list))
+        point_node_list = []
+        for node in self._nodes:
+            for i in xrange(replicas):
+                point = _hash('{}#{}'.format(node, i))
+                point_node_list.append((point, node))
+        point_node_list.sort()
+
+        self._points = [p for p, _ in point_node_list]
+        self._point_nodes = [n for _, n in point_node_list]
+
+    @property
+    def nodes(self):
+        return list(self._nodes)
+
+    def get_node(self, key):
+        """Return the node which 'key' is assigned to, None if no nodes.
+
+        :key: the string to assign to a node
+        :returns: a string from the 'node_list' passed on construction
+
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key))
+        if index == len(self._points):
+            index = 0
+        return self._point_nodes[index]
+
+
+def _hash(text):
+    return int(hashlib.md5(text).hexdigest()[:16], 16)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,107 @@
+"""Test suite for phlsys_hashring."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] get_node() returns None when there are no nodes
+# [ A] get_node() returns the only node when there is one node
+# [ B] get_node() returns the same node for the same key every time
+# [ B] rings made from the same nodes in any order agree
+# [ C] keys are spread over all the nodes
+# [ D] adding a node only moves keys to the new node
+# [ D] removing a node only moves keys from the removed node
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_Stable
+# [ C] test_C_Spread
+# [ D] test_D_MinimalMovement
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import phlsys_hashring
+
+
+_KEY_LIST = ['repo{}'.format(i) for i in xrange(1000)]
+
+
+class Test(unittest.TestCase):
+
+    def test_A_Breathing(self):
+
+        # [ A] get_node() returns None when there are no nodes
+        ring = phlsys_hashring.HashRing([])
+        self.assertIsNone(ring.get_node('key'))
+
+        # [ A] get_node() returns the only node when there is one node
+        ring = phlsys_hashring.HashRing(['alpha'])
+        for key in _KEY_LIST:
+            self.assertEqual(ring.get_node(key), 'alpha')
+
+    def test_B_Stable(self):
+        ring = phlsys_hashring.HashRing(['alpha', 'beta', 'gamma'])
+        ring2 = phlsys_hashring.HashRing(['gamma', 'alpha', 'beta'])
+        for key in _KEY_LIST:
+            node = ring.get_node(key)
+
+            # [ B] get_node() returns the same node for the same key every time
+            self.assertEqual(node, ring.get_node(key))
+
+            # [ B] rings made from the same nodes in any order agree
+            self.assertEqual(node, ring2.get_node(key))
+
+    def test_C_Spread(self):
+        node_list = ['alpha', 'beta', 'gamma', 'delta']
+        ring = phlsys_hashring.HashRing(node_list)
+        node_to_count = {node: 0 for node in node_list}
+        for key in _KEY_LIST:
+            node_to_count[ring.get_node(key)] += 1
+
+        # [ C] keys are spread over all the nodes
+        fair_share = len(_KEY_LIST) // len(node_list)
+        for count in node_to_count.itervalues():
+            self.assertGreater(count, fair_share // 2)
+
+    def test_D_MinimalMovement(self):
+        ring = phlsys_hashring.HashRing(['alpha', 'beta', 'gamma'])
+        bigger_ring = phlsys_hashring.HashRing(
+            ['alpha', 'beta', 'gamma', 'delta'])
+        smaller_ring = phlsys_hashring.HashRing(['alpha', 'gamma'])
+
+        for key in _KEY_LIST:
+            node = ring.get_node(key)
+
+            # [ D] adding a node only moves keys to the new node
+            bigger_node = bigger_ring.get_node(key)
+            if bigger_node != node:
+                self.assertEqual(bigger_node, 'delta')
+
+            # [ D] removing a node only moves keys from the removed node
+            smaller_node = smaller_ring.get_node(key)
+            if smaller_node != node:
+                self.assertEqual(node, 'beta')
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,309 @@
+"""Re-use HTTP connections between requests, with keep-alive.
+
+Each request made via urllib2.urlopen() opens a new connection, which means a
+new TCP handshake and TLS negotiation for every request. A ConnectionPool
+keeps connections alive for each combination of host and proxy, so that
+subsequent requests may re-use them.
+
+Connections aren't shared with forked processes, a pool used in a new process
+will make new connections of its own.
+
+Proxies are chosen as urllib2 would, from the 'proxies' supplied with each
+request or from the environment if none are supplied.
+
+Redirects are followed as urllib2 would follow them, except that the POST is
+repeated at the new location for all but '303 See Other'; urllib2 would
+drop the body, which is the whole of a conduit request.
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# phlsys_httpconnpool
+#
+# Public Classes:
+#   ConnectionPool
+#    .num_connections_made
+#    .post
+#    .close
+#
+# Public Functions:
+#   get_default_pool
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import StringIO
+import base64
+import errno
+import httplib
+import os
+import socket
+import urllib
+import urllib2
+import urlparse
+
+_DEFAULT_TIMEOUT = 600
+
+# errors which mean that a kept-alive connection was closed by the server
+# before our request was read, it's safe to retry these on a new connection
+_STALE_CONNECTION_ERRNOS = (errno.ECONNRESET, errno.EPIPE)
+
+# statuses which mean that the request should be made again at the url in
+# the 'Location' header, '303 See Other' means to GET it instead
+_REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+_SEE_OTHER_STATUS = 303
+
+# as urllib2.HTTPRedirectHandler.max_redirections
+_MAX_REDIRECTS = 10
+
+_DEFAULT_POOL = None
+
+
+class ConnectionPool(object):
+
+    def __init__(self, timeout=_DEFAULT_TIMEOUT):
+        """Create an empty pool.
+
+        :timeout: the number of seconds to wait on connections before failing
+
+        """
+        self._timeout = timeout
+        self._key_to_connection = {}
+        self._pid = os.getpid()
+        self._num_connections_made = 0
+
+    @property
+    def num_connections_made(self):
+        """Return the number of connections this process has opened."""
+        self._reset_if_forked()
+        return self._num_connections_made
+
+    def post(self, url, body, proxies=None):
+        """Return the content from POSTing 'body' to 'url'.
+
+        Raise urllib2.HTTPError if the response status isn't a success, like
+        urllib2.urlopen() does. Redirects are followed, up to a limit.
+
+        :url: the string url to post to
+        :body: the string body of the request, urlencoded form data
+        :proxies: a dict of url schemes to proxy urls, like the parameter to
+                  urllib2.ProxyHandler, or None to use the environment's
+        :returns: the string content of the response
+
+        """
+        self._reset_if_forked()
+
+        method = 'POST'
+        for _ in xrange(_MAX_REDIRECTS + 1):
+            response, content = self._request(method, url, body, proxies)
+
+            if response.status not in _REDIRECT_STATUSES:
+                break
+
+            location = response.getheader('location')
+            if location is None:
+                break
+            url = _get_redirect_url(url, location, response, content)
+            if response.status == _SEE_OTHER_STATUS:
+                method = 'GET'
+                body = None
+        else:
+            raise urllib2.HTTPError(
+                url,
+                response.status,
+                "more than {} redirects, the last was: {}".format(
+                    _MAX_REDIRECTS, response.reason),
+                response.msg,
+                StringIO.StringIO(content))
+
+        if not 200 <= response.status < 300:
+            raise urllib2.HTTPError(
+                url,
+                response.status,
+                response.reason,
+                response.msg,
+                StringIO.StringIO(content))
+
+        return content
+
+    def close(self):
+        """Close all the connections in the pool.
+
+        :returns: None
+
+        """
+        self._reset_if_forked()
+        for connection in self._key_to_connection.itervalues():
+            connection.close()
+        self._key_to_connection = {}
+
+    def _request(self, method, url, body, proxies):
+        split_url = urlparse.urlsplit(url)
+        proxy = _select_proxy(split_url, proxies)
+        key = (split_url.scheme, split_url.hostname, split_url.port, proxy)
+
+        # take the connection out of the pool while we use it, so that a
+        # broken connection is never put back
+        connection = self._key_to_connection.pop(key, None)
+        is_reused = connection is not None
+        if connection is None:
+            connection = self._connect(split_url, proxy)
+
+        try:
+            try:
+                response = _request(
+                    connection, method, split_url, proxy, body)
+            except (httplib.BadStatusLine, httplib.CannotSendRequest,
+                    socket.error) as e:
+                if not is_reused or not _is_stale_connection_error(e):
+                    raise
+                connection.close()
+                connection = self._connect(split_url, proxy)
+                response = _request(
+                    connection, method, split_url, proxy, body)
+            content = response.read()
+        except Exception:
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._key_to_connection[key] = connection
+
+        return response, content
+
+    def _connect(self, split_url, proxy):
+        self._num_connections_made += 1
+        is_https = split_url.scheme == 'https'
+
+        if proxy is None:
+            if is_https:
+                connection_type = httplib.HTTPSConnection
+            else:
+                connection_type = httplib.HTTPConnection
+            return connection_type(
+                split_url.hostname, split_url.port, timeout=self._timeout)
+
+        split_proxy = _split_proxy(proxy)
+        if is_https:
+            # tunnel through the proxy, so that TLS is end-to-end
+            connection = httplib.HTTPSConnection(
+                split_proxy.hostname, split_proxy.port, timeout=self._timeout)
+            connection.set_tunnel(
+                split_url.hostname,
+                split_url.port,
+                _make_proxy_auth_headers(split_proxy))
+            return connection
+
+        return httplib.HTTPConnection(
+            split_proxy.hostname, split_proxy.port, timeout=self._timeout)
+
+    def _reset_if_forked(self):
+        pid = os.getpid()
+        if pid != self._pid:
+            # the connections belong to the parent process, we mustn't close
+            # them in case that affects the parent, just forget them
+            self._key_to_connection = {}
+            self._num_connections_made = 0
+            self._pid = pid
+
+
+def get_default_pool():
+    """Return a ConnectionPool shared by the whole process.
+
+    :returns: a ConnectionPool
+
+    """
+    global _DEFAULT_POOL
+    if _DEFAULT_POOL is None:
+        _DEFAULT_POOL = ConnectionPool()
+    return _DEFAULT_POOL
+
+
+def _request(connection, method, split_url, proxy, body):
+    headers = {}
+    if body is not None:
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+    if proxy is not None and split_url.scheme != 'https':
+        # plain http proxies expect the full url
+        path = split_url.geturl()
+        headers.update(_make_proxy_auth_headers(_split_proxy(proxy)))
+    else:
+        path = split_url.path or '/'
+        if split_url.query:
+            path += '?' + split_url.query
+
+    connection.request(method, path, body, headers)
+    return connection.getresponse()
+
+
+def _get_redirect_url(url, location, response, content):
+    # the location may be relative, like urllib2 we only follow it to http
+    # and https urls, e.g. not to 'file://'
+    new_url = urlparse.urljoin(url, location)
+    if urlparse.urlsplit(new_url).scheme not in ('http', 'https'):
+        raise urllib2.HTTPError(
+            url,
+            response.status,
+            "refusing to redirect to {}".format(new_url),
+            response.msg,
+            StringIO.StringIO(content))
+    return new_url
+
+
+def _is_stale_connection_error(e):
+    if isinstance(e, socket.timeout):
+        # the server may still be processing the request, don't send it twice
+        return False
+    if isinstance(e, socket.error):
+        return e.errno in _STALE_CONNECTION_ERRNOS
+    return True
+
+
+def _select_proxy(split_url, proxies):
+    if proxies is None:
+        if urllib.proxy_bypass(split_url.hostname):
+            return None
+        proxies = urllib.getproxies()
+    return proxies.get(split_url.scheme)
+
+
+def _split_proxy(proxy):
+    # urllib2 allows proxies to be specified without a scheme
+    if '://' not in proxy:
+        proxy = 'http://' + proxy
+    return urlparse.urlsplit(proxy)
+
+
+def _make_proxy_auth_headers(split_proxy):
+    if split_proxy.username is None:
+        return {}
+    credentials = '{}:{}'.format(
+        urllib.unquote(split_proxy.username),
+        urllib.unquote(split_proxy.password or ''))
+    return {'Proxy-Authorization': 'Basic ' + base64.b64encode(credentials)}
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
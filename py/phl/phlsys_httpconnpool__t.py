@@ -0,0 +1,272 @@
+"""Test suite for phlsys_httpconnpool."""
+# =============================================================================
+#                                   TEST PLAN
+# -----------------------------------------------------------------------------
+# Here we detail the things we are concerned to test and specify which tests
+# cover those concerns.
+#
+# Concerns:
+# [ A] ConnectionPool posts the body and returns the content
+# [ A] ConnectionPool re-uses one connection for many requests
+# [ B] ConnectionPool makes a new connection if the server asks to close
+# [ B] ConnectionPool retries on a new connection if a kept-alive one is stale
+# [ C] ConnectionPool raises urllib2.HTTPError for unsuccessful statuses
+# [ C] ConnectionPool makes a new connection after an error status
+# [ D] ConnectionPool makes new connections in forked processes
+# [ D] ConnectionPool still re-uses connections in the parent after a fork
+# [ E] ConnectionPool sends the full url and credentials to http proxies
+# [ F] ConnectionPool repeats the POST at the location of redirects
+# [ F] ConnectionPool follows relative redirects
+# [ F] ConnectionPool GETs the location of '303 See Other' redirects
+# [ F] ConnectionPool raises urllib2.HTTPError for redirect loops
+# [ F] ConnectionPool raises urllib2.HTTPError for redirects to non-http urls
+# -----------------------------------------------------------------------------
+# Tests:
+# [ A] test_A_Breathing
+# [ B] test_B_ClosedConnections
+# [ C] test_C_ErrorStatus
+# [ D] test_D_Fork
+# [ E] test_E_HttpProxy
+# [ F] test_F_Redirect
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import BaseHTTPServer
+import SocketServer
+import json
+import multiprocessing
+import unittest
+import urllib2
+
+import phlsys_httpconnpool
+
+
+class _ThreadingHTTPServer(
+        SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+class _EchoHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    # buffer responses, so that they're sent in as few packets as possible,
+    # otherwise small writes are delayed by Nagle's algorithm on kept-alive
+    # connections
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.connection_count.get_lock():
+            self.server.connection_count.value += 1
+
+    def do_POST(self):
+        if self.path.startswith('/redirect/'):
+            # e.g. '/redirect/307/target' redirects to '/target'
+            _, _, status, location = self.path.split('/', 3)
+            if '://' not in location:
+                location = '/' + location
+            self._redirect(int(status), location)
+            return
+
+        if self.path == '/loop':
+            self._redirect(302, '/loop')
+            return
+
+        body = self.rfile.read(
+            int(self.headers.getheader('Content-Length', 0)))
+        content = json.dumps({
+            'method': self.command,
+            'path': self.path,
+            'body': body,
+            'proxy_auth': self.headers.getheader('Proxy-Authorization'),
+        })
+
+        status = 500 if self.path.endswith('/error') else 200
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(content)))
+        if self.path.endswith('/close'):
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(content)
+
+        if self.path.endswith('/drop'):
+            # close the connection without telling the client, as servers do
+            # when kept-alive connections have been idle for too long
+            self.close_connection = 1
+
+    do_GET = do_POST
+
+    def _redirect(self, status, location):
+        self.rfile.read(int(self.headers.getheader('Content-Length', 0)))
+        self.send_response(status)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass  # don't print output to stderr
+
+
+def _serve_forever(connection_count, port_sender):
+    httpd = _ThreadingHTTPServer(('localhost', 0), _EchoHandler)
+    httpd.connection_count = connection_count
+    port_sender.send(httpd.server_address[1])
+    port_sender.close()
+    httpd.serve_forever()
+
+
+def _post_in_child(url, pool, result_sender):
+    pool.post(url, 'child')
+    result_sender.send(pool.num_connections_made)
+    result_sender.close()
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.connection_count = multiprocessing.Value('i', 0)
+        port_receiver, port_sender = multiprocessing.Pipe(duplex=False)
+        self.server = multiprocessing.Process(
+            target=_serve_forever,
+            args=(self.connection_count, port_sender))
+        self.server.start()
+        port_sender.close()
+        self.base_url = 'http://localhost:{}'.format(port_receiver.recv())
+        self.pool = phlsys_httpconnpool.ConnectionPool()
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.terminate()
+        self.server.join()
+
+    def _post(self, leaf, body='body'):
+        content = self.pool.post(self.base_url + leaf, body, proxies={})
+        return json.loads(content)
+
+    def test_A_Breathing(self):
+        # [ A] ConnectionPool posts the body and returns the content
+        result = self._post('/api/conduit.ping', 'hello')
+        self.assertEqual('/api/conduit.ping', result['path'])
+        self.assertEqual('hello', result['body'])
+
+        # [ A] ConnectionPool re-uses one connection for many requests
+        for _ in xrange(10):
+            self._post('/api/conduit.ping')
+        self.assertEqual(1, self.pool.num_connections_made)
+        self.assertEqual(1, self.connection_count.value)
+
+    def test_B_ClosedConnections(self):
+        # [ B] ConnectionPool makes a new connection if the server asks to
+        #      close
+        self._post('/close')
+        self._post('/')
+        self.assertEqual(2, self.pool.num_connections_made)
+
+        # [ B] ConnectionPool retries on a new connection if a kept-alive one
+        #      is stale
+        self._post('/drop')
+        result = self._post('/after_drop')
+        self.assertEqual('/after_drop', result['path'])
+        self.assertEqual(3, self.pool.num_connections_made)
+
+    def test_C_ErrorStatus(self):
+        self._post('/')
+
+        # [ C] ConnectionPool raises urllib2.HTTPError for unsuccessful
+        #      statuses
+        with self.assertRaises(urllib2.HTTPError) as context:
+            self._post('/error')
+        self.assertEqual(500, context.exception.code)
+        self.assertEqual('/error', json.load(context.exception)['path'])
+
+        # [ C] ConnectionPool makes a new connection after an error status
+        self._post('/')
+        self.assertEqual(1, self.pool.num_connections_made)
+
+    def test_D_Fork(self):
+        url = self.base_url + '/'
+        self.pool.post(url, 'parent', proxies={})
+
+        # [ D] ConnectionPool makes new connections in forked processes
+        result_receiver, result_sender = multiprocessing.Pipe(duplex=False)
+        child = multiprocessing.Process(
+            target=_post_in_child, args=(url, self.pool, result_sender))
+        child.start()
+        result_sender.close()
+        self.assertEqual(1, result_receiver.recv())
+        child.join()
+        self.assertEqual(2, self.connection_count.value)
+
+        # [ D] ConnectionPool still re-uses connections in the parent after a
+        #      fork
+        self.pool.post(url, 'parent', proxies={})
+        self.assertEqual(1, self.pool.num_connections_made)
+        self.assertEqual(2, self.connection_count.value)
+
+    def test_E_HttpProxy(self):
+        # treat our server as a proxy, it will receive the full url
+        proxy = self.base_url.replace('http://', 'http://alice:secret@')
+        content = self.pool.post(
+            'http://example.invalid/api/user.whoami',
+            'body',
+            proxies={'http': proxy})
+        result = json.loads(content)
+
+        # [ E] ConnectionPool sends the full url and credentials to http
+        #      proxies
+        self.assertEqual(
+            'http://example.invalid/api/user.whoami', result['path'])
+        self.assertEqual('Basic YWxpY2U6c2VjcmV0', result['proxy_auth'])
+
+    def test_F_Redirect(self):
+        # [ F] ConnectionPool repeats the POST at the location of redirects
+        for status in (301, 302, 307, 308):
+            result = self._post('/redirect/{}/target'.format(status))
+            self.assertEqual('POST', result['method'])
+            self.assertEqual('/target', result['path'])
+            self.assertEqual('body', result['body'])
+        self.assertEqual(1, self.pool.num_connections_made)
+
+        # [ F] ConnectionPool follows relative redirects
+        result = self._post('/redirect/302/redirect/307/target')
+        self.assertEqual('/target', result['path'])
+
+        # [ F] ConnectionPool GETs the location of '303 See Other' redirects
+        result = self._post('/redirect/303/target')
+        self.assertEqual('GET', result['method'])
+        self.assertEqual('/target', result['path'])
+        self.assertEqual('', result['body'])
+
+        # [ F] ConnectionPool raises urllib2.HTTPError for redirect loops
+        with self.assertRaises(urllib2.HTTPError) as context:
+            self._post('/loop')
+        self.assertEqual(302, context.exception.code)
+
+        # [ F] ConnectionPool raises urllib2.HTTPError for redirects to
+        #      non-http urls
+        with self.assertRaises(urllib2.HTTPError) as context:
+            self._post('/redirect/302/file:///etc/passwd')
+        self.assertEqual(302, context.exception.code)
+        self.assertIn('file:///etc/passwd', context.exception.msg)
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -82,7 +82,11 @@ def add_argparse_arguments(parser):
 
 def make_conduit(uri=None, user=None, cert=None, act_as_user=None):
     uri, user, cert, _ = get_uri_user_cert_explanation(uri, user, cert)
-    return phlsys_conduit.Conduit(uri, user, cert, act_as_user)
+    # take turns with any other tools calling the same instance as the same
+    # user, e.g. arcyd
+    governor = phlsys_conduit.make_governor(uri, user)
+    return phlsys_conduit.Conduit(
+        uri, user, cert, act_as_user, governor=governor)
 
 
 def obscured_cert(cert):
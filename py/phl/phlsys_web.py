@@ -1,4 +1,12 @@
-"""Tools for managing a web server."""
+"""Tools for managing a web server.
+
+The SimpleWebServer serves files like 'python -m SimpleHTTPServer', with some
+of the behaviour of production web servers that clients may rely on.
+Connections are kept alive between requests and responses carry an 'ETag'.
+Conditional requests are answered with '304 Not Modified' when appropriate,
+either via 'If-None-Match' or 'If-Modified-Since'.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -19,8 +27,13 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import BaseHTTPServer
+import SimpleHTTPServer
+import SocketServer
+import email.utils
+import multiprocessing
+import os
 import socket
-import subprocess
 
 import phlsys_pid
 
@@ -37,14 +50,81 @@ class SimpleWebServer(object):
 
     def __init__(self, root_path, port):
         self._root_path = root_path
-        self._process = subprocess.Popen(
-            ['python', '-m', 'SimpleHTTPServer', str(port)],
-            cwd=root_path)
+        self._process = multiprocessing.Process(
+            target=_serve_forever, args=(root_path, port))
+        self._process.start()
 
     def close(self):
         pid = self._process.pid
         phlsys_pid.request_terminate(pid)
-        self._process.wait()
+        self._process.join()
+
+
+class _ThreadingHTTPServer(
+        SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    # connections are kept alive, so serve each in its own thread otherwise
+    # one idle client would block all the others
+    daemon_threads = True
+
+
+class _ConditionalRequestHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+
+    # HTTP/1.1 keeps connections alive by default
+    protocol_version = 'HTTP/1.1'
+
+    # buffer responses, so that they're sent in as few packets as possible,
+    # otherwise small writes are delayed by Nagle's algorithm on kept-alive
+    # connections
+    wbufsize = -1
+
+    def send_head(self):
+        self._etag = None
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self._etag = '"{:x}-{:x}-{:x}"'.format(
+                stat.st_ino, stat.st_size, int(stat.st_mtime * 1000000))
+            if self._is_not_modified(stat.st_mtime):
+                self.send_response(304)
+                self.send_header(
+                    'Last-Modified', self.date_time_string(stat.st_mtime))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return None
+
+        return SimpleHTTPServer.SimpleHTTPRequestHandler.send_head(self)
+
+    def end_headers(self):
+        if getattr(self, '_etag', None) is not None:
+            self.send_header('ETag', self._etag)
+        SimpleHTTPServer.SimpleHTTPRequestHandler.end_headers(self)
+
+    def log_message(self, format, *args):
+        pass  # don't print output to stderr
+
+    def _is_not_modified(self, mtime):
+        # 'If-None-Match' takes precedence over 'If-Modified-Since'
+        if_none_match = self.headers.getheader('If-None-Match')
+        if if_none_match is not None:
+            etags = [e.strip() for e in if_none_match.split(',')]
+            return self._etag in etags or '*' in etags
+
+        if_modified_since = self.headers.getheader('If-Modified-Since')
+        if if_modified_since is not None:
+            parsed = email.utils.parsedate_tz(if_modified_since)
+            if parsed is not None:
+                return int(mtime) <= email.utils.mktime_tz(parsed)
+
+        return False
+
+
+def _serve_forever(root_path, port):
+    os.chdir(root_path)
+    httpd = _ThreadingHTTPServer(('', port), _ConditionalRequestHandler)
+    httpd.serve_forever()
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2015 Bloomberg Finance L.P.
 #
@@ -10,16 +10,22 @@
 #      socket on that port
 # [ B] SimpleWebServer starts without any error
 # [ B] SimpleWebServer serves correct content
+# [ C] SimpleWebServer answers 'If-None-Match' with 304 if unchanged
+# [ C] SimpleWebServer answers 'If-Modified-Since' with 304 if unchanged
+# [ C] SimpleWebServer serves changed content despite validators
+# [ C] SimpleWebServer keeps connections alive between requests
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] test_A_pick_free_port
 # [ B] test_B_webserver
+# [ C] test_C_conditional_requests
 # =============================================================================
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import httplib
 import os
 import socket
 import tempfile
@@ -56,6 +62,49 @@ class Test(unittest.TestCase):
 
         server.close()
 
+    def test_C_conditional_requests(self):
+        port = phlsys_web.pick_free_port()
+        dirpath = tempfile.mkdtemp()
+        filepath = os.path.join(dirpath, 'index.html')
+        phlsys_fs.write_text_file(filepath, 'Hello World')
+        server = phlsys_web.SimpleWebServer(dirpath, port)
+        time.sleep(1)
+
+        connection = httplib.HTTPConnection('localhost', port)
+
+        def get(headers):
+            connection.request('GET', '/index.html', headers=headers)
+            response = connection.getresponse()
+            return response, response.read()
+
+        response, content = get({})
+        self.assertEqual(200, response.status)
+        etag = response.getheader('ETag')
+        last_modified = response.getheader('Last-Modified')
+        sock = connection.sock
+
+        # [ C] SimpleWebServer answers 'If-None-Match' with 304 if unchanged
+        response, content = get({'If-None-Match': etag})
+        self.assertEqual(304, response.status)
+        self.assertEqual('', content)
+
+        # [ C] SimpleWebServer answers 'If-Modified-Since' with 304 if
+        #      unchanged
+        response, content = get({'If-Modified-Since': last_modified})
+        self.assertEqual(304, response.status)
+
+        # [ C] SimpleWebServer keeps connections alive between requests
+        self.assertIs(sock, connection.sock)
+
+        # [ C] SimpleWebServer serves changed content despite validators
+        phlsys_fs.write_text_file(filepath, 'Hello Again World')
+        response, content = get({'If-None-Match': etag})
+        self.assertEqual(200, response.status)
+        self.assertEqual('Hello Again World', content)
+
+        connection.close()
+        server.close()
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2015 Bloomberg Finance L.P.
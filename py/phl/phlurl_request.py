@@ -1,4 +1,11 @@
-"""Utilities for making requests with URLs."""
+"""Utilities for making requests with URLs.
+
+Requests to different hosts are made concurrently, requests to the same host
+are made one after another on a single kept-alive connection. Threads are
+only used while requests are in progress, they're always finished before
+returning.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -10,12 +17,15 @@
 # Public Functions:
 #   join_url
 #   split_url
+#   get_many_conditional
 #   get_many
 #   get
 #
 # Public Assignments:
 #   SplitUrlResult
 #   GroupUrlResult
+#   Validators
+#   ConditionalGetResult
 #
 # -----------------------------------------------------------------------------
 # (this contents block is generated, edits will be lost)
@@ -24,14 +34,19 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import Queue
 import base64
 import collections
 import httplib
+import threading
 import traceback
 import urlparse
 
 _HTTPLIB_TIMEOUT = 600
 
+# the maximum number of hosts to make requests to at once
+_DEFAULT_MAX_WORKERS = 8
+
 
 def join_url(base_url, leaf):
     """Return the result of joining two parts of a url together.
@@ -60,6 +75,14 @@ GroupUrlResult = collections.namedtuple(
     'phlurl_request__GroupUrlResult',
     ['http', 'https'])
 
+Validators = collections.namedtuple(
+    'phlurl_request__Validators',
+    ['etag', 'last_modified'])
+
+ConditionalGetResult = collections.namedtuple(
+    'phlurl_request__ConditionalGetResult',
+    ['status', 'content', 'validators'])
+
 
 class Error(Exception):
     pass
@@ -146,9 +169,9 @@ def _group_urls(url_list):
     return GroupUrlResult(http=http_requests, https=https_requests)
 
 
-def _request(connection, verb, request):
+def _request(connection, verb, request, extra_headers=None):
     try:
-        headers = {}
+        headers = dict(extra_headers or {})
         if request.username:
             auth = base64.b64encode(
                 '%s:%s' % (request.username, request.password))
@@ -157,7 +180,7 @@ def _request(connection, verb, request):
                            url=request.path,
                            headers=headers)
         response = connection.getresponse()
-        return (response.status, response.read())
+        return (response.status, response.read(), response)
     except Exception as e:
         tb = traceback.format_exc()
         message = """Was trying to {verb} the url {request.url}.
@@ -177,36 +200,96 @@ Here is the original traceback:
         raise Error(message)
 
 
-def get_many(url_list):
-    """Return a dict of {url: content_str} from the supplied 'url_list'.
+def _conditional_get(connection, request, validators):
+    headers = {}
+    if validators is not None:
+        if validators.etag is not None:
+            headers['If-None-Match'] = validators.etag
+        if validators.last_modified is not None:
+            headers['If-Modified-Since'] = validators.last_modified
+
+    status, content, response = _request(connection, 'GET', request, headers)
+
+    new_validators = None
+    if status == httplib.OK:
+        new_validators = Validators(
+            response.getheader('ETag'), response.getheader('Last-Modified'))
+        if new_validators == Validators(None, None):
+            new_validators = None
+    elif status == httplib.NOT_MODIFIED:
+        # the server may omit validators which haven't changed
+        new_validators = Validators(
+            response.getheader('ETag', validators.etag),
+            response.getheader('Last-Modified', validators.last_modified))
 
-    Attempts to re-use connections where possible.
+    return ConditionalGetResult(status, content, new_validators)
+
+
+def get_many_conditional(
+        url_to_validators, max_workers=_DEFAULT_MAX_WORKERS):
+    """Return a dict of {url: ConditionalGetResult} for 'url_to_validators'.
+
+    If validators are supplied for a url then the request is conditional, if
+    the content hasn't changed then the status is 304 and the content is
+    empty. The validators in the result may be supplied next time.
+
+    Up to 'max_workers' hosts are requested from at once, connections to each
+    host are re-used.
 
     Note that this shouldn't be used to download large files, there is a
     default timeout in place to prevent blocking for large amounts of time.
 
-    :url_list: a list of string urls, e.g. 'http://www.bloomberg.com/'
-    :returns: a list of string contents
+    :url_to_validators: a dict of string urls to Validators or None
+    :max_workers: the maximum number of hosts to request from at once
+    :returns: a dict of string urls to ConditionalGetResult
 
     """
-    urls = _group_urls(url_list)
+    urls = _group_urls(url_to_validators.iterkeys())
     results = {}
 
+    def make_host_job(connection_type, host_port, request_list):
+        def host_job():
+            connection = connection_type(
+                host_port[0], host_port[1], timeout=_HTTPLIB_TIMEOUT)
+            try:
+                for request in request_list:
+                    results[request.url] = _conditional_get(
+                        connection, request, url_to_validators[request.url])
+            finally:
+                connection.close()
+        return host_job
+
+    job_list = []
     for host_port, request_list in urls.http.iteritems():
-        http = httplib.HTTPConnection(
-            host_port[0], host_port[1], timeout=_HTTPLIB_TIMEOUT)
-        for request in request_list:
-            results[request.url] = _request(http, 'GET', request)
-
+        job_list.append(
+            make_host_job(httplib.HTTPConnection, host_port, request_list))
     for host_port, request_list in urls.https.iteritems():
-        https = httplib.HTTPSConnection(
-            host_port[0], host_port[1], timeout=_HTTPLIB_TIMEOUT)
-        for request in request_list:
-            results[request.url] = _request(https, 'GET', request)
+        job_list.append(
+            make_host_job(httplib.HTTPSConnection, host_port, request_list))
+
+    _run_concurrently(job_list, max_workers)
 
     return results
 
 
+def get_many(url_list, max_workers=_DEFAULT_MAX_WORKERS):
+    """Return a dict of {url: (status, content)} from the supplied 'url_list'.
+
+    Up to 'max_workers' hosts are requested from at once, connections to each
+    host are re-used.
+
+    Note that this shouldn't be used to download large files, there is a
+    default timeout in place to prevent blocking for large amounts of time.
+
+    :url_list: a list of string urls, e.g. 'http://www.bloomberg.com/'
+    :max_workers: the maximum number of hosts to request from at once
+    :returns: a dict of string urls to (status, content)
+
+    """
+    results = get_many_conditional(dict.fromkeys(url_list), max_workers)
+    return {url: r[:2] for url, r in results.iteritems()}
+
+
 def get(url):
     """Return the content of the supplied url.
 
@@ -220,6 +303,44 @@ def get(url):
     return get_many([url])[url]
 
 
+def _run_concurrently(job_list, max_workers):
+    # run each of the callables in 'job_list' on up to 'max_workers' threads,
+    # re-raise the first exception once all the threads have finished
+    if len(job_list) <= 1 or max_workers <= 1:
+        for job in job_list:
+            job()
+        return
+
+    job_queue = Queue.Queue()
+    for job in job_list:
+        job_queue.put(job)
+
+    errors = []
+
+    def worker():
+        while True:
+            try:
+                job = job_queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                job()
+            except Exception as e:
+                errors.append(e)
+
+    thread_list = [
+        threading.Thread(target=worker)
+        for _ in xrange(min(max_workers, len(job_list)))
+    ]
+    for thread in thread_list:
+        thread.start()
+    for thread in thread_list:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2015 Bloomberg Finance L.P.
 #
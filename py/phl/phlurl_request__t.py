@@ -12,6 +12,10 @@
 # [ D] Connections to host are reused for subsequent requests to same host/port
 # [ E] Basic authentication is used if username/password details are provided
 # [ F] '301 moved permanently' HTTP redirection is handled properly
+# [ G] conditional requests for unchanged content return 304, no content
+# [ G] conditional requests for changed content return 200 and the content
+# [ G] conditional requests return validators to supply next time
+# [ H] urls on several hosts can be requested concurrently
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] Test.test_join_url
@@ -21,6 +25,8 @@
 # [ D] HttpTest.test_get_many
 # [CE] HttpTest_Auth.test_get
 # [DE] HttpTest_Auth.test_get_many
+# [ G] HttpTest_Conditional.test_get_many_conditional
+# [ H] HttpTest_Conditional.test_get_many_hosts
 # =============================================================================
 
 from __future__ import absolute_import
@@ -30,8 +36,13 @@ from __future__ import print_function
 import BaseHTTPServer
 import SocketServer
 import multiprocessing
+import socket
+import time
 import unittest
 
+import phlsys_fs
+import phlsys_web
+
 import phlurl_request
 
 
@@ -269,6 +280,87 @@ class HttpTest_Auth(unittest.TestCase):
             port=self.httpd_port)
 
 
+class HttpTest_Conditional(unittest.TestCase):
+
+    def test_get_many_conditional(self):
+        with phlsys_fs.chtmpdir_context() as temp_dir:
+            phlsys_fs.write_text_file('a', 'content a')
+            phlsys_fs.write_text_file('b', 'content b')
+            port = phlsys_web.pick_free_port()
+            server = phlsys_web.SimpleWebServer(temp_dir, port)
+            try:
+                _wait_for_server(port)
+                url_a = 'http://localhost:{}/a'.format(port)
+                url_b = 'http://localhost:{}/b'.format(port)
+
+                results = phlurl_request.get_many_conditional(
+                    {url_a: None, url_b: None})
+                self.assertEqual(200, results[url_a].status)
+                self.assertEqual('content a', results[url_a].content)
+
+                # [ G] conditional requests return validators to supply next
+                #      time
+                validators_a = results[url_a].validators
+                validators_b = results[url_b].validators
+                self.assertIsNotNone(validators_a.etag)
+                self.assertIsNotNone(validators_a.last_modified)
+
+                # change the size of 'b' as well as the content, so that it
+                # looks different even if it's changed within the same second
+                phlsys_fs.write_text_file('b', 'new content b')
+
+                results = phlurl_request.get_many_conditional(
+                    {url_a: validators_a, url_b: validators_b})
+
+                # [ G] conditional requests for unchanged content return 304,
+                #      no content
+                self.assertEqual(304, results[url_a].status)
+                self.assertEqual('', results[url_a].content)
+                self.assertEqual(validators_a, results[url_a].validators)
+
+                # [ G] conditional requests for changed content return 200
+                #      and the content
+                self.assertEqual(200, results[url_b].status)
+                self.assertEqual('new content b', results[url_b].content)
+                self.assertNotEqual(validators_b, results[url_b].validators)
+            finally:
+                server.close()
+
+    def test_get_many_hosts(self):
+        with phlsys_fs.chtmpdir_context() as temp_dir:
+            phlsys_fs.write_text_file('index', 'content')
+            port_list = [phlsys_web.pick_free_port() for _ in xrange(3)]
+            server_list = [
+                phlsys_web.SimpleWebServer(temp_dir, port)
+                for port in port_list
+            ]
+            try:
+                for port in port_list:
+                    _wait_for_server(port)
+                url_list = [
+                    'http://localhost:{}/index'.format(port)
+                    for port in port_list
+                ]
+
+                # [ H] urls on several hosts can be requested concurrently
+                self.assertEqual(
+                    {url: (200, 'content') for url in url_list},
+                    phlurl_request.get_many(url_list, max_workers=2))
+            finally:
+                for server in server_list:
+                    server.close()
+
+
+def _wait_for_server(port):
+    for _ in xrange(100):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise Exception('server on port {} did not start'.format(port))
+
+
 # -----------------------------------------------------------------------------
 # Copyright (C) 2015 Bloomberg Finance L.P.
 #
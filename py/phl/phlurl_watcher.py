@@ -1,4 +1,10 @@
-"""Watch URLs for recent changes, batch updates and re-use connections."""
+"""Watch URLs for recent changes, batch updates and re-use connections.
+
+Refreshes are conditional requests where possible, using the validators that
+the server supplied with the content last time. Content which hasn't changed
+is then not downloaded or hashed again.
+
+"""
 # =============================================================================
 # CONTENTS
 # -----------------------------------------------------------------------------
@@ -6,11 +12,13 @@
 #
 # Public Classes:
 #   Watcher
+#    .is_url_known
 #    .peek_has_url_recently_changed
 #    .has_url_recently_changed
 #    .refresh
 #    .get_data_for_merging
 #    .merge_data_consume_only
+#    .overwrite_data
 #    .load
 #    .dump
 #   FileCacheWatcherWrapper
@@ -27,6 +35,7 @@ from __future__ import print_function
 
 import collections
 import hashlib
+import httplib
 import json
 import os
 
@@ -35,7 +44,15 @@ import phlurl_request
 
 _HashHexdigestHasChanged = collections.namedtuple(
     'phlurl_watcher__HashValueHasChanged',
-    ['hash_hexdigest', 'has_changed'])
+    ['hash_hexdigest', 'has_changed', 'etag', 'last_modified'])
+
+
+def _make_result(value):
+    # earlier versions didn't record validators, so their caches only have
+    # the first two fields
+    value = list(value)
+    value += [None] * (len(_HashHexdigestHasChanged._fields) - len(value))
+    return _HashHexdigestHasChanged(*value)
 
 
 class Watcher(object):
@@ -48,13 +65,22 @@ class Watcher(object):
             self._requester_object = phlurl_request
 
     def _request_and_set_has_changed(self, url, has_changed):
-        (status, content) = self._requester_object.get(url)
+        result = self._requester_object.get_many_conditional({url: None})[url]
+        validators = result.validators or (None, None)
         # pylint: disable=E1101
         self._results[url] = _HashHexdigestHasChanged(
-            hashlib.sha1(content).hexdigest(), has_changed)
+            hashlib.sha1(result.content).hexdigest(), has_changed, *validators)
         # pylint: enable=E1101
         return True
 
+    def is_url_known(self, url):
+        """Return True if the url has been requested before, otherwise False.
+
+        Note that this call never makes a request.
+
+        """
+        return url in self._results
+
     def peek_has_url_recently_changed(self, url):
         """Return True if the url has recently changed, otherwise False.
 
@@ -81,9 +107,8 @@ class Watcher(object):
         if url in self._results:
             old_result = self._results[url].has_changed
             if old_result:
-                hash_hexdigest = self._results[url].hash_hexdigest
-                self._results[url] = _HashHexdigestHasChanged(
-                    hash_hexdigest, False)
+                self._results[url] = self._results[url]._replace(
+                    has_changed=False)
             return old_result
 
         # this is the first query for this url
@@ -93,9 +118,26 @@ class Watcher(object):
     def refresh(self):
         # XXX: it's safe to refresh multiple times - the 'has changed' flag
         #      is only consumed on 'has_url_recently_changed'
-        url_contents = self._requester_object.get_many(self._results.keys())
-        for url, (status, contents) in url_contents.iteritems():
+        url_to_validators = {}
+        for url, result in self._results.iteritems():
+            validators = None
+            if result.etag is not None or result.last_modified is not None:
+                validators = phlurl_request.Validators(
+                    result.etag, result.last_modified)
+            url_to_validators[url] = validators
+
+        url_results = self._requester_object.get_many_conditional(
+            url_to_validators)
+        for url, (status, contents, validators) in url_results.iteritems():
             old_result = self._results[url]
+            if validators is None:
+                validators = (None, None)
+
+            if status == httplib.NOT_MODIFIED:
+                # the content is the same as last time, no need to hash it
+                self._results[url] = old_result._replace(
+                    etag=validators[0], last_modified=validators[1])
+                continue
 
             # Note that hash objects can't be compared directly so we much
             # first convert them to a representation that can be compared, in
@@ -111,7 +153,7 @@ class Watcher(object):
             has_changed = old_result.has_changed or (new_hash != old_hash)
 
             self._results[url] = _HashHexdigestHasChanged(
-                new_hash, has_changed)
+                new_hash, has_changed, *validators)
 
     def get_data_for_merging(self):
         return {k: tuple(v) for k, v in self._results.iteritems()}
@@ -128,16 +170,29 @@ class Watcher(object):
         """
         for key, value in data.iteritems():
             if key not in self._results:
-                self._results[key] = _HashHexdigestHasChanged(*value)
+                self._results[key] = _make_result(value)
 
         overlap = set(self._results.keys()) & set(data.keys())
         for url in overlap:
             ours = self._results[url]
-            theirs = _HashHexdigestHasChanged(*data[url])
+            theirs = _make_result(data[url])
             if ours.hash_hexdigest == theirs.hash_hexdigest:
                 if ours.has_changed and not theirs.has_changed:
-                    self._results[url] = _HashHexdigestHasChanged(
-                        ours.hash_hexdigest, False)
+                    self._results[url] = ours._replace(has_changed=False)
+
+    def overwrite_data(self, data):
+        """Overwrite data for urls in 'data', like get_data_for_merging().
+
+        Unlike 'merge_data_consume_only', this will replace the existing
+        content hash and 'newness' of each url in 'data'. This is useful for
+        bringing a copy of a watcher up to date with the original.
+
+        :data: a dict as returned from get_data_for_merging()
+        :returns: None
+
+        """
+        for key, value in data.iteritems():
+            self._results[key] = _make_result(value)
 
     def load(self, f):
         """Load data from the supplied file pointer, overwriting existing data.
@@ -148,7 +203,7 @@ class Watcher(object):
         """
         results = json.load(f)
         self._results = dict(
-            (k, _HashHexdigestHasChanged(*v)) for k, v in results.iteritems())
+            (k, _make_result(v)) for k, v in results.iteritems())
 
     def dump(self, f):
         """Dump data to the supplied file pointer.
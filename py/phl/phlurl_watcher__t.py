@@ -13,6 +13,12 @@
 # [ D] can't consume newness in merge_data_consume_only() with unmatched hashes
 # [ E] b.merge_data_consume_only(a.get_data_for_merging()) copies elements
 #      which are present in b but not in a.
+# [ F] b.overwrite_data(a.get_data_for_merging()) restores consumed newness
+# [ F] b.overwrite_data(a.get_data_for_merging()) makes b match a
+# [ G] refresh makes conditional requests for content with validators
+# [ G] refresh doesn't download unchanged content again
+# [ G] refresh detects changed content when requesting conditionally
+# [ H] can load a cache from before validators were recorded
 # -----------------------------------------------------------------------------
 # Tests:
 # [ A] test_A_Breathing
@@ -20,16 +26,24 @@
 # [ C] test_C_MergeConsumeMatching
 # [ D] test_D_MergeNotConsumeUnmatching
 # [ E] test_E_MergeConsumeNew
+# [ F] test_F_OverwriteData
+# [ G] test_G_ConditionalRefresh
+# [ H] test_H_LoadWithoutValidators
 # =============================================================================
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import json
+import socket
+import time
 import unittest
 
 import phlsys_fs
+import phlsys_web
 
+import phlurl_request
 import phlurl_watcher
 
 
@@ -49,6 +63,29 @@ class _MockRequesterObject(object):
             result[url] = self.get(url)
         return result
 
+    def get_many_conditional(self, url_to_validators):
+        # never supply validators, so that requests are unconditional
+        result = {}
+        for url in url_to_validators:
+            status, content = self.get(url)
+            result[url] = phlurl_request.ConditionalGetResult(
+                status, content, None)
+        return result
+
+
+class _CountingRequesterObject(object):
+
+    def __init__(self):
+        self.status_list = []
+        self.content_bytes = 0
+
+    def get_many_conditional(self, url_to_validators):
+        results = phlurl_request.get_many_conditional(url_to_validators)
+        for result in results.itervalues():
+            self.status_list.append(result.status)
+            self.content_bytes += len(result.content)
+        return results
+
 
 class Test(unittest.TestCase):
 
@@ -217,6 +254,99 @@ class Test(unittest.TestCase):
             #      elements which are present in b but not in a.
             self.assertEqual(data_after_merge, watcher.get_data_for_merging())
 
+    def test_F_OverwriteData(self):
+
+        requester = _MockRequesterObject()
+        url_a = 'http://a.test'
+        url_b = 'http://b.test'
+
+        watcher = phlurl_watcher.Watcher(requester)
+        self.assertTrue(watcher.peek_has_url_recently_changed(url_a))
+        self.assertTrue(watcher.has_url_recently_changed(url_b))
+
+        # make a copy which has consumed the newness of 'a'
+        watcher2 = phlurl_watcher.Watcher(requester)
+        watcher2.merge_data_consume_only(watcher.get_data_for_merging())
+        self.assertTrue(watcher2.has_url_recently_changed(url_a))
+        self.assertFalse(watcher2.peek_has_url_recently_changed(url_a))
+
+        # [ F] b.overwrite_data(a.get_data_for_merging()) restores consumed
+        #      newness
+        watcher2.overwrite_data(watcher.get_data_for_merging())
+        self.assertTrue(watcher2.peek_has_url_recently_changed(url_a))
+
+        # [ F] b.overwrite_data(a.get_data_for_merging()) makes b match a
+        watcher.refresh()
+        watcher2.overwrite_data(watcher.get_data_for_merging())
+        self.assertEqual(
+            watcher.get_data_for_merging(),
+            watcher2.get_data_for_merging())
+
+    def test_G_ConditionalRefresh(self):
+
+        with phlsys_fs.chtmpdir_context() as temp_dir:
+            content = 'refs ' * 1000
+            phlsys_fs.write_text_file('info_refs', content)
+            port = phlsys_web.pick_free_port()
+            server = phlsys_web.SimpleWebServer(temp_dir, port)
+            try:
+                _wait_for_server(port)
+                url = 'http://localhost:{}/info_refs'.format(port)
+                requester = _CountingRequesterObject()
+                watcher = phlurl_watcher.Watcher(requester)
+
+                self.assertTrue(watcher.has_url_recently_changed(url))
+                self.assertEqual([200], requester.status_list)
+
+                # [ G] refresh makes conditional requests for content with
+                #      validators
+                # [ G] refresh doesn't download unchanged content again
+                for _ in xrange(10):
+                    watcher.refresh()
+                    self.assertFalse(watcher.has_url_recently_changed(url))
+                self.assertEqual([200] + [304] * 10, requester.status_list)
+                self.assertEqual(len(content), requester.content_bytes)
+
+                # [ G] refresh detects changed content when requesting
+                #      conditionally
+                phlsys_fs.write_text_file('info_refs', content + 'new ref')
+                watcher.refresh()
+                self.assertEqual(200, requester.status_list[-1])
+                self.assertTrue(watcher.has_url_recently_changed(url))
+                watcher.refresh()
+                self.assertEqual(304, requester.status_list[-1])
+                self.assertFalse(watcher.has_url_recently_changed(url))
+            finally:
+                server.close()
+
+    def test_H_LoadWithoutValidators(self):
+
+        with phlsys_fs.chtmpdir_context():
+
+            requester = _MockRequesterObject()
+            url = 'http://host.test'
+            cache_path = 'phlurl_watcher_cache.json'
+            phlsys_fs.write_text_file(
+                cache_path, json.dumps({url: ['0' * 40, False]}))
+
+            # [ H] can load a cache from before validators were recorded
+            watcher_cache_wrapper = phlurl_watcher.FileCacheWatcherWrapper(
+                cache_path, requester)
+            watcher = watcher_cache_wrapper.watcher
+            self.assertFalse(watcher.peek_has_url_recently_changed(url))
+            watcher.refresh()
+            self.assertTrue(watcher.has_url_recently_changed(url))
+
+
+def _wait_for_server(port):
+    for _ in xrange(100):
+        try:
+            socket.create_connection(('localhost', port)).close()
+            return
+        except socket.error:
+            time.sleep(0.1)
+    raise Exception('server on port {} did not start'.format(port))
+
 
 # -----------------------------------------------------------------------------
 # Copyright (C) 2013-2015 Bloomberg Finance L.P.
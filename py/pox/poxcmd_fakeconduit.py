@@ -0,0 +1,171 @@
+"""fake-conduit - a local stand-in for Phabricator, for load testing.
+
+Serves the subset of Conduit that Arcyd uses from memory, so that Arcyd may
+be run end to end without a Phabricator install or network access. Calls may
+be delayed, failed and have their sessions expired, to see how Arcyd copes.
+
+The users from the default test install are available, 'phab', 'alice' and
+'bob', with the certificates in phldef_conduit.
+
+"""
+# =============================================================================
+# CONTENTS
+# -----------------------------------------------------------------------------
+# poxcmd_fakeconduit
+#
+# Public Functions:
+#   main
+#
+# -----------------------------------------------------------------------------
+# (this contents block is generated, edits will be lost)
+# =============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+
+import phlcon_fakeserver
+
+_USAGE_EXAMPLES = """
+usage examples:
+    serve on port 8000, with 100ms latency on every call:
+    $ fake-conduit --port 8000 --latency 0.1
+
+    fail 5% of comments and expire sessions after a minute:
+    $ fake-conduit --method-error-rate differential.createcomment=0.05 \\
+        --session-secs 60
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__,
+        epilog=_USAGE_EXAMPLES)
+
+    parser.add_argument(
+        '--host',
+        metavar="ADDRESS",
+        default='127.0.0.1',
+        help="address to serve the conduit on, default is 127.0.0.1")
+
+    parser.add_argument(
+        '--port',
+        metavar="PORT",
+        type=int,
+        default=8000,
+        help="port to serve the conduit on")
+
+    parser.add_argument(
+        '--latency',
+        metavar="SECONDS",
+        type=float,
+        default=0,
+        help="delay every call by this many seconds")
+
+    parser.add_argument(
+        '--method-latency',
+        metavar="METHOD=SECONDS",
+        type=_method_float_pair,
+        action='append',
+        default=[],
+        help="delay calls to METHOD by SECONDS, overrides '--latency'. "
+             "may be specified multiple times.")
+
+    parser.add_argument(
+        '--error-rate',
+        metavar="RATE",
+        type=float,
+        default=0,
+        help="fail this fraction of calls, from 0 to 1")
+
+    parser.add_argument(
+        '--method-error-rate',
+        metavar="METHOD=RATE",
+        type=_method_float_pair,
+        action='append',
+        default=[],
+        help="fail this fraction of calls to METHOD, overrides "
+             "'--error-rate'. may be specified multiple times.")
+
+    parser.add_argument(
+        '--session-secs',
+        metavar="SECONDS",
+        type=float,
+        help="expire sessions after this many seconds, default is never")
+
+    parser.add_argument(
+        '--max-sessions-per-user',
+        metavar="COUNT",
+        type=int,
+        default=5,
+        help="expire the oldest session of a user when they make more than "
+             "this many, default is 5 as in Phabricator")
+
+    parser.add_argument(
+        '--auto-create-users',
+        action='store_true',
+        help="make new users for unknown email addresses, so that commits "
+             "from any author may be reviewed")
+
+    parser.add_argument(
+        '--seed',
+        metavar="INT",
+        type=int,
+        help="seed the injected failures, for repeatable runs")
+
+    args = parser.parse_args()
+
+    phabricator = phlcon_fakeserver.FakePhabricator(
+        base_uri='http://{}:{}'.format(args.host, args.port),
+        session_secs=args.session_secs,
+        max_sessions_per_user=args.max_sessions_per_user,
+        auto_create_users=args.auto_create_users)
+
+    server = phlcon_fakeserver.Server(
+        phabricator,
+        host=args.host,
+        port=args.port,
+        latency_secs=args.latency,
+        error_rate=args.error_rate,
+        method_to_latency_secs=dict(args.method_latency),
+        method_to_error_rate=dict(args.method_error_rate),
+        seed=args.seed)
+
+    print("serving conduit on {}".format(server.uri))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _method_float_pair(text):
+    method, sep, value = text.partition('=')
+    try:
+        if not method or not sep:
+            raise ValueError()
+        return method, float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected METHOD=NUMBER, got '{}'".format(text))
+
+
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
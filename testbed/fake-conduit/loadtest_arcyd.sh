@@ -0,0 +1,149 @@
+# Load test arcyd end to end against a local fake-conduit.
+#
+# Push a number of review branches to a local repo, then time arcyd creating
+# reviews for them, and landing them once they're accepted. Conduit calls are
+# delayed and failed as configured, to see how arcyd copes.
+#
+# usage: loadtest_arcyd.sh [NUM_BRANCHES [LATENCY_SECS [ERROR_RATE]]]
+
+set -e  # exit with error if anything returns non-zero
+set -u  # exit with error if we use an undefined variable
+trap "echo FAILED!; exit 1" EXIT
+
+numbranches=${1:-20}
+latency=${2:-0.05}
+errorrate=${3:-0}
+
+# cd to the dir of this script, so paths are relative
+cd "$(dirname "$0")"
+
+arcyd="$(pwd)/../../proto/arcyd"
+arcyon="$(pwd)/../../bin/arcyon"
+fakeconduit="$(pwd)/../../proto/fake-conduit"
+mail="$(pwd)/../arcyd/savemail"
+
+port=$(python -c 'import socket; s = socket.socket(); s.bind(("", 0)); print(s.getsockname()[1])')
+phaburi="http://127.0.0.1:${port}"
+arcydcert=xnh5tpatpfh4pff4tpnvdv74mh74zkmsualo4l6mx7bb262zqr55vcachxgz7ru3lrv\
+afgzquzl3geyjxw426ujcyqdi2t4ktiv7gmrtlnc3hsy2eqsmhvgifn2vah2uidj6u6hhhxo2j3y2w\
+6lcsehs2le4msd5xsn4f333udwvj6aowokq5l2llvfsl3efcucraawtvzw462q2sxmryg5y5rpicdk\
+3lyr3uvot7fxrotwpi3ty2b2sa2kvlpf
+arcyoncreds="--uri ${phaburi} --user phab --cert ${arcydcert}"
+
+tempdir=$(mktemp -d)
+olddir=$(pwd)
+cd ${tempdir}
+
+# don't inject failures while setting up and checking, only while arcyd runs
+${fakeconduit} \
+    --port ${port} \
+    --latency ${latency} \
+    --method-error-rate differential.createcomment=${errorrate} \
+    --method-error-rate differential.createrevision=${errorrate} \
+    --method-error-rate differential.updaterevision=${errorrate} \
+    --auto-create-users \
+    --seed 0 \
+    > fake-conduit.log 2>&1 &
+fakeconduitpid=$!
+
+function cleanup() {
+    set +e
+    kill ${fakeconduitpid}
+    cd ${olddir}
+    rm -rf ${tempdir}
+}
+trap "echo FAILED!; cleanup; exit 1" EXIT
+
+# wait for the server to come up
+for i in $(seq 50); do
+    if ${arcyon} query ${arcyoncreds} > /dev/null 2>&1; then
+        break
+    fi
+    sleep 0.1
+done
+
+mkdir origin
+git -C origin init -q --bare
+git clone -q origin dev 2> /dev/null
+cd dev
+    git config user.name 'Alice User'
+    git config user.email 'alice@server.test'
+    touch README
+    git add README
+    git commit -q -m 'initial commit'
+    git push -q origin master
+    for i in $(seq ${numbranches}); do
+        git checkout -q -b "arcyd-review/change${i}/master" master
+        echo "change ${i}" > "file${i}"
+        git add "file${i}"
+        git commit -q -m "add file${i}" -m "Test Plan: none"
+    done
+    git push -q origin --all
+cd ..
+
+mkdir arcyd_instance
+cd arcyd_instance
+    ${arcyd} init \
+        --arcyd-email 'arcyd@localhost' \
+        --sleep-secs 0 \
+        --sendmail-binary ${mail} \
+        --sendmail-type catchmail
+    ${arcyd} add-phabricator \
+        --name fake \
+        --instance-uri ${phaburi}/api/ \
+        --review-url-format "${phaburi}/D{review}" \
+        --arcyd-user phab \
+        --arcyd-cert ${arcydcert}
+    ${arcyd} add-repohost \
+        --name fs \
+        --repo-url-format '../{}' \
+        --admin-email 'local-repo-admin@localhost'
+    ${arcyd} add-repo fake fs origin
+cd ..
+
+function run_arcyd() {
+    cd arcyd_instance
+    local start=$(date +%s.%N)
+    # arcyd may exit with an error when failures are injected, carry on
+    ${arcyd} start --no-loop --foreground > /dev/null 2>&1 || true
+    local end=$(date +%s.%N)
+    cd ..
+    echo "$1: $(python -c "print(${end} - ${start})") secs"
+}
+
+function count_reviews() {
+    ${arcyon} query ${arcyoncreds} --status-type $1 --format-type ids | wc -l
+}
+
+run_arcyd "create ${numbranches} reviews"
+echo "open reviews: $(count_reviews open)"
+
+for revisionid in $(${arcyon} query --format-type ids ${arcyoncreds}); do
+    ${arcyon} comment ${revisionid} \
+        --action accept --act-as-user bob ${arcyoncreds} > /dev/null
+done
+
+run_arcyd "land ${numbranches} reviews"
+echo "closed reviews: $(count_reviews closed)"
+
+if [ "${errorrate}" = "0" ]; then
+    test "$(count_reviews closed)" -eq ${numbranches}
+fi
+
+trap - EXIT
+cleanup
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,95 @@
+"""Compare reading commit metadata one commit at a time with batch reading.
+
+Make a temporary repository with a branch of many commits, then read the
+revisions of all of them with a call to 'git log' per commit, as phlgit_log
+used to, with the batch reader and with the streaming reader. Report the
+time taken by each.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlgit_log
+import phlgitu_fixture
+
+
+def _make_commits(repo, num_commits):
+    # fast-import makes the commits much quicker than 'git commit' would,
+    # each commit follows on from the last one on the branch
+    stream = []
+    for i in xrange(num_commits):
+        message = "commit {}\n\nthe body of commit {}\n".format(i, i)
+        stream.append(
+            "commit refs/heads/master\n"
+            "committer Alice <alice@server.test> {} +0000\n"
+            "data {}\n{}\n".format(1400000000 + i, len(message), message))
+        stream.append("M 644 inline file\ndata {}\n{}\n".format(
+            len(str(i)), i))
+    repo("fast-import", "--quiet", stdin="".join(stream))
+
+
+def _one_at_a_time(repo, start):
+    hashes = phlgit_log.get_range_hashes(repo, start, "master")
+    return [phlgit_log.make_revision_from_hash(repo, h) for h in hashes]
+
+
+def _batch(repo, start):
+    hashes = phlgit_log.get_range_hashes(repo, start, "master")
+    return phlgit_log.make_revisions_from_hashes(repo, hashes)
+
+
+def _stream(repo, start):
+    return list(phlgit_log.iter_range_revisions(repo, start, "master"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--commits', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with phlgitu_fixture.temprepo_context() as repo:
+        _make_commits(repo, args.commits + 1)
+        start = phlgit_log.get_last_n_commit_hashes_from_ref(
+            repo, args.commits + 1, "master")[0]
+
+        expected = _one_at_a_time(repo, start)
+        print("revisions: {}".format(len(expected)))
+        for func in (_one_at_a_time, _batch, _stream):
+            assert func(repo, start) == expected
+            secs = timeit.timeit(
+                lambda: func(repo, start), number=args.repeats)
+            print("{}:".format(func.__name__.lstrip('_')))
+            print("  read ms:  {:.1f}".format(secs * 1000 / args.repeats))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
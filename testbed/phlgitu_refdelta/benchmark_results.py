@@ -0,0 +1,115 @@
+"""Compare sending whole ref lists and caches with sending deltas.
+
+Stand in for the results that an arcyd worker returns to the parent process
+for a repository with many refs, where only a few refs changed and a few
+differ cache entries were added. Report the pickled size of the results and
+the time taken to encode them in the worker and merge them in the parent.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import timeit
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlgitu_refdelta
+
+
+class _NoDiffError(Exception):
+    pass
+
+
+def _sha1(text):
+    return hashlib.sha1(text).hexdigest()
+
+
+def _make_state(args):
+    # 'git show-ref' lists refs in order of name
+    old_pairs = sorted(
+        ((_sha1(str(i)), 'refs/remotes/origin/branch/{}'.format(i))
+         for i in xrange(args.refs)),
+        key=lambda pair: pair[1])
+
+    new_pairs = list(old_pairs)
+    for i in xrange(args.changed_refs):
+        sha1, ref = new_pairs[i]
+        new_pairs[i] = (_sha1(sha1), ref)
+
+    def make_entries(start, count):
+        return dict(
+            ((_sha1(str(i)), _sha1(str(-i)), 1000000), _NoDiffError())
+            for i in xrange(start, start + count))
+
+    old_cache = make_entries(0, args.cache_entries)
+    new_entries = make_entries(args.cache_entries, args.new_cache_entries)
+    new_cache = dict(old_cache)
+    new_cache.update(new_entries)
+
+    return old_pairs, new_pairs, old_cache, new_cache, new_entries
+
+
+def _full(old_pairs, new_pairs, old_cache, new_cache, new_entries):
+    # the worker sends everything, the parent replaces its state
+    data = pickle.dumps((new_pairs, new_cache), pickle.HIGHEST_PROTOCOL)
+    pickle.loads(data)
+    return len(data)
+
+
+def _delta(old_pairs, new_pairs, old_cache, new_cache, new_entries):
+    # the worker sends changes, the parent applies them to its state
+    delta = phlgitu_refdelta.make_delta(old_pairs, new_pairs)
+    data = pickle.dumps((delta, new_entries), pickle.HIGHEST_PROTOCOL)
+    delta, entries = pickle.loads(data)
+    phlgitu_refdelta.apply_delta(old_pairs, delta)
+    old_cache.update(entries)
+    return len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--refs', type=int, default=50000)
+    parser.add_argument('--changed-refs', type=int, default=10)
+    parser.add_argument('--cache-entries', type=int, default=5000)
+    parser.add_argument('--new-cache-entries', type=int, default=5)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    state = _make_state(args)
+    for func in (_full, _delta):
+        num_bytes = func(*state)
+        secs = timeit.timeit(lambda: func(*state), number=args.repeats)
+        print("{}:".format(func.__name__.lstrip('_')))
+        print("  bytes transferred:    {}".format(num_bytes))
+        print("  encode and merge ms:  {:.1f}".format(
+            secs * 1000 / args.repeats))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
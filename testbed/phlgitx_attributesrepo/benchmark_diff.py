@@ -0,0 +1,144 @@
+"""Compare diffing with the branch checked out against an attributes repo.
+
+Make a temporary repository with a large tree and two review branches based
+on different versions of it. Diff each branch against master as
+abdt_differresultcache used to, by checking the branch out first, and again
+using phlgitx_attributesrepo, which leaves the working tree alone. Check that
+the diffs are identical and report the time taken by each.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlgit_checkout
+import phlgitu_fixture
+import phlgitx_attributesrepo
+
+
+def _fast_import_commit(ref, from_ref, message, path_content_list):
+    lines = [
+        "commit {}".format(ref),
+        "committer t <t@t> 0 +0000",
+        "data {}".format(len(message)),
+        message,
+    ]
+    if from_ref is not None:
+        lines.append("from {}".format(from_ref))
+    for path, content in path_content_list:
+        lines.append("M 644 inline {}".format(path))
+        lines.append("data {}".format(len(content)))
+        lines.append(content)
+    lines.append("")
+    return "\n".join(lines)
+
+
+def _make_branches(repo, num_files):
+    paths = ["dir{:03}/file{:05}.txt".format(i % 100, i)
+             for i in xrange(num_files)]
+    attributes = [
+        ("dir{:03}/.gitattributes".format(i), "*.bin -diff\n")
+        for i in xrange(0, 100, 10)
+    ]
+
+    # 'old' is a distant base, it touches every file, so checking out one
+    # branch after the other rewrites the whole working tree
+    stream = "".join([
+        _fast_import_commit(
+            "refs/heads/master",
+            None,
+            "initial",
+            [(p, "master {}\n".format(p)) for p in paths] + attributes),
+        _fast_import_commit(
+            "refs/heads/old",
+            "refs/heads/master",
+            "old base",
+            [(p, "old {}\n".format(p)) for p in paths]),
+        _fast_import_commit(
+            "refs/heads/review1",
+            "refs/heads/master",
+            "review 1",
+            [(paths[0], "changed\n"), ("dir000/data.bin", "binary\n")]),
+        _fast_import_commit(
+            "refs/heads/review2",
+            "refs/heads/old",
+            "review 2",
+            [(paths[1], "changed\n"), ("dir010/data.bin", "binary\n")]),
+    ])
+    repo("fast-import", "--quiet", stdin=stream)
+    repo("checkout", "-q", "master")
+
+
+def _diff(repo, branch):
+    return repo("diff", "master...{}".format(branch), "-M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    branches = ['review1', 'review2']
+
+    with phlgitu_fixture.temprepo_context() as repo:
+        _make_branches(repo, args.files)
+
+        def checkout_diffs():
+            diffs = []
+            for branch in branches:
+                phlgit_checkout.branch(repo, branch)
+                diffs.append(_diff(repo, branch))
+            return diffs
+
+        def attributes_diffs():
+            diffs = []
+            for branch in branches:
+                with phlgitx_attributesrepo.attributes_repo_context(
+                        repo, branch) as attributes_repo:
+                    diffs.append(_diff(attributes_repo, branch))
+            return diffs
+
+        expected = checkout_diffs()
+        assert all('Binary files' in diff for diff in expected)
+        assert attributes_diffs() == expected
+
+        print("files: {}".format(args.files))
+        for name, func in (
+                ('checkout', checkout_diffs),
+                ('attributes', attributes_diffs)):
+            secs = timeit.timeit(func, number=args.repeats)
+            print("{}:".format(name))
+            print("  diff ms:  {:.1f}".format(
+                secs * 1000 / (args.repeats * len(branches))))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,113 @@
+"""Compare parent CPU time and result latency of CyclingPool cycles.
+
+Run a number of cycles of jobs which sleep for random amounts of time, as if
+they were waiting on git or the network. Report the CPU time consumed by the
+parent process and the delay between a job finishing in a worker and the
+result being yielded in the parent.
+
+The 'polling' variant reproduces the previous behaviour of CyclingPool, which
+never blocked while waiting for results.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlmp_cyclingpool
+
+
+class _SleepJob(object):
+
+    def __init__(self, sleep_secs):
+        self.sleep_secs = sleep_secs
+
+    def __call__(self):
+        time.sleep(self.sleep_secs)
+        return time.time()
+
+
+class _PollingPoolList(phlmp_cyclingpool._PoolList):
+
+    def wait_for_events(self, timeout_secs):
+        pass
+
+
+def _cpu_secs():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _run(name, args, make_pool_list):
+    random.seed(0)
+    job_list = [
+        _SleepJob(random.uniform(0, args.max_job_secs))
+        for _ in xrange(args.jobs)
+    ]
+    pool = phlmp_cyclingpool.CyclingPool(
+        job_list, args.workers, args.workers // 2)
+    pool._pool_list = make_pool_list()
+
+    latencies = []
+    start_cpu_secs = _cpu_secs()
+    start_secs = time.time()
+    for _ in xrange(args.cycles):
+        for _, finish_time in pool.cycle_results(args.overrun_secs):
+            latencies.append(time.time() - finish_time)
+    for _, finish_time in pool.finish_results():
+        latencies.append(time.time() - finish_time)
+    wall_secs = time.time() - start_secs
+    cpu_secs = _cpu_secs() - start_cpu_secs
+
+    latencies.sort()
+    cycles = args.cycles
+    print("{}:".format(name))
+    print("  wall secs per cycle:       {:.3f}".format(wall_secs / cycles))
+    print("  parent cpu secs per cycle: {:.3f}".format(cpu_secs / cycles))
+    print("  mean result latency ms:    {:.3f}".format(
+        1000 * sum(latencies) / len(latencies)))
+    print("  max result latency ms:     {:.3f}".format(1000 * latencies[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--max-job-secs', type=float, default=0.2)
+    parser.add_argument('--overrun-secs', type=float, default=1.0)
+    args = parser.parse_args()
+
+    _run('polling', args, _PollingPoolList)
+    _run('event-driven', args, phlmp_cyclingpool._PoolList)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
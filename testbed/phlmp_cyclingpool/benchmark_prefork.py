@@ -0,0 +1,110 @@
+"""Compare fork-per-cycle CyclingPool with PreforkCyclingPool.
+
+Allocate a heap in the parent process to stand in for arcyd's repository
+objects and caches, then cycle jobs which touch a little of that heap. Report
+the wall time per cycle along with the minor page faults and peak RSS of the
+worker processes, which reflect the cost of forking and copy-on-write.
+
+Each variant is run in its own process so that the resource usage of the
+workers may be measured separately.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlmp_cyclingpool
+
+
+class _Job(object):
+
+    def __init__(self, index, heap):
+        self.index = index
+        self.heap = heap
+        self.cycle = 0
+
+    def make_sync_state(self, is_warm):
+        return self.cycle
+
+    def apply_sync_state(self, state):
+        self.cycle = state
+
+    def __call__(self):
+        # touch some of the shared heap, as a job would when reading caches
+        chunk = len(self.heap) // 100
+        start = (self.index * chunk) % len(self.heap)
+        return sum(len(s) for s in self.heap[start:start + chunk])
+
+
+def _run(pool_type, args):
+    heap = ['x' * 1024 for _ in xrange(args.heap_mb * 1024)]
+    job_list = [_Job(i, heap) for i in xrange(args.jobs)]
+    pool = pool_type(job_list, args.workers, args.workers // 2)
+
+    start = time.time()
+    for cycle in xrange(args.cycles):
+        for job in job_list:
+            job.cycle = cycle
+        for _ in pool.cycle_results(overrun_secs=60):
+            pass
+    for _ in pool.finish_results():
+        pass
+    wall_secs = time.time() - start
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    print("{}:".format(pool_type.__name__))
+    print("  wall secs per cycle:            {:.3f}".format(
+        wall_secs / args.cycles))
+    print("  worker minor faults per cycle:  {}".format(
+        usage.ru_minflt // args.cycles))
+    print("  peak worker RSS MB:             {:.1f}".format(
+        usage.ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=400)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--heap-mb', type=int, default=200)
+    args = parser.parse_args()
+
+    for pool_type in (
+            phlmp_cyclingpool.CyclingPool,
+            phlmp_cyclingpool.PreforkCyclingPool):
+        process = multiprocessing.Process(target=_run, args=(pool_type, args))
+        process.start()
+        process.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
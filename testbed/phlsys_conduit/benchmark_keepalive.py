@@ -0,0 +1,166 @@
+"""Compare making conduit calls on new connections with kept-alive ones.
+
+Run a stand-in conduit server locally, which answers every call with an empty
+result and counts the connections made to it. Optionally delay each new
+connection, to stand in for the TCP and TLS handshakes with a remote server.
+
+Make the same calls with a fresh urllib2.urlopen() each time, as
+phlsys_conduit used to, and with phlsys_conduit.Conduit. Report the
+connections made and the latency of each call.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import BaseHTTPServer
+import SocketServer
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import urllib
+import urllib2
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlsys_conduit
+import phlsys_timer
+
+
+class _ThreadingHTTPServer(
+        SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+class _StandInConduitHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    # buffer responses, so that they're sent in as few packets as possible,
+    # otherwise small writes are delayed by Nagle's algorithm on kept-alive
+    # connections
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        time.sleep(self.server.connect_secs)
+        with self.server.connection_count.get_lock():
+            self.server.connection_count.value += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.getheader('Content-Length')))
+        content = json.dumps(
+            {'result': {}, 'error_code': None, 'error_info': None})
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass  # don't print output to stderr
+
+
+def _serve_forever(connect_secs, connection_count, port_sender):
+    httpd = _ThreadingHTTPServer(('localhost', 0), _StandInConduitHandler)
+    httpd.connect_secs = connect_secs
+    httpd.connection_count = connection_count
+    port_sender.send(httpd.server_address[1])
+    port_sender.close()
+    httpd.serve_forever()
+
+
+def _make_urlopen_caller(conduit_uri):
+
+    def call(method):
+        body = urllib.urlencode({
+            "params": json.dumps({"__conduit__": {}}),
+            "output": "json",
+        })
+        json.loads(urllib2.urlopen(conduit_uri + method, body, 600).read())
+
+    return call
+
+
+def _make_pooled_caller(conduit_uri):
+    conduit = phlsys_conduit.Conduit(conduit_uri)
+
+    def call(method):
+        conduit(method)
+
+    return call
+
+
+def _measure(call, num_calls):
+    latency_list = []
+    for _ in xrange(num_calls):
+        timer = phlsys_timer.Timer()
+        timer.start()
+        call('differential.query')
+        latency_list.append(timer.duration)
+    return sorted(latency_list)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument(
+        '--connect-ms',
+        type=float,
+        default=20,
+        help="milliseconds to delay each new connection by")
+    args = parser.parse_args()
+
+    connection_count = multiprocessing.Value('i', 0)
+    port_receiver, port_sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=_serve_forever,
+        args=(args.connect_ms / 1000, connection_count, port_sender))
+    server.start()
+    port_sender.close()
+    conduit_uri = 'http://localhost:{}/api/'.format(port_receiver.recv())
+
+    try:
+        for make_caller in (_make_urlopen_caller, _make_pooled_caller):
+            call = make_caller(conduit_uri)
+            connection_count.value = 0
+            latency_list = _measure(call, args.calls)
+            name = make_caller.__name__[len('_make_'):-len('_caller')]
+            print("{}:".format(name))
+            print("  connections:       {}".format(connection_count.value))
+            print("  mean latency ms:   {:.2f}".format(
+                sum(latency_list) * 1000 / len(latency_list)))
+            print("  median latency ms: {:.2f}".format(
+                latency_list[len(latency_list) // 2] * 1000))
+            print("  max latency ms:    {:.2f}".format(
+                latency_list[-1] * 1000))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------
@@ -0,0 +1,108 @@
+"""Compare listing refs with 'git show-ref' against reading them directly.
+
+Make a temporary repository with many packed refs and some loose refs, then
+list them with 'git show-ref' as phlgit_showref used to, with a new RefReader
+each time, with a RefReader when nothing has changed and with a RefReader
+when a loose ref has changed since the last read. Report the time taken by
+each.
+
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import timeit
+
+# append our module dirs to sys.path, which is the list of paths to search
+# for modules this is so we can import our libraries directly
+# N.B. this magic is only really passable up-front in the entrypoint module
+PARENT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BASE_DIR = os.path.dirname(PARENT_DIR)
+sys.path.append(os.path.join(BASE_DIR, "py", "phl"))
+
+import phlgitu_fixture
+import phlsys_gitrefreader
+
+
+def _make_refs(repo, num_packed, num_loose):
+    repo("commit", "--allow-empty", "-m", "initial")
+    head = repo("rev-parse", "HEAD").strip()
+
+    # refs like those of a busy review repository, trackers and branches
+    packed = ["refs/remotes/origin/r/review/{:06}".format(i)
+              for i in xrange(num_packed)]
+    repo(
+        "update-ref", "--stdin",
+        stdin="".join("create {} {}\n".format(r, head) for r in packed))
+    repo("pack-refs", "--all")
+
+    loose = ["refs/heads/loose/{:06}".format(i) for i in xrange(num_loose)]
+    repo(
+        "update-ref", "--stdin",
+        stdin="".join("create {} {}\n".format(r, head) for r in loose))
+    return head, loose
+
+
+def _show_ref(repo):
+    return [tuple(line.split()) for line in repo("show-ref").splitlines()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packed', type=int, default=100000)
+    parser.add_argument('--loose', type=int, default=1000)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with phlgitu_fixture.temprepo_context() as repo:
+        head, loose = _make_refs(repo, args.packed, args.loose)
+        expected = _show_ref(repo)
+        print("refs: {}".format(len(expected)))
+
+        def new_reader():
+            reader = phlsys_gitrefreader.RefReader(repo.working_dir)
+            return reader.read_hash_ref_pairs()
+
+        warm_reader = phlsys_gitrefreader.RefReader(repo.working_dir)
+        assert warm_reader.read_hash_ref_pairs() == expected
+        assert new_reader() == expected
+
+        for name, func in (
+                ('show_ref', lambda: _show_ref(repo)),
+                ('new_reader', new_reader),
+                ('unchanged', warm_reader.read_hash_ref_pairs)):
+            secs = timeit.timeit(func, number=args.repeats)
+            print("{}:".format(name))
+            print("  list ms:  {:.1f}".format(secs * 1000 / args.repeats))
+
+        # time only the reads, not the changes in between them
+        secs = 0
+        commit = repo("commit-tree", "HEAD^{tree}", "-m", "x").strip()
+        for i in xrange(args.repeats):
+            repo("update-ref", loose[0], commit if i % 2 == 0 else head)
+            secs += timeit.timeit(warm_reader.read_hash_ref_pairs, number=1)
+        assert warm_reader.read_hash_ref_pairs() == _show_ref(repo)
+        print("one_changed:")
+        print("  list ms:  {:.1f}".format(secs * 1000 / args.repeats))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# -----------------------------------------------------------------------------
+# Copyright (C) 2016 Bloomberg Finance L.P.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ------------------------------ END-OF-FILE ----------------------------------